@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+自适应容量搜索
+作者: AI Assistant
+用途: 以配置 thresholds 中的成功率、响应时间与 CPU 上限为 SLO，按倍增确定区间、二分逼近拐点，
+      再以完整测试时长确认，自动找出满足 SLO 的最大并发量（闭环）或到达率（开环），
+      替代逐个跑完固定并发量列表的全量扫描
+"""
+
+import os
+import asyncio
+import csv
+import json
+import logging
+import resource
+import time
+from datetime import datetime
+
+from resource_sampler import CLK_TCK, read_system_cpu
+
+SEARCH_HEADER = ['step', 'stage', 'level', 'seconds', 'total_requests', 'success_rate', 'p99_response_time',
+                 'qps', 'host_cpu_percent', 'passed', 'reason']
+# 主机 CPU 采样间隔（秒）
+CPU_SAMPLE_INTERVAL = 1.0
+# 闭环并发量与开环到达率的最小搜索步长
+MIN_STEP = {'closed': 1, 'open': 1.0}
+
+logger = logging.getLogger('load_generator')
+
+
+def search_settings(config):
+    """合并配置中的 capacity_search 段与默认值"""
+    settings = {
+        'min_concurrency': 5,
+        'max_concurrency': 200,
+        'min_rate': 10.0,
+        'max_rate': 1000.0,
+        'growth_factor': 2.0,
+        'resolution_percent': 10.0,
+        'warmup_seconds': 10,
+        'probe_seconds': 30,
+        'confirm_seconds': 120,
+        'recovery_seconds': 10,
+        'max_confirm_steps': 3
+    }
+    settings.update(config.get('capacity_search', {}))
+    return settings
+
+
+def slo_from_config(config):
+    """由 thresholds 与 safety 配置得到判定条件：P99 响应时间取 response_time_maximum_seconds，
+    避免单个离群请求决定整个级别的结果"""
+    thresholds = config.get('thresholds', {})
+    safety = config.get('safety', {})
+    return {
+        'success_rate_minimum_percent': thresholds.get('success_rate_minimum_percent', 95),
+        'response_time_maximum_seconds': thresholds.get('response_time_maximum_seconds', 5.0),
+        'cpu_maximum_percent': thresholds.get('cpu_critical_percent', 90),
+        'error_rate_threshold_percent': safety.get('error_rate_threshold_percent', 50),
+        'max_test_duration_minutes': safety.get('max_test_duration_minutes', 180)
+    }
+
+
+def generator_cpu_ticks():
+    """负载生成器进程及其子进程（exec 后端的 kbs-client）已用 CPU，换算为 /proc/stat 的时钟滴答"""
+    seconds = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        seconds += usage.ru_utime + usage.ru_stime
+    return seconds * CLK_TCK
+
+
+class HostCpuMeter:
+    """周期读取 /proc/stat，计算跳过预热后的主机 CPU 平均利用率；
+    扣除负载生成器自身的 CPU，使与 KBS 同机运行时只反映被测服务及其他进程的负载"""
+
+    def __init__(self, interval=CPU_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = []
+        self._started = 0.0
+        self._task = None
+
+    async def _run(self):
+        total, idle = read_system_cpu()
+        own = generator_cpu_ticks()
+        while True:
+            await asyncio.sleep(self.interval)
+            current_total, current_idle = read_system_cpu()
+            current_own = generator_cpu_ticks()
+            if current_total > total:
+                busy = (current_total - total) - (current_idle - idle) - (current_own - own)
+                self.samples.append((time.monotonic() - self._started,
+                                     max(busy, 0) / (current_total - total) * 100))
+            total, idle, own = current_total, current_idle, current_own
+
+    def start(self):
+        self.samples = []
+        self._started = time.monotonic()
+        if os.path.exists('/proc/stat'):
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def stop(self, skip_seconds=0):
+        """返回 skip_seconds 之后采样的平均 CPU 利用率（%），无采样时返回 None"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        values = [value for elapsed, value in self.samples if elapsed > skip_seconds]
+        return sum(values) / len(values) if values else None
+
+
+class CapacitySearch:
+    """倍增确定 [通过, 失败] 区间，二分到分辨率以内，再以完整时长确认并在失败时逐步下调"""
+
+    def __init__(self, generator, config, mode='closed', lower=None, upper=None, settings=None):
+        self.generator = generator
+        self.mode = mode
+        self.settings = settings or search_settings(config)
+        self.slo = slo_from_config(config)
+        if mode == 'closed':
+            self.lower = int(lower or self.settings['min_concurrency'])
+            self.upper = int(upper or self.settings['max_concurrency'])
+        else:
+            self.lower = float(lower or self.settings['min_rate'])
+            self.upper = float(upper or self.settings['max_rate'])
+        if self.lower <= 0 or self.upper < self.lower:
+            raise ValueError(f"搜索区间无效: [{self.lower}, {self.upper}]")
+        self.probes = []
+        self.stop_reason = None
+        self._started = time.monotonic()
+
+    def _step(self, level):
+        return max(MIN_STEP[self.mode], level * self.settings['resolution_percent'] / 100)
+
+    def _round(self, level):
+        if self.mode == 'closed':
+            return int(round(level))
+        # 到达率保留 3 位有效数字，使文件名标签简短
+        return float(f"{level:.3g}")
+
+    def _out_of_time(self):
+        limit = self.slo['max_test_duration_minutes'] * 60
+        if time.monotonic() - self._started > limit:
+            self.stop_reason = f"搜索耗时超过 safety.max_test_duration_minutes ({limit / 60:g} 分钟)"
+            return True
+        return False
+
+    def evaluate(self, result):
+        """按 SLO 判定单个级别，返回 (是否通过, 是否触发安全阈值, 原因)"""
+        reasons = []
+        safety = False
+        error_rate = 100 - result['success_rate'] if result['total_requests'] else 100
+        if result.get('safety_stop'):
+            safety = True
+            reasons.append(result['safety_stop'])
+        elif error_rate > self.slo['error_rate_threshold_percent']:
+            safety = True
+            reasons.append(f"错误率 {error_rate:.1f}% 超过安全阈值 {self.slo['error_rate_threshold_percent']}%")
+        if result['success_rate'] < self.slo['success_rate_minimum_percent']:
+            reasons.append(f"成功率 {result['success_rate']:.2f}% < {self.slo['success_rate_minimum_percent']}%")
+        if result['p99_response_time'] > self.slo['response_time_maximum_seconds']:
+            reasons.append(f"P99 {result['p99_response_time']:.3f}秒 > "
+                           f"{self.slo['response_time_maximum_seconds']}秒")
+        cpu = result.get('host_cpu_percent')
+        if cpu is not None and cpu > self.slo['cpu_maximum_percent']:
+            reasons.append(f"主机 CPU {cpu:.1f}% > {self.slo['cpu_maximum_percent']}%")
+        return not reasons, safety, '; '.join(reasons)
+
+    async def _measure(self, level, seconds):
+        """执行一个级别（无冷却，恢复时间由搜索统一等待），返回吞吐、成功率与 P99"""
+        warmup = self.settings['warmup_seconds']
+        meter = HostCpuMeter().start()
+        try:
+            if self.mode == 'closed':
+                _, stats, _ = await self.generator.run_level(level, seconds, warmup, 0, prefix='capacity_probe')
+                result = {'total_requests': stats.total, 'success_rate': stats.success_rate,
+                          'p99_response_time': stats.p99_time, 'qps': stats.qps}
+            else:
+                _, stats, _ = await self.generator.run_open_loop(level, seconds, warmup, 0)
+                result = {'total_requests': stats.completed, 'success_rate': stats.success_rate,
+                          'p99_response_time': stats.percentiles()[('corrected', 0.99)],
+                          'qps': stats.achieved_rps}
+        finally:
+            result_cpu = await meter.stop(skip_seconds=warmup)
+        result['host_cpu_percent'] = result_cpu
+        result['safety_stop'] = self.generator.clear_safety_stop()
+        return result
+
+    async def probe(self, stage, level, seconds):
+        """测试一个级别并记录，返回是否通过；用户经 /stop 终止时返回 None"""
+        if self.probes:
+            await asyncio.sleep(self.settings['recovery_seconds'])
+        unit = '并发' if self.mode == 'closed' else 'req/s'
+        logger.info(f"容量搜索 [{stage}] {level:g} {unit}, {seconds}秒")
+        result = await self._measure(level, seconds)
+        if self.generator.abort_reason is not None:
+            self.stop_reason = self.generator.abort_reason
+            return None
+        passed, safety, reason = self.evaluate(result)
+        result.update({'step': len(self.probes) + 1, 'stage': stage, 'level': level, 'seconds': seconds,
+                       'passed': passed, 'safety': safety, 'reason': reason})
+        self.probes.append(result)
+        logger.info(f"容量搜索 [{stage}] {level:g} {unit}: {'通过' if passed else '未通过'} "
+                    f"(QPS {result['qps']:.2f}, 成功率 {result['success_rate']:.2f}%, "
+                    f"P99 {result['p99_response_time']:.3f}秒){' - ' + reason if reason else ''}")
+        return passed
+
+    async def run(self):
+        """返回搜索结果字典：capacity 为确认通过的最大级别，未找到时为 None"""
+        probe_seconds = self.settings['probe_seconds']
+        lo, hi = None, None
+
+        # 1. 倍增：从下限开始，直到失败或到达上限；触发安全阈值后不再加压
+        level = self.lower
+        while True:
+            passed = await self.probe('bracket', level, probe_seconds)
+            if passed is None:
+                break
+            if not passed:
+                hi = level
+                break
+            lo = level
+            if level >= self.upper or self._out_of_time():
+                break
+            level = min(self._round(level * self.settings['growth_factor']), self.upper)
+            if level <= lo:
+                level = min(self._round(lo + MIN_STEP[self.mode]), self.upper)
+
+        # 2. 二分：在 (lo, hi) 内逼近拐点，区间不超过分辨率时停止
+        while lo is not None and hi is not None and self.stop_reason is None and not self._out_of_time():
+            if hi - lo <= self._step(lo):
+                break
+            mid = self._round((lo + hi) / 2)
+            if mid <= lo or mid >= hi:
+                break
+            passed = await self.probe('bisect', mid, probe_seconds)
+            if passed is None:
+                break
+            if passed:
+                lo = mid
+            else:
+                hi = mid
+
+        # 3. 确认：以完整时长复测，未通过时按分辨率逐步下调
+        capacity = None
+        candidate = lo
+        for _ in range(self.settings['max_confirm_steps']):
+            if candidate is None or self.stop_reason is not None or self._out_of_time():
+                break
+            passed = await self.probe('confirm', candidate, self.settings['confirm_seconds'])
+            if passed is None:
+                break
+            if passed:
+                capacity = candidate
+                break
+            hi = candidate
+            candidate = self._round(candidate - self._step(candidate))
+            if candidate < self.lower:
+                break
+
+        return self.summary(capacity, lo, hi)
+
+    def summary(self, capacity, best_probe, first_failure):
+        confirmed = [p for p in self.probes if p['stage'] == 'confirm' and p['level'] == capacity and p['passed']]
+        return {
+            'mode': self.mode,
+            'capacity': capacity,
+            'capacity_qps': confirmed[-1]['qps'] if confirmed else None,
+            'capacity_p99': confirmed[-1]['p99_response_time'] if confirmed else None,
+            'best_probe_level': best_probe,
+            'first_failing_level': first_failure,
+            'search_range': [self.lower, self.upper],
+            'slo': self.slo,
+            'settings': self.settings,
+            'stop_reason': self.stop_reason,
+            'elapsed_seconds': round(time.monotonic() - self._started, 1),
+            'probes': self.probes
+        }
+
+
+def write_search_results(output_dir, summary):
+    """写出逐级别结果 CSV 与搜索摘要 JSON，返回摘要文件路径"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    base = os.path.join(output_dir, f"capacity_search_{summary['mode']}_{timestamp}")
+    with open(base + '.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(SEARCH_HEADER)
+        for probe in summary['probes']:
+            cpu = probe['host_cpu_percent']
+            writer.writerow([probe['step'], probe['stage'], probe['level'], probe['seconds'],
+                             probe['total_requests'], f"{probe['success_rate']:.2f}",
+                             f"{probe['p99_response_time']:.6f}", f"{probe['qps']:.2f}",
+                             '' if cpu is None else f"{cpu:.1f}", int(probe['passed']), probe['reason']])
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return base + '.json'
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+原始数据存储
+作者: AI Assistant
+用途: 负载生成器与资源采样器的逐请求/逐采样记录按列式压缩格式（Parquet，需 pyarrow）写出，
+      报告按需只读取所需列、分块或内存映射加载；未安装 pyarrow 时回退为 CSV，
+      CSV 仍可作为已有结果目录的导入/导出格式
+"""
+
+import os
+import sys
+import argparse
+import csv
+import glob
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+DATA_FORMATS = ('parquet', 'csv')
+FORMAT_EXTENSIONS = {'parquet': '.parquet', 'csv': '.csv'}
+# Parquet 行组大小：缓冲到该行数才写出一个行组，避免大量小行组拖慢读取
+ROW_GROUP_ROWS = 65536
+# CSV 分块读取的行数
+CHUNK_ROWS = 200000
+PARQUET_COMPRESSION = 'zstd'
+
+
+def _to_float(value):
+    return None if value is None or value == '' else float(value)
+
+
+def _to_int(value):
+    return None if value is None or value == '' else int(value)
+
+
+def _to_str(value):
+    return None if value is None else str(value)
+
+
+def _to_timestamp(value):
+    if value is None or value == '':
+        return None
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+# 列类型：(写 Parquet 前的值转换, 读 CSV 时的 pandas dtype)
+COLUMN_TYPES = {
+    'float': (_to_float, 'float64'),
+    'int': (_to_int, 'Int64'),
+    'str': (_to_str, 'string'),
+    'timestamp': (_to_timestamp, None)
+}
+# 测试阶段：请求记录的 test_phase 列取值；只有 steady 阶段计入报告的统计结果
+TEST_PHASES = ('warmup', 'steady', 'cooldown')
+# 负载生成器在结果目录中追加写出的阶段日志：各阶段起止 epoch 秒，报告据此为资源采样标注所处阶段；
+# test_name 为级别数据文件的前缀（concurrent_test、stress_detail、capacity_probe、open_loop_test 等），
+# 与 run_id 一起区分共享数据目录中历次运行及同一并发量的批量测试与压力测试
+PHASE_LOG_FILE = 'test_phases.csv'
+PHASE_LOG_HEADER = ['mode', 'label', 'test_phase', 'start_time', 'end_time', 'test_name', 'run_id']
+
+# 请求记录、资源采样与服务端指标记录中的非浮点列，未列出的列均按 float 处理
+RAW_COLUMN_TYPES = {
+    'timestamp': 'timestamp',
+    'test_phase': 'str',
+    'request_type': 'str',
+    'request_id': 'str',
+    'process': 'str',
+    'endpoint': 'str',
+    'metric': 'str',
+    'labels': 'str',
+    'comm': 'str',
+    'error_msg': 'str',
+    'response_code': 'int',
+    'pid': 'int',
+    'ppid': 'int',
+    'threads': 'int',
+    'fds': 'int',
+    'process_count': 'int',
+    'tcp_established': 'int',
+    'tcp_time_wait': 'int',
+    'tcp_close_wait': 'int',
+    'tcp_listen': 'int',
+    'tcp_other': 'int'
+}
+
+
+def resolve_format(requested):
+    """确定实际使用的数据格式：请求 parquet 但未安装 pyarrow 时回退为 csv，调用方据返回值提示"""
+    data_format = (requested or 'csv').lower()
+    if data_format not in DATA_FORMATS:
+        raise ValueError(f"不支持的数据格式: {requested}（可选 {', '.join(DATA_FORMATS)}）")
+    if data_format == 'parquet' and pa is None:
+        return 'csv'
+    return data_format
+
+
+def data_path(base, data_format):
+    """不含扩展名的路径加上数据格式对应的扩展名"""
+    return base + FORMAT_EXTENSIONS[data_format]
+
+
+def _arrow_type(type_name):
+    if type_name == 'timestamp':
+        return pa.timestamp('ms')
+    return {'float': pa.float64(), 'int': pa.int64(), 'str': pa.string()}[type_name]
+
+
+class CsvTableWriter:
+    """逐行写 CSV，flush 时写盘；CSV 不带列类型，读取时由 read_table 按列类型转换"""
+
+    def __init__(self, path, header):
+        self.path = path
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetTableWriter:
+    """按列类型转换后以行组写出 Parquet；不足一个行组的数据在 close 时写出"""
+
+    def __init__(self, path, header, types=RAW_COLUMN_TYPES):
+        self.path = path
+        self.header = list(header)
+        self._types = [types.get(column, 'float') for column in self.header]
+        self._schema = pa.schema([(column, _arrow_type(type_name))
+                                  for column, type_name in zip(self.header, self._types)])
+        self._writer = pq.ParquetWriter(path, self._schema, compression=PARQUET_COMPRESSION)
+        self._rows = []
+
+    def write_rows(self, rows):
+        self._rows.extend(rows)
+        if len(self._rows) >= ROW_GROUP_ROWS:
+            self._write_group()
+
+    def _write_group(self):
+        if not self._rows:
+            return
+        columns = list(zip(*self._rows))
+        arrays = []
+        for values, type_name, field in zip(columns, self._types, self._schema):
+            convert = COLUMN_TYPES[type_name][0]
+            arrays.append(pa.array([convert(value) for value in values], type=field.type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+        self._rows = []
+
+    def flush(self):
+        # Parquet 文件在 close 写出文件尾之前不可读，flush 只在凑满行组时写盘
+        if len(self._rows) >= ROW_GROUP_ROWS:
+            self._write_group()
+
+    def close(self):
+        self._write_group()
+        self._writer.close()
+
+
+def open_table(path, header, types=RAW_COLUMN_TYPES):
+    """按扩展名打开表写入器：.parquet 为列式格式，其余为 CSV"""
+    if path.endswith(FORMAT_EXTENSIONS['parquet']):
+        if pa is None:
+            raise RuntimeError("写 Parquet 需要 pyarrow: pip3 install pyarrow")
+        return ParquetTableWriter(path, header, types)
+    return CsvTableWriter(path, header)
+
+
+def append_phase_log(directory, rows):
+    """向目录中的阶段日志追加行；旧版日志（缺少 test_name、run_id 列）先补齐空列再追加"""
+    log_file = os.path.join(directory, PHASE_LOG_FILE)
+    header = None
+    existing = []
+    if os.path.exists(log_file):
+        with open(log_file, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header != PHASE_LOG_HEADER:
+                existing = [row + [''] * (len(PHASE_LOG_HEADER) - len(row)) for row in reader]
+    mode = 'a' if header == PHASE_LOG_HEADER else 'w'
+    with open(log_file, mode, newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if mode == 'w':
+            writer.writerow(PHASE_LOG_HEADER)
+            writer.writerows(existing)
+        writer.writerows(rows)
+
+
+def find_tables(data_dir, pattern):
+    """查找 pattern（不含扩展名，如 concurrent_test_*）对应的数据文件，同名文件优先取 Parquet"""
+    tables = {}
+    for data_format in reversed(DATA_FORMATS):
+        for path in glob.glob(os.path.join(data_dir, pattern + FORMAT_EXTENSIONS[data_format])):
+            tables[os.path.splitext(path)[0]] = path
+    return sorted(tables.values())
+
+
+def table_stem(path):
+    """去掉数据格式扩展名后的文件名，用于按文件名解析并发量等信息"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def table_columns(path):
+    """数据文件的列名"""
+    if path.endswith(FORMAT_EXTENSIONS['parquet']):
+        return pq.read_schema(path).names
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), [])
+
+
+def iter_table(path, columns=None, types=RAW_COLUMN_TYPES, chunksize=CHUNK_ROWS):
+    """分块读取数据文件，逐块返回 DataFrame；columns 中文件不存在的列跳过"""
+    import pandas as pd
+
+    available = table_columns(path)
+    if columns is not None:
+        columns = [column for column in columns if column in available]
+    if path.endswith(FORMAT_EXTENSIONS['parquet']):
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    dtype = {column: COLUMN_TYPES[types.get(column, 'float')][1]
+             for column in (columns or available) if types.get(column, 'float') != 'timestamp'}
+    yield from pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize)
+
+
+def read_table(path, columns=None, types=RAW_COLUMN_TYPES):
+    """读取数据文件的指定列：Parquet 内存映射整体读取，CSV 分块解析后拼接"""
+    import pandas as pd
+
+    if path.endswith(FORMAT_EXTENSIONS['parquet']):
+        if columns is not None:
+            available = table_columns(path)
+            columns = [column for column in columns if column in available]
+        return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+    chunks = list(iter_table(path, columns, types))
+    if not chunks:
+        return pd.DataFrame(columns=columns or table_columns(path))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def convert(path, data_format, output=None):
+    """在 CSV 与 Parquet 之间分块转换单个数据文件，返回输出路径"""
+    output = output or data_path(os.path.splitext(path)[0], data_format)
+    if data_format == 'csv':
+        first = True
+        for chunk in iter_table(path):
+            chunk.to_csv(output, index=False, mode='w' if first else 'a', header=first)
+            first = False
+        return output
+    if pa is None:
+        raise RuntimeError("转换为 Parquet 需要 pyarrow: pip3 install pyarrow")
+    header = table_columns(path)
+    writer = ParquetTableWriter(output, header)
+    for chunk in iter_table(path):
+        # 经 object 转换，使 pandas 的缺失值统一为 None
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        writer.write_rows(chunk[header].itertuples(index=False, name=None))
+    writer.close()
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description='原始数据格式转换（CSV <-> Parquet）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    conv = subparsers.add_parser('convert', help='转换数据文件格式，输出与源文件同名、扩展名不同')
+    conv.add_argument('files', nargs='+', help='数据文件')
+    conv.add_argument('--to', choices=DATA_FORMATS, required=True, help='目标格式')
+    export = subparsers.add_parser('export', help='以 CSV 输出到标准输出（供 awk 等文本工具使用）')
+    export.add_argument('file', help='数据文件')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        first = True
+        for chunk in iter_table(args.file):
+            chunk.to_csv(sys.stdout, index=False, header=first)
+            first = False
+        return
+    for path in args.files:
+        print(convert(path, args.to))
+
+
+if __name__ == '__main__':
+    main()
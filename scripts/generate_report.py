@@ -13,26 +13,132 @@ import argparse
 import glob
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import plotly.graph_objects as go
-import plotly.express as px
+from plotly.colors import DEFAULT_PLOTLY_COLORS
 from plotly.subplots import make_subplots
-import plotly.offline as pyo
+from plotly.offline import get_plotlyjs
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import html
 import json
 import logging
+import math
+import re
+
+from data_store import PHASE_LOG_FILE, find_tables, read_table, table_columns, table_stem
+from latency_histogram import LatencyHistogram, bucket_indexes, bucket_upper_bounds, load_artifact, merge_artifacts
+from scalability_model import CONFIDENCE, MIN_LEVELS, NEGLIGIBLE_COEFFICIENT, concurrency_for, fit_usl, predict
+from leak_trend import LEAK_CONFIDENCE, fit_trend, is_leak
+from load_coordinator import agent_breakdown, distributed_settings
+from metrics_scraper import server_metrics_settings, summarize_gauge, summarize_histogram
+import run_catalog
+
+# 请求记录中的协议阶段耗时列（进程内 RCAR 客户端写入，exec 后端为空）
+PHASE_LABELS = {
+    'connect': '建立连接',
+    'tls': 'TLS 握手',
+    'auth': '/auth',
+    'attest': '/attest (AS/RVPS 校验与 token 签发)',
+    'resource': '/resource'
+}
+
+# 数据文件名中的时间戳（YYYYmmdd_HHMMSS），未指定运行标识时每个级别只取最新一批文件
+FILE_TIMESTAMP = re.compile(r'(?<![0-9])\d{8}_\d{6}(?![0-9])')
+
+# 资源采样器采集的操作系统级指标列（旧版资源文件中不存在时跳过）
+OS_METRIC_LABELS = {
+    'voluntary_ctx_per_sec': '自愿上下文切换/秒',
+    'involuntary_ctx_per_sec': '非自愿上下文切换/秒',
+    'minor_faults_per_sec': '次缺页/秒',
+    'major_faults_per_sec': '主缺页/秒',
+    'io_read_bytes_per_sec': '读字节/秒',
+    'io_write_bytes_per_sec': '写字节/秒',
+    'net_rx_bytes_per_sec': '网卡接收字节/秒',
+    'net_tx_bytes_per_sec': '网卡发送字节/秒',
+    'tcp_established': 'ESTABLISHED',
+    'tcp_time_wait': 'TIME_WAIT',
+    'tcp_close_wait': 'CLOSE_WAIT'
+}
+
+# 报告只读取用到的列（Parquet 按列读取，CSV 分块解析时跳过其余列）
+RESOURCE_COLUMNS = ['timestamp', 'epoch_time', 'process', 'cpu_percent', 'memory_rss_mb', 'threads', 'fds',
+                    'process_count'] + list(OS_METRIC_LABELS)
+PERFORMANCE_COLUMNS = ['start_time', 'end_time', 'duration', 'response_code', 'test_phase'] + \
+    [f'{phase}_time' for phase in PHASE_LABELS]
+OPEN_LOOP_COLUMNS = ['intended_time', 'start_time', 'end_time', 'duration', 'corrected_duration', 'response_code',
+                     'test_phase']
+# 已有直方图的并发量只读取原始记录中预热收敛检查用到的列
+WARMUP_COLUMNS = ['start_time', 'end_time', 'duration', 'response_code', 'test_phase']
+SERVER_METRIC_COLUMNS = ['epoch_time', 'endpoint', 'metric', 'labels', 'value']
+# 服务端延迟指标序列的角色（配置 server_metrics.series 的 role）
+SERVER_ROLE_LABELS = {'processing': '处理', 'queueing': '排队', 'downstream': '下游调用'}
+
+# 时间窗口：原始请求记录按完成时刻落入该长度的分箱，直方图文件沿用其统计窗口
+TIMELINE_BIN_SECONDS = 1.0
+# 延迟热力图：时间方向超过该列数时相邻窗口合并，延迟方向按对数等分为该行数
+HEATMAP_MAX_COLUMNS = 240
+HEATMAP_LATENCY_ROWS = 48
+# 分位数带
+BAND_QUANTILES = (0.50, 0.90, 0.99)
+# 某并发量的 P99 达到最低并发量 P99 的该倍数时视为延迟拐点
+KNEE_P99_FACTOR = 2.0
+# 拐点处服务 CPU 达到其各并发量均值峰值的该比例（且不低于 SATURATION_MIN_CPU）时视为饱和：CPU 已不再随负载增长
+SATURATION_CPU_RATIO = 0.9
+SATURATION_MIN_CPU = 5.0
+# 主机整体 CPU 使用率达到该值时视为整机饱和
+SATURATION_HOST_CPU = 90.0
+# 计算相关系数所需的最少时间点数
+MIN_CORRELATION_POINTS = 5
+# 预热收敛检查：逐秒延迟中位数与稳态中位数相差不超过该比例即视为稳定
+WARMUP_BIN_SECONDS = 1.0
+WARMUP_TOLERANCE = 0.2
+# 容量规划：建议并发量取吞吐达到模型上限该比例的最小并发量，更高的并发只增加排队延迟
+USL_THROUGHPUT_TARGET = 0.9
+# 按 CPU 规划核数时的目标利用率，留出突发余量
+SIZING_CPU_UTILIZATION = 0.7
+# 各并发量的吞吐相差不足该比例时无法回归出 CPU 的增长斜率，改用 CPU / 吞吐 的均值
+SIZING_MIN_QPS_SPREAD = 0.2
+# 长稳测试：拟合趋势的指标（列名: (名称, 单位)）；smaps_rollup 快照区分匿名页（堆）与文件映射页
+SOAK_METRICS = {
+    'memory_rss_mb': ('RSS', 'MB'),
+    'fds': ('文件描述符', '个'),
+    'threads': ('线程数', '个'),
+    'tcp_established': ('TCP ESTABLISHED', '个'),
+    'tcp_close_wait': ('TCP CLOSE_WAIT', '个')
+}
+SMAPS_METRICS = {'anonymous_mb': ('匿名页（堆）', 'MB'), 'file_mb': ('文件映射', 'MB')}
+# 趋势拟合跳过的开头分钟数（缓存填充、连接池建立等一次性增长），以及判定疑似泄漏的最小每小时增长率；
+# 可由配置 soak.trend_skip_minutes / soak.leak_growth_percent_per_hour 覆盖
+SOAK_TREND_SKIP_MINUTES = 15
+LEAK_GROWTH_PERCENT_PER_HOUR = 1.0
+# 失败请求表中响应体显示的最大字符数（完整内容保存在直方图文件的 tail 段）
+TAIL_BODY_CHARS = 300
+
+
+def render_chart(fig, chart_file):
+    """写出独立图表文件（引用同目录的 plotly.min.js），返回嵌入报告的 div 片段；供进程池调用"""
+    fig.write_html(chart_file, include_plotlyjs='directory')
+    return fig.to_html(full_html=False, include_plotlyjs=False)
 
-# 设置中文字体和样式
-plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
-plt.style.use('seaborn-v0_8')
 
 class TrusteeReportGenerator:
-    def __init__(self, test_name, data_dir, output_dir):
+    def __init__(self, test_name, data_dir, output_dir, jobs=None, target_qps=None, catalog=None, build=None,
+                 baseline=None, config_path=None, run_id=None):
         self.test_name = test_name
         self.data_dir = data_dir
+        # 运行标识：指定时只读取文件名含该标识的数据文件（负载生成器 --run-id、资源采样的测试名称）
+        self.run_id = run_id
         self.output_dir = output_dir
+        # 容量规划的生产目标 QPS，未指定时取测试中的最大成功吞吐
+        self.target_qps = target_qps
+        # 运行目录：收录本次运行（以测试名称为运行标识）并与基线运行逐级别对比
+        self.catalog = catalog
+        self.build = build
+        self.baseline = baseline
+        self.config_path = config_path
         self.charts_dir = os.path.join(output_dir, 'charts')
+        # 图表渲染进程数，1 表示在当前进程内依次渲染
+        self.jobs = jobs or os.cpu_count() or 1
         
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
@@ -48,156 +154,1069 @@ class TrusteeReportGenerator:
         # 初始化数据容器
         self.resource_data = {}
         self.performance_data = {}
+        self.concurrency_data = {}
+        self.open_loop_data = {}
+        self.open_loop_stats = {}
+        # 合并后的延迟直方图（merge_artifacts 结果），按并发量 / 到达率标签索引
+        self.histogram_data = {}
+        self.open_loop_histograms = {}
+        # 时间对齐结果：逐时间段的 QPS、P99 与各服务 CPU/RSS，各服务相关系数，延迟拐点与饱和服务
+        self.timeline = pd.DataFrame()
+        self.correlations = {}
+        self.saturation = None
+        # 逐时间窗口的请求数与延迟直方图，按并发量 / 到达率标签索引
+        self.latency_windows = {}
+        self.open_loop_windows = {}
+        # 负载生成器阶段日志（闭环，按并发量索引）、预热阶段请求记录与预热收敛结果
+        self.phase_log = {}
+        self.warmup_data = {}
+        self.warmup_stats = {}
+        # USL 拟合结果、未测试并发量的预测与按目标 QPS 的资源规划
+        self.scalability = None
+        self.sizing = None
+        # 与基线运行的对比结果（run_catalog.compare_runs 的单个结果）与回归判定阈值
+        self.regression = None
+        self.regression_settings = None
+        # 长稳测试的窗口化资源趋势与 smaps_rollup 快照（按测试名称索引），以及各服务各指标的趋势拟合结果
+        self.soak_data = {}
+        self.soak_smaps = {}
+        self.soak_trends = []
+        # 分布式负载生成的逐代理明细（load_coordinator.agent_breakdown 结果，附级别），用于发现饱和的生成器
+        self.agent_rows = []
+        # 混合场景各级别按请求类型的份额、吞吐与延迟（由直方图文件的 request_types 得到）
+        self.request_type_stats = []
+        # 各级别的最慢 / 失败请求明细（直方图文件 tail 段合并结果，含匹配的服务日志行）与失败请求总数
+        self.tail_requests = []
+        self.tail_failed_totals = {}
+        # 服务端指标样本（按并发量索引，只含 steady 阶段）、各级别各指标序列的统计，
+        # 以及客户端平均延迟按服务端处理、下游调用、服务端排队与其余部分的拆分
+        self.server_metrics = {}
+        self.server_series = []
+        self.latency_breakdown = {}
         self.summary_stats = {}
+        # 各并发量的负载指标（请求数、成功率、QPS、延迟），不依赖资源数据
+        self.level_stats = {}
     
     def load_data(self):
         """加载所有测试数据"""
         self.logger.info("开始加载测试数据...")
+
+        # 阶段日志：资源采样据此标注所处阶段，统计只取 steady 阶段
+        self.phase_log = self._load_phase_log()
         
         # 加载资源使用数据
-        resource_files = glob.glob(os.path.join(self.data_dir, 'resource_usage_*.csv'))
+        resource_files = self._select_files(find_tables(self.data_dir, 'resource_usage_*'),
+                                            self._concurrency_from_name)
         self.logger.info(f"找到 {len(resource_files)} 个资源监控文件")
         
         for file_path in resource_files:
             try:
                 # 从文件名提取并发量信息
-                filename = os.path.basename(file_path)
+                filename = table_stem(file_path)
                 if '_' in filename:
-                    parts = filename.split('_')
-                    concurrency = None
-                    for part in parts:
-                        if part.endswith('c.csv'):
-                            concurrency = int(part[:-5])
-                            break
-                    
+                    concurrency = self._concurrency_from_name(filename)
                     if concurrency:
-                        df = pd.read_csv(file_path)
+                        df = read_table(file_path, RESOURCE_COLUMNS)
                         df['timestamp'] = pd.to_datetime(df['timestamp'])
-                        self.resource_data[concurrency] = df
+                        if 'epoch_time' not in df.columns:
+                            df['epoch_time'] = self._local_epoch(df['timestamp'])
+                        self._tag_resource_phases(df, concurrency)
                         self.logger.info(f"加载 {concurrency} 并发资源数据: {len(df)} 条记录")
+                        self.resource_data[concurrency] = self._steady_only(df, f"{concurrency} 并发资源数据")
             except Exception as e:
                 self.logger.error(f"加载资源文件失败 {file_path}: {e}")
         
-        # 加载性能测试数据
-        perf_files = glob.glob(os.path.join(self.data_dir, 'concurrent_test_*.csv'))
+        # 加载服务端指标（与资源采样同名、同一 epoch 时钟）
+        for file_path in self._select_files(find_tables(self.data_dir, 'server_metrics_*'),
+                                            self._concurrency_from_name):
+            try:
+                concurrency = self._concurrency_from_name(table_stem(file_path))
+                if concurrency:
+                    df = read_table(file_path, SERVER_METRIC_COLUMNS)
+                    self._tag_resource_phases(df, concurrency)
+                    self.logger.info(f"加载 {concurrency} 并发服务端指标: {len(df)} 条记录")
+                    self.server_metrics[concurrency] = self._steady_only(df, f"{concurrency} 并发服务端指标")
+            except Exception as e:
+                self.logger.error(f"加载服务端指标文件失败 {file_path}: {e}")
+
+        # 加载延迟直方图（本次运行同一并发量的多轮/多台生成器主机文件合并）
+        self.histogram_data = self._load_histograms('latency_histogram_*.json', 2, int)
+        self.open_loop_histograms = self._load_histograms('open_loop_histogram_*.json', 3, str)
+
+        # 加载性能测试数据（已有直方图的并发量只读取预热部分，用于收敛检查）
+        perf_files = self._select_files(find_tables(self.data_dir, 'concurrent_test_*'), lambda stem: stem.split('_')[2])
         self.logger.info(f"找到 {len(perf_files)} 个性能测试文件")
-        
+
         for file_path in perf_files:
             try:
                 # 从文件名提取并发量信息
-                filename = os.path.basename(file_path)
+                filename = table_stem(file_path)
                 parts = filename.split('_')
                 if len(parts) >= 3:
                     concurrency = int(parts[2])
-                    df = pd.read_csv(file_path)
-                    self.performance_data[concurrency] = df
+                    if concurrency in self.histogram_data:
+                        if 'test_phase' in table_columns(file_path):
+                            self._keep_warmup(concurrency, read_table(file_path, WARMUP_COLUMNS))
+                        continue
+                    df = read_table(file_path, PERFORMANCE_COLUMNS)
                     self.logger.info(f"加载 {concurrency} 并发性能数据: {len(df)} 条记录")
+                    self._keep_warmup(concurrency, df)
+                    self.performance_data[concurrency] = self._steady_only(df, f"{concurrency} 并发性能数据")
             except Exception as e:
                 self.logger.error(f"加载性能文件失败 {file_path}: {e}")
-        
+
+        # 加载在途请求数时间线（实际达到的并发）
+        timeline_files = self._select_files(glob.glob(os.path.join(self.data_dir, 'concurrency_timeline_*.csv')),
+                                            lambda stem: stem.split('_')[2])
+        for file_path in timeline_files:
+            try:
+                filename = os.path.basename(file_path)
+                parts = filename.split('_')
+                if len(parts) >= 3:
+                    concurrency = int(parts[2])
+                    self.concurrency_data[concurrency] = pd.read_csv(file_path)
+            except Exception as e:
+                self.logger.error(f"加载并发时间线文件失败 {file_path}: {e}")
+
+        # 加载开环测试数据（按到达率区分）
+        open_loop_files = self._select_files(find_tables(self.data_dir, 'open_loop_test_*'),
+                                             lambda stem: stem.split('_')[3])
+        self.logger.info(f"找到 {len(open_loop_files)} 个开环测试文件")
+        for file_path in open_loop_files:
+            try:
+                filename = table_stem(file_path)
+                parts = filename.split('_')
+                if len(parts) >= 4:
+                    rate_label = parts[3]
+                    if rate_label in self.open_loop_histograms:
+                        continue
+                    df = read_table(file_path, OPEN_LOOP_COLUMNS)
+                    self.logger.info(f"加载 {rate_label} req/s 开环测试数据: {len(df)} 条记录")
+                    self.open_loop_data[rate_label] = self._steady_only(df, f"{rate_label} req/s 开环测试数据")
+            except Exception as e:
+                self.logger.error(f"加载开环测试文件失败 {file_path}: {e}")
+
+        # 加载长稳测试的资源趋势与 smaps_rollup 快照
+        for pattern, target in (('soak_trend_*.csv', self.soak_data), ('soak_smaps_*.csv', self.soak_smaps)):
+            for file_path in self._select_files(glob.glob(os.path.join(self.data_dir, pattern)), lambda stem: pattern):
+                try:
+                    name = os.path.splitext(os.path.basename(file_path))[0].split('_', 2)[2]
+                    df = pd.read_csv(file_path)
+                    if not df.empty:
+                        target[name] = df
+                        self.logger.info(f"加载长稳测试数据 {os.path.basename(file_path)}: {len(df)} 条记录")
+                except Exception as e:
+                    self.logger.error(f"加载长稳测试文件失败 {file_path}: {e}")
+
         self.logger.info("数据加载完成")
+
+    def _load_phase_log(self):
+        """读取负载生成器的阶段日志，只取批量并发测试（concurrent_test）的闭环阶段，按并发量索引、按起始时间排序
+
+        与 _select_files 相同：指定 run_id 时只保留该运行的阶段；未指定时每个并发量只保留最近一次运行的阶段。
+        压力测试与容量探测的同一并发量级别以 test_name 区分；旧版日志没有 test_name、run_id 列，视为批量测试且无运行标识
+        """
+        log_file = os.path.join(self.data_dir, PHASE_LOG_FILE)
+        if not os.path.exists(log_file):
+            return {}
+        try:
+            log = pd.read_csv(log_file, dtype={'label': str, 'test_name': str, 'run_id': str})
+        except Exception as e:
+            self.logger.error(f"加载阶段日志失败 {log_file}: {e}")
+            return {}
+        for column in ('test_name', 'run_id'):
+            log[column] = log[column].fillna('') if column in log.columns else ''
+        log = log[(log['mode'] == 'closed') & log['test_name'].isin(['concurrent_test', ''])]
+        if self.run_id:
+            log = log[log['run_id'] == self.run_id]
+        phase_log = {}
+        for label, group in log.groupby('label'):
+            group = group.sort_values('start_time', ignore_index=True)
+            if not self.run_id:
+                group = group[group['run_id'] == group['run_id'].iloc[-1]].reset_index(drop=True)
+            phase_log[int(label)] = group
+        return phase_log
+
+    @staticmethod
+    def _concurrency_from_name(filename):
+        """资源采样与服务端指标文件名中 <N>c 段的并发量，没有时返回 None"""
+        for part in filename.split('_'):
+            if part.endswith('c') and part[:-1].isdigit():
+                return int(part[:-1])
+        return None
+
+    def _tag_resource_phases(self, df, concurrency):
+        """资源采样按 epoch_time 落入该并发量的阶段区间，标注 test_phase；测试间恢复期等不在任何区间内的为空"""
+        phases = self.phase_log.get(concurrency)
+        if phases is None or df.empty:
+            return
+        starts = phases['start_time'].to_numpy()
+        ends = phases['end_time'].to_numpy()
+        names = phases['test_phase'].to_numpy(dtype=object)
+        epoch = df['epoch_time'].to_numpy(dtype='float64')
+        index = np.clip(np.searchsorted(starts, epoch, side='right') - 1, 0, None)
+        inside = (epoch >= starts[index]) & (epoch <= ends[index])
+        df['test_phase'] = np.where(inside, names[index], None)
+
+    def _steady_only(self, df, description):
+        """只保留 steady 阶段的记录；没有阶段标注的旧版数据原样返回"""
+        if 'test_phase' not in df.columns or not df['test_phase'].notna().any():
+            return df
+        steady = df[df['test_phase'] == 'steady'].reset_index(drop=True)
+        if len(steady) < len(df):
+            self.logger.info(f"{description}: 排除预热、冷却等非稳态记录 {len(df) - len(steady)} 条")
+        return steady
+
+    def _keep_warmup(self, concurrency, df):
+        if 'test_phase' in df.columns:
+            warmup = df[df['test_phase'] == 'warmup']
+            if not warmup.empty:
+                self.warmup_data[concurrency] = warmup.reset_index(drop=True)
+
+    def _phase_interval(self, concurrency, test_phase):
+        """阶段日志中该并发量（本次运行）最近一次 test_phase 阶段的 (起, 止) epoch 秒"""
+        phases = self.phase_log.get(concurrency)
+        if phases is None:
+            return None
+        rows = phases[phases['test_phase'] == test_phase]
+        if rows.empty:
+            return None
+        return rows['start_time'].iloc[-1], rows['end_time'].iloc[-1]
+
+    @staticmethod
+    def _local_epoch(timestamps):
+        """旧版资源文件只有本地时间字符串，按本地时区换算为 epoch 秒（取首个时间点的时区偏移）"""
+        if timestamps.empty:
+            return pd.Series(dtype='float64', index=timestamps.index)
+        seconds = (timestamps - pd.Timestamp(0)).dt.total_seconds()
+        offset = timestamps.iloc[0].to_pydatetime().timestamp() - seconds.iloc[0]
+        return seconds + offset
+
+    def _select_files(self, paths, key):
+        """筛选本次运行的数据文件：指定 run_id 时只保留文件名含该运行标识的文件；
+        未指定时按 key(文件名) 得到的级别分组，每组只保留时间戳最新的一批（分布式测试各代理的文件时间戳相同），
+        共享数据目录中历次运行的文件不会混入"""
+        stems = {path: os.path.splitext(os.path.basename(path))[0] for path in paths}
+        if self.run_id:
+            token = f"_{self.run_id}_"
+            return sorted(path for path, stem in stems.items() if token in f"_{stem}_")
+        groups = {}
+        for path, stem in stems.items():
+            try:
+                group = key(stem)
+            except (IndexError, ValueError):
+                group = stem
+            stamps = FILE_TIMESTAMP.findall(stem)
+            groups.setdefault(group, []).append((stamps[-1] if stamps else '', path))
+        selected = []
+        for items in groups.values():
+            latest = max(stamp for stamp, _ in items)
+            selected += [path for stamp, path in items if stamp == latest]
+        return sorted(selected)
+
+    def _load_histograms(self, pattern, key_index, key_type):
+        """按文件名第 key_index 段分组读取本次运行的直方图文件并合并"""
+        groups = {}
+        paths = glob.glob(os.path.join(self.data_dir, pattern))
+        for file_path in self._select_files(paths, lambda stem: stem.split('_')[key_index]):
+            try:
+                parts = os.path.basename(file_path).split('_')
+                if len(parts) > key_index:
+                    groups.setdefault(key_type(parts[key_index]), []).append(load_artifact(file_path))
+            except Exception as e:
+                self.logger.error(f"加载直方图文件失败 {file_path}: {e}")
+        merged = {}
+        for key, documents in groups.items():
+            merged[key] = merge_artifacts(documents)
+            self.logger.info(f"加载 {key} 延迟直方图: {len(documents)} 个文件, {merged[key]['total']} 个请求")
+        return merged
     
     def analyze_resource_usage(self):
-        """分析资源使用情况"""
+        """分析资源使用情况：全部并发量合并为一张表，按 (并发量, 进程) 一次分组聚合"""
         self.logger.info("开始分析资源使用情况...")
-        
+
         self.summary_stats = {}
-        
-        for concurrency, df in self.resource_data.items():
-            if df.empty:
-                continue
-                
-            # 过滤掉系统数据，只分析应用进程
-            app_df = df[df['process'] != 'system'].copy()
-            
-            if app_df.empty:
+        frame = self._combine_levels(self.resource_data, 'concurrency')
+        if frame.empty:
+            self.logger.info("资源分析完成")
+            return
+
+        if 'process_count' not in frame.columns:
+            # 旧版资源文件没有 process_count 列，按单进程计
+            frame['process_count'] = 1
+        os_columns = [column for column in OS_METRIC_LABELS if column in frame.columns]
+        # 数值列统一为 float64 的连续二维块，每种聚合对全部列只做一次分组计算
+        values = frame[['cpu_percent', 'memory_rss_mb', 'threads', 'fds', 'process_count'] + os_columns] \
+            .astype('float64')
+        grouped = values.groupby([frame['concurrency'], frame['process']], sort=True)
+        means, maxes, mins, sizes = grouped.mean(), grouped.max(), grouped.min(), grouped.size()
+
+        is_app = means.index.get_level_values(1) != 'system'
+        totals = pd.DataFrame({
+            'cpu_avg': means.loc[is_app, 'cpu_percent'],
+            'memory_avg': means.loc[is_app, 'memory_rss_mb'],
+            'cpu_max': maxes.loc[is_app, 'cpu_percent'],
+            'memory_max': maxes.loc[is_app, 'memory_rss_mb']
+        }).groupby(level=0).sum()
+
+        for key in means.index:
+            concurrency, process = key
+            if concurrency not in totals.index:
+                # 只有 system 行的并发量不纳入汇总
                 continue
-            
-            stats = {
+            mean, peak = means.loc[key], maxes.loc[key]
+            os_metrics = {column: {'avg': mean[column], 'max': peak[column]}
+                          for column in os_columns if pd.notna(mean[column])}
+            stats = self.summary_stats.setdefault(concurrency, {
                 'concurrency': concurrency,
                 'processes': {},
-                'total_cpu_avg': 0,
-                'total_memory_avg': 0,
-                'total_cpu_max': 0,
-                'total_memory_max': 0
+                'total_cpu_avg': totals.at[concurrency, 'cpu_avg'],
+                'total_memory_avg': totals.at[concurrency, 'memory_avg'],
+                'total_cpu_max': totals.at[concurrency, 'cpu_max'],
+                'total_memory_max': totals.at[concurrency, 'memory_max'],
+                'system': {}
+            })
+            if process == 'system':
+                stats['system'] = os_metrics
+                continue
+            stats['processes'][process] = {
+                'cpu_avg': mean['cpu_percent'],
+                'cpu_max': peak['cpu_percent'],
+                'cpu_min': mins.at[key, 'cpu_percent'],
+                'memory_avg': mean['memory_rss_mb'],
+                'memory_max': peak['memory_rss_mb'],
+                'memory_min': mins.at[key, 'memory_rss_mb'],
+                'threads_avg': mean['threads'],
+                'fds_avg': mean['fds'],
+                'sample_count': int(sizes.loc[key]),
+                'process_count_max': peak['process_count'] if pd.notna(peak['process_count']) else 1,
+                'os_metrics': os_metrics
             }
-            
-            # 按进程分析
-            for process in app_df['process'].unique():
-                process_df = app_df[app_df['process'] == process]
-                
-                process_stats = {
-                    'cpu_avg': process_df['cpu_percent'].mean(),
-                    'cpu_max': process_df['cpu_percent'].max(),
-                    'cpu_min': process_df['cpu_percent'].min(),
-                    'memory_avg': process_df['memory_rss_mb'].mean(),
-                    'memory_max': process_df['memory_rss_mb'].max(),
-                    'memory_min': process_df['memory_rss_mb'].min(),
-                    'threads_avg': process_df['threads'].mean(),
-                    'fds_avg': process_df['fds'].mean(),
-                    'sample_count': len(process_df)
-                }
-                
-                stats['processes'][process] = process_stats
-                stats['total_cpu_avg'] += process_stats['cpu_avg']
-                stats['total_memory_avg'] += process_stats['memory_avg']
-                stats['total_cpu_max'] += process_stats['cpu_max']
-                stats['total_memory_max'] += process_stats['memory_max']
-            
-            self.summary_stats[concurrency] = stats
-        
+
         self.logger.info("资源分析完成")
-    
+
+    def _combine_levels(self, frames, key):
+        """各并发量（或到达率）的数据合并为一张表，key 列标识来源，便于一次分组计算全部统计量"""
+        frames = {level: df for level, df in frames.items() if not df.empty}
+        if not frames:
+            return pd.DataFrame()
+        combined = pd.concat(frames.values(), keys=list(frames.keys()), names=[key, None])
+        return combined.reset_index(level=0)
+
     def analyze_performance_metrics(self):
-        """分析性能指标"""
+        """分析性能指标：各并发量的负载指标先存入 level_stats，有资源汇总的并发量再合并进 summary_stats"""
         self.logger.info("开始分析性能指标...")
-        
+
+        self.level_stats = {concurrency: self._histogram_metrics(concurrency, merged)
+                            for concurrency, merged in self.histogram_data.items() if merged['total']}
+
+        frame = self._combine_levels(self.performance_data, 'concurrency')
+        if not frame.empty:
+            for concurrency, metrics in self._latency_metrics(frame).items():
+                metrics['achieved_concurrency'] = self._achieved_concurrency(concurrency)
+                self.level_stats[concurrency] = metrics
+
+        for concurrency, metrics in self.level_stats.items():
+            if concurrency in self.summary_stats:
+                self.summary_stats[concurrency].update(metrics)
+
+        self.logger.info("性能分析完成")
+
+    def _achieved_concurrency(self, concurrency):
+        """实际达到的平均并发（时间加权在途请求数）"""
+        timeline_df = self.concurrency_data.get(concurrency)
+        if timeline_df is not None and not timeline_df.empty:
+            return timeline_df['avg_inflight'].mean()
+        return None
+
+    def _histogram_metrics(self, concurrency, merged):
+        """由合并后的直方图计算性能指标，QPS 按窗口覆盖的时间计算"""
+        histogram = merged['histogram']
+        covered = merged['covered']
+        p95, p99 = histogram.percentiles([0.95, 0.99])
+        phases = {}
+        for phase in PHASE_LABELS:
+            extra = merged['extra'].get(phase)
+            if extra is not None and extra.count:
+                phase_p95, phase_p99 = extra.percentiles([0.95, 0.99])
+                phases[phase] = {'avg': extra.mean, 'p95': phase_p95, 'p99': phase_p99}
+        return {
+            'total_requests': merged['total'],
+            'successful_requests': merged['successful'],
+            'failed_requests': merged['failed'],
+            'success_rate': merged['successful'] / merged['total'] * 100,
+            'avg_response_time': histogram.mean,
+            'min_response_time': histogram.min,
+            'max_response_time': histogram.max,
+            'p95_response_time': p95,
+            'p99_response_time': p99,
+            'qps': merged['total'] / covered if covered > 0 else 0,
+            'achieved_concurrency': self._achieved_concurrency(concurrency),
+            'phases': phases
+        }
+
+    def _latency_metrics(self, frame):
+        """按并发量一次分组计算请求数、成功率、QPS、响应时间分位数与各协议阶段耗时"""
+        success = frame['response_code'].eq(200).fillna(False).astype(bool)
+        by_level = frame.groupby('concurrency')
+        counts = by_level.agg(total=('duration', 'size'), start=('start_time', 'min'), end=('end_time', 'max'))
+        counts['successful'] = success.groupby(frame['concurrency']).sum()
+
+        ok = frame[success]
+        phase_columns = [f'{phase}_time' for phase in PHASE_LABELS if f'{phase}_time' in frame.columns]
+        # 成功请求的耗时列合并为 float64 二维块，均值与分位数各一次分组计算
+        ok_by_level = ok[['duration'] + phase_columns].astype('float64').groupby(ok['concurrency'])
+        means = ok_by_level.mean()
+        quantiles = ok_by_level.quantile([0.95, 0.99]).unstack()
+        extremes = ok.groupby('concurrency')['duration'].agg(['min', 'max'])
+
+        results = {}
+        for concurrency, row in counts.iterrows():
+            total = int(row['total'])
+            successful = int(row['successful'])
+            span = row['end'] - row['start']
+            has_success = concurrency in means.index
+            phases = {}
+            for phase in PHASE_LABELS:
+                column = f'{phase}_time'
+                if has_success and column in phase_columns and pd.notna(means.at[concurrency, column]):
+                    phases[phase] = {
+                        'avg': means.at[concurrency, column],
+                        'p95': quantiles.at[concurrency, (column, 0.95)],
+                        'p99': quantiles.at[concurrency, (column, 0.99)]
+                    }
+            results[concurrency] = {
+                'total_requests': total,
+                'successful_requests': successful,
+                'failed_requests': total - successful,
+                'success_rate': successful / total * 100 if total > 0 else 0,
+                'avg_response_time': means.at[concurrency, 'duration'] if has_success else 0,
+                'min_response_time': extremes.at[concurrency, 'min'] if has_success else 0,
+                'max_response_time': extremes.at[concurrency, 'max'] if has_success else 0,
+                'p95_response_time': quantiles.at[concurrency, ('duration', 0.95)] if has_success else 0,
+                'p99_response_time': quantiles.at[concurrency, ('duration', 0.99)] if has_success else 0,
+                'qps': total / span if span > 0 else 0,
+                'phases': phases
+            }
+        return results
+
+    def _steady_p50(self, concurrency):
+        """稳态阶段成功请求的延迟中位数"""
+        if concurrency in self.histogram_data:
+            return self.histogram_data[concurrency]['histogram'].percentile(0.5)
+        df = self.performance_data.get(concurrency)
+        if df is None or df.empty:
+            return None
+        durations = df.loc[df['response_code'].eq(200).fillna(False).astype(bool), 'duration']
+        return durations.median() if not durations.empty else None
+
+    def analyze_warmup(self):
+        """预热收敛检查：预热阶段逐秒成功请求延迟中位数与稳态中位数之比，
+        从某一秒起直到预热结束都保持在 1 ± WARMUP_TOLERANCE 以内，该秒即为达到稳定延迟所需时间
+        """
+        self.warmup_stats = {}
+        for concurrency, df in sorted(self.warmup_data.items()):
+            steady_p50 = self._steady_p50(concurrency)
+            ok = df[df['response_code'].eq(200).fillna(False).astype(bool)]
+            if ok.empty or not steady_p50:
+                continue
+            interval = self._phase_interval(concurrency, 'warmup')
+            origin, end = interval if interval else (df['start_time'].min(), df['end_time'].max())
+            offsets = np.floor((ok['end_time'] - origin) / WARMUP_BIN_SECONDS) * WARMUP_BIN_SECONDS
+            # 只取完整的分箱：预热结束时在途请求完成于末尾不足一个分箱的时间内，样本过少
+            complete = offsets + WARMUP_BIN_SECONDS <= end - origin
+            if not complete.any():
+                continue
+            ratio = ok.loc[complete, 'duration'].groupby(offsets[complete]).median() / steady_p50
+            within = ((ratio - 1).abs() <= WARMUP_TOLERANCE).astype(int)
+            stable = within[::-1].cummin()[::-1].astype(bool)
+            converged = ratio.index[stable.to_numpy()]
+            self.warmup_stats[concurrency] = {
+                'warmup_seconds': end - origin,
+                'converged_after': float(converged[0]) if len(converged) else None,
+                'first_p50': ratio.iloc[0] * steady_p50,
+                'steady_p50': steady_p50,
+                'offsets': ratio.index.tolist(),
+                'ratios': ratio.tolist()
+            }
+        if self.warmup_stats:
+            self.logger.info("预热收敛: " + ', '.join(
+                f"{c} 并发 {'%.0f 秒' % s['converged_after'] if s['converged_after'] is not None else '未收敛'}"
+                for c, s in self.warmup_stats.items()))
+
+    def analyze_latency_windows(self):
+        """各并发量 / 到达率逐时间窗口的请求数与成功请求延迟直方图：直方图文件直接取其窗口，
+        仅有原始记录时按完成时刻分箱聚合为同样结构，时间线、热力图与分位数带均基于窗口计算
+        """
+        self.latency_windows = {concurrency: self._histogram_windows(merged)
+                                for concurrency, merged in self.histogram_data.items() if merged['windows']}
         for concurrency, df in self.performance_data.items():
-            if df.empty:
+            if not df.empty and concurrency not in self.latency_windows:
+                self.latency_windows[concurrency] = self._raw_windows(df, 'duration')
+        # 开环测试的窗口直方图为校正延迟
+        self.open_loop_windows = {label: self._histogram_windows(merged)
+                                  for label, merged in self.open_loop_histograms.items() if merged['windows']}
+        for label, df in self.open_loop_data.items():
+            if not df.empty and label not in self.open_loop_windows:
+                self.open_loop_windows[label] = self._raw_windows(df, 'corrected_duration')
+
+    @staticmethod
+    def _histogram_windows(merged):
+        """直方图文件的窗口：多台生成器主机同一时段的窗口合并为一个时间段，请求数为各主机之和"""
+        windows = merged['windows']
+        length = float(np.median([window['end'] - window['start'] for window in windows])) or TIMELINE_BIN_SECONDS
+        slots = {}
+        for window in windows:
+            slot = slots.setdefault(round(window['start'] / length), {
+                'start': window['start'], 'end': window['end'], 'seconds': length, 'total': 0,
+                'histogram': LatencyHistogram()})
+            slot['start'] = min(slot['start'], window['start'])
+            slot['end'] = max(slot['end'], window['end'])
+            slot['total'] += window['total']
+            slot['histogram'].merge(window['histogram'])
+        return sorted(slots.values(), key=lambda slot: slot['start'])
+
+    @staticmethod
+    def _raw_windows(df, column):
+        """原始记录按完成时刻落入 TIMELINE_BIN_SECONDS 分箱，成功请求的 column 列一次性向量化分桶为逐窗口直方图"""
+        starts = np.floor(df['end_time'].to_numpy(dtype='float64') / TIMELINE_BIN_SECONDS) * TIMELINE_BIN_SECONDS
+        totals = pd.Series(starts).value_counts().sort_index()
+        success = df['response_code'].eq(200).fillna(False).to_numpy(dtype=bool)
+        values = np.rint(np.clip(df[column].to_numpy(dtype='float64')[success], 0, None) * 1e6).astype(np.int64)
+        samples = pd.DataFrame({'start': starts[success], 'value': values, 'bucket': bucket_indexes(values)})
+        summary = samples.groupby('start')['value'].agg(['size', 'sum', 'min', 'max'])
+        buckets = samples.groupby(['start', 'bucket']).size()
+
+        histograms = {}
+        for start, counts in buckets.groupby(level=0):
+            row = summary.loc[start]
+            histograms[start] = LatencyHistogram.from_dict({
+                'count': int(row['size']), 'total_us': int(row['sum']), 'min_us': int(row['min']),
+                'max_us': int(row['max']),
+                'buckets': list(zip(counts.index.get_level_values(1).tolist(), counts.tolist()))
+            })
+        return [{'start': start, 'end': start + TIMELINE_BIN_SECONDS, 'seconds': TIMELINE_BIN_SECONDS,
+                 'total': int(total), 'histogram': histograms.get(start, LatencyHistogram())}
+                for start, total in totals.items()]
+
+    def _latency_timeline(self):
+        """各并发量逐时间窗口的 QPS 与成功请求 P99"""
+        rows = [(concurrency, window['start'], window['end'], window['total'] / window['seconds'],
+                 window['histogram'].percentile(0.99) if window['histogram'].count else np.nan)
+                for concurrency, windows in self.latency_windows.items() for window in windows]
+        if not rows:
+            return pd.DataFrame()
+        return pd.DataFrame(rows, columns=['concurrency', 'start', 'end', 'qps', 'p99']) \
+            .sort_values('start', ignore_index=True)
+
+    def analyze_timeline(self):
+        """按共同的 epoch 时钟对齐请求延迟与各服务资源采样，计算相关系数并定位延迟拐点处饱和的服务"""
+        latency = self._latency_timeline()
+        resources = self._combine_levels(self.resource_data, 'concurrency')
+        if latency.empty or resources.empty:
+            return
+
+        self.logger.info("开始时间对齐分析...")
+        # 每个资源采样归入同一并发量下起始时刻不晚于它的时间段，超出该时间段结束时刻的（预热、恢复间隔）丢弃
+        samples = resources[['concurrency', 'epoch_time', 'process', 'cpu_percent', 'memory_rss_mb']] \
+            .dropna(subset=['epoch_time']).sort_values('epoch_time')
+        joined = pd.merge_asof(samples, latency[['concurrency', 'start', 'end']], left_on='epoch_time',
+                               right_on='start', by='concurrency', direction='backward')
+        joined = joined[joined['epoch_time'] < joined['end']]
+        usage = joined.groupby(['concurrency', 'start', 'process'])[['cpu_percent', 'memory_rss_mb']].mean() \
+            .unstack('process')
+        usage.columns = [f'{metric}:{process}' for metric, process in usage.columns]
+        timeline = latency.merge(usage.reset_index(), on=['concurrency', 'start'], how='left')
+        self.timeline = timeline
+
+        processes = sorted({column.split(':', 1)[1] for column in usage.columns})
+        for process in processes:
+            cpu = timeline[f'cpu_percent:{process}']
+            rss = timeline[f'memory_rss_mb:{process}']
+            points = int((cpu.notna() & timeline['p99'].notna()).sum())
+            if points < MIN_CORRELATION_POINTS:
                 continue
-            
-            # 计算性能指标
-            total_requests = len(df)
-            successful_requests = len(df[df['response_code'] == 200])
-            failed_requests = total_requests - successful_requests
-            success_rate = (successful_requests / total_requests * 100) if total_requests > 0 else 0
-            
-            # 只计算成功请求的响应时间
-            success_df = df[df['response_code'] == 200]
-            if not success_df.empty:
-                avg_response_time = success_df['duration'].mean()
-                min_response_time = success_df['duration'].min()
-                max_response_time = success_df['duration'].max()
-                p95_response_time = success_df['duration'].quantile(0.95)
-                p99_response_time = success_df['duration'].quantile(0.99)
-            else:
-                avg_response_time = min_response_time = max_response_time = 0
-                p95_response_time = p99_response_time = 0
-            
-            # 计算 QPS
-            if not df.empty:
-                test_duration = df['end_time'].max() - df['start_time'].min()
-                qps = total_requests / test_duration if test_duration > 0 else 0
-            else:
-                qps = 0
-            
-            # 更新汇总数据
-            if concurrency in self.summary_stats:
-                self.summary_stats[concurrency].update({
-                    'total_requests': total_requests,
-                    'successful_requests': successful_requests,
-                    'failed_requests': failed_requests,
-                    'success_rate': success_rate,
-                    'avg_response_time': avg_response_time,
-                    'min_response_time': min_response_time,
-                    'max_response_time': max_response_time,
-                    'p95_response_time': p95_response_time,
-                    'p99_response_time': p99_response_time,
-                    'qps': qps
+            # 整段不变的序列（如空闲服务的 CPU）相关系数为 NaN，报告中显示为 -
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.correlations[process] = {
+                    'cpu_p99': cpu.corr(timeline['p99']),
+                    'cpu_qps': cpu.corr(timeline['qps']),
+                    'rss_p99': rss.corr(timeline['p99']),
+                    'points': points
+                }
+
+        self.saturation = self._find_saturation(timeline, processes)
+        if self.saturation and self.saturation['knee'] is not None:
+            services = ', '.join(service['process'] for service in self.saturation['services']) or '无'
+            self.logger.info(f"延迟拐点: {self.saturation['knee']} 并发, 饱和服务: {services}")
+        self.logger.info("时间对齐分析完成")
+
+    def _find_saturation(self, timeline, processes):
+        """延迟拐点为 P99 首次达到最低并发量 P99 的 KNEE_P99_FACTOR 倍的并发量；
+        拐点处 CPU 已接近其各并发量均值峰值（不再随负载增长）的服务判定为饱和，按 CPU 与 P99 的相关系数排序
+        """
+        levels = sorted(c for c, stats in self.summary_stats.items() if stats.get('p99_response_time'))
+        if len(levels) < 2:
+            return None
+        baseline = self.summary_stats[levels[0]]['p99_response_time']
+        knee = next((c for c in levels[1:]
+                     if self.summary_stats[c]['p99_response_time'] >= baseline * KNEE_P99_FACTOR), None)
+        result = {'knee': knee, 'baseline_level': levels[0], 'baseline_p99': baseline, 'services': [],
+                  'host_cpu': None}
+        if knee is None:
+            return result
+        result['knee_p99'] = self.summary_stats[knee]['p99_response_time']
+        level_cpu = timeline.groupby('concurrency')[[f'cpu_percent:{process}' for process in processes]].mean()
+        if knee not in level_cpu.index:
+            return result
+
+        for process in processes:
+            column = f'cpu_percent:{process}'
+            at_knee, peak = level_cpu.at[knee, column], level_cpu[column].max()
+            if pd.isna(at_knee):
+                continue
+            if process == 'system':
+                result['host_cpu'] = at_knee
+                continue
+            if at_knee >= SATURATION_MIN_CPU and at_knee >= peak * SATURATION_CPU_RATIO:
+                result['services'].append({
+                    'process': process, 'cpu': at_knee, 'peak_cpu': peak,
+                    'cpu_p99': self.correlations.get(process, {}).get('cpu_p99')
                 })
-        
-        self.logger.info("性能分析完成")
+        result['services'].sort(key=lambda service: -(service['cpu_p99'] if pd.notna(service['cpu_p99']) else -1))
+        return result
+
+    def _server_metrics_settings(self):
+        config = {}
+        if self.config_path and os.path.exists(self.config_path):
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        return server_metrics_settings(config)
+
+    def analyze_server_metrics(self):
+        """由服务端直方图在 steady 阶段的增量计算各指标序列的耗时与分位数，并按客户端请求拆分平均延迟：
+        服务端每秒累计耗时除以客户端 QPS 即每个客户端请求在服务端花费的时间（一个客户端请求可含多次 HTTP 交互），
+        客户端平均延迟减去服务端处理与排队后的部分为网络、接入排队与客户端开销
+        """
+        if not self.server_metrics:
+            return
+        self.logger.info("开始分析服务端指标...")
+        series_list = self._server_metrics_settings()['series']
+        for concurrency in sorted(self.server_metrics):
+            frame = self.server_metrics[concurrency]
+            stats = self.summary_stats.get(concurrency, {})
+            client_qps = stats.get('qps') or 0
+            per_request = {}
+            for series in series_list:
+                rows = frame[frame['endpoint'] == series.get('endpoint')]
+                if 'histogram' in series:
+                    summary = summarize_histogram(rows, series['histogram'], series.get('labels'))
+                    kind = 'histogram'
+                else:
+                    summary = summarize_gauge(rows, series.get('gauge'), series.get('labels'))
+                    kind = 'gauge'
+                if summary is None:
+                    continue
+                entry = {'level': concurrency, 'name': series['name'], 'role': series.get('role'), 'kind': kind,
+                         'summary': summary}
+                if kind == 'histogram' and summary['seconds'] > 0 and client_qps > 0:
+                    entry['per_request'] = summary['sum'] / summary['seconds'] / client_qps
+                    per_request.setdefault(series.get('role'), 0.0)
+                    per_request[series.get('role')] += entry['per_request']
+                self.server_series.append(entry)
+
+            client_mean = stats.get('avg_response_time')
+            if 'processing' in per_request and client_mean:
+                processing, queueing = per_request['processing'], per_request.get('queueing', 0.0)
+                self.latency_breakdown[concurrency] = {
+                    'client': client_mean,
+                    'processing': processing,
+                    # 未配置下游调用直方图时为 None
+                    'downstream': min(per_request['downstream'], processing) if 'downstream' in per_request else None,
+                    'queueing': queueing,
+                    'other': max(client_mean - processing - queueing, 0.0)
+                }
+        self.logger.info(f"服务端指标分析完成: {len({entry['name'] for entry in self.server_series})} 个指标序列")
+
+    def _server_metrics_summary(self):
+        """客户端延迟拆分的文字结论：最低与最高并发量下排队与处理所占比例"""
+        if not self.latency_breakdown:
+            return '未配置服务端处理耗时（role 为 processing）的直方图，或缺少对应并发量的客户端统计，未拆分客户端延迟。'
+        levels = sorted(self.latency_breakdown)
+        parts = []
+        for concurrency in (levels[0], levels[-1]) if len(levels) > 1 else levels:
+            item = self.latency_breakdown[concurrency]
+            client = item['client']
+            downstream = f"，含下游调用 {item['downstream'] * 1000:.2f}ms" if item['downstream'] is not None else ''
+            parts.append(f"{concurrency} 并发时客户端平均 {client * 1000:.2f}ms，其中服务端处理 "
+                         f"{item['processing'] * 1000:.2f}ms（{item['processing'] / client * 100:.0f}%{downstream}）、"
+                         f"服务端排队 {item['queueing'] * 1000:.2f}ms（{item['queueing'] / client * 100:.0f}%），"
+                         f"其余 {item['other'] * 1000:.2f}ms 为网络、接入排队与客户端开销")
+        text = '；'.join(parts) + '。'
+        if len(levels) > 1:
+            low, high = self.latency_breakdown[levels[0]], self.latency_breakdown[levels[-1]]
+            growth = high['client'] - low['client']
+            if growth > 0:
+                waiting = (high['queueing'] + high['other']) - (low['queueing'] + low['other'])
+                text += (f" 从 {levels[0]} 到 {levels[-1]} 并发，客户端平均延迟增加 {growth * 1000:.2f}ms，"
+                         f"<strong>其中 {max(min(waiting / growth, 1), 0) * 100:.0f}% 来自排队</strong>"
+                         f"（服务端排队与服务端计时之外的等待），其余来自处理耗时的增长。")
+        return text
+
+    def analyze_scalability(self):
+        """以 USL 拟合成功吞吐随并发量的变化，预测未测试并发量的吞吐与延迟，并据此规划目标 QPS 所需资源"""
+        levels = sorted(c for c, stats in self.summary_stats.items() if stats.get('qps'))
+        goodput = np.array([self.summary_stats[c]['qps'] * self.summary_stats[c]['success_rate'] / 100
+                            for c in levels])
+        if len(levels) < MIN_LEVELS:
+            return
+        self.logger.info("开始拟合可扩展性模型...")
+        fit = fit_usl(levels, goodput)
+        if fit is None:
+            self.logger.info("有效并发量不足，跳过可扩展性模型")
+            return
+
+        recommended = None
+        if math.isfinite(fit['x_max']):
+            recommended = concurrency_for(fit, fit['x_max'] * USL_THROUGHPUT_TARGET)
+        # 预测点：峰值并发、建议并发与测试上限之外的并发量中未实际测试的部分
+        top = levels[-1]
+        candidates = {int(top * 1.5), top * 2}
+        if math.isfinite(fit['n_peak']) and fit['n_peak'] <= top * 10:
+            candidates.add(max(int(round(fit['n_peak'])), 1))
+        if recommended is not None:
+            candidates.add(recommended)
+        points = sorted(candidates - set(levels))
+        self.scalability = {
+            'fit': fit,
+            'levels': levels,
+            'goodput': goodput,
+            'recommended': recommended,
+            'predictions': predict(fit, points) if points else None
+        }
+        self.sizing = self._plan_capacity(fit, levels, goodput, recommended)
+        self.logger.info(f"USL 拟合: σ={fit['sigma']:.4f}, κ={fit['kappa']:.6f}, R²={fit['r2']:.3f}, "
+                         f"峰值并发 {fit['n_peak']:.0f}, 吞吐上限 {fit['x_max']:.1f} req/s")
+
+    def _plan_capacity(self, fit, levels, goodput, recommended):
+        """按各服务 CPU 随吞吐、内存峰值随并发量的线性增长，估算目标 QPS 所需实例数、每实例并发量、核数与内存"""
+        target = self.target_qps or float(goodput.max())
+        # 单实例按建议并发量运行；模型无吞吐上限（线性扩展）时单实例即可承载
+        if recommended is not None:
+            per_instance_limit = float(predict(fit, recommended)['throughput'][0])
+            instances = max(1, math.ceil(target / per_instance_limit))
+        else:
+            instances = 1
+        per_instance_qps = target / instances
+        concurrency = concurrency_for(fit, per_instance_qps) or recommended or levels[-1]
+
+        processes = set.intersection(*(set(self.summary_stats[c]['processes']) for c in levels))
+        services = []
+        for process in sorted(processes):
+            cpu = np.array([self.summary_stats[c]['processes'][process]['cpu_avg'] for c in levels])
+            memory = np.array([self.summary_stats[c]['processes'][process]['memory_max'] for c in levels])
+            cpu_slope, cpu_base = self._cpu_per_qps(goodput, cpu)
+            memory_slope, memory_base = np.polyfit(levels, memory, 1)
+            cpu_needed = max(cpu_base + cpu_slope * per_instance_qps, 0.0)
+            services.append({
+                'process': process,
+                # CPU 百分比（单核 = 100%）每 req/s 的增量换算为每请求 CPU 毫秒
+                'cpu_ms_per_request': cpu_slope * 10,
+                'cpu_base': cpu_base,
+                'cores': cpu_needed / 100 / SIZING_CPU_UTILIZATION,
+                'memory_mb': max(memory_base + memory_slope * concurrency, memory.min())
+            })
+        return {
+            'target_qps': target,
+            'target_given': self.target_qps is not None,
+            'instances': instances,
+            'per_instance_qps': per_instance_qps,
+            'concurrency': concurrency,
+            'services': services,
+            'total_cores': sum(service['cores'] for service in services),
+            'total_memory_mb': sum(service['memory_mb'] for service in services)
+        }
+
+    @staticmethod
+    def _cpu_per_qps(goodput, cpu):
+        """CPU（%）= 空载 CPU + 斜率 × 吞吐；吞吐变化太小或斜率非正时按 CPU / 吞吐 的均值、空载为 0"""
+        if (goodput.max() - goodput.min()) >= SIZING_MIN_QPS_SPREAD * goodput.max():
+            slope, base = np.polyfit(goodput, cpu, 1)
+            if slope > 0:
+                return slope, max(base, 0.0)
+        return float(np.mean(cpu / goodput)), 0.0
+
+    def analyze_open_loop(self):
+        """分析开环测试：请求负载、实际吞吐与校正前后的延迟分位数"""
+        if not self.open_loop_data and not self.open_loop_histograms:
+            return
+
+        self.logger.info("开始分析开环测试...")
+
+        for rate_label, merged in self.open_loop_histograms.items():
+            if not merged['total']:
+                continue
+            # 单个文件直接取生成器记录的吞吐；多个文件按窗口覆盖时间重新计算，调度滞后取最大值
+            summaries = [source.get('summary') or {} for source in merged['sources']]
+            covered = merged['covered']
+            if len(summaries) == 1:
+                offered_rps = summaries[0].get('offered_rps', 0)
+                achieved_rps = summaries[0].get('achieved_rps', 0)
+            else:
+                offered_rps = sum(s.get('offered', 0) for s in summaries) / covered if covered > 0 else 0
+                achieved_rps = merged['successful'] / covered if covered > 0 else 0
+            stats = {
+                'offered_rps': offered_rps,
+                'achieved_rps': achieved_rps,
+                'total_requests': merged['total'],
+                'success_rate': merged['successful'] / merged['total'] * 100,
+                'max_schedule_lag': max((s.get('max_schedule_lag', 0) for s in summaries), default=0)
+            }
+            service = merged['extra'].get('service', merged['histogram'])
+            for q in (0.50, 0.95, 0.99):
+                key = int(q * 100)
+                stats[f'p{key}_service_time'] = service.percentile(q)
+                stats[f'p{key}_corrected'] = merged['histogram'].percentile(q)
+            self.open_loop_stats[rate_label] = stats
+
+        frame = self._combine_levels(self.open_loop_data, 'rate_label')
+        if not frame.empty:
+            frame['schedule_lag'] = frame['start_time'] - frame['intended_time']
+            success = frame['response_code'].eq(200).fillna(False).astype(bool)
+            counts = frame.groupby('rate_label').agg(
+                total=('intended_time', 'size'), first_intended=('intended_time', 'min'),
+                last_intended=('intended_time', 'max'), last_end=('end_time', 'max'),
+                max_schedule_lag=('schedule_lag', 'max'))
+            counts['successful'] = success.groupby(frame['rate_label']).sum()
+            quantiles = frame[success].groupby('rate_label')[['duration', 'corrected_duration']] \
+                .quantile([0.50, 0.95, 0.99]).unstack()
+
+            for rate_label, row in counts.iterrows():
+                intended_span = row['last_intended'] - row['first_intended']
+                completion_span = row['last_end'] - row['first_intended']
+                stats = {
+                    'offered_rps': (row['total'] - 1) / intended_span if intended_span > 0 else 0,
+                    'achieved_rps': row['successful'] / completion_span if completion_span > 0 else 0,
+                    'total_requests': int(row['total']),
+                    'success_rate': row['successful'] / row['total'] * 100,
+                    'max_schedule_lag': row['max_schedule_lag']
+                }
+                for q in (0.50, 0.95, 0.99):
+                    key = int(q * 100)
+                    if rate_label in quantiles.index:
+                        stats[f'p{key}_service_time'] = quantiles.at[rate_label, ('duration', q)]
+                        stats[f'p{key}_corrected'] = quantiles.at[rate_label, ('corrected_duration', q)]
+                    else:
+                        stats[f'p{key}_service_time'] = stats[f'p{key}_corrected'] = 0
+                self.open_loop_stats[rate_label] = stats
+
+        self.logger.info("开环测试分析完成")
     
+    def analyze(self):
+        """依次完成全部分析"""
+        self.analyze_resource_usage()
+        self.analyze_performance_metrics()
+        self.analyze_open_loop()
+        self.analyze_warmup()
+        self.analyze_latency_windows()
+        self.analyze_timeline()
+        self.analyze_server_metrics()
+        self.analyze_scalability()
+        self.analyze_soak()
+        self.analyze_agents()
+        self.analyze_request_types()
+        self.analyze_tail_requests()
+
+    def analyze_tail_requests(self):
+        """整理各级别直方图文件中采集的最慢成功请求与失败请求抽样，标注耗时最长的协议阶段"""
+        for unit, histograms in (('并发', self.histogram_data), ('req/s', self.open_loop_histograms)):
+            for label in sorted(histograms):
+                tail = histograms[label].get('tail') or {}
+                level = f"{label} {unit}"
+                for kind in ('slowest', 'failed'):
+                    for record in tail.get(kind, []):
+                        phases = record.get('phases') or {}
+                        timed = {phase: value for phase, value in phases.items() if phase not in ('connect', 'tls')}
+                        self.tail_requests.append(dict(record, level=level, kind=kind,
+                                                       dominant=max(timed, key=timed.get) if timed else None))
+                if tail.get('failed_total'):
+                    self.tail_failed_totals[level] = tail['failed_total']
+        if self.tail_requests:
+            with_logs = sum(1 for record in self.tail_requests if record.get('logs'))
+            self.logger.info(f"尾部请求分析完成: {len(self.tail_requests)} 个最慢/失败请求，{with_logs} 个匹配到服务日志")
+
+    def analyze_request_types(self):
+        """混合场景：按级别统计各请求类型的份额、吞吐、成功率与延迟分位数，QPS 按窗口覆盖的时间计算"""
+        for unit, histograms in (('并发', self.histogram_data), ('req/s', self.open_loop_histograms)):
+            for label in sorted(label for label, merged in histograms.items() if merged['request_types']):
+                merged = histograms[label]
+                covered = merged['covered']
+                scenarios = sorted({source['scenario'] for source in merged['sources'] if source.get('scenario')})
+                for name, counts in sorted(merged['request_types'].items(), key=lambda item: -item[1]['total']):
+                    histogram = counts['histogram']
+                    p50, p95, p99 = histogram.percentiles([0.50, 0.95, 0.99])
+                    self.request_type_stats.append({
+                        'level': f"{label} {unit}",
+                        'concurrency': label if unit == '并发' else None,
+                        'scenario': ', '.join(scenarios),
+                        'name': name,
+                        'total': counts['total'],
+                        'share': counts['total'] / merged['total'] * 100 if merged['total'] else 0,
+                        'qps': counts['total'] / covered if covered > 0 else 0,
+                        'success_rate': counts['successful'] / counts['total'] * 100 if counts['total'] else 0,
+                        'avg': histogram.mean,
+                        'p50': p50,
+                        'p95': p95,
+                        'p99': p99
+                    })
+        if self.request_type_stats:
+            self.logger.info(f"请求类型分析完成: {len({row['name'] for row in self.request_type_stats})} 种请求类型")
+
+    def _distributed_settings(self):
+        config = {}
+        if self.config_path and os.path.exists(self.config_path):
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        return distributed_settings(config)
+
+    def analyze_agents(self):
+        """分布式测试：按级别整理各代理的份额、吞吐、延迟与生成器开销，标出可能饱和的生成器"""
+        settings = None
+        for unit, histograms in (('并发', self.histogram_data), ('req/s', self.open_loop_histograms)):
+            # 协调器写出的级别标签均为数值（开环不支持 ramp）
+            labels = [label for label, merged in histograms.items()
+                      if any(source.get('agent') for source in merged['sources'])]
+            for label in sorted(labels, key=float):
+                settings = settings or self._distributed_settings()
+                for row in sorted(agent_breakdown(histograms[label]['sources'], settings), key=lambda row: row['name']):
+                    self.agent_rows.append(dict(row, level=f"{label} {unit}"))
+        saturated = [row for row in self.agent_rows if row['reasons']]
+        if saturated:
+            self.logger.warning(f"{len(saturated)} 个代理级别的负载生成器可能饱和: " +
+                                ', '.join(f"{row['level']} {row['name']}" for row in saturated))
+
+    def _agent_summary(self):
+        """逐代理明细的文字结论"""
+        saturated = [row for row in self.agent_rows if row['reasons']]
+        agents = sorted({row['name'] for row in self.agent_rows})
+        text = f"共 {len(agents)} 个代理（{', '.join(agents)}）。"
+        if not saturated:
+            return text + '各级别均未发现负载生成器饱和，合并后的延迟可代表服务端。'
+        levels = sorted({row['level'] for row in saturated}, key=lambda level: float(level.split()[0]))
+        return text + (f"<strong>{', '.join(levels)} 存在可能饱和的生成器</strong>，这些级别的延迟与吞吐含有生成器自身的排队，"
+                       f"建议增加代理或降低对应代理的权重后重测。")
+
+    def _soak_settings(self):
+        settings = {'trend_skip_minutes': SOAK_TREND_SKIP_MINUTES,
+                    'leak_growth_percent_per_hour': LEAK_GROWTH_PERCENT_PER_HOUR}
+        if self.config_path and os.path.exists(self.config_path):
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                soak = json.load(f).get('soak', {})
+            settings.update({key: soak[key] for key in settings if key in soak})
+        return settings
+
+    @staticmethod
+    def _soak_series(df, time_column, skip_seconds):
+        """单个服务的长稳测试序列：按时间排序，跳过开头 skip_seconds 秒，服务重启（主进程 pid 变化）时
+        只取最后一次启动之后的部分；返回 (序列, 重启次数, 时间轴小时数组)"""
+        df = df.sort_values(time_column)
+        df = df[df[time_column] >= df[time_column].iloc[0] + skip_seconds]
+        restarts = int((df['pid'] != df['pid'].shift()).sum()) - 1 if not df.empty else 0
+        if restarts > 0:
+            df = df[df['pid'] == df['pid'].iloc[-1]]
+        return df, max(restarts, 0), (df[time_column].to_numpy(dtype=float) - df[time_column].min()) / 3600
+
+    def analyze_soak(self):
+        """长稳测试泄漏检测：各服务 RSS、fd、线程与 TCP 连接数（及 smaps 匿名页/文件映射页）的线性趋势，
+        每小时增长率、置信区间与增长置信度；显著增长且超过阈值的判定为疑似泄漏"""
+        if not self.soak_data and not self.soak_smaps:
+            return
+        self.logger.info("开始分析长稳测试资源趋势...")
+        settings = self._soak_settings()
+        skip_seconds = settings['trend_skip_minutes'] * 60
+        sources = [(name, df, 'window_end', SOAK_METRICS) for name, df in self.soak_data.items()] + \
+                  [(name, df, 'epoch_time', SMAPS_METRICS) for name, df in self.soak_smaps.items()]
+        for name, df, time_column, metrics in sources:
+            for process, group in df.groupby('process'):
+                series, restarts, hours = self._soak_series(group, time_column, skip_seconds)
+                for metric, (label, unit) in metrics.items():
+                    if metric not in series.columns:
+                        continue
+                    trend = fit_trend(hours, series[metric].to_numpy(dtype=float))
+                    if trend is None:
+                        continue
+                    leak = is_leak(trend, settings['leak_growth_percent_per_hour'])
+                    self.soak_trends.append({'test': name, 'process': process, 'metric': metric, 'label': label,
+                                             'unit': unit, 'trend': trend, 'leak': leak, 'restarts': restarts})
+                    if leak:
+                        self.logger.warning(f"疑似泄漏 [{process}] {label}: {trend['slope_per_hour']:+.2f} {unit}/小时, "
+                                            f"置信度 {trend['confidence'] * 100:.1f}%")
+        self.logger.info(f"长稳测试趋势分析完成: {len(self.soak_trends)} 条趋势, "
+                         f"{sum(t['leak'] for t in self.soak_trends)} 条疑似泄漏")
+
+    @staticmethod
+    def _level_histogram(windows):
+        histogram = LatencyHistogram()
+        for window in windows or []:
+            histogram.merge(window['histogram'])
+        return histogram
+
+    def catalog_levels(self):
+        """各并发量 / 到达率的汇总统计与全程成功请求延迟直方图（开环为校正延迟），供运行目录收录；
+        延迟分位数统一由直方图计算，使不同运行之间的对比口径一致；没有资源数据的级别 CPU / 内存为空"""
+        levels = []
+        for concurrency, stats in sorted(self.level_stats.items()):
+            histogram = self._level_histogram(self.latency_windows.get(concurrency))
+            if not stats['total_requests'] or not histogram.count:
+                continue
+            resources = self.summary_stats.get(concurrency, {})
+            p50, p95, p99 = histogram.percentiles([0.50, 0.95, 0.99])
+            levels.append({
+                'mode': 'closed', 'level': concurrency, 'total_requests': stats['total_requests'],
+                'success_rate': stats['success_rate'], 'qps': stats['qps'],
+                'avg_response_time': histogram.mean, 'p50_response_time': p50, 'p95_response_time': p95,
+                'p99_response_time': p99, 'max_response_time': histogram.max,
+                'cpu_avg': resources.get('total_cpu_avg'), 'memory_avg': resources.get('total_memory_avg'),
+                'histogram': histogram
+            })
+        for label, stats in self.open_loop_stats.items():
+            histogram = self._level_histogram(self.open_loop_windows.get(label))
+            if not histogram.count:
+                continue
+            p50, p95, p99 = histogram.percentiles([0.50, 0.95, 0.99])
+            levels.append({
+                'mode': 'open', 'level': label, 'total_requests': stats['total_requests'],
+                'success_rate': stats['success_rate'], 'qps': stats['achieved_rps'],
+                'avg_response_time': histogram.mean, 'p50_response_time': p50, 'p95_response_time': p95,
+                'p99_response_time': p99, 'max_response_time': histogram.max, 'histogram': histogram
+            })
+        return levels
+
+    def record_run(self):
+        """收录本次运行到运行目录；指定基线时逐级别对比，结果写入报告的回归对比部分"""
+        db = run_catalog.connect(self.catalog)
+        # 运行标识与筛选数据文件所用的标识一致，未指定时取测试名称
+        run_id = self.run_id or self.test_name
+        count = run_catalog.record_generator(db, self, run_id, self.build,
+                                             config_digest=run_catalog.config_hash(self.config_path))
+        self.logger.info(f"已收录到运行目录 {self.catalog}: {count} 个级别")
+        if not self.baseline:
+            return
+        baseline = run_catalog.resolve_run(db, self.baseline, exclude=run_id)
+        if baseline is None:
+            self.logger.info("运行目录中没有可作为基线的运行，跳过回归对比")
+            return
+        self.regression_settings = run_catalog.regression_settings(self.config_path)
+        try:
+            self.regression = run_catalog.compare_runs(db, [baseline, run_id], self.regression_settings)[0]
+        except KeyError as e:
+            self.logger.warning(f"基线运行不存在: {e.args[0]}")
+            return
+        regressed = [row for row in self.regression['levels'] if row['regressions']]
+        for row in regressed:
+            self.logger.warning(f"性能回归 [{row['mode']} {row['level']}]: {'；'.join(row['regressions'])}")
+        self.logger.info(f"与基线 {baseline} 对比完成，{len(regressed)} 个级别出现回归")
+
     def create_resource_charts(self):
         """创建资源使用图表"""
         self.logger.info("创建资源使用图表...")
@@ -235,9 +1254,7 @@ class TrusteeReportGenerator:
             height=500
         )
         
-        chart_file = os.path.join(self.charts_dir, 'cpu_usage_trend.html')
-        fig.write_html(chart_file)
-        charts.append(('CPU 使用率趋势', chart_file))
+        charts.append(('CPU 使用率趋势', 'cpu_usage_trend', fig))
         
         # 2. 内存使用量随并发量变化趋势图
         total_memory_avg = [self.summary_stats[c]['total_memory_avg'] for c in concurrencies]
@@ -265,9 +1282,7 @@ class TrusteeReportGenerator:
             height=500
         )
         
-        chart_file = os.path.join(self.charts_dir, 'memory_usage_trend.html')
-        fig.write_html(chart_file)
-        charts.append(('内存使用量趋势', chart_file))
+        charts.append(('内存使用量趋势', 'memory_usage_trend', fig))
         
         # 3. 各进程资源占用对比图（选择中等并发量）
         mid_concurrency = concurrencies[len(concurrencies)//2]
@@ -298,12 +1313,100 @@ class TrusteeReportGenerator:
             height=500
         )
         
-        chart_file = os.path.join(self.charts_dir, 'process_resource_comparison.html')
-        fig.write_html(chart_file)
-        charts.append(('进程资源对比', chart_file))
-        
+        charts.append(('进程资源对比', 'process_resource_comparison', fig))
+
+        charts.extend(self.create_os_metric_charts())
+
         return charts
-    
+
+    def create_os_metric_charts(self):
+        """创建操作系统级指标图表：各服务上下文切换、缺页与 TCP 连接状态，以及系统磁盘与网卡吞吐"""
+        concurrencies = sorted(self.summary_stats.keys())
+        processes = sorted({p for c in concurrencies
+                            for p, stats in self.summary_stats[c]['processes'].items() if stats.get('os_metrics')})
+        if not processes:
+            return []
+
+        def metric(concurrency, process, column, key='avg'):
+            stats = self.summary_stats[concurrency]['processes'].get(process, {})
+            return stats.get('os_metrics', {}).get(column, {}).get(key)
+
+        def total(concurrency, process, columns):
+            values = [metric(concurrency, process, column) for column in columns]
+            values = [v for v in values if v is not None]
+            return sum(values) if values else None
+
+        charts = []
+        colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2']
+        fig = make_subplots(
+            rows=2, cols=2,
+            subplot_titles=('上下文切换/秒（实线自愿 / 虚线非自愿）', '缺页/秒（次缺页 + 主缺页）',
+                            'ESTABLISHED 连接数（平均）', 'TIME_WAIT / CLOSE_WAIT 峰值（虚线 CLOSE_WAIT）')
+        )
+        for process, color in zip(processes, colors * 3):
+            fig.add_trace(go.Scatter(
+                x=concurrencies, y=[metric(c, process, 'voluntary_ctx_per_sec') for c in concurrencies],
+                mode='lines+markers', name=process, legendgroup=process, line=dict(color=color, width=2)
+            ), row=1, col=1)
+            fig.add_trace(go.Scatter(
+                x=concurrencies, y=[metric(c, process, 'involuntary_ctx_per_sec') for c in concurrencies],
+                mode='lines+markers', name=process, legendgroup=process, showlegend=False,
+                line=dict(color=color, width=2, dash='dash')
+            ), row=1, col=1)
+            fig.add_trace(go.Scatter(
+                x=concurrencies,
+                y=[total(c, process, ['minor_faults_per_sec', 'major_faults_per_sec']) for c in concurrencies],
+                mode='lines+markers', name=process, legendgroup=process, showlegend=False,
+                line=dict(color=color, width=2)
+            ), row=1, col=2)
+            fig.add_trace(go.Scatter(
+                x=concurrencies, y=[metric(c, process, 'tcp_established') for c in concurrencies],
+                mode='lines+markers', name=process, legendgroup=process, showlegend=False,
+                line=dict(color=color, width=2)
+            ), row=2, col=1)
+            fig.add_trace(go.Scatter(
+                x=concurrencies, y=[metric(c, process, 'tcp_time_wait', 'max') for c in concurrencies],
+                mode='lines+markers', name=process, legendgroup=process, showlegend=False,
+                line=dict(color=color, width=2)
+            ), row=2, col=2)
+            fig.add_trace(go.Scatter(
+                x=concurrencies, y=[metric(c, process, 'tcp_close_wait', 'max') for c in concurrencies],
+                mode='lines+markers', name=process, legendgroup=process, showlegend=False,
+                line=dict(color=color, width=2, dash='dash')
+            ), row=2, col=2)
+        for row in (1, 2):
+            for col in (1, 2):
+                fig.update_xaxes(title_text='并发量', row=row, col=col)
+        fig.update_layout(title='各服务操作系统级指标', template='plotly_white', height=800)
+
+        charts.append(('进程调度、缺页与 TCP 连接', 'process_os_metrics', fig))
+
+        # 系统磁盘与网卡吞吐
+        if any(self.summary_stats[c]['system'] for c in concurrencies):
+            def system_mb(concurrency, column):
+                value = self.summary_stats[concurrency]['system'].get(column, {}).get('avg')
+                return value / 1048576 if value is not None else None
+
+            fig = make_subplots(rows=1, cols=2, subplot_titles=('磁盘吞吐', '网卡吞吐（不含 lo）'))
+            for column, name, color, col in (
+                    ('io_read_bytes_per_sec', '磁盘读', '#1f77b4', 1),
+                    ('io_write_bytes_per_sec', '磁盘写', '#ff7f0e', 1),
+                    ('net_rx_bytes_per_sec', '接收', '#2ca02c', 2),
+                    ('net_tx_bytes_per_sec', '发送', '#d62728', 2)):
+                fig.add_trace(go.Scatter(
+                    x=concurrencies, y=[system_mb(c, column) for c in concurrencies],
+                    mode='lines+markers', name=name, line=dict(color=color, width=3)
+                ), row=1, col=col)
+            fig.update_xaxes(title_text='并发量', row=1, col=1)
+            fig.update_xaxes(title_text='并发量', row=1, col=2)
+            fig.update_yaxes(title_text='MB/秒', row=1, col=1)
+            fig.update_yaxes(title_text='MB/秒', row=1, col=2)
+            fig.update_layout(title='系统磁盘与网卡吞吐', template='plotly_white', height=500)
+
+            charts.append(('系统磁盘与网卡吞吐', 'system_io_throughput', fig))
+
+        return charts
+
     def create_performance_charts(self):
         """创建性能图表"""
         self.logger.info("创建性能图表...")
@@ -342,9 +1445,7 @@ class TrusteeReportGenerator:
             height=500
         )
         
-        chart_file = os.path.join(self.charts_dir, 'performance_metrics.html')
-        fig.write_html(chart_file)
-        charts.append(('性能指标', chart_file))
+        charts.append(('性能指标', 'performance_metrics', fig))
         
         # 5. 响应时间分布图
         avg_times = [self.summary_stats[c].get('avg_response_time', 0) for c in concurrencies]
@@ -379,12 +1480,712 @@ class TrusteeReportGenerator:
             height=500
         )
         
-        chart_file = os.path.join(self.charts_dir, 'response_time_distribution.html')
-        fig.write_html(chart_file)
-        charts.append(('响应时间分布', chart_file))
-        
+        charts.append(('响应时间分布', 'response_time_distribution', fig))
+
+        # 6. 目标并发 vs 实际在途请求数
+        if self.concurrency_data:
+            fig = make_subplots(
+                rows=1, cols=2,
+                subplot_titles=('目标并发 vs 实际平均并发', '在途请求数随时间变化'),
+                specs=[[{"secondary_y": False}, {"secondary_y": False}]]
+            )
+
+            achieved = [self.summary_stats[c].get('achieved_concurrency') for c in concurrencies]
+            fig.add_trace(
+                go.Scatter(x=concurrencies, y=concurrencies, mode='lines',
+                           name='目标并发', line=dict(color='#7f7f7f', width=2, dash='dash')),
+                row=1, col=1
+            )
+            fig.add_trace(
+                go.Scatter(x=concurrencies, y=achieved, mode='lines+markers',
+                           name='实际平均并发', line=dict(color='#1f77b4', width=3)),
+                row=1, col=1
+            )
+
+            for concurrency in sorted(self.concurrency_data.keys()):
+                timeline_df = self.concurrency_data[concurrency]
+                if timeline_df.empty:
+                    continue
+                elapsed = timeline_df['timestamp'] - timeline_df['timestamp'].min()
+                fig.add_trace(
+                    go.Scatter(x=elapsed, y=timeline_df['avg_inflight'], mode='lines',
+                               name=f'{concurrency} 并发'),
+                    row=1, col=2
+                )
+
+            fig.update_xaxes(title_text='目标并发', row=1, col=1)
+            fig.update_xaxes(title_text='测试时间 (秒)', row=1, col=2)
+            fig.update_yaxes(title_text='在途请求数', row=1, col=1)
+            fig.update_layout(
+                title='实际达到的并发',
+                template='plotly_white',
+                height=500
+            )
+
+            charts.append(('实际并发', 'achieved_concurrency', fig))
+
+        charts.extend(self.create_scalability_charts())
+        charts.extend(self.create_timeline_charts())
+        charts.extend(self.create_server_metrics_charts())
+        charts.extend(self.create_latency_heatmap_charts())
+        charts.extend(self.create_warmup_charts())
+        charts.extend(self.create_latency_cdf_charts())
+        charts.extend(self.create_phase_charts())
+        charts.extend(self.create_request_type_charts())
+        charts.extend(self.create_open_loop_charts())
+
+        return charts
+
+    def create_scalability_charts(self):
+        """实测成功吞吐与 USL 拟合曲线（含置信带），副轴为 Little 定律推算与实测的平均响应时间"""
+        if not self.scalability:
+            return []
+        fit = self.scalability['fit']
+        levels = self.scalability['levels']
+        upper = levels[-1] * 2
+        if math.isfinite(fit['n_peak']):
+            upper = max(upper, min(fit['n_peak'] * 1.5, levels[-1] * 4))
+        grid = np.unique(np.linspace(1, upper, 200).round(1))
+        curve = predict(fit, grid)
+        band = f'{CONFIDENCE * 100:.0f}% 置信区间'
+
+        fig = make_subplots(specs=[[{'secondary_y': True}]])
+        fig.add_trace(go.Scatter(x=np.concatenate([grid, grid[::-1]]),
+                                 y=np.concatenate([curve['throughput_high'], curve['throughput_low'][::-1]]),
+                                 fill='toself', fillcolor='rgba(31,119,180,0.15)', line=dict(width=0),
+                                 name=band, hoverinfo='skip'), secondary_y=False)
+        fig.add_trace(go.Scatter(x=grid, y=curve['throughput'], mode='lines', name='USL 拟合吞吐',
+                                 line=dict(color='#1f77b4', width=2)), secondary_y=False)
+        fig.add_trace(go.Scatter(x=levels, y=self.scalability['goodput'], mode='markers', name='实测成功吞吐',
+                                 marker=dict(color='#1f77b4', size=9)), secondary_y=False)
+        fig.add_trace(go.Scatter(x=grid, y=curve['response_time'] * 1000, mode='lines', name='推算平均响应时间',
+                                 line=dict(color='#d62728', width=2, dash='dash')), secondary_y=True)
+        fig.add_trace(go.Scatter(x=levels, y=[self.summary_stats[c].get('avg_response_time', 0) * 1000 for c in levels],
+                                 mode='markers', name='实测平均响应时间',
+                                 marker=dict(color='#d62728', size=8, symbol='diamond')), secondary_y=True)
+        if math.isfinite(fit['n_peak']) and fit['n_peak'] <= upper:
+            fig.add_vline(x=fit['n_peak'], line=dict(color='#7f7f7f', width=1, dash='dot'),
+                          annotation_text=f"峰值并发 {fit['n_peak']:.0f}", annotation_position='top')
+        fig.update_xaxes(title_text='并发量')
+        fig.update_yaxes(title_text='成功吞吐 (req/s)', secondary_y=False)
+        fig.update_yaxes(title_text='平均响应时间 (ms)', secondary_y=True)
+        fig.update_layout(title='吞吐可扩展性模型（USL）', template='plotly_white', height=500)
+        return [('吞吐可扩展性模型', 'usl_fit', fig)]
+
+    def create_request_type_charts(self):
+        """混合场景各请求类型的 P99 与 QPS 随并发量的变化（至少两个并发量时绘制）"""
+        rows = [row for row in self.request_type_stats if row['concurrency'] is not None]
+        if len({row['concurrency'] for row in rows}) < 2:
+            return []
+        fig = make_subplots(rows=1, cols=2, subplot_titles=('P99 响应时间', 'QPS'))
+        for index, name in enumerate(sorted({row['name'] for row in rows})):
+            typed = sorted((row for row in rows if row['name'] == name), key=lambda row: row['concurrency'])
+            color = DEFAULT_PLOTLY_COLORS[index % len(DEFAULT_PLOTLY_COLORS)]
+            levels = [row['concurrency'] for row in typed]
+            fig.add_trace(go.Scatter(x=levels, y=[row['p99'] * 1000 for row in typed], mode='lines+markers',
+                                     name=name, legendgroup=name, line=dict(color=color)), row=1, col=1)
+            fig.add_trace(go.Scatter(x=levels, y=[row['qps'] for row in typed], mode='lines+markers',
+                                     name=name, legendgroup=name, showlegend=False, line=dict(color=color)),
+                          row=1, col=2)
+        fig.update_xaxes(title_text='并发量')
+        fig.update_yaxes(title_text='P99 (ms)', row=1, col=1)
+        fig.update_yaxes(title_text='QPS', row=1, col=2)
+        fig.update_layout(title='各请求类型的延迟与吞吐', template='plotly_white', height=500)
+        return [('各请求类型的延迟与吞吐', 'request_types', fig)]
+
+    def create_timeline_charts(self):
+        """QPS、P99 与各服务 CPU/RSS 按同一时间轴绘制，延迟拐点所在并发量的时间段加底色标出"""
+        timeline = self.timeline
+        if timeline.empty:
+            return []
+
+        x = [datetime.fromtimestamp(start) for start in timeline['start']]
+        fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.05,
+                            subplot_titles=('QPS', 'P99 响应时间 (ms)', '各服务 CPU 使用率 (%)', '各服务内存 RSS (MB)'))
+        fig.add_trace(go.Scatter(x=x, y=timeline['qps'], mode='lines', name='QPS',
+                                 line=dict(color='#9467bd', width=2)), row=1, col=1)
+        fig.add_trace(go.Scatter(x=x, y=timeline['p99'] * 1000, mode='lines', name='P99',
+                                 line=dict(color='#d62728', width=2)), row=2, col=1)
+        for column in timeline.columns:
+            metric, _, process = column.partition(':')
+            if not process:
+                continue
+            row = 3 if metric == 'cpu_percent' else 4
+            # 主机整体的“内存”为已用内存，与服务 RSS 量级不同，只绘制 CPU
+            if process == 'system' and row == 4:
+                continue
+            name = '主机整体' if process == 'system' else process
+            fig.add_trace(go.Scatter(x=x, y=timeline[column], mode='lines', name=name, legendgroup=process,
+                                     showlegend=row == 3,
+                                     line=dict(width=2, dash='dot' if process == 'system' else 'solid')),
+                          row=row, col=1)
+
+        if self.saturation and self.saturation['knee'] is not None:
+            knee_rows = timeline[timeline['concurrency'] == self.saturation['knee']]
+            if not knee_rows.empty:
+                fig.add_vrect(x0=datetime.fromtimestamp(knee_rows['start'].min()),
+                              x1=datetime.fromtimestamp(knee_rows['end'].max()),
+                              fillcolor='#ff7f0e', opacity=0.12, line_width=0, row='all', col=1)
+                fig.add_annotation(x=datetime.fromtimestamp(knee_rows['start'].min()), y=1, yref='paper',
+                                   text=f"延迟拐点: {self.saturation['knee']} 并发", showarrow=False,
+                                   xanchor='left', yanchor='bottom', font=dict(color='#ff7f0e'))
+
+        fig.update_xaxes(title_text='时间', row=4, col=1)
+        fig.update_layout(title='请求延迟与服务资源时间线', template='plotly_white', height=1000)
+        return [('延迟与资源时间线', 'latency_resource_timeline', fig)]
+
+    def create_server_metrics_charts(self):
+        """客户端平均延迟按服务端处理/下游调用/排队/其余部分堆叠（各并发量），
+        以及同一时间轴上客户端窗口平均延迟、服务端各直方图逐采样区间平均耗时与仪表盘指标"""
+        charts = []
+        if self.latency_breakdown:
+            levels = sorted(self.latency_breakdown)
+            x = [str(c) for c in levels]
+            fig = make_subplots(rows=1, cols=2, subplot_titles=('客户端平均延迟拆分 (ms)', 'P99 响应时间 (ms)'))
+            for key, name, color in (('processing', '服务端处理（不含下游）', '#1f77b4'),
+                                     ('downstream', '下游调用', '#17becf'),
+                                     ('queueing', '服务端排队', '#ff7f0e'),
+                                     ('other', '网络/接入排队/客户端', '#7f7f7f')):
+                values = [self.latency_breakdown[c][key] or 0.0 for c in levels]
+                if key == 'processing':
+                    values = [value - (self.latency_breakdown[c]['downstream'] or 0.0) for c, value in zip(levels, values)]
+                fig.add_trace(go.Bar(x=x, y=[value * 1000 for value in values], name=name, marker_color=color),
+                              row=1, col=1)
+            fig.add_trace(go.Scatter(x=x, y=[self.summary_stats[c]['p99_response_time'] * 1000 for c in levels],
+                                     mode='lines+markers', name='客户端 P99', line=dict(color='#d62728', width=2)),
+                          row=1, col=2)
+            for entry in self.server_series:
+                if entry['role'] != 'processing' or entry['kind'] != 'histogram':
+                    continue
+                typed = [item for item in self.server_series if item['name'] == entry['name'] and item['level'] in levels]
+                if entry is not typed[0]:
+                    continue
+                fig.add_trace(go.Scatter(x=[str(item['level']) for item in typed],
+                                         y=[item['summary']['p99'] * 1000 for item in typed],
+                                         mode='lines+markers', name=f"{entry['name']} P99（服务端）",
+                                         line=dict(width=2, dash='dash')), row=1, col=2)
+            fig.update_xaxes(title_text='并发量', type='category')
+            fig.update_layout(title='服务端与客户端延迟', template='plotly_white', height=500, barmode='stack')
+            charts.append(('服务端与客户端延迟', 'server_client_latency', fig))
+
+        histograms = [entry for entry in self.server_series if entry['kind'] == 'histogram']
+        gauges = [entry for entry in self.server_series if entry['kind'] == 'gauge']
+        if histograms:
+            fig = make_subplots(rows=2 if gauges else 1, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                                subplot_titles=('平均耗时 (ms)', '服务端仪表盘指标') if gauges else ('平均耗时 (ms)',))
+            client = self._latency_timeline_means()
+            if client:
+                fig.add_trace(go.Scatter(x=[datetime.fromtimestamp(start) for start, _ in client],
+                                         y=[mean * 1000 for _, mean in client], mode='lines', name='客户端',
+                                         line=dict(color='#d62728', width=2)), row=1, col=1)
+            for index, name in enumerate(dict.fromkeys(entry['name'] for entry in histograms + gauges)):
+                color = DEFAULT_PLOTLY_COLORS[index % len(DEFAULT_PLOTLY_COLORS)]
+                entries = [entry for entry in histograms + gauges if entry['name'] == name]
+                if entries[0]['kind'] == 'histogram':
+                    frame = pd.concat([entry['summary']['intervals'] for entry in entries], ignore_index=True)
+                    x, y, row = frame['epoch_time'], frame['mean'] * 1000, 1
+                else:
+                    frame = pd.concat([entry['summary']['series'] for entry in entries], ignore_index=True)
+                    x, y, row = frame['epoch_time'], frame['value'], 2
+                # 并发量之间的恢复间隔不连线
+                gaps = np.diff(x.to_numpy(), prepend=x.iloc[0]) > self._metric_gap(x)
+                y = y.where(~gaps)
+                fig.add_trace(go.Scatter(x=[datetime.fromtimestamp(value) for value in x], y=y, mode='lines',
+                                         name=name, connectgaps=False, line=dict(color=color, width=2)),
+                              row=row, col=1)
+            fig.update_layout(title='服务端指标时间线', template='plotly_white', height=800 if gauges else 450)
+            charts.append(('服务端指标时间线', 'server_metrics_timeline', fig))
         return charts
+
+    @staticmethod
+    def _metric_gap(epoch):
+        """相邻样本间隔超过中位间隔 3 倍视为两段测试之间的断开"""
+        steps = np.diff(epoch.to_numpy())
+        return float(np.median(steps)) * 3 if len(steps) else math.inf
+
+    def _latency_timeline_means(self):
+        """各并发量逐时间窗口的客户端成功请求平均延迟 [(窗口起点, 平均秒)]"""
+        return sorted((window['start'], window['histogram'].mean)
+                      for windows in self.latency_windows.values() for window in windows
+                      if window['histogram'].count)
+
+    def create_soak_charts(self):
+        """长稳测试各服务资源随时间的变化与拟合趋势线（虚线），smaps 快照另绘匿名页与文件映射页"""
+        charts = []
+        fitted = {(t['test'], t['process'], t['metric']): t['trend'] for t in self.soak_trends}
+        for name, df in self.soak_data.items():
+            metrics = [metric for metric in SOAK_METRICS if metric in df.columns]
+            fig = make_subplots(rows=len(metrics), cols=1, shared_xaxes=True, vertical_spacing=0.04,
+                                subplot_titles=[f"{SOAK_METRICS[m][0]} ({SOAK_METRICS[m][1]})" for m in metrics])
+            start = df['window_end'].min()
+            self._add_soak_traces(fig, df, 'window_end', start, metrics, name, fitted)
+            fig.update_xaxes(title_text='测试时长 (小时)', row=len(metrics), col=1)
+            fig.update_layout(title=f'长稳测试资源趋势 ({name})', template='plotly_white', height=260 * len(metrics))
+            charts.append((f'长稳测试资源趋势 {name}', f'soak_trend_{name}', fig))
+        for name, df in self.soak_smaps.items():
+            metrics = list(SMAPS_METRICS)
+            fig = make_subplots(rows=len(metrics), cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                                subplot_titles=[f"{SMAPS_METRICS[m][0]} ({SMAPS_METRICS[m][1]})" for m in metrics])
+            start = self.soak_data[name]['window_end'].min() if name in self.soak_data else df['epoch_time'].min()
+            self._add_soak_traces(fig, df, 'epoch_time', start, metrics, name, fitted)
+            fig.update_xaxes(title_text='测试时长 (小时)', row=len(metrics), col=1)
+            fig.update_layout(title=f'内存映射构成 smaps_rollup ({name})', template='plotly_white', height=600)
+            charts.append((f'内存映射构成 {name}', f'soak_smaps_{name}', fig))
+        return charts
+
+    def _add_soak_traces(self, fig, df, time_column, start, metrics, name, fitted):
+        skip_seconds = self._soak_settings()['trend_skip_minutes'] * 60
+        colors = {process: DEFAULT_PLOTLY_COLORS[i % len(DEFAULT_PLOTLY_COLORS)]
+                  for i, process in enumerate(sorted(df['process'].unique()))}
+        for row, metric in enumerate(metrics, start=1):
+            for process, group in df.groupby('process'):
+                group = group.sort_values(time_column)
+                fig.add_trace(go.Scatter(x=(group[time_column] - start) / 3600, y=group[metric], mode='lines',
+                                         name=process, legendgroup=process, showlegend=row == 1,
+                                         line=dict(width=2, color=colors[process])), row=row, col=1)
+                trend = fitted.get((name, process, metric))
+                if trend is None:
+                    continue
+                series, _, _ = self._soak_series(group, time_column, skip_seconds)
+                x = (series[time_column].iloc[[0, -1]] - start) / 3600
+                fig.add_trace(go.Scatter(x=x, y=[trend['start'], trend['end']], mode='lines',
+                                         name=f'{process} 趋势', legendgroup=process, showlegend=False,
+                                         line=dict(width=2, dash='dash', color=colors[process])), row=row, col=1)
+
+    @staticmethod
+    def _coarsen_windows(windows):
+        """时间方向超过 HEATMAP_MAX_COLUMNS 列时，相邻窗口的直方图合并为一列"""
+        step = -(-len(windows) // HEATMAP_MAX_COLUMNS)
+        if step <= 1:
+            return windows
+        columns = []
+        for i in range(0, len(windows), step):
+            group = windows[i:i + step]
+            histogram = LatencyHistogram()
+            for window in group:
+                histogram.merge(window['histogram'])
+            columns.append({'start': group[0]['start'], 'end': group[-1]['end'], 'histogram': histogram})
+        return columns
+
+    def _latency_heatmap(self, windows):
+        """由逐窗口直方图计算热力图矩阵与分位数带
+
+        返回 (各列相对首个窗口的秒数, 各行延迟中心值 ms, 请求数矩阵 [行, 列], {分位数带名称: 各列值 ms})，
+        无成功请求时返回 None；计算量只与窗口数和桶数有关，与请求数无关
+        """
+        columns = [column for column in self._coarsen_windows(windows) if column['histogram'].count]
+        if not columns:
+            return None
+        low = max(min(column['histogram'].min_us for column in columns), 1)
+        high = max(max(column['histogram'].max_us for column in columns), low + 1)
+        edges = np.geomspace(low, high, HEATMAP_LATENCY_ROWS + 1)
+
+        matrix = np.zeros((HEATMAP_LATENCY_ROWS, len(columns)))
+        bands = {f'P{q * 100:g}': [] for q in BAND_QUANTILES}
+        bands['最大值'] = []
+        for i, column in enumerate(columns):
+            histogram = column['histogram']
+            indexes = np.fromiter(histogram.counts.keys(), dtype=np.int64, count=len(histogram.counts))
+            counts = np.fromiter(histogram.counts.values(), dtype=np.int64, count=len(histogram.counts))
+            upper = np.minimum(bucket_upper_bounds(indexes), histogram.max_us)
+            rows = np.clip(np.searchsorted(edges, upper, side='right') - 1, 0, HEATMAP_LATENCY_ROWS - 1)
+            matrix[:, i] = np.bincount(rows, weights=counts, minlength=HEATMAP_LATENCY_ROWS)
+            for name, value in zip(bands, histogram.percentiles(BAND_QUANTILES) + [histogram.max]):
+                bands[name].append(value * 1000)
+
+        origin = windows[0]['start']
+        x = [column['start'] - origin for column in columns]
+        y = np.sqrt(edges[:-1] * edges[1:]) / 1000
+        return x, y, matrix, bands
+
+    def create_latency_heatmap_charts(self):
+        """各并发量 / 到达率的延迟热力图（时间 × 延迟，颜色为请求数）与 P50/P90/P99/最大值分位数带，下拉框切换"""
+        series = [(f'{c} 并发', self.latency_windows[c]) for c in sorted(self.latency_windows)]
+        series += [(f'{label} req/s 开环（校正）', self.open_loop_windows[label])
+                   for label in sorted(self.open_loop_windows)]
+        if not series:
+            return []
+
+        fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08, row_heights=[0.6, 0.4],
+                            subplot_titles=('延迟热力图（颜色为请求数，对数刻度）', '延迟分位数带'))
+        band_colors = ['#1f77b4', '#2ca02c', '#d62728', '#7f7f7f']
+        groups = []
+        for name, windows in series:
+            heatmap = self._latency_heatmap(windows)
+            if heatmap is None:
+                continue
+            x, y, matrix, bands = heatmap
+            visible = not groups
+            first_trace = len(fig.data)
+            counts = np.where(matrix > 0, matrix, np.nan)
+            fig.add_trace(go.Heatmap(
+                x=x, y=y, z=np.log10(counts), customdata=counts, colorscale='YlOrRd', visible=visible,
+                colorbar=dict(title='log10(请求数)', len=0.55, y=0.78),
+                hovertemplate='%{x:.0f}s  %{y:.2f}ms: %{customdata:.0f} 个请求<extra></extra>'
+            ), row=1, col=1)
+            for i, (band, values) in enumerate(bands.items()):
+                # P90、P99 与前一条分位线之间填充，形成分位数带
+                fill = 'tonexty' if 0 < i < len(BAND_QUANTILES) else None
+                fig.add_trace(go.Scatter(
+                    x=x, y=values, mode='lines', name=band, visible=visible, fill=fill,
+                    line=dict(color=band_colors[i], width=2 if fill or i == 0 else 1,
+                              dash='dot' if i == len(BAND_QUANTILES) else 'solid')
+                ), row=2, col=1)
+            groups.append((name, first_trace, len(fig.data)))
+        if not groups:
+            return []
+
+        if len(groups) > 1:
+            buttons = []
+            for name, first, last in groups:
+                visibility = [first <= i < last for i in range(len(fig.data))]
+                buttons.append(dict(label=name, method='update',
+                                    args=[{'visible': visibility}, {'title': f'延迟随时间分布: {name}'}]))
+            fig.update_layout(updatemenus=[dict(buttons=buttons, direction='down', showactive=True,
+                                                x=0, xanchor='left', y=1.12, yanchor='top')])
+        fig.update_yaxes(type='log', title_text='响应时间 (ms)', row=1, col=1)
+        fig.update_yaxes(type='log', title_text='响应时间 (ms)', row=2, col=1)
+        fig.update_xaxes(title_text='测试时间 (秒)', row=2, col=1)
+        fig.update_layout(title=f'延迟随时间分布: {groups[0][0]}', template='plotly_white', height=800)
+        return [('延迟热力图与分位数带', 'latency_heatmap', fig)]
+
+    def create_warmup_charts(self):
+        """预热阶段逐秒延迟中位数与稳态中位数之比，阴影为视为稳定的容差范围"""
+        if not self.warmup_stats:
+            return []
+        fig = go.Figure()
+        for concurrency, stats in self.warmup_stats.items():
+            fig.add_trace(go.Scatter(x=stats['offsets'], y=stats['ratios'], mode='lines',
+                                     name=f'{concurrency} 并发', line=dict(width=2)))
+        fig.add_hrect(y0=1 - WARMUP_TOLERANCE, y1=1 + WARMUP_TOLERANCE, fillcolor='#2ca02c', opacity=0.12,
+                      line_width=0)
+        fig.add_hline(y=1, line=dict(color='#2ca02c', width=1, dash='dot'))
+        fig.update_xaxes(title_text='预热开始后 (秒)')
+        fig.update_yaxes(type='log', title_text='P50 / 稳态 P50')
+        fig.update_layout(title='预热阶段延迟收敛', template='plotly_white', height=500)
+        return [('预热收敛', 'warmup_convergence', fig)]
+
+    def create_latency_cdf_charts(self):
+        """由延迟直方图绘制各并发量 / 到达率的延迟累计分布（对数横轴，便于观察尾部）"""
+        series = [(f'{c} 并发', self.histogram_data[c]['histogram']) for c in sorted(self.histogram_data)]
+        series += [(f'{label} req/s 开环（校正）', self.open_loop_histograms[label]['histogram'])
+                   for label in sorted(self.open_loop_histograms)]
+        series = [(name, histogram) for name, histogram in series if histogram.count]
+        if not series:
+            return []
+
+        fig = go.Figure()
+        for name, histogram in series:
+            points = histogram.cdf()
+            fig.add_trace(go.Scatter(
+                x=[value for value, _ in points], y=[fraction * 100 for _, fraction in points],
+                mode='lines', name=name, line=dict(width=2, shape='hv')
+            ))
+        for q in (50, 95, 99):
+            fig.add_hline(y=q, line=dict(color='#7f7f7f', width=1, dash='dot'),
+                          annotation_text=f'P{q}', annotation_position='bottom right')
+        fig.update_xaxes(type='log', title_text='响应时间 (秒，对数)')
+        fig.update_yaxes(title_text='累计占比 (%)', range=[0, 100.5])
+        fig.update_layout(title='延迟累计分布（成功请求）', template='plotly_white', height=500)
+
+        return [('延迟累计分布', 'latency_cdf', fig)]
+
+    def create_phase_charts(self):
+        """创建协议阶段耗时图表：各并发量的阶段平均耗时堆叠图与阶段 P95/P99"""
+        concurrencies = [c for c in sorted(self.summary_stats.keys())
+                         if self.summary_stats[c].get('phases')]
+        if not concurrencies:
+            return []
+
+        phases = [p for p in PHASE_LABELS
+                  if any(p in self.summary_stats[c]['phases'] for c in concurrencies)]
+        colors = ['#8c564b', '#e377c2', '#1f77b4', '#d62728', '#2ca02c']
+
+        fig = make_subplots(
+            rows=1, cols=2,
+            subplot_titles=('各阶段平均耗时（堆叠）', '各阶段 P95 / P99 耗时'),
+            specs=[[{"secondary_y": False}, {"secondary_y": False}]]
+        )
+
+        for phase, color in zip(phases, colors):
+            values = [self.summary_stats[c]['phases'].get(phase, {}) for c in concurrencies]
+            fig.add_trace(
+                go.Bar(x=concurrencies, y=[v.get('avg', 0) for v in values],
+                       name=PHASE_LABELS[phase], marker_color=color, legendgroup=phase),
+                row=1, col=1
+            )
+            fig.add_trace(
+                go.Scatter(x=concurrencies, y=[v.get('p95', 0) for v in values], mode='lines+markers',
+                           name=f'{PHASE_LABELS[phase]} P95', line=dict(color=color, width=2, dash='dash'),
+                           legendgroup=phase, showlegend=False),
+                row=1, col=2
+            )
+            fig.add_trace(
+                go.Scatter(x=concurrencies, y=[v.get('p99', 0) for v in values], mode='lines+markers',
+                           name=f'{PHASE_LABELS[phase]} P99', line=dict(color=color, width=3),
+                           legendgroup=phase, showlegend=False),
+                row=1, col=2
+            )
+
+        fig.update_xaxes(title_text='并发量', row=1, col=1)
+        fig.update_xaxes(title_text='并发量', row=1, col=2)
+        fig.update_yaxes(title_text='耗时 (秒)', row=1, col=1)
+        fig.update_yaxes(title_text='耗时 (秒，实线 P99 / 虚线 P95)', row=1, col=2)
+        fig.update_layout(
+            title='认证握手各阶段耗时',
+            barmode='stack',
+            template='plotly_white',
+            height=500
+        )
+
+        return [('认证握手阶段耗时', 'phase_breakdown', fig)]
+
+    def create_open_loop_charts(self):
+        """创建开环测试图表：请求负载 vs 实际吞吐，校正前后 P99 对比"""
+        if not self.open_loop_stats:
+            return []
+
+        labels = sorted(self.open_loop_stats.keys(), key=lambda l: self.open_loop_stats[l]['offered_rps'])
+        offered = [self.open_loop_stats[l]['offered_rps'] for l in labels]
+        achieved = [self.open_loop_stats[l]['achieved_rps'] for l in labels]
+
+        fig = make_subplots(
+            rows=1, cols=2,
+            subplot_titles=('请求负载 vs 实际吞吐', '校正延迟 vs 服务时间'),
+            specs=[[{"secondary_y": False}, {"secondary_y": False}]]
+        )
+
+        fig.add_trace(
+            go.Scatter(x=offered, y=offered, mode='lines', name='理想吞吐',
+                       line=dict(color='#7f7f7f', width=2, dash='dash')),
+            row=1, col=1
+        )
+        fig.add_trace(
+            go.Scatter(x=offered, y=achieved, mode='lines+markers', name='实际吞吐',
+                       line=dict(color='#9467bd', width=3)),
+            row=1, col=1
+        )
+
+        for key, name, color, dash in [('p99_corrected', 'P99 校正延迟', '#d62728', None),
+                                       ('p95_corrected', 'P95 校正延迟', '#ff7f0e', None),
+                                       ('p99_service_time', 'P99 服务时间', '#1f77b4', 'dash'),
+                                       ('p95_service_time', 'P95 服务时间', '#17becf', 'dash')]:
+            fig.add_trace(
+                go.Scatter(x=offered, y=[self.open_loop_stats[l][key] for l in labels],
+                           mode='lines+markers', name=name, line=dict(color=color, width=3, dash=dash)),
+                row=1, col=2
+            )
+
+        fig.update_xaxes(title_text='请求负载 (req/s)', row=1, col=1)
+        fig.update_xaxes(title_text='请求负载 (req/s)', row=1, col=2)
+        fig.update_yaxes(title_text='吞吐 (req/s)', row=1, col=1)
+        fig.update_yaxes(title_text='延迟 (秒)', row=1, col=2)
+        fig.update_layout(
+            title='开环测试：请求负载与延迟',
+            template='plotly_white',
+            height=500
+        )
+
+        return [('开环测试', 'open_loop_latency', fig)]
+
+    def render_charts(self, charts):
+        """并行渲染图表：每个图表写出独立文件到 charts/，返回 [(标题, 嵌入报告的 div 片段)]
+
+        独立图表文件共用 charts/plotly.min.js，报告本身只内嵌一份 plotly.js
+        """
+        if not charts:
+            return []
+        self.logger.info(f"渲染 {len(charts)} 个图表...")
+        bundle_file = os.path.join(self.charts_dir, 'plotly.min.js')
+        if not os.path.exists(bundle_file):
+            with open(bundle_file, 'w', encoding='utf-8') as f:
+                f.write(get_plotlyjs())
+
+        figures = [fig for _, _, fig in charts]
+        chart_files = [os.path.join(self.charts_dir, f'{name}.html') for _, name, _ in charts]
+        jobs = min(self.jobs, len(charts))
+        fragments = None
+        if jobs > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    fragments = list(executor.map(render_chart, figures, chart_files))
+            except (OSError, RuntimeError) as e:
+                self.logger.warning(f"进程池不可用，改为依次渲染图表: {e}")
+        if fragments is None:
+            fragments = [render_chart(fig, chart_file) for fig, chart_file in zip(figures, chart_files)]
+        return [(title, fragment) for (title, _, _), fragment in zip(charts, fragments)]
+
+    def _render_table(self, rows):
+        """将字典列表渲染为 HTML 表格"""
+        if not rows:
+            return ""
+        html = "<table><thead><tr>"
+        html += "".join(f"<th>{key}</th>" for key in rows[0].keys())
+        html += "</tr></thead><tbody>"
+        for row in rows:
+            html += "<tr>" + "".join(f"<td>{value}</td>" for value in row.values()) + "</tr>"
+        html += "</tbody></table>"
+        return html
     
+    @staticmethod
+    def _format_ms(seconds):
+        return f"{seconds * 1000:.2f}" if pd.notna(seconds) else '-'
+
+    @staticmethod
+    def _format_corr(value):
+        return f"{value:.2f}" if pd.notna(value) else '-'
+
+    def _saturation_summary(self):
+        """延迟拐点与饱和服务的文字结论"""
+        saturation = self.saturation
+        if not saturation:
+            return '并发量不足两个，未判断延迟拐点。'
+        if saturation['knee'] is None:
+            return (f"各并发量 P99 均未达到 {saturation['baseline_level']} 并发 P99 "
+                    f"({saturation['baseline_p99'] * 1000:.1f}ms) 的 {KNEE_P99_FACTOR:g} 倍，未出现延迟拐点。")
+        text = (f"<strong>延迟拐点: {saturation['knee']} 并发</strong>，P99 {saturation['knee_p99'] * 1000:.1f}ms，"
+                f"为 {saturation['baseline_level']} 并发的 {saturation['knee_p99'] / saturation['baseline_p99']:.1f} 倍。")
+        if saturation['services']:
+            details = '；'.join(
+                f"{service['process']} CPU {service['cpu']:.1f}%（各并发量峰值 {service['peak_cpu']:.1f}%，"
+                f"CPU~P99 相关系数 {self._format_corr(service['cpu_p99'])}）" for service in saturation['services'])
+            text += f" 拐点处 CPU 已不再随负载增长的服务: {details}，<strong>{saturation['services'][0]['process']}</strong> 最可能是瓶颈。"
+        else:
+            text += ' 拐点处没有服务的 CPU 达到其峰值，瓶颈可能在 CPU 之外（锁、连接池或下游 I/O）。'
+        if saturation['host_cpu'] is not None and saturation['host_cpu'] >= SATURATION_HOST_CPU:
+            text += f" 主机整体 CPU 使用率 {saturation['host_cpu']:.1f}%，整机 CPU 已饱和。"
+        return text
+
+    @staticmethod
+    def _format_interval(low, high, fmt):
+        """置信区间文字，inf 显示为 ∞"""
+        def value(v):
+            return format(v, fmt) if math.isfinite(v) else '∞'
+        return f"[{value(low)}, {value(high)}]"
+
+    def _scalability_summary(self):
+        """USL 参数的文字结论：争用、一致性开销与吞吐上限"""
+        fit = self.scalability['fit']
+        if fit['sigma'] > NEGLIGIBLE_COEFFICIENT:
+            text = (f"争用系数 σ = {fit['sigma']:.4f}：约 {fit['sigma'] * 100:.1f}% 的工作串行执行（锁、单线程环节），"
+                    f"仅此一项限制吞吐不超过单并发吞吐的 {1 / fit['sigma']:.0f} 倍。")
+        else:
+            text = "争用系数 σ ≈ 0：未观察到串行化瓶颈。"
+        if math.isfinite(fit['n_peak']):
+            text += (f" 一致性系数 κ = {fit['kappa']:.6f}：并发之间的相互协调（共享状态同步、缓存失效）"
+                     f"使吞吐在 <strong>{fit['n_peak']:.0f} 并发</strong>达到峰值 {fit['x_max']:.1f} req/s，之后并发越高吞吐越低。")
+        elif math.isfinite(fit['x_max']):
+            text += f" 一致性系数 κ ≈ 0：吞吐随并发单调趋近上限 {fit['x_max']:.1f} req/s，不会回落。"
+        else:
+            text += ' 一致性系数 κ ≈ 0：在测试范围内吞吐近似线性扩展，模型给不出吞吐上限（无上限）。'
+        if self.scalability['recommended'] is not None:
+            text += (f" 达到吞吐上限 {USL_THROUGHPUT_TARGET * 100:.0f}% 的最小并发量为 "
+                     f"<strong>{self.scalability['recommended']}</strong>，再增加并发只会增加排队延迟。")
+        if fit['r2'] < 0.9:
+            text += f" 拟合优度 R² = {fit['r2']:.3f} 偏低，预测仅供参考。"
+        return text
+
+    def _soak_summary(self):
+        """疑似泄漏的服务与指标；RSS 增长时按 smaps 快照判断主要来自匿名页（堆）还是文件映射"""
+        leaks = [item for item in self.soak_trends if item['leak']]
+        if not leaks:
+            return '长稳测试期间未发现显著的资源增长趋势。'
+        sentences = []
+        for item in leaks:
+            if item['metric'] in SMAPS_METRICS:
+                continue
+            sentence = (f"{item['process']} 的{item['label']}每小时增长 {item['trend']['slope_per_hour']:+.2f} "
+                        f"{item['unit']}")
+            if item['metric'] == 'memory_rss_mb':
+                parts = {t['metric']: t['trend']['slope_per_hour'] for t in self.soak_trends
+                         if t['test'] == item['test'] and t['process'] == item['process'] and t['metric'] in SMAPS_METRICS}
+                if len(parts) == len(SMAPS_METRICS):
+                    source = 'anonymous_mb' if parts['anonymous_mb'] >= parts['file_mb'] else 'file_mb'
+                    sentence += (f"，主要来自{SMAPS_METRICS[source][0]}（匿名页 {parts['anonymous_mb']:+.2f} MB/小时，"
+                                 f"文件映射 {parts['file_mb']:+.2f} MB/小时）")
+            sentences.append(sentence)
+        if not sentences:
+            sentences = [f"{item['process']} 的{item['label']}每小时增长 {item['trend']['slope_per_hour']:+.2f} "
+                         f"{item['unit']}" for item in leaks]
+        return '<strong>疑似泄漏：</strong>' + '；'.join(sentences) + '。'
+
+    def _tail_summary(self):
+        """最慢请求的主要耗时阶段、失败请求的常见错误与服务日志匹配情况"""
+        sentences = []
+        slowest = [record for record in self.tail_requests if record['kind'] == 'slowest']
+        if slowest:
+            top = max(slowest, key=lambda record: record['duration'])
+            sentence = (f"最慢的成功请求为 {html.escape(top['request_id'])}（{top['level']}），"
+                        f"耗时 {top['duration'] * 1000:.2f}ms")
+            if top['dominant']:
+                sentence += f"，其中 {top['dominant']} 阶段 {top['phases'][top['dominant']] * 1000:.2f}ms"
+            sentences.append(sentence)
+            dominant = pd.Series([record['dominant'] for record in slowest if record['dominant']]).value_counts()
+            if not dominant.empty:
+                sentences.append(f"采集的 {len(slowest)} 个最慢请求中 {dominant.iloc[0]} 个耗时最长的阶段为 "
+                                 f"{dominant.index[0]}")
+        failed = [record for record in self.tail_requests if record['kind'] == 'failed']
+        if failed:
+            errors = pd.Series([record['error_msg'].split(':', 1)[0] for record in failed]).value_counts()
+            sentences.append(f"共 {sum(self.tail_failed_totals.values())} 个失败请求，抽样 {len(failed)} 个，"
+                             f"最常见的错误为“{html.escape(errors.index[0])}”（{errors.iloc[0]} 个）")
+        with_logs = sum(1 for record in self.tail_requests if record.get('logs'))
+        if with_logs:
+            sentences.append(f"{with_logs} 个请求匹配到服务日志（见下方明细）")
+        else:
+            sentences.append('没有匹配到服务日志（未配置 tail_capture.log_files，或服务日志不在生成器主机上，'
+                             '可复制日志后以 tail_capture.py extract 事后提取）')
+        return '；'.join(sentences) + '。'
+
+    @staticmethod
+    def _format_clock(epoch):
+        return datetime.fromtimestamp(epoch).strftime('%H:%M:%S.%f')[:-3]
+
+    def _tail_rows(self):
+        """最慢请求与失败请求两张表的行"""
+        has_corrected = any('corrected_duration' in record for record in self.tail_requests)
+        slow_rows, failed_rows = [], []
+        for record in self.tail_requests:
+            phases = record.get('phases') or {}
+            row = {
+                '级别': record['level'],
+                '请求ID': html.escape(record['request_id']),
+                '请求类型': html.escape(record.get('request_type') or '-'),
+                '开始时间': self._format_clock(record['start_time']),
+                '耗时(ms)': f"{record['duration'] * 1000:.2f}"
+            }
+            if has_corrected:
+                row['校正延迟(ms)'] = self._format_ms(record.get('corrected_duration', np.nan))
+            if record['kind'] == 'slowest':
+                for phase in PHASE_LABELS:
+                    row[f"{phase}(ms)"] = self._format_ms(phases.get(phase, np.nan))
+                row['主要阶段'] = record['dominant'] or '-'
+                row['日志行数'] = sum(len(lines) for lines in (record.get('logs') or {}).values())
+                slow_rows.append(row)
+            else:
+                body = record.get('error_body') or ''
+                row['HTTP状态'] = record.get('http_status') or '-'
+                row['错误信息'] = html.escape(record.get('error_msg') or '')
+                row['响应体'] = html.escape(body[:TAIL_BODY_CHARS] + ('…' if len(body) > TAIL_BODY_CHARS else ''))
+                row['日志行数'] = sum(len(lines) for lines in (record.get('logs') or {}).values())
+                failed_rows.append(row)
+        return slow_rows, failed_rows
+
+    def _render_tail_logs(self):
+        """逐请求的服务日志明细（可折叠）；≈ 开头的行为按时间窗口匹配（日志行不含请求 ID）"""
+        blocks = []
+        for record in self.tail_requests:
+            logs = record.get('logs')
+            if not logs:
+                continue
+            lines = [f"[{service}] {'' if entry['match'] == 'id' else '≈ '}{entry['line']}"
+                     for service, entries in logs.items() for entry in entries]
+            title = (f"{html.escape(record['request_id'])} · {record['level']} · "
+                     f"{'最慢' if record['kind'] == 'slowest' else '失败'} · {record['duration'] * 1000:.2f}ms")
+            content = html.escape('\n'.join(lines))
+            blocks.append(f"<details><summary>{title}</summary><pre class=\"log-lines\">{content}</pre></details>")
+        return '\n'.join(blocks)
+
     def generate_html_report(self, resource_charts, performance_charts):
         """生成 HTML 报告"""
         self.logger.info("生成 HTML 报告...")
@@ -393,8 +2194,10 @@ class TrusteeReportGenerator:
         table_data = []
         for concurrency in sorted(self.summary_stats.keys()):
             stats = self.summary_stats[concurrency]
+            achieved = stats.get('achieved_concurrency')
             table_data.append({
                 '并发量': concurrency,
+                '实际并发': f"{achieved:.2f}" if achieved is not None else '-',
                 '总CPU(%)': f"{stats.get('total_cpu_avg', 0):.2f}",
                 '总内存(MB)': f"{stats.get('total_memory_avg', 0):.2f}",
                 '成功率(%)': f"{stats.get('success_rate', 0):.2f}",
@@ -410,7 +2213,7 @@ class TrusteeReportGenerator:
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Trustee Service 性能测试报告</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+    <script type="text/javascript">{get_plotlyjs()}</script>
     <style>
         body {{ font-family: 'Microsoft YaHei', Arial, sans-serif; margin: 20px; }}
         .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; border-radius: 10px; margin-bottom: 30px; }}
@@ -425,6 +2228,7 @@ class TrusteeReportGenerator:
         .metric {{ display: inline-block; margin: 10px 20px 10px 0; }}
         .metric-value {{ font-size: 24px; font-weight: bold; color: #007bff; }}
         .metric-label {{ color: #6c757d; font-size: 14px; }}
+        .log-lines {{ background: white; border: 1px solid #dee2e6; padding: 10px; overflow-x: auto; font-size: 12px; }}
     </style>
 </head>
 <body>
@@ -448,6 +2252,7 @@ class TrusteeReportGenerator:
             <div class="metric-value">{len(set().union(*[stats['processes'].keys() for stats in self.summary_stats.values()]))}</div>
             <div class="metric-label">监控进程数</div>
         </div>
+        <p>统计结果只包含正式测试（steady）阶段；预热与冷却阶段的请求记录和资源采样按阶段标注后排除。</p>
     </div>
     
     <div class="chart-section">
@@ -456,20 +2261,13 @@ class TrusteeReportGenerator:
 """
         
         # 添加资源图表
-        for chart_title, chart_file in resource_charts:
-            with open(chart_file, 'r', encoding='utf-8') as f:
-                chart_html = f.read()
-                # 提取图表的 div 部分
-                start = chart_html.find('<div id="') if '<div id="' in chart_html else chart_html.find('<div>')
-                end = chart_html.rfind('</div>') + 6
-                chart_content = chart_html[start:end] if start != -1 and end != -1 else chart_html
-                
-                html_content += f"""
+        for chart_title, chart_content in resource_charts:
+            html_content += f"""
             <div class="chart-container">
                 <h3>{chart_title}</h3>
                 {chart_content}
             </div>"""
-        
+
         html_content += """
         </div>
     </div>
@@ -480,19 +2278,13 @@ class TrusteeReportGenerator:
 """
         
         # 添加性能图表
-        for chart_title, chart_file in performance_charts:
-            with open(chart_file, 'r', encoding='utf-8') as f:
-                chart_html = f.read()
-                start = chart_html.find('<div id="') if '<div id="' in chart_html else chart_html.find('<div>')
-                end = chart_html.rfind('</div>') + 6
-                chart_content = chart_html[start:end] if start != -1 and end != -1 else chart_html
-                
-                html_content += f"""
+        for chart_title, chart_content in performance_charts:
+            html_content += f"""
             <div class="chart-container">
                 <h3>{chart_title}</h3>
                 {chart_content}
             </div>"""
-        
+
         html_content += """
         </div>
     </div>
@@ -526,15 +2318,360 @@ class TrusteeReportGenerator:
             </tbody>
         </table>
     </div>
-    
+"""
+
+        # 操作系统级指标明细：各服务与系统整体
+        os_rows = []
+        for concurrency in sorted(self.summary_stats.keys()):
+            stats = self.summary_stats[concurrency]
+            entries = [(process, p_stats.get('process_count_max'), p_stats.get('os_metrics', {}))
+                       for process, p_stats in stats.get('processes', {}).items()]
+            entries.append(('system', None, stats.get('system', {})))
+            for process, process_count, metrics in entries:
+                if not metrics:
+                    continue
+                row = {'并发量': concurrency, '进程': process,
+                       '进程数': int(process_count) if process_count is not None else '-'}
+                for column, label in OS_METRIC_LABELS.items():
+                    value = metrics.get(column)
+                    if value is None:
+                        row[label] = '-'
+                    elif column.startswith('tcp_'):
+                        row[label] = f"{value['avg']:.0f} / {value['max']:.0f}"
+                    elif column.endswith('bytes_per_sec'):
+                        row[label] = f"{value['avg'] / 1024:.1f} KB/s"
+                    else:
+                        row[label] = f"{value['avg']:.0f}"
+                os_rows.append(row)
+        if os_rows:
+            html_content += f"""
+    <div class="summary">
+        <h2>🧵 进程调度、缺页、I/O 与 TCP 连接</h2>
+        <p>速率为采样区间均值；TCP 连接数为 平均 / 峰值。非自愿上下文切换或主缺页随并发量上升通常意味着 CPU 争用或内存压力，CLOSE_WAIT 持续增长提示服务端未及时关闭连接。</p>
+        {self._render_table(os_rows)}
+    </div>
+"""
+
+        # 协议阶段耗时明细
+        phase_rows = []
+        for concurrency in sorted(self.summary_stats.keys()):
+            for phase, values in self.summary_stats[concurrency].get('phases', {}).items():
+                phase_rows.append({
+                    '并发量': concurrency,
+                    '阶段': PHASE_LABELS[phase],
+                    '平均(ms)': f"{values['avg'] * 1000:.2f}",
+                    'P95(ms)': f"{values['p95'] * 1000:.2f}",
+                    'P99(ms)': f"{values['p99'] * 1000:.2f}"
+                })
+        if phase_rows:
+            html_content += f"""
+    <div class="summary">
+        <h2>🔍 认证握手阶段耗时</h2>
+        <p>/attest 阶段包含 grpc-as 证据校验、rvps 参考值查询与 token 签发；对比各阶段随并发量的增长可定位最先饱和的服务。</p>
+        {self._render_table(phase_rows)}
+    </div>
+"""
+
+        # 时间对齐：各服务资源与延迟的相关系数及延迟拐点处的饱和服务
+        if self.correlations or self.saturation:
+            correlation_rows = []
+            for process in sorted(self.correlations, key=lambda p: p != 'system'):
+                values = self.correlations[process]
+                correlation_rows.append({
+                    '进程': '主机整体' if process == 'system' else process,
+                    'CPU ~ P99': self._format_corr(values['cpu_p99']),
+                    'CPU ~ QPS': self._format_corr(values['cpu_qps']),
+                    'RSS ~ P99': self._format_corr(values['rss_p99']),
+                    '时间点数': values['points']
+                })
+            html_content += f"""
+    <div class="summary">
+        <h2>⏱️ 延迟与资源时间对齐</h2>
+        <p>资源采样与请求记录使用同一 epoch 时钟，按时间段对齐后计算 Pearson 相关系数；CPU 与 P99 强正相关的服务最可能是延迟上升的来源。</p>
+        <p>{self._saturation_summary()}</p>
+        {self._render_table(correlation_rows)}
+    </div>
+"""
+
+        # 服务端指标：服务端处理、下游调用与排队耗时，与客户端延迟对比
+        if self.server_series:
+            series_rows = []
+            for entry in self.server_series:
+                summary = entry['summary']
+                if entry['kind'] == 'histogram':
+                    series_rows.append({
+                        '并发量': entry['level'],
+                        '指标': entry['name'],
+                        '角色': SERVER_ROLE_LABELS.get(entry['role'], '-'),
+                        '每秒次数': f"{summary['rate']:.1f}",
+                        '平均(ms)': f"{summary['mean'] * 1000:.2f}" if pd.notna(summary['mean']) else '-',
+                        'P50(ms)': self._format_ms(summary['p50']),
+                        'P99(ms)': self._format_ms(summary['p99']),
+                        '每客户端请求(ms)': f"{entry['per_request'] * 1000:.2f}" if 'per_request' in entry else '-'
+                    })
+                else:
+                    series_rows.append({
+                        '并发量': entry['level'], '指标': entry['name'], '角色': '仪表盘',
+                        '每秒次数': '-', '平均(ms)': f"均值 {summary['avg']:.2f}", 'P50(ms)': '-',
+                        'P99(ms)': f"最大 {summary['max']:.2f}", '每客户端请求(ms)': '-'
+                    })
+            breakdown_rows = [{
+                '并发量': concurrency,
+                '客户端平均(ms)': f"{item['client'] * 1000:.2f}",
+                '服务端处理(ms)': f"{item['processing'] * 1000:.2f}",
+                '其中下游调用(ms)': self._format_ms(item['downstream']) if item['downstream'] is not None else '-',
+                '服务端排队(ms)': f"{item['queueing'] * 1000:.2f}",
+                '网络/接入排队/客户端(ms)': f"{item['other'] * 1000:.2f}",
+                '服务端处理占比(%)': f"{item['processing'] / item['client'] * 100:.1f}"
+            } for concurrency, item in sorted(self.latency_breakdown.items())]
+            html_content += f"""
+    <div class="summary">
+        <h2>🖥️ 服务端指标</h2>
+        <p>服务端指标由抓取器按资源采样间隔轮询各服务的 Prometheus / JSON 指标端点得到，与请求记录、资源采样使用同一 epoch 时钟，只取 steady 阶段；直方图的耗时与分位数由阶段内的计数增量计算。“每客户端请求”为服务端每秒累计耗时除以客户端 QPS，一个客户端请求包含的多次 HTTP 交互均计入。</p>
+        <p>{self._server_metrics_summary()}</p>
+        {self._render_table(breakdown_rows)}
+        {self._render_table(series_rows)}
+    </div>
+"""
+
+        # 最慢请求：尾部请求明细与匹配的服务日志行
+        if self.tail_requests:
+            slow_rows, failed_rows = self._tail_rows()
+            html_content += f"""
+    <div class="summary">
+        <h2>🐢 最慢请求</h2>
+        <p>负载生成器为每个请求分配请求 ID（进程内客户端以 X-Request-Id 头发送），正式测试阶段以有界蓄水池保留各级别最慢的成功请求与失败请求的均匀抽样，记录各阶段耗时、HTTP 状态与响应体；级别结束后只读取各服务日志在该级别期间新写入的部分，按请求 ID 与请求时间窗口提取匹配行，不保存逐请求的日志。开环测试按服务时间排序。</p>
+        <p>{self._tail_summary()}</p>
+        {self._render_table(slow_rows)}
+        {self._render_table(failed_rows)}
+        {self._render_tail_logs()}
+    </div>
+"""
+
+        # 可扩展性模型：USL 参数、置信区间与未测试并发量的预测
+        if self.scalability:
+            fit = self.scalability['fit']
+            ci = fit['ci']
+            level = f'{CONFIDENCE * 100:.0f}% 置信区间'
+            model_rows = [
+                {'参数': 'λ 单并发吞吐 (req/s)', '估计值': f"{fit['lambda']:.2f}",
+                 level: self._format_interval(*ci['lambda'], '.2f')},
+                {'参数': 'σ 争用系数', '估计值': f"{fit['sigma']:.4f}", level: self._format_interval(*ci['sigma'], '.4f')},
+                {'参数': 'κ 一致性系数', '估计值': f"{fit['kappa']:.6f}",
+                 level: self._format_interval(*ci['kappa'], '.6f')},
+                {'参数': 'N* 吞吐峰值并发', '估计值': f"{fit['n_peak']:.0f}" if math.isfinite(fit['n_peak']) else '∞',
+                 level: self._format_interval(*ci['n_peak'], '.0f')},
+                {'参数': 'X_max 吞吐上限 (req/s)',
+                 '估计值': f"{fit['x_max']:.1f}" if math.isfinite(fit['x_max']) else '∞（线性扩展，无上限）',
+                 level: self._format_interval(*ci['x_max'], '.1f')},
+                {'参数': 'R² 拟合优度', '估计值': f"{fit['r2']:.3f}", level: '-'}
+            ]
+            prediction_rows = []
+            predictions = self.scalability['predictions']
+            if predictions is not None:
+                for i, concurrency in enumerate(predictions['concurrency']):
+                    prediction_rows.append({
+                        '并发量（未测试）': f"{concurrency:.0f}",
+                        '预测吞吐 (req/s)': f"{predictions['throughput'][i]:.1f}",
+                        f'吞吐 {level}': self._format_interval(predictions['throughput_low'][i],
+                                                             predictions['throughput_high'][i], '.1f'),
+                        '预测平均响应时间 (ms)': f"{predictions['response_time'][i] * 1000:.1f}",
+                        f'响应时间 {level}': self._format_interval(predictions['response_time_low'][i] * 1000,
+                                                               predictions['response_time_high'][i] * 1000, '.1f')
+                    })
+            html_content += f"""
+    <div class="summary">
+        <h2>📐 可扩展性模型（USL）</h2>
+        <p>以通用可扩展性定律 X(N) = λN / (1 + σ(N-1) + κN(N-1)) 拟合各并发量的成功吞吐，置信区间由残差自助法得到；平均响应时间按 Little 定律 R = N / X 推算（无思考时间）。</p>
+        <p>{self._scalability_summary()}</p>
+        {self._render_table(model_rows)}
+        {self._render_table(prediction_rows)}
+    </div>
+"""
+
+        # 混合场景：各请求类型的吞吐与延迟
+        if self.request_type_stats:
+            type_rows = [{
+                '级别': row['level'],
+                '场景': row['scenario'] or '-',
+                '请求类型': row['name'],
+                '请求数': row['total'],
+                '占比(%)': f"{row['share']:.1f}",
+                'QPS': f"{row['qps']:.2f}",
+                '成功率(%)': f"{row['success_rate']:.2f}",
+                '平均(ms)': f"{row['avg'] * 1000:.2f}",
+                'P50(ms)': f"{row['p50'] * 1000:.2f}",
+                'P95(ms)': f"{row['p95'] * 1000:.2f}",
+                'P99(ms)': f"{row['p99'] * 1000:.2f}"
+            } for row in self.request_type_stats]
+            html_content += f"""
+    <div class="summary">
+        <h2>🧩 请求类型</h2>
+        <p>混合场景按配置权重与虚拟用户会话流程发出多种请求，上方汇总为全部请求类型合并后的结果；下表按级别拆分各请求类型的占比、吞吐与成功请求延迟。资源请求前没有有效 token 时会先完成一次证明，计入证明请求。</p>
+        {self._render_table(type_rows)}
+    </div>
+"""
+
+        # 分布式负载生成：逐代理明细与生成器饱和判定
+        if self.agent_rows:
+            settings = self._distributed_settings()
+            agent_rows = []
+            for row in self.agent_rows:
+                stats, overhead = row['stats'], row['overhead']
+                agent_rows.append({
+                    '级别': row['level'],
+                    '代理': row['name'],
+                    '主机': row['host'],
+                    '份额': f"{row['share']:g}",
+                    '请求数': stats['total'],
+                    'QPS': f"{stats['qps']:.2f}",
+                    '成功率(%)': f"{stats['success_rate']:.2f}",
+                    'P50(ms)': f"{stats['p50'] * 1000:.2f}",
+                    'P99(ms)': f"{stats['p99'] * 1000:.2f}",
+                    '生成器CPU(%)': f"{overhead['generator_cpu_percent']:.1f}",
+                    'CPU(μs/请求)': f"{overhead['generator_cpu_us_per_request']:.0f}",
+                    '最大循环延迟(ms)': f"{overhead['max_loop_lag_ms']:.1f}",
+                    '时钟偏差(ms)': f"{row['clock_offset_ms']:+.2f}",
+                    '开始延迟(ms)': f"{row['start_late_ms']:.1f}",
+                    '结论': f"<strong>可能饱和</strong>：{'；'.join(row['reasons'])}" if row['reasons'] else '正常'
+                })
+            html_content += f"""
+    <div class="summary">
+        <h2>🛰️ 分布式负载生成</h2>
+        <p>各级别的总负载由协调器按权重分给多个代理，开始时间与窗口时间戳已按测得的时钟偏差换算到协调器时钟，上方统计为全部代理合并后的结果。生成器 CPU 达到 {settings['max_generator_cpu_percent']:g}%、事件循环延迟达到 {settings['max_loop_lag_ms']:g}ms、实际并发或到达率低于份额的 {settings['min_achieved_ratio'] * 100:.0f}%，或 P99 超过各代理中位数的 {settings['p99_outlier_ratio']:g} 倍时判定为可能饱和。</p>
+        <p>{self._agent_summary()}</p>
+        {self._render_table(agent_rows)}
+    </div>
+"""
+
+        # 长稳测试：各服务资源增长趋势与泄漏判定
+        if self.soak_trends:
+            settings = self._soak_settings()
+            soak_rows = []
+            for item in self.soak_trends:
+                trend = item['trend']
+                growth = trend['growth_percent_per_hour']
+                if item['leak']:
+                    verdict = '<strong>疑似泄漏</strong>'
+                elif trend['confidence'] >= LEAK_CONFIDENCE and trend['ci'][0] > 0:
+                    verdict = '缓慢增长（低于阈值）'
+                else:
+                    verdict = '无显著增长'
+                soak_rows.append({
+                    '服务': item['process'],
+                    '指标': f"{item['label']} ({item['unit']})",
+                    '拟合时长(h)': f"{trend['hours']:.1f}" + (f"（重启 {item['restarts']} 次后）" if item['restarts'] else ''),
+                    '起始值': f"{trend['start']:.1f}",
+                    '每小时增长': f"{trend['slope_per_hour']:+.3f}",
+                    f'{CONFIDENCE * 100:.0f}% 置信区间': self._format_interval(*trend['ci'], '+.3f'),
+                    '相对增长(%/h)': f"{growth:+.2f}" if growth is not None else '-',
+                    '增长置信度': f"{trend['confidence'] * 100:.1f}%",
+                    '结论': verdict
+                })
+            html_content += f"""
+    <div class="summary">
+        <h2>🕒 长稳测试与泄漏检测</h2>
+        <p>按聚合窗口对各服务资源做线性趋势拟合，跳过开头 {settings['trend_skip_minutes']:g} 分钟；相邻窗口的残差自相关已计入斜率标准误。增长为正的置信度达到 {LEAK_CONFIDENCE * 100:.0f}%、置信区间下界为正且每小时增长不低于起始值的 {settings['leak_growth_percent_per_hour']:g}% 时判定为疑似泄漏。</p>
+        <p>{self._soak_summary()}</p>
+        {self._render_table(soak_rows)}
+    </div>
+"""
+
+        # 回归对比：与运行目录中的基线运行逐级别对比
+        if self.regression:
+            settings = self.regression_settings
+            html_content += f"""
+    <div class="summary">
+        <h2>📉 回归对比</h2>
+        <p>延迟分位数上升或 QPS 下降超过 {settings['threshold_percent']:g}%、成功率下降超过 {settings['success_rate_drop_percent']:g} 个百分点判定为回归；延迟回归还要求成功请求延迟分布的两样本 KS 检验 p 值低于 {settings['significance']:g}。</p>
+        <p>{run_catalog.comparison_summary(self.regression, settings)}</p>
+        {self._render_table(run_catalog.comparison_rows(self.regression))}
+    </div>
+"""
+
+        # 预热收敛：KBS 多久达到稳定延迟
+        if self.warmup_stats:
+            warmup_rows = []
+            for concurrency, stats in self.warmup_stats.items():
+                converged = stats['converged_after']
+                warmup_rows.append({
+                    '并发量': concurrency,
+                    '预热时长(s)': f"{stats['warmup_seconds']:.0f}",
+                    '预热首秒 P50(ms)': f"{stats['first_p50'] * 1000:.2f}",
+                    '稳态 P50(ms)': f"{stats['steady_p50'] * 1000:.2f}",
+                    '达到稳定延迟(s)': f"{converged:.0f}" if converged is not None else '未收敛'
+                })
+            converged = [s['converged_after'] for s in self.warmup_stats.values() if s['converged_after'] is not None]
+            conclusion = f"KBS 最长在预热开始后 {max(converged):.0f} 秒达到稳定延迟。" if converged else ''
+            if len(converged) < len(self.warmup_stats):
+                conclusion += ' 部分并发量直到预热结束仍未收敛，建议加长预热时间。'
+            html_content += f"""
+    <div class="summary">
+        <h2>🔥 预热收敛</h2>
+        <p>预热阶段逐秒成功请求延迟中位数与稳态中位数相差不超过 {WARMUP_TOLERANCE * 100:.0f}% 并保持到预热结束，即视为达到稳定延迟。{conclusion}</p>
+        {self._render_table(warmup_rows)}
+    </div>
+"""
+
+        # 开环测试：请求负载、实际吞吐与校正分位数并列
+        if self.open_loop_stats:
+            open_loop_rows = []
+            for rate_label in sorted(self.open_loop_stats.keys(),
+                                     key=lambda l: self.open_loop_stats[l]['offered_rps']):
+                stats = self.open_loop_stats[rate_label]
+                open_loop_rows.append({
+                    '目标到达率': rate_label,
+                    '请求负载(req/s)': f"{stats['offered_rps']:.2f}",
+                    '实际吞吐(req/s)': f"{stats['achieved_rps']:.2f}",
+                    '成功率(%)': f"{stats['success_rate']:.2f}",
+                    'P50 服务/校正(s)': f"{stats['p50_service_time']:.3f} / {stats['p50_corrected']:.3f}",
+                    'P95 服务/校正(s)': f"{stats['p95_service_time']:.3f} / {stats['p95_corrected']:.3f}",
+                    'P99 服务/校正(s)': f"{stats['p99_service_time']:.3f} / {stats['p99_corrected']:.3f}",
+                    '最大调度滞后(s)': f"{stats['max_schedule_lag']:.3f}"
+                })
+            html_content += f"""
+    <div class="summary">
+        <h2>🌊 开环测试（恒定到达率）</h2>
+        <p>校正延迟自预定发送时间起算，包含服务变慢时请求在客户端侧的等待，反映真实到达率下用户感知的延迟。</p>
+        {self._render_table(open_loop_rows)}
+    </div>
+"""
+
+        html_content += """
     <div class="summary">
         <h2>💡 部署建议</h2>
         <h3>资源配置建议:</h3>
         <ul>
 """
         
-        # 生成部署建议
-        if self.summary_stats:
+        # 生成部署建议：有 USL 拟合时按模型与每请求资源消耗规划，否则按峰值使用量加缓冲估算
+        if self.sizing:
+            sizing = self.sizing
+            source = '指定的目标' if sizing['target_given'] else '测试中的最大成功吞吐，可用 --target-qps 指定'
+            html_content += f"""
+            <li><strong>目标吞吐:</strong> {sizing['target_qps']:.1f} req/s（{source}）</li>
+            <li><strong>实例数:</strong> {sizing['instances']} 个，每实例承载 {sizing['per_instance_qps']:.1f} req/s，约需 {sizing['concurrency']} 并发</li>
+            <li><strong>CPU:</strong> 每实例约 {sizing['total_cores']:.1f} 核（按各服务 CPU 随吞吐的线性增长推算，CPU 利用率控制在 {SIZING_CPU_UTILIZATION * 100:.0f}% 以内）</li>
+            <li><strong>内存:</strong> 每实例约 {sizing['total_memory_mb']:.0f} MB（按各服务内存峰值随并发量的线性增长推算）</li>
+"""
+            if self.scalability['recommended'] is not None:
+                html_content += f"""
+            <li><strong>推荐并发量:</strong> 每实例不超过 {self.scalability['recommended']}（吞吐已达模型上限的 {USL_THROUGHPUT_TARGET * 100:.0f}%）</li>
+"""
+            sizing_rows = [{
+                '服务': service['process'],
+                '每请求 CPU (ms)': f"{service['cpu_ms_per_request']:.3f}",
+                '空载 CPU (%)': f"{service['cpu_base']:.1f}",
+                '所需核数': f"{service['cores']:.2f}",
+                '所需内存 (MB)': f"{service['memory_mb']:.0f}"
+            } for service in sizing['services']]
+            html_content += f"""
+        </ul>
+        <h3>各服务资源规划（每实例）:</h3>
+        {self._render_table(sizing_rows)}
+        <ul>
+"""
+        elif self.summary_stats:
             max_cpu_percent = max(stats['total_cpu_avg'] for stats in self.summary_stats.values())
             max_memory = max(stats['total_memory_avg'] for stats in self.summary_stats.values())
             
@@ -576,13 +2713,16 @@ class TrusteeReportGenerator:
             # 1. 加载数据
             self.load_data()
             
-            # 2. 分析数据
-            self.analyze_resource_usage()
-            self.analyze_performance_metrics()
+            # 2. 分析数据，收录到运行目录并与基线对比
+            self.analyze()
+            if self.catalog:
+                self.record_run()
             
-            # 3. 创建图表
-            resource_charts = self.create_resource_charts()
+            # 3. 创建图表并并行渲染
+            resource_charts = self.create_resource_charts() + self.create_soak_charts()
             performance_charts = self.create_performance_charts()
+            rendered = self.render_charts(resource_charts + performance_charts)
+            resource_charts, performance_charts = rendered[:len(resource_charts)], rendered[len(resource_charts):]
             
             # 4. 生成 HTML 报告
             html_report = self.generate_html_report(resource_charts, performance_charts)
@@ -598,8 +2738,16 @@ def main():
     parser = argparse.ArgumentParser(description='生成 Trustee Service 性能测试报告')
     parser.add_argument('--test-name', required=True, help='测试名称')
     parser.add_argument('--data-dir', required=True, help='数据目录路径')
+    parser.add_argument('--run-id',
+                        help='只读取文件名含该运行标识的数据文件（负载生成器 --run-id）；未指定时每个级别取最新一批文件')
     parser.add_argument('--output-dir', required=True, help='输出目录路径')
     parser.add_argument('--log-file', help='日志文件路径')
+    parser.add_argument('--jobs', type=int, help='图表渲染进程数（默认 CPU 核数，1 为不使用进程池）')
+    parser.add_argument('--target-qps', type=float, help='容量规划的生产目标 QPS（默认取测试中的最大成功吞吐）')
+    parser.add_argument('--catalog', help='运行目录 SQLite 文件，指定时收录本次运行（以 --run-id 为运行标识，未指定时取测试名称）')
+    parser.add_argument('--build', help='被测 trustee 的构建/版本号，随运行收录')
+    parser.add_argument('--baseline', help='对比的基线运行标识，auto 为同主机同配置的上一次运行，latest 为最近一次运行')
+    parser.add_argument('--config', default=run_catalog.DEFAULT_CONFIG, help='测试配置文件（配置哈希与回归阈值）')
     
     args = parser.parse_args()
     
@@ -619,7 +2767,14 @@ def main():
         generator = TrusteeReportGenerator(
             test_name=args.test_name,
             data_dir=args.data_dir,
-            output_dir=args.output_dir
+            output_dir=args.output_dir,
+            jobs=args.jobs,
+            target_qps=args.target_qps,
+            catalog=args.catalog,
+            build=args.build,
+            baseline=args.baseline,
+            config_path=args.config,
+            run_id=args.run_id
         )
         
         # 生成报告
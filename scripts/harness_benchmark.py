@@ -0,0 +1,665 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+负载工具自身基准
+作者: AI Assistant
+用途: 以仓库内的 KBS 替身服务（kbs_stub.py，延迟分布/错误率/并发上限可配）替代 trustee，测量各负载生成模式
+      （闭环 rcar、exec、混合场景、开环）的最大可持续请求率与每请求 CPU/内存开销、计时准确度、资源采样器开销
+      以及报告生成随数据量（10⁵~10⁷ 行）的耗时；结果按 git 提交收录到运行目录（run_catalog.db），
+      与同主机同参数的上一次运行逐指标对比，负载工具自身的性能回归以退出码 1 返回
+"""
+
+import os
+import sys
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import resource
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from capacity_search import CapacitySearch, search_settings
+from data_store import find_tables, read_table
+from load_generator import DEFAULT_CONFIG, PROJECT_ROOT, SCRIPT_DIR, build_generator, load_config, parse_args, \
+    setup_logging
+from resource_sampler import CLK_TCK
+from run_catalog import (DEFAULT_CATALOG, EXIT_ERROR, EXIT_OK, EXIT_REGRESSION, compare_harness_metrics, connect,
+                         load_harness_run, record_harness_run, resolve_harness_run)
+
+DEFAULT_LOG_FILE = os.path.join(PROJECT_ROOT, 'results', 'logs', 'harness_benchmark.log')
+STUB_SCRIPT = os.path.join(SCRIPT_DIR, 'kbs_stub.py')
+# 替身服务进程的 argv[0]，资源采样器据此匹配目标进程
+STUB_PROCESS_NAME = 'kbs-stub'
+STUB_START_TIMEOUT = 10.0
+# 子进程峰值 RSS 的轮询间隔（秒）
+RSS_POLL_INTERVAL = 0.05
+SUITES = ('closed', 'exec', 'scenario', 'open', 'timing', 'sampler', 'report')
+# 不影响测量结果、不参与参数哈希的设置
+UNHASHED_SETTINGS = ('suites', 'threshold_percent')
+DIRECTION_LABELS = {'higher': '越高越好', 'lower': '越低越好', 'none': '仅记录'}
+
+logger = logging.getLogger('load_generator')
+
+
+class HarnessError(RuntimeError):
+    """基准环境准备或子进程执行失败"""
+
+
+def harness_settings(config, **overrides):
+    """合并默认值、配置中的 harness_benchmark 段与命令行覆盖值"""
+    settings = {
+        'suites': list(SUITES),
+        'stub_processes': 0,
+        'stub_latency_ms': 0.0,
+        'stub_latency_dist': 'fixed',
+        'stub_error_rate': 0.0,
+        'warmup_seconds': 2,
+        'probe_seconds': 10,
+        'closed_concurrency': 64,
+        'exec_concurrency': 16,
+        'exec_command': 'true',
+        'scenario': 'token_reuse',
+        'open_min_rate': 100.0,
+        'open_max_rate': 20000.0,
+        'open_resolution_percent': 10.0,
+        'open_min_achieved_ratio': 0.98,
+        'open_max_schedule_lag_ms': 50.0,
+        'timing_latency_ms': 20.0,
+        'timing_concurrency': 8,
+        'timing_rate': 100.0,
+        'sampler_targets': 4,
+        'sampler_interval_seconds': 0.1,
+        'report_rows': [100000, 1000000],
+        'report_full': False,
+        'threshold_percent': 15.0
+    }
+    settings.update(config.get('harness_benchmark', {}))
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    if not settings['stub_processes']:
+        # 0 为自动：与负载生成器平分 CPU
+        settings['stub_processes'] = max(1, (os.cpu_count() or 1) // 2)
+    unknown = set(settings['suites']) - set(SUITES)
+    if unknown:
+        raise ValueError(f"未知的基准项: {', '.join(sorted(unknown))}（可选 {', '.join(SUITES)}）")
+    return settings
+
+
+def settings_hash(settings):
+    """影响测量结果的设置与 CPU 核数的短哈希，相同哈希的运行才可直接比较"""
+    content = {key: value for key, value in settings.items() if key not in UNHASHED_SETTINGS}
+    content['cpu_count'] = os.cpu_count()
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def git_commit():
+    """当前仓库的短提交号，工作区有未提交改动时加 -dirty；不在 git 仓库中时返回 None"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def metric(value, unit, better):
+    """better 为 higher/lower；单次最大值等易受调度噪声影响的指标为 none，只记录不判定回归"""
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def reset_peak_rss():
+    """清零本进程的峰值 RSS（VmHWM），使各基准项的峰值互不影响；内核不支持时保留进程生命周期内的峰值"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def process_peak_rss_mb(pid='self'):
+    """进程自身的峰值 RSS（/proc/<pid>/status 的 VmHWM，MB）；读取失败或进程已退出（僵尸进程无此项）时返回 None"""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """本进程的峰值 RSS（MB），/proc 不可读时取 ru_maxrss"""
+    rss = process_peak_rss_mb()
+    return rss if rss is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def process_tree_cpu_seconds(pid):
+    """进程及其子进程（替身服务多进程模式）累计的 CPU 秒数，读取失败的进程忽略"""
+    total = 0.0
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as f:
+            pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    for item in pids:
+        try:
+            with open(f'/proc/{item}/stat', 'r') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / CLK_TCK
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def run_measured(argv, log_path):
+    """运行子进程直到退出，返回 (墙钟秒, CPU 秒, 峰值 RSS MB)；输出写入 log_path，非 0 退出时抛出 HarnessError。
+    ru_maxrss 含 fork 时继承的父进程峰值，峰值 RSS 改为在子进程运行期间轮询其 VmHWM（exec 后重新计数）"""
+    start = time.perf_counter()
+    peak = 0.0
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.Popen(argv, stdout=log, stderr=subprocess.STDOUT)
+        while True:
+            rss = process_peak_rss_mb(process.pid)
+            if rss is not None:
+                peak = max(peak, rss)
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            time.sleep(RSS_POLL_INTERVAL)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            tail = f.read()[-500:]
+        raise HarnessError(f"{os.path.basename(argv[1])} 退出码 {process.returncode}: {tail.strip()}")
+    return wall, usage.ru_utime + usage.ru_stime, peak
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class StubProcess:
+    """以子进程运行 KBS 替身服务，进入时等待端口可连接，退出时终止（多进程模式下子进程随之退出）"""
+
+    def __init__(self, processes=1, latency_ms=0.0, latency_dist='fixed', error_rate=0.0, workers=0):
+        self.options = ['--processes', str(processes), '--latency-ms', str(latency_ms),
+                        '--latency-dist', latency_dist, '--error-rate', str(error_rate), '--workers', str(workers)]
+        self.port = None
+        self.process = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/api"
+
+    def __enter__(self):
+        self.port = free_port()
+        self.process = subprocess.Popen([STUB_PROCESS_NAME, STUB_SCRIPT, '--port', str(self.port)] + self.options,
+                                        executable=sys.executable, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + STUB_START_TIMEOUT
+        while True:
+            if self.process.poll() is not None:
+                raise HarnessError(f"替身服务启动失败，退出码 {self.process.returncode}")
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=0.5):
+                    return self
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.__exit__(None, None, None)
+                    raise HarnessError(f"替身服务 {STUB_START_TIMEOUT:g} 秒内未监听端口 {self.port}")
+                time.sleep(0.05)
+
+    def cpu_seconds(self):
+        return process_tree_cpu_seconds(self.process.pid)
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class SustainableRateSearch(CapacitySearch):
+    """开环最大可持续到达率：以负载工具自身能否按计划发出请求为判定条件（实际吞吐达到请求负载的
+    min_achieved_ratio、调度滞后不超过上限、成功率不低于 99%），不使用 SLO 的响应时间与主机 CPU 条件"""
+
+    def __init__(self, generator, config, settings):
+        search = search_settings(config)
+        search.update({
+            'min_rate': settings['open_min_rate'],
+            'max_rate': settings['open_max_rate'],
+            'growth_factor': 2.0,
+            'resolution_percent': settings['open_resolution_percent'],
+            'warmup_seconds': settings['warmup_seconds'],
+            'probe_seconds': settings['probe_seconds'],
+            'confirm_seconds': settings['probe_seconds'],
+            'recovery_seconds': 1,
+            'max_confirm_steps': 2
+        })
+        super().__init__(generator, config, 'open', settings=search)
+        self.min_achieved_ratio = settings['open_min_achieved_ratio']
+        self.max_schedule_lag = settings['open_max_schedule_lag_ms'] / 1000
+
+    async def _measure(self, level, seconds):
+        _, stats, overhead = await self.generator.run_open_loop(level, seconds, self.settings['warmup_seconds'], 0)
+        return {'total_requests': stats.completed, 'success_rate': stats.success_rate,
+                'p99_response_time': stats.percentiles()[('corrected', 0.99)], 'qps': stats.achieved_rps,
+                'offered_rps': stats.offered_rps, 'max_schedule_lag': stats.max_schedule_lag,
+                'host_cpu_percent': None, 'overhead': overhead,
+                'safety_stop': self.generator.clear_safety_stop()}
+
+    def evaluate(self, result):
+        reasons = []
+        ratio = result['qps'] / result['offered_rps'] if result['offered_rps'] else 0
+        if ratio < self.min_achieved_ratio:
+            reasons.append(f"实际吞吐 {result['qps']:.1f} req/s 仅为请求负载的 {ratio * 100:.1f}%")
+        if result['max_schedule_lag'] > self.max_schedule_lag:
+            reasons.append(f"调度滞后 {result['max_schedule_lag'] * 1000:.1f}ms > {self.max_schedule_lag * 1000:g}ms")
+        if result['success_rate'] < 99:
+            reasons.append(f"成功率 {result['success_rate']:.2f}% < 99%")
+        return not reasons, bool(result.get('safety_stop')), '; '.join(reasons)
+
+
+class HarnessBenchmark:
+    """依次执行各基准项，汇总指标与说明"""
+
+    def __init__(self, config, settings, work_dir):
+        self.config = config
+        self.settings = settings
+        self.work_dir = work_dir
+        self.metrics = {}
+        self.notes = []
+
+    def _suite_dir(self, suite):
+        path = os.path.join(self.work_dir, suite)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _stub(self, **overrides):
+        settings = self.settings
+        options = dict(processes=settings['stub_processes'], latency_ms=settings['stub_latency_ms'],
+                       latency_dist=settings['stub_latency_dist'], error_rate=settings['stub_error_rate'])
+        options.update(overrides)
+        return StubProcess(**options)
+
+    def _generator(self, suite, stub, extra):
+        argv = ['--output-dir', self._suite_dir(suite), '--base-url', stub.base_url] + extra
+        generator = build_generator(self.config, parse_args(argv))
+        generator.raw_records = True
+        return generator
+
+    def _cpu_note(self, suite, overhead, stub_cpu):
+        """吞吐上限归因：对比负载生成器（含 exec 子进程）与替身服务各自占用的 CPU"""
+        wall = overhead['wall_seconds'] or 1
+        client = overhead['client_cpu_seconds']
+        self.notes.append(f"{suite}: 生成器 CPU {overhead['generator_cpu_percent']:.0f}%"
+                          f"{f'，exec 子进程 CPU {client / wall * 100:.0f}%' if client else ''}，"
+                          f"替身服务 CPU {stub_cpu / wall * 100:.0f}%（单核百分比，主机 {os.cpu_count()} 核）；"
+                          f"生成器一侧接近 100% 时吞吐上限来自负载工具")
+
+    async def _closed_level(self, suite, stub_options, extra, concurrency):
+        """在替身服务上执行一个闭环级别，返回 (统计, 开销, 峰值 RSS)"""
+        settings = self.settings
+        with self._stub(**stub_options) as stub:
+            generator = self._generator(suite, stub, extra)
+            reset_peak_rss()
+            try:
+                stub_before = stub.cpu_seconds()
+                _, stats, overhead = await generator.run_level(concurrency, settings['probe_seconds'],
+                                                               settings['warmup_seconds'], 0,
+                                                               prefix=f'harness_{suite}')
+                stub_cpu = stub.cpu_seconds() - stub_before
+            finally:
+                generator.backend.close()
+            self._cpu_note(suite, overhead, stub_cpu)
+        return stats, overhead, peak_rss_mb()
+
+    def _record_closed(self, suite, stats, overhead, rss):
+        if stats.success_rate < 99:
+            self.notes.append(f"{suite}: 成功率仅 {stats.success_rate:.2f}%，吞吐不代表负载工具上限")
+        self.metrics.update({
+            f'{suite}.qps': metric(stats.qps, 'req/s', 'higher'),
+            f'{suite}.cpu_per_request': metric(overhead['generator_cpu_us_per_request'], 'us/req', 'lower'),
+            f'{suite}.max_loop_lag': metric(overhead['max_loop_lag_ms'], 'ms', 'none'),
+            f'{suite}.peak_rss': metric(rss, 'MB', 'lower')
+        })
+
+    async def suite_closed(self):
+        """闭环 rcar 后端：零延迟替身服务上的饱和吞吐与每请求开销"""
+        self._record_closed('closed', *await self._closed_level(
+            'closed', {}, ['--backend', 'rcar'], self.settings['closed_concurrency']))
+
+    async def suite_exec(self):
+        """exec 后端：每个请求派生一次 exec_command，测量派生子进程的吞吐上限与生成器/子进程开销"""
+        suite = 'exec'
+        stats, overhead, rss = await self._closed_level(
+            suite, {}, ['--backend', 'exec', '--command', self.settings['exec_command']],
+            self.settings['exec_concurrency'])
+        self._record_closed(suite, stats, overhead, rss)
+        self.metrics[f'{suite}.client_cpu_per_request'] = metric(overhead['client_cpu_us_per_request'],
+                                                                 'us/req', 'lower')
+
+    async def suite_scenario(self):
+        """混合场景：按配置场景（默认 token_reuse）执行，覆盖会话与分类型统计的开销"""
+        self._record_closed('scenario', *await self._closed_level(
+            'scenario', {}, ['--scenario', self.settings['scenario']], self.settings['closed_concurrency']))
+
+    async def suite_open(self):
+        """开环：倍增加二分搜索负载工具能按计划发出的最大到达率"""
+        suite = 'open'
+        with self._stub() as stub:
+            generator = self._generator(suite, stub, ['--backend', 'rcar'])
+            # 搜索中的每个探测都写原始记录没有意义，只保留统计
+            generator.raw_records = False
+            search = SustainableRateSearch(generator, self.config, self.settings)
+            reset_peak_rss()
+            try:
+                summary = await search.run()
+            finally:
+                generator.backend.close()
+        rss = peak_rss_mb()
+        capacity = summary['capacity']
+        if capacity is None:
+            self.notes.append(f"open: 最低到达率 {self.settings['open_min_rate']:g} req/s 也未通过: "
+                              f"{summary['probes'][0]['reason'] if summary['probes'] else summary['stop_reason']}")
+            self.metrics[f'{suite}.peak_rss'] = metric(rss, 'MB', 'lower')
+            return
+        confirmed = [probe for probe in summary['probes'] if probe['stage'] == 'confirm' and probe['passed']][-1]
+        overhead = confirmed['overhead']
+        if capacity >= self.settings['open_max_rate']:
+            self.notes.append(f"open: 达到搜索上限 {capacity:g} req/s，实际上限更高（调大 open_max_rate）")
+        failing = summary['first_failing_level']
+        if failing is not None:
+            reason = next((probe['reason'] for probe in summary['probes']
+                           if probe['level'] == failing and not probe['passed']), '')
+            self.notes.append(f"open: {failing:g} req/s 未通过: {reason}")
+        self.metrics.update({
+            f'{suite}.max_sustainable_rate': metric(capacity, 'req/s', 'higher'),
+            f'{suite}.cpu_per_request': metric(overhead['generator_cpu_us_per_request'], 'us/req', 'lower'),
+            f'{suite}.cpu_percent_at_max': metric(overhead['generator_cpu_percent'], '%', 'none'),
+            f'{suite}.max_schedule_lag_at_max': metric(confirmed['max_schedule_lag'] * 1000, 'ms', 'none'),
+            f'{suite}.peak_rss': metric(rss, 'MB', 'lower')
+        })
+
+    async def suite_timing(self):
+        """计时准确度：固定延迟 L 的替身服务上，attest 流程（auth+attest 两次交互）的测量值与 2L 之差，
+        以及开环实际发出时间相对预定时间的滞后与实际到达率误差"""
+        import numpy as np
+
+        suite = 'timing'
+        settings = self.settings
+        expected = 2 * settings['timing_latency_ms']
+        stub_options = {'latency_ms': settings['timing_latency_ms'], 'latency_dist': 'fixed', 'error_rate': 0.0}
+        with self._stub(**stub_options) as stub:
+            generator = self._generator(suite, stub, ['--backend', 'rcar', '--flow', 'attest'])
+            try:
+                closed_file, _, _ = await generator.run_level(settings['timing_concurrency'],
+                                                              settings['probe_seconds'], settings['warmup_seconds'],
+                                                              0, prefix='harness_timing')
+                open_file, open_stats, _ = await generator.run_open_loop(settings['timing_rate'],
+                                                                         settings['probe_seconds'],
+                                                                         settings['warmup_seconds'], 0)
+            finally:
+                generator.backend.close()
+
+        closed = read_table(closed_file, ['duration', 'response_code', 'test_phase'])
+        closed = closed[(closed['test_phase'] == 'steady') & (closed['response_code'] == 200)]
+        durations = closed['duration'].to_numpy() * 1000
+        opened = read_table(open_file, ['start_time', 'intended_time', 'test_phase'])
+        opened = opened[opened['test_phase'] == 'steady']
+        dispatch = (opened['start_time'] - opened['intended_time']).to_numpy() * 1000
+        if not len(durations) or not len(dispatch):
+            self.notes.append('timing: 没有成功的请求记录，跳过计时准确度')
+            return
+        p50, p99 = np.percentile(durations, [50, 99])
+        self.notes.append(f"timing: 期望 {expected:g}ms，测得 P50 {p50:.2f}ms / P99 {p99:.2f}ms")
+        self.metrics.update({
+            f'{suite}.closed_p50_error': metric(p50 - expected, 'ms', 'lower'),
+            f'{suite}.closed_p99_error': metric(p99 - expected, 'ms', 'lower'),
+            f'{suite}.open_dispatch_p99': metric(float(np.percentile(dispatch, 99)), 'ms', 'lower'),
+            f'{suite}.open_dispatch_max': metric(open_stats.max_schedule_lag * 1000, 'ms', 'none'),
+            f'{suite}.open_rate_error': metric(abs(open_stats.offered_rps / settings['timing_rate'] - 1) * 100,
+                                               '%', 'lower')
+        })
+
+    async def suite_sampler(self):
+        """资源采样器：以 sampler_targets 个替身服务进程为目标按 sampler_interval_seconds 采样，
+        测量采样器自身 CPU、峰值内存与 system 行的采样间隔抖动"""
+        import numpy as np
+
+        suite = 'sampler'
+        settings = self.settings
+        output_dir = self._suite_dir(suite)
+        config = dict(self.config, target_processes=[{'name': STUB_PROCESS_NAME,
+                                                       'executables': [STUB_PROCESS_NAME]}])
+        config_path = os.path.join(output_dir, 'sampler_config.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        argv = [sys.executable, os.path.join(SCRIPT_DIR, 'resource_sampler.py'), '--config', config_path,
+                '--output-dir', output_dir, '--log-file', os.path.join(output_dir, 'sampler.log'),
+                '--interval', str(settings['sampler_interval_seconds']), '--data-format', 'csv',
+                'monitor', 'harness_1c', str(settings['probe_seconds'])]
+        stubs = [self._stub(processes=1) for _ in range(settings['sampler_targets'])]
+        try:
+            for stub in stubs:
+                stub.__enter__()
+            wall, cpu, rss = await asyncio.to_thread(run_measured, argv, os.path.join(output_dir, 'sampler.out'))
+        finally:
+            for stub in stubs:
+                if stub.process is not None:
+                    stub.__exit__(None, None, None)
+
+        tables = find_tables(output_dir, 'resource_usage_harness_1c')
+        if not tables:
+            raise HarnessError('资源采样器没有输出数据文件')
+        rows = read_table(tables[0], ['epoch_time', 'process'])
+        epochs = np.sort(rows.loc[rows['process'] == 'system', 'epoch_time'].to_numpy())
+        jitter = np.abs(np.diff(epochs) - settings['sampler_interval_seconds']) * 1000
+        self.metrics.update({
+            f'{suite}.cpu_percent': metric(cpu / wall * 100 if wall > 0 else 0, '%', 'lower'),
+            f'{suite}.peak_rss': metric(rss, 'MB', 'lower')
+        })
+        if len(jitter):
+            self.metrics[f'{suite}.interval_jitter_p99'] = metric(float(np.percentile(jitter, 99)), 'ms', 'lower')
+
+    async def suite_report(self):
+        """报告生成：以子进程运行 report_benchmark.py，逐个行数测量耗时与峰值内存"""
+        suite = 'report'
+        output_dir = self._suite_dir(suite)
+        for rows in self.settings['report_rows']:
+            json_path = os.path.join(output_dir, f'report_{rows}.json')
+            argv = [sys.executable, os.path.join(SCRIPT_DIR, 'report_benchmark.py'), '--rows', str(rows),
+                    '--json', json_path] + (['--full'] if self.settings['report_full'] else [])
+            _, _, rss = await asyncio.to_thread(run_measured, argv, os.path.join(output_dir, f'report_{rows}.out'))
+            with open(json_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)['results'][0]
+            self.metrics.update({
+                f'{suite}.{rows}_rows.seconds': metric(result['total'], 's', 'lower'),
+                f'{suite}.{rows}_rows.peak_rss': metric(rss, 'MB', 'lower')
+            })
+
+    async def run(self):
+        for suite in SUITES:
+            if suite not in self.settings['suites']:
+                continue
+            logger.info(f"负载工具基准 [{suite}] 开始")
+            start = time.monotonic()
+            try:
+                await getattr(self, f'suite_{suite}')()
+            except (HarnessError, OSError, ValueError) as e:
+                logger.error(f"负载工具基准 [{suite}] 失败: {e}")
+                self.notes.append(f"{suite}: 失败 - {e}")
+            logger.info(f"负载工具基准 [{suite}] 完成，用时 {time.monotonic() - start:.1f}秒")
+        return self.metrics
+
+
+def _format_value(value):
+    return f"{value:.3g}" if abs(value) < 100 else f"{value:.0f}"
+
+
+def print_metrics(metrics):
+    print(f"{'指标':<36} {'值':>12} {'单位':<8} 方向")
+    for name, item in sorted(metrics.items()):
+        print(f"{name:<36} {_format_value(item['value']):>12} {item['unit']:<8} "
+              f"{DIRECTION_LABELS[item['better']]}")
+
+
+def print_comparison(baseline_run, candidate_run, rows, threshold):
+    regressions = [row for row in rows if row['regression']]
+    print(f"基线 {baseline_run['run_id']}（提交 {baseline_run['git_commit']}）→ {candidate_run['run_id']}"
+          f"（提交 {candidate_run['git_commit']}），共同指标 {len(rows)} 个，"
+          f"{f'{len(regressions)} 个回归' if regressions else f'未发现超过 {threshold:g}% 的回归'}")
+    if baseline_run['settings_hash'] != candidate_run['settings_hash']:
+        print('注意: 两次运行的基准参数或 CPU 核数不同，差异可能来自参数')
+    for row in rows:
+        change = f"{row['change']:+.1f}%" if row['change'] is not None else '-'
+        print(f"{'!!' if row['regression'] else '  '} {row['metric']:<36} "
+              f"{_format_value(row['baseline']):>10} → {_format_value(row['candidate']):<10} {row['unit']:<8} {change}")
+    return bool(regressions)
+
+
+def run(args, config):
+    try:
+        settings = harness_settings(config, suites=args.suites, probe_seconds=args.probe_seconds,
+                                    stub_processes=args.stub_processes, report_rows=args.report_rows,
+                                    threshold_percent=args.threshold)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    commit = git_commit()
+    started_at = datetime.now()
+    run_id = f"harness_{commit or 'unknown'}_{started_at.strftime('%Y%m%d_%H%M%S')}"
+    work_dir = args.keep or tempfile.mkdtemp(prefix='harness_benchmark_')
+    logger.info(f"负载工具基准 {run_id}: 基准项 {', '.join(settings['suites'])}，替身服务 "
+                f"{settings['stub_processes']} 个进程，工作目录 {work_dir}")
+    benchmark = HarnessBenchmark(config, settings, work_dir)
+    try:
+        metrics = asyncio.run(benchmark.run())
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"运行 {run_id}（提交 {commit or '未知'}，主机 {socket.gethostname()}，{os.cpu_count()} 核）")
+    print_metrics(metrics)
+    for note in benchmark.notes:
+        print(f"- {note}")
+
+    db = connect(args.db)
+    digest = settings_hash(settings)
+    if not args.no_record:
+        record_harness_run(db, run_id, metrics, commit, settings=settings, settings_digest=digest,
+                           started_at=started_at.isoformat(timespec='seconds'))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'run_id': run_id, 'git_commit': commit, 'host': socket.gethostname(),
+                       'settings_hash': digest, 'settings': settings, 'metrics': metrics,
+                       'notes': benchmark.notes}, f, ensure_ascii=False, indent=2)
+        print(f"JSON: {args.json}")
+    if args.no_record:
+        return EXIT_OK
+
+    baseline = resolve_harness_run(db, args.baseline, exclude=run_id)
+    if baseline is None:
+        print('没有同主机同参数的历史运行，本次作为后续对比的基线')
+        return EXIT_OK
+    baseline_run, baseline_metrics = load_harness_run(db, baseline)
+    if baseline_run is None:
+        print(f"错误: 基线运行不存在: {baseline}", file=sys.stderr)
+        return EXIT_ERROR
+    candidate_run, _ = load_harness_run(db, run_id)
+    rows = compare_harness_metrics(baseline_metrics, metrics, settings['threshold_percent'])
+    return EXIT_REGRESSION if print_comparison(baseline_run, candidate_run, rows,
+                                               settings['threshold_percent']) else EXIT_OK
+
+
+def list_runs(args, config):
+    db = connect(args.db)
+    query = "SELECT r.*, COUNT(m.metric) AS metrics FROM harness_runs r " \
+            "LEFT JOIN harness_metrics m ON m.run_id = r.run_id"
+    params = []
+    if args.host:
+        query += " WHERE r.host = ?"
+        params.append(args.host)
+    query += " GROUP BY r.run_id ORDER BY r.started_at DESC"
+    print(f"{'运行':<44} {'提交':<16} {'主机':<16} {'参数':<12} {'开始时间':<20} {'指标数':>6}")
+    for row in db.execute(query, params):
+        print(f"{row['run_id']:<44} {row['git_commit'] or '-':<16} {row['host'] or '-':<16} "
+              f"{row['settings_hash'] or '-':<12} {row['started_at'] or '-':<20} {row['metrics']:>6}")
+    return EXIT_OK
+
+
+def compare(args, config):
+    db = connect(args.db)
+    threshold = args.threshold if args.threshold is not None else harness_settings(config)['threshold_percent']
+    run_ids = list(args.runs)
+    if len(run_ids) == 1:
+        # 只给出待比较的运行时，基线取同主机同参数的上一次运行
+        candidate = resolve_harness_run(db, run_ids[0])
+        run_ids = [resolve_harness_run(db, 'auto', exclude=candidate), candidate]
+    else:
+        run_ids = [resolve_harness_run(db, run_ids[0], exclude=run_ids[1]), run_ids[1]]
+    if None in run_ids:
+        print("错误: 找不到可作为基线的运行", file=sys.stderr)
+        return EXIT_ERROR
+    (baseline_run, baseline_metrics), (candidate_run, candidate_metrics) = [load_harness_run(db, run_id)
+                                                                            for run_id in run_ids]
+    for run_id, loaded in zip(run_ids, (baseline_run, candidate_run)):
+        if loaded is None:
+            print(f"错误: 运行不存在: {run_id}", file=sys.stderr)
+            return EXIT_ERROR
+    rows = compare_harness_metrics(baseline_metrics, candidate_metrics, threshold)
+    return EXIT_REGRESSION if print_comparison(baseline_run, candidate_run, rows, threshold) else EXIT_OK
+
+
+def main():
+    parser = argparse.ArgumentParser(description='负载工具自身基准（本地 KBS 替身服务）')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='测试配置文件（读取 harness_benchmark 段与场景）')
+    parser.add_argument('--db', default=DEFAULT_CATALOG, help='运行目录 SQLite 文件')
+    parser.add_argument('--log-file', default=DEFAULT_LOG_FILE, help='日志文件路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='执行基准并与同主机同参数的上一次运行对比，有回归时退出码为 1')
+    run_parser.add_argument('--suites', nargs='+', choices=SUITES, help='只执行指定基准项（默认全部）')
+    run_parser.add_argument('--probe-seconds', type=float, help='每个测量的时长（秒）')
+    run_parser.add_argument('--stub-processes', type=int, help='替身服务进程数（0 为 CPU 核数的一半）')
+    run_parser.add_argument('--report-rows', type=int, nargs='+',
+                            help='报告生成基准的行数（可多个，如 100000 1000000 10000000）')
+    run_parser.add_argument('--threshold', type=float, help='回归阈值百分比（默认取配置 threshold_percent）')
+    run_parser.add_argument('--baseline', default='auto', help='对比基线：运行标识、latest 或 auto（默认）')
+    run_parser.add_argument('--no-record', action='store_true', help='不收录到运行目录，也不做对比')
+    run_parser.add_argument('--json', help='同时将指标写入该 JSON 文件')
+    run_parser.add_argument('--keep', help='保留各基准项原始数据的目录（默认使用临时目录并删除）')
+
+    list_parser = subparsers.add_parser('list', help='列出已收录的负载工具基准运行')
+    list_parser.add_argument('--host', help='只列出指定主机')
+
+    compare_parser = subparsers.add_parser('compare', help='对比两次负载工具基准运行，有回归时退出码为 1')
+    compare_parser.add_argument('runs', nargs='+',
+                                help='运行标识；第一个可为 latest，只给一个时基线取同主机同参数的上一次运行')
+    compare_parser.add_argument('--threshold', type=float, help='回归阈值百分比')
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.command == 'run':
+        setup_logging(args.log_file)
+    handlers = {'run': run, 'list': list_runs, 'compare': compare}
+    sys.exit(handlers[args.command](args, config))
+
+
+if __name__ == '__main__':
+    main()
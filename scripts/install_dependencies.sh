@@ -77,6 +77,7 @@ python_packages=(
     "psutil>=5.8.0"
     "jinja2>=3.0.0"
     "kaleido"          # plotly 导出图片
+    "pyarrow>=10.0.0"  # 原始数据 Parquet 格式（缺失时回退为 CSV）
     "requests>=2.25.0"
 )
 
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地 KBS 替身服务
+作者: AI Assistant
+用途: 在无网络/无 trustee 服务的机器上模拟 KBS RCAR 接口，用于验证负载生成器与进程内客户端；
+      延迟分布、错误注入与多进程监听可配置，供负载工具自身基准（harness_benchmark.py）使用
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import secrets
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from rcar_client import (KBS_AUTH_PATH, KBS_ATTEST_PATH, KBS_RESOURCE_PATH, KBS_SESSION_COOKIE, REQUEST_ID_HEADER,
+                         HttpError, build_http_message, read_http_body, read_http_head)
+
+KBS_RESOURCE_POLICY_PATH = '/kbs/v0/resource-policy'
+KBS_ATTESTATION_POLICY_PATH = '/kbs/v0/attestation-policy'
+KBS_METRICS_PATH = '/metrics'
+# /metrics 直方图的桶上界（秒）
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 处理延迟分布：latency 为均值，lognormal 的形状参数为 latency_sigma
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+DEFAULT_LATENCY_SIGMA = 0.5
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+               500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+class MetricHistogram:
+    """Prometheus 直方图：各桶累积计数、总和与次数"""
+
+    def __init__(self):
+        self.buckets = [0] * len(METRIC_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(METRIC_BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+
+    def exposition(self, name, labels=''):
+        prefix = f"{labels}," if labels else ''
+        lines = [f'{name}_bucket{{{prefix}le="{bound:g}"}} {count}'
+                 for bound, count in zip(METRIC_BUCKETS, self.buckets)]
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ''
+        lines += [f"{name}_sum{suffix} {self.sum:.6f}", f"{name}_count{suffix} {self.count}"]
+        return lines
+
+
+class KbsStub:
+    """模拟 KBS 的 /auth、/attest、/resource 与策略管理接口，支持 keep-alive；
+    /metrics 以 Prometheus 文本格式暴露各接口处理耗时、排队耗时与在途/排队请求数。
+    workers 大于 0 时同时处理的请求数受限，超出的请求排队等待，用于验证排队与处理耗时的区分；
+    access_log 为打开的文件时逐请求写一行带 UTC 时间戳与请求 ID 的访问日志（非 200 为 WARN），用于验证尾部日志提取；
+    latency 按 latency_dist 分布抽样（均值为 latency），error_rate 为业务接口按比例返回 500 的注入错误率"""
+
+    def __init__(self, prefix='/api', latency=0.0, workers=0, access_log=None, latency_dist='fixed',
+                 latency_sigma=DEFAULT_LATENCY_SIGMA, error_rate=0.0):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"不支持的延迟分布 {latency_dist}（可选 {', '.join(LATENCY_DISTRIBUTIONS)}）")
+        self.prefix = prefix.rstrip('/')
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.latency_sigma = latency_sigma
+        # 对数正态的 mu 取使均值等于 latency 的值
+        self.latency_mu = math.log(latency) - latency_sigma ** 2 / 2 if latency > 0 else 0.0
+        self.error_rate = error_rate
+        self.sessions = {}
+        self.policies = {}
+        self.workers = asyncio.Semaphore(workers) if workers else None
+        self.durations = {}
+        self.queue_wait = MetricHistogram()
+        self.inflight = 0
+        self.queued = 0
+        self.connections = 0
+        self.requests = 0
+        self.access_log = access_log
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                start_line, headers = await read_http_head(reader)
+                if start_line is None or len(start_line) < 3:
+                    break
+                method, target = start_line[0], start_line[1]
+                body = await read_http_body(reader, headers)
+                self.requests += 1
+
+                status, response_headers, response_body = await self.route(method, target, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                response_headers['Content-Length'] = str(len(response_body))
+                response_headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+                writer.write(build_http_message(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}", response_headers, response_body))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, HttpError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, headers, body):
+        """按路径分发请求，返回 (状态码, 头部, 消息体)"""
+        path = target.split('?', 1)[0]
+        if self.prefix and path.startswith(self.prefix + '/'):
+            path = path[len(self.prefix):]
+        if path == KBS_METRICS_PATH:
+            return self.metrics()
+
+        # 排队耗时为等待处理槽位的时间，处理耗时从取得槽位开始计
+        queued_at = time.perf_counter()
+        self.queued += 1
+        if self.workers is not None:
+            await self.workers.acquire()
+        self.queued -= 1
+        self.inflight += 1
+        start = time.perf_counter()
+        self.queue_wait.observe(start - queued_at)
+        status = 500
+        try:
+            response = await self._dispatch(method, path, headers, body)
+            status = response[0]
+            return response
+        finally:
+            self.inflight -= 1
+            if self.workers is not None:
+                self.workers.release()
+            end = time.perf_counter()
+            # 资源路径按前缀归为一类，避免标签基数随资源数增长
+            route = KBS_RESOURCE_PATH.rstrip('/') if path.startswith(KBS_RESOURCE_PATH) else path
+            self.durations.setdefault((method, route), MetricHistogram()).observe(end - start)
+            if self.access_log is not None:
+                self.access_log.write(
+                    f"{datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')} "
+                    f"{'INFO' if status == 200 else 'WARN'} kbs_stub: {method} {path} status={status} "
+                    f"request_id={headers.get(REQUEST_ID_HEADER.lower(), '-')} "
+                    f"queue_ms={(start - queued_at) * 1000:.3f} handle_ms={(end - start) * 1000:.3f}\n")
+
+    def sample_latency(self):
+        """按延迟分布抽样一次处理延迟（秒）"""
+        if self.latency <= 0 or self.latency_dist == 'fixed':
+            return self.latency
+        if self.latency_dist == 'uniform':
+            return random.uniform(0.0, 2 * self.latency)
+        if self.latency_dist == 'exponential':
+            return random.expovariate(1.0 / self.latency)
+        return random.lognormvariate(self.latency_mu, self.latency_sigma)
+
+    async def _dispatch(self, method, path, headers, body):
+        delay = self.sample_latency()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if path == '/health':
+            return self._json(200, {'status': 'ok'})
+        if self.error_rate > 0 and random.random() < self.error_rate:
+            return self._json(500, {'error': 'injected failure'})
+        if method == 'POST' and path == KBS_AUTH_PATH:
+            return self.auth(body)
+        if method == 'POST' and path == KBS_ATTEST_PATH:
+            return self.attest(headers, body)
+        if method == 'GET' and path.startswith(KBS_RESOURCE_PATH):
+            return self.resource(headers, path[len(KBS_RESOURCE_PATH):])
+        if path in (KBS_RESOURCE_POLICY_PATH, KBS_ATTESTATION_POLICY_PATH) and method in ('GET', 'POST'):
+            return self.policy(method, path, headers, body)
+        return self._json(404, {'error': f"no route for {method} {path}"})
+
+    def metrics(self):
+        lines = ['# TYPE kbs_http_request_duration_seconds histogram']
+        for (method, route), histogram in sorted(self.durations.items()):
+            lines += histogram.exposition('kbs_http_request_duration_seconds', f'method="{method}",path="{route}"')
+        lines += ['# TYPE kbs_queue_wait_seconds histogram'] + self.queue_wait.exposition('kbs_queue_wait_seconds')
+        lines += ['# TYPE kbs_inflight_requests gauge', f"kbs_inflight_requests {self.inflight}",
+                  '# TYPE kbs_queued_requests gauge', f"kbs_queued_requests {self.queued}"]
+        return 200, {'Content-Type': 'text/plain; version=0.0.4'}, ('\n'.join(lines) + '\n').encode('utf-8')
+
+    @staticmethod
+    def _json(status, payload, extra_headers=None):
+        headers = {'Content-Type': 'application/json'}
+        if extra_headers:
+            headers.update(extra_headers)
+        return status, headers, json.dumps(payload).encode('utf-8')
+
+    def auth(self, body):
+        request = json.loads(body.decode('utf-8'))
+        if 'tee' not in request:
+            return self._json(400, {'error': 'missing tee'})
+        session_id = secrets.token_hex(16)
+        nonce = _b64url(os.urandom(32))
+        self.sessions[session_id] = nonce
+        return self._json(200, {'nonce': nonce, 'extra-params': ''},
+                          {'Set-Cookie': f"{KBS_SESSION_COOKIE}={session_id}; Max-Age=300"})
+
+    def attest(self, headers, body):
+        session_id = None
+        for item in headers.get('cookie', '').split(';'):
+            name, _, value = item.strip().partition('=')
+            if name == KBS_SESSION_COOKIE:
+                session_id = value
+        if session_id is None or self.sessions.pop(session_id, None) is None:
+            return self._json(401, {'error': 'invalid session'})
+
+        attestation = json.loads(body.decode('utf-8'))
+        if 'tee-evidence' not in attestation:
+            return self._json(400, {'error': 'missing evidence'})
+
+        claims = {'exp': int(time.time()) + 300, 'tee-pubkey': attestation.get('tee-pubkey')}
+        token = '.'.join([_b64url(b'{"alg":"none"}'), _b64url(json.dumps(claims).encode('utf-8')), ''])
+        return self._json(200, {'token': token})
+
+    def resource(self, headers, resource_path):
+        if not headers.get('authorization', '').startswith('Bearer '):
+            return self._json(401, {'error': 'missing token'})
+        return self._json(200, {
+            'protected': _b64url(b'{"alg":"RSA1_5","enc":"A256GCM"}'),
+            'encrypted_key': _b64url(os.urandom(256)),
+            'iv': _b64url(os.urandom(12)),
+            'ciphertext': _b64url(resource_path.encode('utf-8')),
+            'tag': _b64url(os.urandom(16))
+        })
+
+    def policy(self, method, path, headers, body):
+        """策略读写：要求 Bearer 管理 token（替身不校验签名），POST 保存策略，GET 返回已保存的策略"""
+        if not headers.get('authorization', '').startswith('Bearer '):
+            return self._json(401, {'error': 'missing admin token'})
+        if method == 'POST':
+            request = json.loads(body.decode('utf-8') or '{}')
+            if 'policy' not in request:
+                return self._json(400, {'error': 'missing policy'})
+            self.policies[path] = request['policy']
+            return self._json(200, {})
+        return self._json(200, {'policy': self.policies.get(path, '')})
+
+
+async def start_stub(host='127.0.0.1', port=0, prefix='/api', latency=0.0, workers=0, access_log=None,
+                     latency_dist='fixed', latency_sigma=DEFAULT_LATENCY_SIGMA, error_rate=0.0, reuse_port=False):
+    """启动替身服务，返回 (stub, server, 实际端口)；reuse_port 时多个进程可监听同一端口，由内核分发连接"""
+    stub = KbsStub(prefix=prefix, latency=latency, workers=workers, access_log=access_log,
+                   latency_dist=latency_dist, latency_sigma=latency_sigma, error_rate=error_rate)
+    server = await asyncio.start_server(stub.handle_connection, host, port, reuse_port=reuse_port or None)
+    return stub, server, server.sockets[0].getsockname()[1]
+
+
+def spawn_children(args):
+    """多进程模式：以相同参数再启动 processes-1 个子进程共享端口（workers 与访问日志按进程各自生效）"""
+    argv = [sys.executable, os.path.abspath(__file__), '--host', args.host, '--port', str(args.port),
+            '--prefix', args.prefix, '--latency-ms', str(args.latency_ms), '--latency-dist', args.latency_dist,
+            '--latency-sigma', str(args.latency_sigma), '--error-rate', str(args.error_rate),
+            '--workers', str(args.workers), '--reuse-port']
+    if args.access_log:
+        argv += ['--access-log', args.access_log]
+    return [subprocess.Popen(argv) for _ in range(args.processes - 1)]
+
+
+async def serve(args):
+    # 访问日志行缓冲，日志提取读到的总是完整行；多进程时各进程追加写同一文件
+    access_log = open(args.access_log, 'a', buffering=1, encoding='utf-8') if args.access_log else None
+    stub, server, port = await start_stub(args.host, args.port, args.prefix, args.latency_ms / 1000.0,
+                                          args.workers, access_log, args.latency_dist, args.latency_sigma,
+                                          args.error_rate, args.reuse_port or args.processes > 1)
+    if not args.reuse_port:
+        print(f"KBS 替身服务已启动: http://{args.host}:{port}{stub.prefix}"
+              f"{f'（{args.processes} 个进程）' if args.processes > 1 else ''}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if access_log is not None:
+            access_log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 KBS 替身服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8081, help='监听端口')
+    parser.add_argument('--prefix', default='/api', help='URL 前缀（与 base_url 的路径一致）')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='每个接口附加的处理延迟均值（毫秒）')
+    parser.add_argument('--latency-dist', choices=LATENCY_DISTRIBUTIONS, default='fixed',
+                        help='处理延迟分布：fixed 固定、uniform 为 [0, 2×均值] 均匀、exponential 指数、lognormal 对数正态')
+    parser.add_argument('--latency-sigma', type=float, default=DEFAULT_LATENCY_SIGMA,
+                        help='lognormal 分布的形状参数 sigma（越大尾部越长）')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='业务接口按该比例（0~1）返回 500 注入错误，/health 与 /metrics 不受影响')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='监听进程数，大于 1 时以 SO_REUSEPORT 共享端口（需指定非 0 端口，/metrics 为单进程视图）')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='同时处理的请求数上限，超出的请求排队（0 为不限制），用于验证服务端排队耗时')
+    parser.add_argument('--access-log', help='逐请求访问日志文件（含请求 ID），用于验证慢请求的服务日志提取')
+    parser.add_argument('--reuse-port', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if not 0 <= args.error_rate <= 1:
+        parser.error('--error-rate 取值为 0~1')
+    if args.processes > 1 and args.port == 0:
+        parser.error('多进程模式需要指定非 0 的 --port')
+
+    # SIGTERM 与 Ctrl+C 一样正常退出，确保子进程随之终止
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    children = spawn_children(args) if args.processes > 1 and not args.reuse_port else []
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+可合并的延迟直方图
+作者: AI Assistant
+用途: 以对数-线性分桶（HDR 风格）记录微秒级延迟，O(1) 记录、可按窗口合并，用于实时分位数统计；
+      每个并发量/到达率输出逐窗口直方图文件，报告与跨轮次、跨生成器主机的合并均基于该文件，无需原始记录
+"""
+
+import argparse
+import json
+
+from tail_capture import merge_tails
+
+# 低于 2^SUB_BUCKET_BITS 微秒的值逐微秒精确计数，其上每个 2 的幂区间划分为 2^(SUB_BUCKET_BITS-1) 个桶，
+# 相对误差不超过 1/2^(SUB_BUCKET_BITS-1)（默认 8 位：256us 内精确，其上误差 < 0.8%）
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+ARTIFACT_FORMAT = 'trustee-latency-histogram'
+ARTIFACT_VERSION = 1
+
+
+def bucket_index(value):
+    """微秒值对应的桶序号"""
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (value >> shift) - SUB_BUCKET_HALF
+
+
+def bucket_bounds(index):
+    """桶序号对应的 [下界, 上界] 微秒值（闭区间）"""
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    shift, offset = divmod(index - SUB_BUCKET_COUNT, SUB_BUCKET_HALF)
+    shift += 1
+    lower = (offset + SUB_BUCKET_HALF) << shift
+    return lower, lower + (1 << shift) - 1
+
+
+def bucket_indexes(values):
+    """bucket_index 的向量化版本：values 为非负整数微秒数组，用于把大批原始记录一次性分桶（需 numpy）"""
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.int64)
+    # frexp 的指数即整数的二进制位数，2^53 以内精确
+    _, bit_length = np.frexp(values.astype(np.float64))
+    shift = np.maximum(bit_length - SUB_BUCKET_BITS, 1)
+    large = SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (values >> shift) - SUB_BUCKET_HALF
+    return np.where(values < SUB_BUCKET_COUNT, values, large)
+
+
+def bucket_upper_bounds(indexes):
+    """bucket_bounds 上界的向量化版本（需 numpy）"""
+    import numpy as np
+
+    indexes = np.asarray(indexes, dtype=np.int64)
+    shift, offset = np.divmod(np.maximum(indexes - SUB_BUCKET_COUNT, 0), SUB_BUCKET_HALF)
+    shift += 1
+    upper = ((offset + SUB_BUCKET_HALF) << shift) + (1 << shift) - 1
+    return np.where(indexes < SUB_BUCKET_COUNT, indexes, upper)
+
+
+class LatencyHistogram:
+    """稀疏对数-线性直方图：{桶序号: 计数}，同时保留精确的最小值、最大值与总和"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record(self, seconds):
+        value = int(seconds * 1e6 + 0.5) if seconds > 0 else 0
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_us += value
+        if self.min_us is None or value < self.min_us:
+            self.min_us = value
+        if value > self.max_us:
+            self.max_us = value
+
+    def merge(self, other):
+        """将另一个直方图累加到本直方图（窗口汇总为全程、多个生成器汇总）"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    @property
+    def mean(self):
+        """平均值（秒）"""
+        return self.total_us / self.count / 1e6 if self.count else 0.0
+
+    @property
+    def max(self):
+        return self.max_us / 1e6
+
+    @property
+    def min(self):
+        return (self.min_us or 0) / 1e6
+
+    def percentile(self, q):
+        """第 q 分位（0-1）所在桶的上界（秒），不超过记录到的最大值"""
+        if not self.count:
+            return 0.0
+        target = max(1, int(q * self.count + 0.999999))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(bucket_bounds(index)[1], self.max_us) / 1e6
+        return self.max
+
+    def percentiles(self, quantiles):
+        """一次遍历计算多个分位数，返回与 quantiles 顺序一致的列表（秒）"""
+        if not self.count:
+            return [0.0] * len(quantiles)
+        order = sorted(range(len(quantiles)), key=lambda i: quantiles[i])
+        results = [self.max] * len(quantiles)
+        indexes = sorted(self.counts)
+        position = 0
+        seen = 0
+        for i in order:
+            target = max(1, int(quantiles[i] * self.count + 0.999999))
+            while position < len(indexes) and seen < target:
+                seen += self.counts[indexes[position]]
+                position += 1
+            if seen >= target:
+                results[i] = min(bucket_bounds(indexes[position - 1])[1], self.max_us) / 1e6
+        return results
+
+    def cdf(self):
+        """累计分布：[(桶上界秒, 累计占比), ...]，按延迟升序"""
+        points = []
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            points.append((min(bucket_bounds(index)[1], self.max_us) / 1e6, seen / self.count))
+        return points
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_us': self.total_us,
+            'min_us': self.min_us,
+            'max_us': self.max_us,
+            'buckets': sorted(self.counts.items())
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {int(index): int(count) for index, count in data.get('buckets', [])}
+        histogram.count = data.get('count', 0)
+        histogram.total_us = data.get('total_us', 0)
+        histogram.min_us = data.get('min_us')
+        histogram.max_us = data.get('max_us', 0)
+        return histogram
+
+
+def write_artifact(path, meta, windows, extra=None, summary=None, request_types=None, tail=None):
+    """写出直方图文件
+
+    windows 为 [{'start', 'end', 'total', 'successful', 'failed', 'histogram': LatencyHistogram}]，
+    histogram 只记录成功请求；extra 为不分窗口的附加直方图（如协议阶段、开环服务时间）；
+    request_types 为混合场景各请求类型的全程计数与成功请求直方图，结构同单个窗口（不含起止时间）；
+    tail 为最慢 / 失败请求明细（tail_capture.TailReservoir.to_dict()，含匹配的服务日志行）
+    """
+    document = dict(meta)
+    document.update({
+        'format': ARTIFACT_FORMAT,
+        'version': ARTIFACT_VERSION,
+        'sub_bucket_bits': SUB_BUCKET_BITS,
+        'unit': 'us',
+        'windows': [dict(window, histogram=window['histogram'].to_dict()) for window in windows],
+        'extra': {name: histogram.to_dict() for name, histogram in (extra or {}).items()},
+        'request_types': {name: dict(counts, histogram=counts['histogram'].to_dict())
+                          for name, counts in (request_types or {}).items()},
+        'tail': tail or {},
+        'summary': summary or {}
+    })
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+    return path
+
+
+def load_artifact(path):
+    """读取直方图文件，直方图还原为 LatencyHistogram"""
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if document.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f"不是延迟直方图文件: {path}")
+    if document.get('sub_bucket_bits') != SUB_BUCKET_BITS:
+        raise ValueError(f"分桶精度不一致（{document.get('sub_bucket_bits')} != {SUB_BUCKET_BITS}），无法合并: {path}")
+    for window in document['windows']:
+        window['histogram'] = LatencyHistogram.from_dict(window['histogram'])
+    document['extra'] = {name: LatencyHistogram.from_dict(data) for name, data in document['extra'].items()}
+    document['request_types'] = {name: dict(counts, histogram=LatencyHistogram.from_dict(counts['histogram']))
+                                 for name, counts in document.get('request_types', {}).items()}
+    document.setdefault('tail', {})
+    return document
+
+
+def merge_artifacts(documents):
+    """合并多个直方图文件（多轮测试或多台生成器主机的同一并发量）
+
+    返回 {'windows', 'extra', 'request_types', 'tail', 'histogram', 'total', 'successful', 'failed', 'start', 'end',
+    'covered', 'sources'}，
+    窗口按起始时间排序后保留，全程直方图为全部窗口之和；covered 为窗口时间区间并集的秒数，
+    多台主机同时施压时重叠部分只计一次（吞吐相加），先后多轮测试则时长累加（吞吐取平均）
+    """
+    merged = {'windows': [], 'extra': {}, 'request_types': {}, 'histogram': LatencyHistogram(), 'total': 0,
+              'successful': 0, 'failed': 0, 'start': None, 'end': None, 'covered': 0.0, 'sources': []}
+    for document in documents:
+        merged['sources'].append({key: document.get(key)
+                                  for key in ('host', 'label', 'mode', 'summary', 'agent', 'scenario')})
+        for window in document['windows']:
+            merged['windows'].append(window)
+            merged['histogram'].merge(window['histogram'])
+            merged['total'] += window['total']
+            merged['successful'] += window['successful']
+            merged['failed'] += window['failed']
+            if merged['start'] is None or window['start'] < merged['start']:
+                merged['start'] = window['start']
+            if merged['end'] is None or window['end'] > merged['end']:
+                merged['end'] = window['end']
+        for name, histogram in document['extra'].items():
+            merged['extra'].setdefault(name, LatencyHistogram()).merge(histogram)
+        for name, counts in document['request_types'].items():
+            target = merged['request_types'].setdefault(
+                name, {'total': 0, 'successful': 0, 'failed': 0, 'histogram': LatencyHistogram()})
+            for key in ('total', 'successful', 'failed'):
+                target[key] += counts[key]
+            target['histogram'].merge(counts['histogram'])
+    merged['tail'] = merge_tails([document.get('tail') for document in documents])
+    merged['windows'].sort(key=lambda window: window['start'])
+    covered_end = None
+    for window in merged['windows']:
+        start = window['start'] if covered_end is None else max(window['start'], covered_end)
+        if window['end'] > start:
+            merged['covered'] += window['end'] - start
+        covered_end = window['end'] if covered_end is None else max(covered_end, window['end'])
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='延迟直方图文件汇总与合并')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    summary = subparsers.add_parser('summary', help='合并并输出分位数')
+    summary.add_argument('files', nargs='+', help='直方图文件（*_histogram_*.json）')
+    merge = subparsers.add_parser('merge', help='合并为一个直方图文件')
+    merge.add_argument('files', nargs='+', help='直方图文件')
+    merge.add_argument('-o', '--output', required=True, help='输出文件')
+    args = parser.parse_args()
+
+    documents = [load_artifact(path) for path in args.files]
+    merged = merge_artifacts(documents)
+    if args.command == 'merge':
+        first = documents[0]
+        meta = {'mode': first.get('mode'), 'label': first.get('label'), 'latency': first.get('latency'),
+                'host': ','.join(sorted({str(d.get('host')) for d in documents})), 'merged_from': args.files}
+        write_artifact(args.output, meta, merged['windows'], merged['extra'], request_types=merged['request_types'],
+                       tail=merged['tail'])
+        print(args.output)
+        return
+
+    histogram = merged['histogram']
+    covered = merged['covered']
+    print(f"文件数: {len(documents)}  请求数: {merged['total']}  失败: {merged['failed']}  "
+          f"QPS: {merged['total'] / covered if covered > 0 else 0:.2f}")
+    print(f"平均: {histogram.mean * 1000:.3f}ms  最大: {histogram.max * 1000:.3f}ms")
+    for q in (0.50, 0.90, 0.95, 0.99, 0.999):
+        print(f"P{q * 100:g}: {histogram.percentile(q) * 1000:.3f}ms")
+    for name, extra in merged['extra'].items():
+        print(f"{name}: 平均 {extra.mean * 1000:.3f}ms  P99 {extra.percentile(0.99) * 1000:.3f}ms")
+    for name, counts in merged['request_types'].items():
+        print(f"[{name}] 请求数: {counts['total']}  失败: {counts['failed']}  "
+              f"QPS: {counts['total'] / covered if covered > 0 else 0:.2f}  "
+              f"P50: {counts['histogram'].percentile(0.50) * 1000:.3f}ms  "
+              f"P99: {counts['histogram'].percentile(0.99) * 1000:.3f}ms")
+    for record in merged['tail'].get('slowest', [])[:5]:
+        print(f"慢请求 {record['request_id']}: {record['duration'] * 1000:.3f}ms  {record.get('request_type') or ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+资源泄漏趋势
+作者: AI Assistant
+用途: 对长稳测试中各服务的 RSS、fd、线程与 TCP 连接数按时间做线性趋势拟合，
+      按残差一阶自相关修正斜率标准误后给出每小时增长率、置信区间与增长为正的置信度；
+      t 分布由正则化不完全贝塔函数计算，只依赖 numpy
+"""
+
+import math
+
+import numpy as np
+
+# 拟合所需的最少聚合窗口数
+MIN_POINTS = 6
+# 增长率置信区间的置信水平，以及判定为疑似泄漏所需的增长置信度
+CONFIDENCE = 0.95
+LEAK_CONFIDENCE = 0.95
+# 残差自相关系数上限，避免有效样本数趋于 0
+MAX_AUTOCORRELATION = 0.95
+
+
+def _betacf(a, b, x):
+    """不完全贝塔函数的连分式（修正 Lentz 法）"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1, a - 1
+    c, d = 1.0, 1 - qab * x / qap
+    d = 1 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 301):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)), -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1 + aa * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + aa / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1) < 1e-14:
+            break
+    return h
+
+
+def betainc(a, b, x):
+    """正则化不完全贝塔函数 I_x(a, b)"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1 - front * _betacf(b, a, 1 - x) / b
+
+
+def t_cdf(t, df):
+    """自由度 df（可为非整数）的 t 分布累积分布函数"""
+    tail = 0.5 * betainc(df / 2, 0.5, df / (df + t * t))
+    return 1 - tail if t > 0 else tail
+
+
+def t_quantile(p, df):
+    """t 分布分位数（二分求解）"""
+    low, high = -1e3, 1e3
+    for _ in range(200):
+        mid = (low + high) / 2
+        if t_cdf(mid, df) < p:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def fit_trend(hours, values):
+    """对 values 随时间（小时）做最小二乘线性拟合，返回斜率（每小时）、置信区间、增长置信度等；
+    点数不足 MIN_POINTS 或时间跨度为 0 时返回 None
+
+    相邻窗口的资源值（如 GC 锯齿）并不独立，按残差一阶自相关 r 将斜率标准误放大 sqrt((1+r)/(1-r))，
+    自由度取有效样本数 n(1-r)/(1+r) - 2，避免短期波动被误判为显著增长
+    """
+    t = np.asarray(hours, dtype=float)
+    y = np.asarray(values, dtype=float)
+    valid = np.isfinite(t) & np.isfinite(y)
+    t, y = t[valid], y[valid]
+    n = len(t)
+    if n < MIN_POINTS:
+        return None
+    t_mean = t.mean()
+    sxx = np.sum((t - t_mean) ** 2)
+    if sxx <= 0:
+        return None
+    slope = float(np.sum((t - t_mean) * (y - y.mean())) / sxx)
+    intercept = float(y.mean() - slope * t_mean)
+    residual = y - (intercept + slope * t)
+
+    if np.allclose(residual, 0):
+        autocorrelation = 0.0
+    else:
+        autocorrelation = float(np.sum(residual[1:] * residual[:-1]) / np.sum(residual ** 2))
+    autocorrelation = min(max(autocorrelation, 0.0), MAX_AUTOCORRELATION)
+    inflation = (1 + autocorrelation) / (1 - autocorrelation)
+    df = max(n / inflation - 2, 1.0)
+    stderr = math.sqrt(np.sum(residual ** 2) / (n - 2) / sxx * inflation)
+
+    if stderr > 0:
+        margin = t_quantile(1 - (1 - CONFIDENCE) / 2, df) * stderr
+        confidence = t_cdf(slope / stderr, df)
+    else:
+        margin = 0.0
+        confidence = 1.0 if slope > 0 else 0.0 if slope < 0 else 0.5
+    start = intercept + slope * t.min()
+    return {
+        'points': n,
+        'hours': float(t.max() - t.min()),
+        'start': float(start),
+        'end': float(intercept + slope * t.max()),
+        'slope_per_hour': slope,
+        'ci': (slope - margin, slope + margin),
+        # 相对拟合起点的每小时增长百分比
+        'growth_percent_per_hour': float(slope / start * 100) if start > 0 else None,
+        'confidence': confidence,
+        'autocorrelation': autocorrelation,
+        'intercept': intercept
+    }
+
+
+def is_leak(trend, min_growth_percent, min_growth_absolute=0.0):
+    """增长置信度达到 LEAK_CONFIDENCE、置信区间下界为正，且增长率超过相对与绝对阈值时判定为疑似泄漏"""
+    if trend is None or trend['confidence'] < LEAK_CONFIDENCE or trend['ci'][0] <= 0:
+        return False
+    if trend['slope_per_hour'] <= min_growth_absolute:
+        return False
+    growth = trend['growth_percent_per_hour']
+    return growth is None or growth >= min_growth_percent
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+负载生成器实时统计
+作者: AI Assistant
+用途: 在内存中按窗口滚动汇总请求计数、错误数与延迟直方图，逐窗口写出 concurrent_stats_*.csv，
+      测试结束时写出可合并的逐窗口直方图文件，并可通过本地 HTTP/JSON 端点或终端输出实时查看 QPS 与 P99
+"""
+
+import asyncio
+import csv
+import json
+import socket
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+from latency_histogram import LatencyHistogram, write_artifact
+from rcar_client import HttpError, build_http_message, read_http_body, read_http_head
+
+STATS_HEADER = ['timestamp', 'concurrent_requests', 'total_requests', 'successful_requests', 'failed_requests',
+                'avg_response_time', 'qps', 'p50_response_time', 'p95_response_time', 'p99_response_time',
+                'max_response_time', 'inflight', 'cumulative_p99', 'epoch_time']
+QUANTILES = (0.50, 0.95, 0.99)
+# HTTP 端点返回的最近窗口数
+STATS_HISTORY = 60
+
+
+class WindowStats:
+    """单个统计窗口（或单个请求类型全程）的计数与成功请求延迟直方图"""
+
+    def __init__(self):
+        self.total = 0
+        self.successful = 0
+        self.failed = 0
+        self.histogram = LatencyHistogram()
+
+    def add(self, duration, response_code):
+        self.total += 1
+        if response_code == 200:
+            self.successful += 1
+            self.histogram.record(duration)
+        else:
+            self.failed += 1
+
+
+class LiveStats:
+    """滚动窗口统计：每个请求 O(1) 计入当前窗口，窗口结束时写出一行并合并进全程直方图"""
+
+    def __init__(self, stats_file, label, interval, inflight=None, echo=False, on_window=None,
+                 histogram_file=None, histogram_meta=None, max_windows=None):
+        self.stats_file = stats_file
+        self.label = label
+        self.interval = interval
+        self.inflight = inflight
+        self.echo = echo
+        self.on_window = on_window
+        self.histogram_file = histogram_file
+        self.histogram_meta = histogram_meta or {}
+        self.window = WindowStats()
+        self.cumulative = LatencyHistogram()
+        # 不分窗口的附加直方图（协议阶段耗时、开环服务时间等）
+        self.extra = {}
+        # 混合场景各请求类型的全程计数与直方图
+        self.request_types = {}
+        # 最慢 / 失败请求蓄水池（tail_capture.TailReservoir），由生成器设置，随直方图文件保存
+        self.tail = None
+        self.total = 0
+        self.failed = 0
+        self.recent = deque(maxlen=STATS_HISTORY)
+        # 直方图文件的逐窗口记录，窗口数 = 时长 / 窗口长度，内存占用与请求数无关；
+        # 指定 max_windows 时超出即相邻两两合并，此后每 _span 个统计窗口合为一个，数小时的测试内存也有上界
+        self.windows = []
+        self.max_windows = max_windows
+        self._span = 1
+        self._pending = None
+        self._pending_count = 0
+        self._start = time.perf_counter()
+        self._stop = None
+        self._window_start = self._start
+        self._window_start_epoch = time.time()
+        self._task = None
+        self._file = open(stats_file, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(STATS_HEADER)
+
+    def add(self, duration, response_code, request_type=None):
+        self.window.add(duration, response_code)
+        if request_type is not None:
+            typed = self.request_types.get(request_type)
+            if typed is None:
+                typed = self.request_types[request_type] = WindowStats()
+            typed.add(duration, response_code)
+
+    def add_extra(self, name, seconds):
+        histogram = self.extra.get(name)
+        if histogram is None:
+            histogram = self.extra[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def rotate(self):
+        """结束当前窗口：写出统计行、合并全程直方图，返回该行的字典形式"""
+        now = time.perf_counter()
+        now_epoch = time.time()
+        elapsed = now - self._window_start
+        window, self.window = self.window, WindowStats()
+        self._window_start = now
+        if self.histogram_file:
+            self._keep_window({'start': round(self._window_start_epoch, 6), 'end': round(now_epoch, 6),
+                               'total': window.total, 'successful': window.successful,
+                               'failed': window.failed, 'histogram': window.histogram})
+        self._window_start_epoch = now_epoch
+
+        self.cumulative.merge(window.histogram)
+        self.total += window.total
+        self.failed += window.failed
+        p50, p95, p99 = window.histogram.percentiles(QUANTILES)
+        row = {
+            'timestamp': datetime.fromtimestamp(now_epoch).strftime('%Y-%m-%d %H:%M:%S'),
+            'concurrent_requests': self.label,
+            'total_requests': window.total,
+            'successful_requests': window.successful,
+            'failed_requests': window.failed,
+            'avg_response_time': round(window.histogram.mean, 6),
+            'qps': round(window.total / elapsed, 2) if elapsed > 0 else 0,
+            'p50_response_time': p50,
+            'p95_response_time': p95,
+            'p99_response_time': p99,
+            'max_response_time': window.histogram.max,
+            'inflight': self.inflight.current if self.inflight is not None else '',
+            'cumulative_p99': self.cumulative.percentile(0.99),
+            # 窗口结束时刻，与请求记录、资源采样同为 epoch 秒
+            'epoch_time': round(now_epoch, 3)
+        }
+        self.recent.append(row)
+        self._writer.writerow([row[column] for column in STATS_HEADER])
+        self._file.flush()
+
+        if self.echo:
+            error_rate = window.failed / window.total * 100 if window.total else 0
+            print(f"[{now - self._start:6.0f}s] {self.label} | QPS {row['qps']:8.2f} | 错误率 {error_rate:5.1f}% | "
+                  f"P50 {p50 * 1000:7.1f}ms  P95 {p95 * 1000:7.1f}ms  P99 {p99 * 1000:7.1f}ms | "
+                  f"在途 {row['inflight']}", file=sys.stderr, flush=True)
+        if self.on_window is not None:
+            self.on_window(window, row)
+        return row
+
+    @staticmethod
+    def _merge_window(target, window):
+        target['end'] = window['end']
+        for key in ('total', 'successful', 'failed'):
+            target[key] += window[key]
+        target['histogram'].merge(window['histogram'])
+        return target
+
+    def _keep_window(self, window):
+        if self._pending is None:
+            self._pending, self._pending_count = window, 1
+        else:
+            self._merge_window(self._pending, window)
+            self._pending_count += 1
+        if self._pending_count < self._span:
+            return
+        self.windows.append(self._pending)
+        self._pending = None
+        if self.max_windows and len(self.windows) > self.max_windows and len(self.windows) % 2 == 0:
+            self.windows = [self._merge_window(first, second)
+                            for first, second in zip(self.windows[::2], self.windows[1::2])]
+            self._span *= 2
+
+    async def _run(self):
+        next_tick = time.perf_counter() + self.interval
+        while True:
+            await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+            next_tick += self.interval
+            self.rotate()
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def stop(self, summary=None):
+        """停止窗口滚动，写出最后一个不完整窗口并关闭文件；summary 随直方图文件一并保存"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.window.total:
+            self.rotate()
+        if self._pending is not None:
+            self.windows.append(self._pending)
+            self._pending = None
+        self._stop = time.perf_counter()
+        self._file.close()
+        if self.histogram_file:
+            meta = dict(self.histogram_meta, label=str(self.label), host=socket.gethostname(),
+                        interval_seconds=self.interval * self._span)
+            request_types = {name: {'total': typed.total, 'successful': typed.successful, 'failed': typed.failed,
+                                    'histogram': typed.histogram}
+                             for name, typed in self.request_types.items()}
+            write_artifact(self.histogram_file, meta, self.windows, self.extra, summary, request_types,
+                           self.tail.to_dict() if self.tail is not None else None)
+
+    def request_type_summary(self):
+        """各请求类型的请求数、吞吐、成功率与分位数（混合场景），按请求数降序"""
+        elapsed = (self._stop or time.perf_counter()) - self._start
+        summary = {}
+        for name, typed in sorted(self.request_types.items(), key=lambda item: -item[1].total):
+            p50, p95, p99 = typed.histogram.percentiles(QUANTILES)
+            summary[name] = {
+                'total_requests': typed.total,
+                'failed_requests': typed.failed,
+                'success_rate': round(typed.successful / typed.total * 100, 3) if typed.total else 0,
+                'qps': round(typed.total / elapsed, 3) if elapsed > 0 else 0,
+                'mean_response_time': round(typed.histogram.mean, 6),
+                'p50_response_time': p50,
+                'p95_response_time': p95,
+                'p99_response_time': p99
+            }
+        return summary
+
+    def snapshot(self):
+        """当前统计的 JSON 可序列化快照"""
+        return {
+            'label': self.label,
+            'stats_file': self.stats_file,
+            'interval_seconds': self.interval,
+            'elapsed_seconds': round(time.perf_counter() - self._start, 3),
+            'cumulative': {
+                'total_requests': self.total,
+                'failed_requests': self.failed,
+                'mean_response_time': round(self.cumulative.mean, 6),
+                'p50_response_time': self.cumulative.percentile(0.50),
+                'p95_response_time': self.cumulative.percentile(0.95),
+                'p99_response_time': self.cumulative.percentile(0.99),
+                'max_response_time': self.cumulative.max
+            },
+            'request_types': self.request_type_summary(),
+            'windows': list(self.recent)
+        }
+
+
+class StatsServer:
+    """本地 HTTP/JSON 端点：GET /stats 返回实时统计，POST /stop 提前结束测试"""
+
+    def __init__(self, host, port, snapshot, stop):
+        self.host = host
+        self.port = port
+        self.snapshot = snapshot
+        self.stop = stop
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def handle_connection(self, reader, writer):
+        try:
+            start_line, headers = await read_http_head(reader)
+            if start_line is None or len(start_line) < 3:
+                return
+            await read_http_body(reader, headers)
+            method, path = start_line[0], start_line[1].split('?', 1)[0]
+            if method == 'GET' and path in ('/', '/stats'):
+                status, payload = 200, self.snapshot()
+            elif method == 'POST' and path == '/stop':
+                self.stop("收到 /stop 请求")
+                status, payload = 200, {'status': 'stopping'}
+            else:
+                status, payload = 404, {'error': f"no route for {method} {path}"}
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            writer.write(build_http_message(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Not Found'}",
+                {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': str(len(body)),
+                 'Connection': 'close'},
+                body))
+            await writer.drain()
+        except (ConnectionError, HttpError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
@@ -0,0 +1,694 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分布式负载生成协调器与代理
+作者: AI Assistant
+用途: 单台负载生成器成为瓶颈时，由协调器把并发量或到达率按权重分给多个代理（本机多进程或实验室多台主机）；
+      协调器测量各代理的时钟偏差并据此同步开始时间，测试结束后收集各代理的逐窗口直方图、统计与在途请求时间线，
+      换算到协调器时钟后写入同一数据目录，交给 generate_report.py 合并分析，并保留逐代理明细用于发现饱和的生成器
+"""
+
+import os
+import sys
+import argparse
+import asyncio
+import copy
+import csv
+import glob
+import json
+import logging
+import re
+import socket
+import statistics
+import time
+from datetime import datetime
+
+from data_store import PHASE_LOG_FILE, append_phase_log
+from latency_histogram import LatencyHistogram
+from load_generator import (PROJECT_ROOT, TIMELINE_HEADER, add_common_arguments, artifact_base, build_generator,
+                            load_config, setup_logging)
+from rcar_client import HttpConnection, HttpError, build_http_message, read_http_body, read_http_head
+
+DEFAULT_LOG_FILE = os.path.join(PROJECT_ROOT, 'results', 'logs', 'load_coordinator.log')
+
+# 配置 distributed 段的默认值
+DEFAULT_DISTRIBUTED = {
+    # 协调器连接的代理地址（host:port），命令行 --agents 覆盖
+    'agents': [],
+    'agent_port': 8790,
+    # 下发任务到各代理开始施压之间的间隔，需大于任务下发耗时
+    'start_delay_seconds': 3,
+    'poll_interval_seconds': 2,
+    # 每个代理的时钟偏差测量次数，取往返时间最短的一次
+    'clock_samples': 5,
+    'max_clock_offset_ms': 50,
+    # 生成器饱和判定阈值
+    'max_generator_cpu_percent': 80,
+    'max_loop_lag_ms': 50,
+    'min_achieved_ratio': 0.9,
+    'p99_outlier_ratio': 1.5
+}
+# 协调器单次 HTTP 调用超时（秒），以及连续多少次调用失败后放弃该代理
+AGENT_TIMEOUT = 10
+AGENT_MAX_FAILURES = 3
+# 本机代理进程启动后报告监听端口的超时（秒）
+AGENT_START_TIMEOUT = 30
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 409: 'Conflict'}
+
+logger = logging.getLogger('load_generator')
+
+
+class AgentError(Exception):
+    """代理不可达、拒绝任务或执行失败"""
+
+
+def distributed_settings(config):
+    """合并配置中的 distributed 段与默认值"""
+    settings = dict(DEFAULT_DISTRIBUTED)
+    settings.update(config.get('distributed', {}))
+    return settings
+
+
+def split_load(load, weights, integer):
+    """按权重拆分总负载；闭环并发量按最大余数法取整，保证各份额之和等于总并发"""
+    total_weight = sum(weights)
+    exact = [load * weight / total_weight for weight in weights]
+    if not integer:
+        return exact
+    shares = [int(value) for value in exact]
+    remainders = sorted(range(len(exact)), key=lambda i: exact[i] - shares[i], reverse=True)
+    for i in remainders[:int(round(load)) - sum(shares)]:
+        shares[i] += 1
+    return shares
+
+
+def safe_name(name):
+    """代理名称用于文件名后缀，只保留字母、数字、点与连字符"""
+    return re.sub(r'[^A-Za-z0-9.-]+', '-', str(name)).strip('-') or 'agent'
+
+
+def saturation_reasons(agent, summary, median_p99, settings):
+    """判断单个代理的负载生成器是否饱和，返回原因列表（为空表示未饱和）
+
+    生成器 CPU 或事件循环延迟过高、实际并发/到达率明显低于分配份额、P99 明显高于其他代理，
+    都说明延迟中混入了生成器自身的排队，该代理的数据不能代表服务端
+    """
+    reasons = []
+    overhead = agent.get('overhead') or {}
+    cpu = overhead.get('generator_cpu_percent')
+    if cpu is not None and cpu >= settings['max_generator_cpu_percent']:
+        reasons.append(f"生成器 CPU {cpu:.0f}%")
+    lag = overhead.get('max_loop_lag_ms')
+    if lag is not None and lag >= settings['max_loop_lag_ms']:
+        reasons.append(f"事件循环延迟 {lag:.0f}ms")
+    share = agent.get('share') or 0
+    if share > 0:
+        if agent.get('mode') == 'closed':
+            achieved = summary.get('achieved_concurrency')
+            # 有思考时间时在途请求数本就低于虚拟用户数，不据此判断
+            if achieved is not None and not agent.get('think_time') and \
+                    achieved < share * settings['min_achieved_ratio']:
+                reasons.append(f"实际并发 {achieved:.1f}/{share:g}")
+        else:
+            offered = summary.get('offered_rps')
+            if offered is not None and offered < share * settings['min_achieved_ratio']:
+                reasons.append(f"实际到达率 {offered:.1f}/{share:g} req/s")
+    p99 = (agent.get('stats') or {}).get('p99')
+    if median_p99 and p99 and p99 > median_p99 * settings['p99_outlier_ratio']:
+        reasons.append(f"P99 为各代理中位数的 {p99 / median_p99:.1f} 倍")
+    return reasons
+
+
+def agent_breakdown(sources, settings):
+    """由合并直方图的 sources（merge_artifacts 结果）整理逐代理明细，并附上饱和判定原因"""
+    agents = [source for source in sources if source.get('agent')]
+    p99s = [source['agent']['stats']['p99'] for source in agents if source['agent']['stats']['successful']]
+    median_p99 = statistics.median(p99s) if len(p99s) >= 2 else None
+    rows = []
+    for source in agents:
+        summary = source.get('summary') or {}
+        row = dict(source['agent'], summary=summary)
+        row['reasons'] = saturation_reasons(source['agent'], summary, median_p99, settings)
+        rows.append(row)
+    return rows
+
+
+def artifact_stats(document):
+    """单个直方图文件（未还原的 JSON）的请求数、QPS 与分位数"""
+    histogram = LatencyHistogram()
+    total = successful = failed = 0
+    start = end = None
+    for window in document['windows']:
+        histogram.merge(LatencyHistogram.from_dict(window['histogram']))
+        total += window['total']
+        successful += window['successful']
+        failed += window['failed']
+        start = window['start'] if start is None else min(start, window['start'])
+        end = window['end'] if end is None else max(end, window['end'])
+    seconds = end - start if start is not None else 0
+    p50, p99 = histogram.percentiles([0.50, 0.99]) if successful else (0, 0)
+    return {
+        'total': total,
+        'successful': successful,
+        'failed': failed,
+        'seconds': round(seconds, 3),
+        'qps': total / seconds if seconds > 0 else 0,
+        'success_rate': successful / total * 100 if total else 0,
+        'p50': p50,
+        'p99': p99
+    }
+
+
+class LoadAgent:
+    """负载生成代理：按协调器下发的任务在指定时刻开始施压，结果文件经 HTTP/JSON 取回"""
+
+    def __init__(self, args, config):
+        self.args = args
+        self.config = config
+        self.name = args.name or socket.gethostname()
+        self.generator = None
+        self.job = None
+        self.status = 'idle'
+        self.error = None
+        self.result = None
+        self._task = None
+
+    def start_job(self, job):
+        if self._task is not None and not self._task.done():
+            raise AgentError(f"代理 {self.name} 正在执行任务 {self.job['job_id']}")
+        self.job = job
+        self.status = 'scheduled'
+        self.error = None
+        self.result = None
+        self._task = asyncio.ensure_future(self._run_job(job))
+
+    def stop(self, reason):
+        if self.generator is not None:
+            self.generator.abort(reason)
+
+    async def _run_job(self, job):
+        job_args = copy.copy(self.args)
+        job_args.output_dir = os.path.join(self.args.output_dir, job['job_id'])
+        generator = build_generator(self.config, job_args)
+        generator.raw_records = generator.raw_records and job.get('raw_records', False)
+        self.generator = generator
+        try:
+            delay = job['start_at'] - time.time()
+            logger.info(f"任务 {job['job_id']}: {job['mode']} 份额 {job['share']:g}，{max(delay, 0):.2f} 秒后开始")
+            if delay > 0:
+                await asyncio.sleep(delay)
+            start_late = max(time.time() - job['start_at'], 0)
+            self.status = 'running'
+            if job['mode'] == 'closed':
+                _, _, overhead = await generator.run_level(int(job['share']), job['duration'], job['warmup'],
+                                                           job['cooldown'])
+            else:
+                _, _, overhead = await generator.run_open_loop(job['share'], job['duration'], job['warmup'],
+                                                               job['cooldown'], arrival=job.get('arrival', 'fixed'))
+            self.result = self._collect(job_args.output_dir, overhead, start_late)
+            self.status = 'done'
+        except Exception as e:
+            logger.exception(f"任务 {job['job_id']} 执行失败")
+            self.error = str(e)
+            self.status = 'failed'
+        finally:
+            generator.backend.close()
+
+    def _collect(self, output_dir, overhead, start_late):
+        """读取本次任务写出的直方图、窗口统计、在途请求时间线与阶段日志"""
+        def read_first(pattern):
+            paths = sorted(glob.glob(os.path.join(output_dir, pattern)))
+            if not paths:
+                return None
+            with open(paths[-1], 'r', encoding='utf-8') as f:
+                return f.read()
+
+        histogram = read_first('*_histogram_*.json')
+        if histogram is None:
+            raise AgentError(f"任务目录中没有直方图文件: {output_dir}")
+        return {
+            'name': self.name,
+            'host': socket.gethostname(),
+            'histogram': json.loads(histogram),
+            'stats_csv': read_first('*_stats_*.csv') or '',
+            'timeline_csv': read_first('concurrency_timeline_*.csv') or '',
+            'phases_csv': read_first(PHASE_LOG_FILE) or '',
+            'overhead': overhead,
+            'think_time': self.generator.think_time,
+            'abort_reason': self.generator.abort_reason,
+            'start_late_ms': start_late * 1000
+        }
+
+    def status_payload(self):
+        return {'name': self.name, 'status': self.status, 'error': self.error,
+                'job_id': self.job['job_id'] if self.job else None,
+                'abort_reason': self.generator.abort_reason if self.generator else None}
+
+    def stats_payload(self):
+        if self.generator is None:
+            return {'status': self.status}
+        return self.generator.live_snapshot()
+
+
+class AgentServer:
+    """代理的 HTTP/JSON 控制端点
+
+    GET /time 返回本机时钟，GET /status 任务状态，GET /stats 实时统计，GET /result 任务结果，
+    POST /run 下发任务，POST /stop 提前结束当前任务
+    """
+
+    def __init__(self, agent, host, port):
+        self.agent = agent
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    def route(self, method, path, body):
+        agent = self.agent
+        if method == 'GET' and path == '/time':
+            return 200, {'name': agent.name, 'time': time.time()}
+        if method == 'GET' and path == '/status':
+            return 200, agent.status_payload()
+        if method == 'GET' and path == '/stats':
+            return 200, agent.stats_payload()
+        if method == 'GET' and path == '/result':
+            if agent.result is None:
+                return 409, {'error': f"任务尚未完成（{agent.status}）"}
+            return 200, agent.result
+        if method == 'POST' and path == '/run':
+            try:
+                agent.start_job(json.loads(body))
+            except AgentError as e:
+                return 409, {'error': str(e)}
+            except (ValueError, KeyError) as e:
+                return 400, {'error': f"任务格式错误: {e}"}
+            return 200, agent.status_payload()
+        if method == 'POST' and path == '/stop':
+            agent.stop("协调器请求停止")
+            return 200, {'status': 'stopping'}
+        return 404, {'error': f"no route for {method} {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            start_line, headers = await read_http_head(reader)
+            if start_line is None or len(start_line) < 3:
+                return
+            body = await read_http_body(reader, headers)
+            status, payload = self.route(start_line[0], start_line[1].split('?', 1)[0], body)
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            writer.write(build_http_message(
+                f"HTTP/1.1 {status} {HTTP_REASONS.get(status, 'Error')}",
+                {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': str(len(data)),
+                 'Connection': 'close'},
+                data))
+            await writer.drain()
+        except (ConnectionError, HttpError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+async def call_agent(address, method, path, payload=None, timeout=AGENT_TIMEOUT):
+    """向代理发送一次 HTTP/JSON 请求，非 200 响应抛出 AgentError"""
+    host, port = address
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    try:
+        conn = await asyncio.wait_for(HttpConnection.open(host, port), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise AgentError(f"无法连接代理 {host}:{port}: {e or '超时'}")
+    try:
+        status, _, response = await asyncio.wait_for(conn.request(
+            method, path, {'Host': f"{host}:{port}", 'Content-Type': 'application/json',
+                           'Content-Length': str(len(body)), 'Connection': 'close'}, body), timeout)
+    except (OSError, HttpError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        raise AgentError(f"代理 {host}:{port} {method} {path} 失败: {e or '超时'}")
+    finally:
+        conn.close()
+    data = json.loads(response) if response else {}
+    if status != 200:
+        raise AgentError(f"代理 {host}:{port} {method} {path} 返回 {status}: {data.get('error')}")
+    return data
+
+
+def parse_address(text, default_port):
+    host, _, port = text.strip().rpartition(':')
+    if not host:
+        return text.strip(), default_port
+    return host, int(port)
+
+
+class LoadCoordinator:
+    """把每个级别的负载按权重分给各代理，同步开始时间并把结果合并写入同一数据目录"""
+
+    def __init__(self, addresses, output_dir, settings, weights=None, run_id=None):
+        if weights is not None and len(weights) != len(addresses):
+            raise ValueError(f"权重个数（{len(weights)}）与代理个数（{len(addresses)}）不一致")
+        self.agents = [{'address': address, 'name': None, 'weight': weight, 'offset': 0.0, 'rtt': 0.0}
+                       for address, weight in zip(addresses, weights or [1] * len(addresses))]
+        self.output_dir = output_dir
+        self.settings = settings
+        self.run_id = run_id
+        self.abort_reason = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    async def measure_clocks(self):
+        """NTP 式时钟偏差测量：offset = 代理时钟 - 往返中点，取往返时间最短的一次；名称重复时追加序号"""
+        names = set()
+        for index, agent in enumerate(self.agents):
+            best = None
+            for _ in range(self.settings['clock_samples']):
+                sent = time.time()
+                reply = await call_agent(agent['address'], 'GET', '/time')
+                received = time.time()
+                sample = (received - sent, reply['time'] - (sent + received) / 2)
+                if best is None or sample[0] < best[0]:
+                    best = sample
+            agent['rtt'], agent['offset'] = best
+            name = safe_name(reply['name'])
+            agent['name'] = name if name not in names else f"{name}-{index + 1}"
+            names.add(agent['name'])
+            offset_ms = agent['offset'] * 1000
+            if abs(offset_ms) > self.settings['max_clock_offset_ms']:
+                logger.warning(f"代理 {agent['name']} 时钟偏差 {offset_ms:+.1f}ms 超过 "
+                               f"{self.settings['max_clock_offset_ms']}ms，请检查 NTP 同步；"
+                               f"本次按测得偏差校正开始时间与窗口时间戳（误差约 ±{agent['rtt'] * 500:.1f}ms）")
+            else:
+                logger.info(f"代理 {agent['name']} ({agent['address'][0]}:{agent['address'][1]}) "
+                            f"时钟偏差 {offset_ms:+.2f}ms，往返 {agent['rtt'] * 1000:.2f}ms")
+
+    async def stop_all(self, agents=None):
+        for agent in agents or self.agents:
+            try:
+                await call_agent(agent['address'], 'POST', '/stop')
+            except AgentError as e:
+                logger.warning(str(e))
+
+    async def run_level(self, mode, load, duration, warmup, cooldown, arrival='fixed'):
+        """执行一个级别：closed 时 load 为总并发量，open 时为总到达率（req/s）；返回逐代理明细"""
+        label = f"{int(load)}" if mode == 'closed' else f"{load:g}"
+        shares = split_load(load, [agent['weight'] for agent in self.agents], mode == 'closed')
+        active = [(agent, share) for agent, share in zip(self.agents, shares) if share > 0]
+        await self.measure_clocks()
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        job_id = f"{mode}_{label}_{timestamp}"
+        start_at = time.time() + self.settings['start_delay_seconds']
+        logger.info(f"级别 {label}{' 并发' if mode == 'closed' else ' req/s'}: 份额 " +
+                    ', '.join(f"{agent['name']}={share:g}" for agent, share in active))
+        for agent, share in active:
+            await call_agent(agent['address'], 'POST', '/run', {
+                'job_id': job_id, 'mode': mode, 'share': share, 'label': label,
+                'duration': duration, 'warmup': warmup, 'cooldown': cooldown, 'arrival': arrival,
+                'start_at': start_at + agent['offset']
+            })
+
+        try:
+            await self._wait([agent for agent, _ in active])
+        except BaseException:
+            await self.stop_all([agent for agent, _ in active])
+            raise
+        results = []
+        for agent, share in active:
+            results.append((agent, share, await call_agent(agent['address'], 'GET', '/result', timeout=60)))
+        return self._write_dataset(mode, label, load, timestamp, results)
+
+    async def _wait(self, agents):
+        failures = {agent['name']: 0 for agent in agents}
+        pending = list(agents)
+        while pending:
+            await asyncio.sleep(self.settings['poll_interval_seconds'])
+            for agent in list(pending):
+                try:
+                    status = await call_agent(agent['address'], 'GET', '/status')
+                    failures[agent['name']] = 0
+                except AgentError as e:
+                    failures[agent['name']] += 1
+                    logger.warning(str(e))
+                    if failures[agent['name']] >= AGENT_MAX_FAILURES:
+                        raise AgentError(f"代理 {agent['name']} 连续 {AGENT_MAX_FAILURES} 次无响应")
+                    continue
+                if status['status'] == 'failed':
+                    raise AgentError(f"代理 {agent['name']} 任务失败: {status['error']}")
+                if status['status'] == 'done':
+                    pending.remove(agent)
+
+    def _write_dataset(self, mode, label, load, timestamp, results):
+        """各代理结果换算到协调器时钟后写入数据目录：
+        直方图与窗口统计每个代理一个文件（文件名中的级别为总负载，报告按级别合并），
+        在途请求时间线按秒求和为一个文件，阶段日志取各代理的最早开始与最晚结束"""
+        prefix = 'latency_histogram' if mode == 'closed' else 'open_loop_histogram'
+        stats_prefix = 'concurrent_stats' if mode == 'closed' else 'open_loop_stats'
+        timeline = {}
+        phases = {}
+        sources = []
+        for agent, share, result in results:
+            offset = agent['offset']
+
+            document = result['histogram']
+            for window in document['windows']:
+                window['start'] = round(window['start'] - offset, 6)
+                window['end'] = round(window['end'] - offset, 6)
+            document['label'] = label
+            if mode == 'closed':
+                document['concurrency'] = int(load)
+            document['agent'] = {
+                'name': agent['name'], 'host': result['host'], 'address': f"{agent['address'][0]}:{agent['address'][1]}",
+                'mode': mode, 'share': share, 'agents': len(results), 'think_time': result['think_time'],
+                'clock_offset_ms': round(offset * 1000, 3), 'rtt_ms': round(agent['rtt'] * 1000, 3),
+                'start_late_ms': round(result['start_late_ms'], 3), 'overhead': result['overhead'],
+                'stats': artifact_stats(document)
+            }
+            with open(f"{artifact_base(self.output_dir, prefix, label, timestamp, self.run_id)}_{agent['name']}.json",
+                      'w', encoding='utf-8') as f:
+                json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+            sources.append({'agent': document['agent'], 'summary': document.get('summary')})
+
+            rows = list(csv.DictReader(result['stats_csv'].splitlines()))
+            if rows:
+                stats_base = artifact_base(self.output_dir, stats_prefix, label, timestamp, self.run_id)
+                with open(f"{stats_base}_{agent['name']}.csv", 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+                    writer.writeheader()
+                    for row in rows:
+                        row['epoch_time'] = f"{float(row['epoch_time']) - offset:.3f}"
+                        writer.writerow(row)
+
+            for row in csv.DictReader(result['timeline_csv'].splitlines()):
+                second = round(float(row['timestamp']) - offset)
+                entry = timeline.setdefault(second, {'agents': 0, 'inflight': 0, 'avg_inflight': 0.0,
+                                                     'max_inflight': 0})
+                entry['agents'] += 1
+                entry['inflight'] += int(row['inflight'])
+                entry['avg_inflight'] += float(row['avg_inflight'])
+                entry['max_inflight'] += int(row['max_inflight'])
+
+            for row in csv.DictReader(result['phases_csv'].splitlines()):
+                start, end = float(row['start_time']) - offset, float(row['end_time']) - offset
+                known = phases.get(row['test_phase'])
+                phases[row['test_phase']] = (min(start, known[0]), max(end, known[1])) if known else (start, end)
+
+            if result['abort_reason']:
+                self.abort_reason = f"{agent['name']}: {result['abort_reason']}"
+
+        # 只保留所有代理都有采样的秒，避免首尾个别代理缺失造成在途请求数偏低
+        if mode == 'closed' and timeline:
+            timeline_base = artifact_base(self.output_dir, 'concurrency_timeline', label, timestamp, self.run_id)
+            with open(timeline_base + '.csv', 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(TIMELINE_HEADER)
+                for second in sorted(timeline):
+                    entry = timeline[second]
+                    if entry['agents'] == len(results):
+                        writer.writerow([f"{second:.3f}", label, entry['inflight'], f"{entry['avg_inflight']:.2f}",
+                                         entry['max_inflight']])
+
+        test_name = 'concurrent_test' if mode == 'closed' else 'open_loop_test'
+        phase_rows = []
+        for test_phase in ('warmup', 'steady', 'cooldown'):
+            if test_phase in phases:
+                start, end = phases[test_phase]
+                phase_rows.append([mode, label, test_phase, f"{start:.6f}", f"{end:.6f}", test_name, self.run_id or ''])
+        append_phase_log(self.output_dir, phase_rows)
+
+        breakdown = agent_breakdown(sources, self.settings)
+        for row in breakdown:
+            stats = row['stats']
+            line = (f"  {row['name']}: 份额 {row['share']:g}, QPS {stats['qps']:.2f}, 成功率 {stats['success_rate']:.2f}%, "
+                    f"P99 {stats['p99'] * 1000:.1f}ms, 生成器 CPU {row['overhead']['generator_cpu_percent']:.0f}%")
+            if row['reasons']:
+                logger.warning(line + f" —— 生成器可能饱和: {'; '.join(row['reasons'])}")
+            else:
+                logger.info(line)
+        return breakdown
+
+
+def agent_argv(args):
+    """本机代理进程沿用协调器的请求后端与统计选项"""
+    argv = ['--config', args.config]
+    for option, value in (('--command', args.command), ('--timeout', args.timeout), ('--backend', args.backend),
+                          ('--base-url', args.base_url), ('--flow', args.flow),
+                          ('--resource-path', args.resource_path), ('--pool-size', args.pool_size),
+                          ('--evidence-file', args.evidence_file), ('--scenario', args.scenario),
+                          ('--scenario-file', args.scenario_file), ('--think-time', args.think_time),
+                          ('--think-distribution', args.think_distribution),
+                          ('--stats-interval', args.stats_interval), ('--data-format', args.data_format)):
+        if value is not None:
+            argv += [option, str(value)]
+    for option, enabled in (('--fresh-connections', args.fresh_connections), ('--no-raw', args.no_raw)):
+        if enabled:
+            argv.append(option)
+    return argv
+
+
+async def spawn_local_agents(args, count):
+    """在本机启动 count 个代理进程（监听随机端口），返回 (进程列表, 地址列表)"""
+    agent_dir = os.path.join(args.output_dir, 'agents')
+    processes, addresses = [], []
+    try:
+        for index in range(count):
+            name = f"local{index + 1}"
+            command = [sys.executable, os.path.abspath(__file__)] + agent_argv(args) + [
+                '--output-dir', os.path.join(agent_dir, name),
+                '--log-file', os.path.join(os.path.dirname(args.log_file), f"load_agent_{name}.log"),
+                'agent', '--listen', '127.0.0.1', '--port', '0', '--name', name]
+            # 代理日志写入各自的日志文件，stderr 不再重复输出到协调器终端
+            process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.DEVNULL)
+            processes.append(process)
+            line = await asyncio.wait_for(process.stdout.readline(), AGENT_START_TIMEOUT)
+            if not line.strip():
+                raise AgentError(f"本机代理 {name} 启动失败")
+            addresses.append(('127.0.0.1', int(line)))
+    except BaseException:
+        await stop_local_agents(processes)
+        raise
+    logger.info(f"已启动 {count} 个本机代理: {', '.join(f'{host}:{port}' for host, port in addresses)}")
+    return processes, addresses
+
+
+async def stop_local_agents(processes):
+    for process in processes:
+        if process.returncode is None:
+            process.terminate()
+    for process in processes:
+        await process.wait()
+
+
+async def run_agent(args, config):
+    agent = LoadAgent(args, config)
+    port = args.port if args.port is not None else distributed_settings(config)['agent_port']
+    server = await AgentServer(agent, args.listen, port).start()
+    logger.info(f"负载生成代理 {agent.name} 监听 {args.listen}:{server.port}")
+    # 首行输出监听端口，供协调器启动本机代理时读取
+    print(server.port, flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.close()
+
+
+async def run_coordinator(args, config):
+    settings = distributed_settings(config)
+    durations = config.get('test_duration', {})
+    weights = [float(w) for w in args.weights.split(',')] if args.weights else None
+    processes = []
+    if args.local:
+        processes, addresses = await spawn_local_agents(args, args.local)
+    else:
+        agents = args.agents.split(',') if args.agents else settings['agents']
+        if not agents:
+            raise SystemExit("错误: 需要通过 --agents 或配置 distributed.agents 指定代理地址，或使用 --local N")
+        addresses = [parse_address(text, settings['agent_port']) for text in agents]
+
+    try:
+        coordinator = LoadCoordinator(addresses, args.output_dir, settings, weights, args.run_id)
+        duration = args.duration if args.duration is not None else durations.get('steady_state_seconds', 120)
+        warmup = getattr(args, 'warmup', None)
+        warmup = warmup if warmup is not None else durations.get('warmup_seconds', 30)
+        cooldown = getattr(args, 'cooldown', None)
+        cooldown = cooldown if cooldown is not None else durations.get('cooldown_seconds', 30)
+
+        if args.mode == 'rate':
+            await coordinator.run_level('open', args.rate, duration, warmup, cooldown, arrival=args.arrival)
+        elif args.mode == 'single':
+            await coordinator.run_level('closed', args.concurrency, duration, warmup, cooldown)
+        else:
+            levels = config.get('concurrency_levels', [5, 10, 15, 20, 25, 30, 40, 50, 60, 70, 80, 90, 100])
+            for index, concurrency in enumerate(levels):
+                await coordinator.run_level('closed', concurrency, duration, warmup, cooldown)
+                if coordinator.abort_reason:
+                    logger.warning(f"提前终止批量测试: {coordinator.abort_reason}")
+                    break
+                if index < len(levels) - 1:
+                    logger.info("等待系统恢复...")
+                    await asyncio.sleep(durations.get('recovery_between_tests_seconds', 60))
+    finally:
+        await stop_local_agents(processes)
+    logger.info(f"分布式测试完成，合并数据目录: {args.output_dir}")
+    return args.output_dir
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Trustee Service 分布式负载生成（协调器 / 代理）')
+    add_common_arguments(parser, DEFAULT_LOG_FILE)
+    parser.add_argument('--agents', help='代理地址列表 host:port,host:port（默认取配置 distributed.agents）')
+    parser.add_argument('--local', type=int, help='在本机启动 N 个代理进程代替远程代理')
+    parser.add_argument('--weights', help='各代理的负载权重，如 1,1,2（默认均分）')
+
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    agent = subparsers.add_parser('agent', help='以代理身份运行，等待协调器下发任务')
+    agent.add_argument('--listen', default='127.0.0.1', help='监听地址，实验室多主机时使用 0.0.0.0')
+    agent.add_argument('--port', type=int, help='监听端口（默认取配置 distributed.agent_port，0 为随机端口）')
+    agent.add_argument('--name', help='代理名称（默认主机名）')
+
+    single = subparsers.add_parser('single', help='单个总并发量，按权重分给各代理')
+    single.add_argument('concurrency', type=int, help='总并发数')
+    single.add_argument('duration', type=int, nargs='?', help='持续时间（秒）')
+    single.add_argument('warmup', type=int, nargs='?', help='预热时间（秒）')
+    single.add_argument('cooldown', type=int, nargs='?', help='冷却时间（秒）')
+
+    batch = subparsers.add_parser('batch', help='依次测试配置中的各并发量')
+    batch.add_argument('duration', type=int, nargs='?', help='单次持续时间（秒）')
+
+    rate = subparsers.add_parser('rate', help='开环总到达率，按权重分给各代理')
+    rate.add_argument('rate', type=float, help='总到达率（请求/秒）')
+    rate.add_argument('duration', type=int, nargs='?', help='持续时间（秒）')
+    rate.add_argument('warmup', type=int, nargs='?', help='预热时间（秒）')
+    rate.add_argument('cooldown', type=int, nargs='?', help='冷却时间（秒）')
+    rate.add_argument('--arrival', choices=['fixed', 'poisson'], default='fixed', help='到达模式')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    config = load_config(args.config)
+    setup_logging(args.log_file)
+
+    try:
+        if args.mode == 'agent':
+            asyncio.run(run_agent(args, config))
+            return
+        result = asyncio.run(run_coordinator(args, config))
+    except KeyboardInterrupt:
+        logger.info("测试被中断")
+        sys.exit(130)
+    except AgentError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    print(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Trustee Service 异步负载生成引擎
+作者: AI Assistant
+用途: 以 asyncio 持续保持 N 个在途请求，替代 concurrent_test.sh 中逐请求 fork 的循环
+"""
+
+import os
+import sys
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import logging
+import random
+import re
+import resource
+import secrets
+import shlex
+import time
+from datetime import datetime
+
+from capacity_search import CapacitySearch, search_settings, write_search_results
+from data_store import DATA_FORMATS, append_phase_log, data_path, open_table, resolve_format
+from latency_histogram import LatencyHistogram
+from live_stats import LiveStats, StatsServer
+from rcar_client import ERROR_BODY_LIMIT, PHASE_NAMES, RcarBackend, RequestTrace, current_trace
+from scenarios import ScenarioBackend, ScenarioError, load_scenario
+from tail_capture import LogTail, TailReservoir, tail_capture_settings
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+DEFAULT_CONFIG = os.path.join(PROJECT_ROOT, 'config', 'test_config.json')
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'results', 'raw_data')
+DEFAULT_LOG_FILE = os.path.join(PROJECT_ROOT, 'results', 'logs', 'concurrent_test.log')
+
+# test_phase 为请求发出时所处的测试阶段（warmup / steady），request_type 为混合场景中的请求类型（单一流程为空），
+# request_id 为生成器分配的请求 ID（进程内客户端以 X-Request-Id 头发送，用于关联服务端日志）
+RESULT_HEADER = ['start_time', 'end_time', 'duration', 'response_code', 'error_msg'] + \
+    [f"{phase}_time" for phase in PHASE_NAMES] + ['test_phase', 'request_type', 'request_id']
+BATCH_SUMMARY_HEADER = ['concurrency', 'total_requests', 'successful_requests', 'failed_requests',
+                        'success_rate', 'avg_response_time', 'max_response_time', 'qps']
+STRESS_HEADER = ['concurrency', 'timestamp', 'qps', 'avg_response_time', 'error_rate']
+TIMELINE_HEADER = ['timestamp', 'target_concurrency', 'inflight', 'avg_inflight', 'max_inflight']
+OPEN_LOOP_HEADER = RESULT_HEADER + ['intended_time', 'corrected_duration']
+OPEN_LOOP_SUMMARY_HEADER = ['rate_label', 'arrival', 'offered_rps', 'achieved_rps', 'success_rate',
+                            'p50_service_time', 'p95_service_time', 'p99_service_time',
+                            'p50_corrected', 'p95_corrected', 'p99_corrected', 'max_schedule_lag']
+
+# 每累计多少条记录批量写盘一次
+FLUSH_BATCH_SIZE = 1000
+# 事件循环延迟采样间隔（秒）
+LOOP_LAG_INTERVAL = 0.1
+# 在途请求数采样间隔（秒）
+INFLIGHT_SAMPLE_INTERVAL = 1.0
+# 实时统计窗口（秒），与原 shell 脚本的统计间隔一致
+STATS_INTERVAL = 10.0
+# 窗口请求数不少于该值时才按错误率判断是否自动停止，避免窗口过小误判
+AUTO_STOP_MIN_REQUESTS = 20
+
+logger = logging.getLogger('load_generator')
+
+
+def check_run_id(value):
+    """运行标识写入数据文件名，只允许字母、数字与 . _ -"""
+    if not re.fullmatch(r'[A-Za-z0-9][A-Za-z0-9._-]*', value):
+        raise argparse.ArgumentTypeError(f"运行标识只能包含字母、数字与 . _ -: {value}")
+    return value
+
+
+def artifact_base(output_dir, kind, label, timestamp, run_id=None):
+    """数据文件路径（不含扩展名）：<类型>_<级别>[_<运行标识>]_<时间戳>，报告按运行标识只读取同一次运行的文件"""
+    return os.path.join(output_dir, '_'.join([kind, str(label)] + ([run_id] if run_id else []) + [timestamp]))
+
+
+def level_artifact_kinds(prefix):
+    """闭环级别各输出文件的类型名：扫描级别（concurrent_test）沿用报告读取的文件名，
+    压力测试、容量探测等其他前缀的文件以该前缀开头，不会混入扫描结果"""
+    if prefix == 'concurrent_test':
+        return {'stats': 'concurrent_stats', 'histogram': 'latency_histogram', 'timeline': 'concurrency_timeline'}
+    return {'stats': f'{prefix}_stats', 'histogram': f'{prefix}_histogram', 'timeline': f'{prefix}_timeline'}
+
+
+def format_phases(phases):
+    """阶段耗时格式化为 CSV 字段；后端无法分阶段计时（如 exec）时留空"""
+    if phases is None:
+        return ('',) * len(PHASE_NAMES)
+    return tuple('' if value is None else f"{value:.6f}" for value in phases)
+
+
+def load_config(config_path):
+    """读取测试配置文件，不存在时返回空配置"""
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def setup_logging(log_file):
+    """日志同时写入文件与 stderr，stdout 只输出结果文件路径"""
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    formatter = logging.Formatter('[%(asctime)s] %(message)s', '%Y-%m-%d %H:%M:%S')
+    for handler in (logging.FileHandler(log_file, encoding='utf-8'), logging.StreamHandler(sys.stderr)):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+class ExecBackend:
+    """通过 asyncio 子进程执行 kbs-client 命令的请求后端"""
+
+    def __init__(self, command, timeout):
+        self.argv = shlex.split(command)
+        self.timeout = timeout
+
+    async def request(self):
+        """执行一次请求，返回 (response_code, error_msg, 阶段耗时, 请求类型)；子进程无法分阶段计时。
+        失败时 error_msg 附带 stderr 最后一行，stderr 尾部记入请求追踪供最慢 / 失败请求明细使用"""
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self.argv,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except OSError as e:
+            return 500, f"Exec failed: {e.strerror}", None, None
+
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return 500, "Request timeout", None, None
+
+        if proc.returncode == 0:
+            return 200, "", None, None
+        output = stderr[-ERROR_BODY_LIMIT:].decode('utf-8', 'replace')
+        trace = current_trace.get()
+        if trace is not None:
+            trace.error_body = output
+        lines = output.strip().splitlines()
+        detail = f": {lines[-1][:200].replace(',', ';')}" if lines else ""
+        return 500, f"Request failed (exit {proc.returncode}){detail}", None, None
+
+    def session(self):
+        return self
+
+    def close(self):
+        pass
+
+
+class RecordWriter:
+    """在内存中缓冲请求记录并批量写入数据文件（按扩展名为 CSV 或 Parquet）；
+    file_path 为 None 时丢弃记录（长时间测试只保留统计与直方图）"""
+
+    def __init__(self, file_path, header=RESULT_HEADER):
+        self.file_path = file_path
+        self._buffer = []
+        self._table = open_table(file_path, header) if file_path is not None else None
+
+    def add(self, row):
+        if self._table is None:
+            return
+        self._buffer.append(row)
+        if len(self._buffer) >= FLUSH_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._table.write_rows(self._buffer)
+            self._buffer.clear()
+            self._table.flush()
+
+    def close(self):
+        if self._table is not None:
+            self.flush()
+            self._table.close()
+
+
+def format_request_types(request_types):
+    """混合场景报告中各请求类型的吞吐与延迟行；单一流程返回空列表"""
+    if not request_types:
+        return []
+    lines = ["", "请求类型 (混合场景):   请求数   QPS   成功率   平均   P50   P95   P99"]
+    for name, typed in request_types.items():
+        lines.append(f"  {name:<20} {typed['total_requests']:>7} {typed['qps']:>8.2f} "
+                     f"{typed['success_rate']:>7.2f}% {typed['mean_response_time']:.3f}秒 "
+                     f"{typed['p50_response_time']:.3f}秒 {typed['p95_response_time']:.3f}秒 "
+                     f"{typed['p99_response_time']:.3f}秒")
+    return lines
+
+
+class LevelStats:
+    """单个并发量的增量统计（不保留原始记录）"""
+
+    def __init__(self):
+        self.total = 0
+        self.successful = 0
+        self.failed = 0
+        self.total_time = 0.0
+        self.success_time = 0.0
+        self.min_time = 0.0
+        self.max_time = 0.0
+        self.first_start = None
+        self.last_end = None
+        self.achieved_concurrency = 0.0
+        # 成功请求 P99，由实时统计的全程直方图得到
+        self.p99_time = 0.0
+        # 混合场景各请求类型的吞吐与分位数，由实时统计得到
+        self.request_types = {}
+
+    def add(self, start_time, end_time, duration, response_code):
+        self.total += 1
+        self.total_time += duration
+        if self.first_start is None or start_time < self.first_start:
+            self.first_start = start_time
+        if self.last_end is None or end_time > self.last_end:
+            self.last_end = end_time
+
+        if response_code == 200:
+            self.successful += 1
+            self.success_time += duration
+            if self.min_time == 0 or duration < self.min_time:
+                self.min_time = duration
+            if duration > self.max_time:
+                self.max_time = duration
+        else:
+            self.failed += 1
+
+    @property
+    def success_rate(self):
+        return self.successful / self.total * 100 if self.total > 0 else 0
+
+    @property
+    def error_rate(self):
+        return self.failed / self.total * 100 if self.total > 0 else 0
+
+    @property
+    def avg_success_time(self):
+        return self.success_time / self.successful if self.successful > 0 else 0
+
+    @property
+    def avg_time(self):
+        return self.total_time / self.total if self.total > 0 else 0
+
+    @property
+    def wall_time(self):
+        if self.first_start is None or self.last_end is None:
+            return 0
+        return self.last_end - self.first_start
+
+    @property
+    def qps(self):
+        wall_time = self.wall_time
+        return self.total / wall_time if wall_time > 0 else 0
+
+
+class OpenLoopStats:
+    """开环测试统计：区分服务时间与按预定发送时间校正后的延迟；
+    延迟计入直方图而非逐个保留，数小时的长稳测试内存占用也不随请求数增长"""
+
+    def __init__(self):
+        self.offered = 0
+        self.completed = 0
+        self.successful = 0
+        self.service_times = LatencyHistogram()
+        self.corrected_times = LatencyHistogram()
+        self.max_schedule_lag = 0.0
+        self.first_intended = None
+        self.last_intended = None
+        self.last_end = None
+        self.request_types = {}
+
+    def schedule(self, intended_time):
+        self.offered += 1
+        if self.first_intended is None:
+            self.first_intended = intended_time
+        self.last_intended = intended_time
+
+    def add(self, intended_time, start_time, end_time, response_code):
+        self.completed += 1
+        if response_code == 200:
+            self.successful += 1
+            self.service_times.record(end_time - start_time)
+            self.corrected_times.record(end_time - intended_time)
+        lag = start_time - intended_time
+        if lag > self.max_schedule_lag:
+            self.max_schedule_lag = lag
+        if self.last_end is None or end_time > self.last_end:
+            self.last_end = end_time
+
+    @property
+    def offered_rps(self):
+        if self.first_intended is None or self.last_intended == self.first_intended:
+            return 0
+        # n 个到达点之间有 n-1 个间隔
+        return (self.offered - 1) / (self.last_intended - self.first_intended)
+
+    @property
+    def achieved_rps(self):
+        if self.first_intended is None or self.last_end is None or self.last_end <= self.first_intended:
+            return 0
+        return self.successful / (self.last_end - self.first_intended)
+
+    @property
+    def success_rate(self):
+        return self.successful / self.completed * 100 if self.completed > 0 else 0
+
+    def percentiles(self):
+        """返回 {(类型, 分位): 秒}，类型为 service 或 corrected"""
+        result = {}
+        for kind, histogram in (('service', self.service_times), ('corrected', self.corrected_times)):
+            for q, value in zip((0.50, 0.95, 0.99), histogram.percentiles([0.50, 0.95, 0.99])):
+                result[(kind, q)] = value
+        return result
+
+
+class InflightTracker:
+    """跟踪实际在途请求数，按时间加权计算区间平均值与峰值"""
+
+    def __init__(self):
+        self.current = 0
+        now = time.perf_counter()
+        self._last_change = now
+        self._window_start = now
+        self._window_area = 0.0
+        self._window_max = 0
+        self._total_start = now
+        self._total_area = 0.0
+
+    def _advance(self):
+        now = time.perf_counter()
+        area = self.current * (now - self._last_change)
+        self._window_area += area
+        self._total_area += area
+        self._last_change = now
+        return now
+
+    def enter(self):
+        self._advance()
+        self.current += 1
+        if self.current > self._window_max:
+            self._window_max = self.current
+
+    def leave(self):
+        self._advance()
+        self.current -= 1
+
+    def reset(self):
+        """从当前时刻重新开始累计整体平均值"""
+        now = self._advance()
+        self._total_start = now
+        self._total_area = 0.0
+        self._window_start = now
+        self._window_area = 0.0
+        self._window_max = self.current
+
+    def snapshot(self):
+        """返回自上次快照以来的 (当前值, 时间加权平均, 峰值) 并开启新区间"""
+        now = self._advance()
+        elapsed = now - self._window_start
+        avg = self._window_area / elapsed if elapsed > 0 else self.current
+        result = (self.current, avg, self._window_max)
+        self._window_start = now
+        self._window_area = 0.0
+        self._window_max = self.current
+        return result
+
+    @property
+    def average(self):
+        now = self._advance()
+        elapsed = now - self._total_start
+        return self._total_area / elapsed if elapsed > 0 else 0
+
+
+class OverheadMeter:
+    """测量负载生成器自身的 CPU 开销与事件循环延迟"""
+
+    def __init__(self):
+        self.max_loop_lag = 0.0
+        self._lag_task = None
+
+    def start(self):
+        self._self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        self._child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self._wall_start = time.perf_counter()
+        self.max_loop_lag = 0.0
+        self._lag_task = asyncio.ensure_future(self._watch_loop_lag())
+
+    async def _watch_loop_lag(self):
+        while True:
+            expected = time.perf_counter() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = time.perf_counter() - expected
+            if lag > self.max_loop_lag:
+                self.max_loop_lag = lag
+
+    async def stop(self, request_count):
+        """停止测量并返回开销汇总"""
+        self._lag_task.cancel()
+        try:
+            await self._lag_task
+        except asyncio.CancelledError:
+            pass
+
+        wall_time = time.perf_counter() - self._wall_start
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        generator_cpu = (self_usage.ru_utime - self._self_usage.ru_utime +
+                         self_usage.ru_stime - self._self_usage.ru_stime)
+        client_cpu = (child_usage.ru_utime - self._child_usage.ru_utime +
+                      child_usage.ru_stime - self._child_usage.ru_stime)
+
+        return {
+            'wall_seconds': wall_time,
+            'requests': request_count,
+            'generator_cpu_seconds': generator_cpu,
+            'generator_cpu_percent': generator_cpu / wall_time * 100 if wall_time > 0 else 0,
+            'generator_cpu_us_per_request': generator_cpu / request_count * 1e6 if request_count else 0,
+            'client_cpu_seconds': client_cpu,
+            'client_cpu_us_per_request': client_cpu / request_count * 1e6 if request_count else 0,
+            'max_loop_lag_ms': self.max_loop_lag * 1000
+        }
+
+
+class LoadGenerator:
+    """异步负载生成器：每个并发量保持固定数量的在途请求"""
+
+    def __init__(self, backend, output_dir, config=None, think_time=0, think_distribution='fixed',
+                 stats_interval=STATS_INTERVAL, live_echo=False, raw_records=True, data_format='csv', run_id=None):
+        self.backend = backend
+        self.output_dir = output_dir
+        # 运行标识写入各数据文件名，同一数据目录中的多次运行可按运行区分
+        self.run_id = run_id
+        self.config = config or {}
+        self.think_time = think_time
+        self.think_distribution = think_distribution
+        self.stats_interval = stats_interval
+        self.live_echo = live_echo
+        self.raw_records = raw_records
+        self.data_format = data_format
+        self.inflight = InflightTracker()
+        # 正式测试阶段的实时统计；abort_reason 非空时所有阶段尽快结束
+        self.live = None
+        self.abort_reason = None
+        # 由窗口错误率安全阈值触发的终止原因，容量搜索据此只结束当前级别
+        self.safety_reason = None
+        # 直方图文件保留的窗口数上限（长稳测试），None 为不限制
+        self.max_windows = None
+        safety = self.config.get('safety', {})
+        self.auto_stop = safety.get('auto_stop_on_high_error_rate', False)
+        self.error_rate_threshold = safety.get('error_rate_threshold_percent', 50)
+        # 请求 ID 为进程随机前缀 + 定长序号：多台生成器主机之间不重复，定长使任一 ID 不是另一 ID 的前缀，按子串匹配日志不会误配
+        self._request_prefix = secrets.token_hex(4)
+        self._request_seq = itertools.count(1)
+        # 正式测试阶段的最慢 / 失败请求采集；配置了服务日志文件时级别结束后提取匹配行
+        self.tail_settings = tail_capture_settings(self.config)
+        self.log_tail = LogTail(self.tail_settings) if any(self.tail_settings['log_files'].values()) else None
+        # perf_counter_ns 与墙钟时间的锚点，记录中的时间戳统一换算为 epoch 秒
+        self._epoch_anchor_ns = time.time_ns() - time.perf_counter_ns()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _to_epoch(self, perf_ns):
+        return (self._epoch_anchor_ns + perf_ns) / 1e9
+
+    def _new_trace(self):
+        """为下一个请求分配请求 ID 并设为当前任务的追踪上下文"""
+        trace = RequestTrace(f"{self._request_prefix}-{next(self._request_seq):010x}")
+        current_trace.set(trace)
+        return trace
+
+    @staticmethod
+    def _tail_record(trace, start_time, end_time, duration, response_code, error_msg, phases, request_type):
+        """尾部蓄水池保留的请求明细；只在请求失败或足够慢时构造"""
+        return {
+            'request_id': trace.request_id,
+            'request_type': request_type,
+            'start_time': round(start_time, 6),
+            'end_time': round(end_time, 6),
+            'duration': round(duration, 6),
+            'response_code': response_code,
+            'error_msg': error_msg,
+            'http_status': trace.http_status,
+            'error_body': trace.error_body,
+            'phases': {} if phases is None else
+            {phase: round(value, 6) for phase, value in zip(PHASE_NAMES, phases) if value is not None}
+        }
+
+    def _connections_opened(self):
+        """进程内客户端已建立的连接数；exec 后端每个请求都新建连接，返回 None"""
+        pool = getattr(self.backend, 'pool', None)
+        return pool.opened if pool is not None else None
+
+    def abort(self, reason):
+        """提前结束测试：在途请求完成后各阶段立即返回，批量/压力测试不再进入下一级"""
+        if self.abort_reason is None:
+            self.abort_reason = reason
+            logger.warning(f"提前终止测试: {reason}")
+
+    def _check_window(self, window, row):
+        if not self.auto_stop or window.total < AUTO_STOP_MIN_REQUESTS:
+            return
+        error_rate = window.failed / window.total * 100
+        if error_rate > self.error_rate_threshold:
+            self.safety_reason = f"窗口错误率 {error_rate:.1f}% 超过阈值 {self.error_rate_threshold}%"
+            self.abort(self.safety_reason)
+
+    def clear_safety_stop(self):
+        """安全阈值触发的终止只结束当前级别：清除并返回原因；其他原因（如 /stop）的终止保持不变"""
+        reason, self.safety_reason = self.safety_reason, None
+        if reason is None or self.abort_reason != reason:
+            return None
+        self.abort_reason = None
+        return reason
+
+    def _start_live(self, stats_file, label, histogram_file, histogram_meta):
+        scenario = getattr(self.backend, 'scenario_name', None)
+        if scenario:
+            histogram_meta['scenario'] = scenario
+        self.live = LiveStats(stats_file, label, self.stats_interval, self.inflight,
+                              echo=self.live_echo, on_window=self._check_window,
+                              histogram_file=histogram_file, histogram_meta=histogram_meta,
+                              max_windows=self.max_windows).start()
+        self.live.tail = TailReservoir(self.tail_settings['slowest'], self.tail_settings['failed'])
+        if self.log_tail is not None:
+            self.log_tail.mark()
+        return self.live
+
+    async def _stop_live(self, summary=None):
+        live, self.live = self.live, None
+        if live is not None:
+            if self.log_tail is not None:
+                # 只读取本级别期间新写入的日志，在线程中扫描以免阻塞事件循环（实时统计端点仍可响应）
+                records = live.tail.records()
+                matched = await asyncio.to_thread(self.log_tail.extract, records)
+                logger.info(f"尾部采集: {len(records)} 个最慢/失败请求匹配到 {matched} 行服务日志")
+            await live.stop(summary)
+        return live
+
+    def live_snapshot(self):
+        """供 HTTP 端点使用的实时统计快照"""
+        if self.live is None:
+            return {'status': 'aborted' if self.abort_reason else 'idle', 'abort_reason': self.abort_reason}
+        snapshot = self.live.snapshot()
+        snapshot['status'] = 'running'
+        snapshot['abort_reason'] = self.abort_reason
+        return snapshot
+
+    def _think_delay(self):
+        if self.think_time <= 0:
+            return 0
+        if self.think_distribution == 'exponential':
+            return random.expovariate(1.0 / self.think_time)
+        return self.think_time
+
+    def _log_phase(self, mode, label, test_phase, start_ns, test_name):
+        """阶段结束时向结果目录的阶段日志追加一行起止 epoch 秒，test_name 为该级别数据文件的前缀"""
+        append_phase_log(self.output_dir, [[mode, label, test_phase, f"{self._to_epoch(start_ns):.6f}",
+                                            f"{self._to_epoch(time.perf_counter_ns()):.6f}", test_name,
+                                            self.run_id or '']])
+
+    async def _worker(self, deadline_ns, writer, stats, test_phase):
+        """闭环虚拟用户：上一个请求完成（及可选思考时间）后立即发出下一个；混合场景中每个虚拟用户持有独立会话"""
+        perf_counter_ns = time.perf_counter_ns
+        inflight = self.inflight
+        live = self.live
+        tail = live.tail if live is not None else None
+        session = self.backend.session()
+        while perf_counter_ns() < deadline_ns and self.abort_reason is None:
+            trace = self._new_trace()
+            start_ns = perf_counter_ns()
+            inflight.enter()
+            try:
+                response_code, error_msg, phases, request_type = await session.request()
+            finally:
+                inflight.leave()
+            end_ns = perf_counter_ns()
+
+            start_time = self._to_epoch(start_ns)
+            end_time = self._to_epoch(end_ns)
+            duration = (end_ns - start_ns) / 1e9
+            writer.add((f"{start_time:.6f}", f"{end_time:.6f}", f"{duration:.6f}", response_code, error_msg) +
+                       format_phases(phases) + (test_phase, request_type or '', trace.request_id))
+            if stats is not None:
+                stats.add(start_time, end_time, duration, response_code)
+            if live is not None:
+                live.add(duration, response_code, request_type)
+                if phases is not None and response_code == 200:
+                    for phase, value in zip(PHASE_NAMES, phases):
+                        if value is not None:
+                            live.add_extra(phase, value)
+            if tail is not None and (response_code != 200 or tail.is_slow(duration)):
+                tail.add(duration, response_code != 200,
+                         self._tail_record(trace, start_time, end_time, duration, response_code, error_msg,
+                                           phases, request_type))
+
+            think = self._think_delay()
+            if think > 0:
+                remaining = (deadline_ns - perf_counter_ns()) / 1e9
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(think, remaining))
+
+    async def _sample_inflight(self, concurrency, rows):
+        """周期记录在途请求数，用于对比目标并发与实际达到的并发"""
+        while True:
+            await asyncio.sleep(INFLIGHT_SAMPLE_INTERVAL)
+            current, avg, peak = self.inflight.snapshot()
+            rows.append((f"{time.time():.3f}", concurrency, current, f"{avg:.2f}", peak))
+
+    def _write_timeline(self, kind, concurrency, timestamp, rows):
+        timeline_file = artifact_base(self.output_dir, kind, concurrency, timestamp, self.run_id) + '.csv'
+        with open(timeline_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(TIMELINE_HEADER)
+            writer.writerows(rows)
+        return timeline_file
+
+    async def _run_phase(self, concurrency, seconds, writer, stats, prefix, test_phase='steady'):
+        if seconds <= 0:
+            return
+        start_ns = time.perf_counter_ns()
+        deadline_ns = start_ns + int(seconds * 1e9)
+        workers = [self._worker(deadline_ns, writer, stats, test_phase) for _ in range(concurrency)]
+        await asyncio.gather(*workers)
+        self._log_phase('closed', concurrency, test_phase, start_ns, prefix)
+
+    async def _cooldown(self, mode, label, seconds, prefix):
+        """冷却阶段不发请求，只记录阶段起止时间供资源采样标注"""
+        logger.info(f"冷却阶段开始 ({seconds}秒)")
+        if seconds > 0:
+            start_ns = time.perf_counter_ns()
+            await asyncio.sleep(seconds)
+            self._log_phase(mode, label, 'cooldown', start_ns, prefix)
+        logger.info("冷却完成")
+
+    async def run_level(self, concurrency, test_duration, warmup_time, cooldown_time, prefix='concurrent_test'):
+        """执行单个并发量测试，返回 (结果文件, 统计, 开销)"""
+        logger.info(f"开始并发测试: {concurrency} 并发")
+        logger.info(f"测试参数: 并发={concurrency}, 持续={test_duration}s, 预热={warmup_time}s, 冷却={cooldown_time}s")
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        kinds = level_artifact_kinds(prefix)
+        result_file = data_path(artifact_base(self.output_dir, prefix, concurrency, timestamp, self.run_id),
+                                self.data_format)
+        stats_file = artifact_base(self.output_dir, kinds['stats'], concurrency, timestamp, self.run_id) + '.csv'
+        histogram_file = artifact_base(self.output_dir, kinds['histogram'], concurrency, timestamp,
+                                       self.run_id) + '.json'
+        writer = RecordWriter(result_file if self.raw_records else None)
+        stats = LevelStats()
+        meter = OverheadMeter()
+
+        try:
+            # 预热请求写入结果文件（标注 warmup）但不计入统计
+            logger.info(f"预热阶段开始 ({warmup_time}秒)")
+            await self._run_phase(concurrency, warmup_time, writer, None, prefix, 'warmup')
+            logger.info("预热完成")
+
+            logger.info(f"正式测试开始 ({test_duration}秒)")
+            connections_before = self._connections_opened()
+            meter.start()
+            self.inflight.reset()
+            timeline_rows = []
+            sampler = asyncio.ensure_future(self._sample_inflight(concurrency, timeline_rows))
+            self._start_live(stats_file, concurrency, histogram_file,
+                             {'mode': 'closed', 'latency': 'service_time', 'concurrency': concurrency})
+            try:
+                await self._run_phase(concurrency, test_duration, writer, stats, prefix)
+            finally:
+                sampler.cancel()
+                live = await self._stop_live({'achieved_concurrency': round(self.inflight.average, 3)})
+            stats.achieved_concurrency = self.inflight.average
+            stats.p99_time = live.cumulative.percentile(0.99)
+            stats.request_types = live.request_type_summary()
+            overhead = await meter.stop(stats.total)
+            if connections_before is not None:
+                overhead['connections_opened'] = self._connections_opened() - connections_before
+            logger.info("正式测试完成")
+        finally:
+            writer.close()
+
+        self._write_timeline(kinds['timeline'], concurrency, timestamp, timeline_rows)
+        logger.info(f"目标并发: {concurrency}, 实际平均在途请求: {stats.achieved_concurrency:.2f}")
+
+        await self._cooldown('closed', concurrency, cooldown_time, prefix)
+
+        self.write_final_report(result_file, concurrency, stats, overhead)
+        logger.info(f"延迟直方图: {histogram_file}")
+        logger.info(f"并发测试完成: {concurrency} 并发")
+        return result_file if self.raw_records else histogram_file, stats, overhead
+
+    def write_final_report(self, result_file, concurrency, stats, overhead):
+        """生成最终统计报告（含负载生成器开销）"""
+        report_file = f"{os.path.splitext(result_file)[0]}_report.txt"
+        logger.info(f"生成测试报告: {report_file}")
+
+        lines = [
+            "=== 并发测试报告 ===",
+            f"并发数: {concurrency}",
+            f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            "",
+            f"总请求数: {stats.total}",
+            f"成功请求: {stats.successful}",
+            f"失败请求: {stats.failed}",
+            f"成功率: {stats.success_rate:.2f}%",
+            "",
+            "响应时间统计 (成功请求):",
+            f"  最小值: {stats.min_time:.3f}秒",
+            f"  最大值: {stats.max_time:.3f}秒",
+            f"  平均值: {stats.avg_success_time:.3f}秒",
+            f"  P99: {stats.p99_time:.3f}秒",
+            f"  总平均: {stats.avg_time:.3f}秒",
+            "",
+            "性能指标:",
+            f"  测试时长: {stats.wall_time:.1f}秒",
+            f"  平均QPS: {stats.qps:.2f}",
+            f"  实际平均并发: {stats.achieved_concurrency:.2f} (目标 {concurrency})",
+            "",
+            "负载生成器开销 (正式测试阶段):",
+            f"  生成器 CPU: {overhead['generator_cpu_seconds']:.3f}秒 "
+            f"({overhead['generator_cpu_percent']:.2f}% 单核)",
+            f"  每请求生成器开销: {overhead['generator_cpu_us_per_request']:.1f}微秒",
+            f"  每请求客户端进程 CPU: {overhead['client_cpu_us_per_request']:.1f}微秒",
+            f"  事件循环最大延迟: {overhead['max_loop_lag_ms']:.2f}毫秒",
+        ]
+        if 'connections_opened' in overhead:
+            lines.append(f"  新建连接数: {overhead['connections_opened']} "
+                         f"(请求数 {overhead['requests']})")
+        lines += format_request_types(stats.request_types)
+        if self.abort_reason:
+            lines += ["", f"提前终止: {self.abort_reason}"]
+        with open(report_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        logger.info(f"生成器开销: {overhead['generator_cpu_us_per_request']:.1f}微秒/请求, "
+                    f"CPU {overhead['generator_cpu_percent']:.2f}%")
+        logger.info(f"报告已生成: {report_file}")
+        return report_file
+
+    @staticmethod
+    def arrival_offsets(rate, seconds, arrival='fixed', ramp_to=None):
+        """生成相对阶段起点的预定发送时间（秒），与响应快慢无关"""
+        offset = 0.0
+        while offset < seconds:
+            yield offset
+            if arrival == 'poisson':
+                offset += random.expovariate(rate)
+            elif arrival == 'ramp':
+                target = ramp_to if ramp_to is not None else rate
+                current_rate = rate + (target - rate) * offset / seconds
+                offset += 1.0 / max(current_rate, 1e-6)
+            else:
+                offset += 1.0 / rate
+
+    async def _open_loop_request(self, intended_ns, writer, stats, semaphore, test_phase):
+        """按预定时间发出一个请求；超过在途上限时排队，排队时间计入校正延迟"""
+        perf_counter_ns = time.perf_counter_ns
+        if semaphore is not None:
+            await semaphore.acquire()
+        try:
+            trace = self._new_trace()
+            start_ns = perf_counter_ns()
+            self.inflight.enter()
+            try:
+                response_code, error_msg, phases, request_type = await self.backend.request()
+            finally:
+                self.inflight.leave()
+            end_ns = perf_counter_ns()
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+        intended_time = self._to_epoch(intended_ns)
+        start_time = self._to_epoch(start_ns)
+        end_time = self._to_epoch(end_ns)
+        service_time = (end_ns - start_ns) / 1e9
+        writer.add((f"{start_time:.6f}", f"{end_time:.6f}", f"{service_time:.6f}", response_code, error_msg) +
+                   format_phases(phases) + (test_phase, request_type or '', trace.request_id) +
+                   (f"{intended_time:.6f}", f"{(end_ns - intended_ns) / 1e9:.6f}"))
+        if stats is not None:
+            stats.add(intended_time, start_time, end_time, response_code)
+        if self.live is not None:
+            # 开环模式的实时延迟取校正延迟（自预定发送时间起），服务时间另记附加直方图
+            self.live.add((end_ns - intended_ns) / 1e9, response_code, request_type)
+            if response_code == 200:
+                self.live.add_extra('service', service_time)
+            # 尾部请求按服务时间排序（与服务端日志对应），校正延迟另记
+            tail = self.live.tail
+            if tail is not None and (response_code != 200 or tail.is_slow(service_time)):
+                record = self._tail_record(trace, start_time, end_time, service_time, response_code, error_msg,
+                                           phases, request_type)
+                record['corrected_duration'] = round((end_ns - intended_ns) / 1e9, 6)
+                tail.add(service_time, response_code != 200, record)
+
+    async def _run_open_loop_phase(self, label, rate, seconds, arrival, ramp_to, writer, stats, semaphore,
+                                   test_phase='steady'):
+        if seconds <= 0:
+            return
+        perf_counter_ns = time.perf_counter_ns
+        phase_start_ns = perf_counter_ns()
+        pending = set()
+
+        for offset in self.arrival_offsets(rate, seconds, arrival, ramp_to):
+            if self.abort_reason is not None:
+                break
+            intended_ns = phase_start_ns + int(offset * 1e9)
+            delay = (intended_ns - perf_counter_ns()) / 1e9
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # 落后于预定时间时也让出事件循环，已创建的请求、实时统计与中止检查不会被连续补发的到达饿死
+                await asyncio.sleep(0)
+            if stats is not None:
+                stats.schedule(self._to_epoch(intended_ns))
+            task = asyncio.ensure_future(self._open_loop_request(intended_ns, writer, stats, semaphore, test_phase))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+        self._log_phase('open', label, test_phase, phase_start_ns, 'open_loop_test')
+
+    async def run_open_loop(self, rate, test_duration, warmup_time, cooldown_time,
+                            arrival='fixed', ramp_to=None, max_inflight=None):
+        """开环恒定到达率测试，返回 (结果文件, 统计, 开销)"""
+        label = f"{rate:g}" if arrival != 'ramp' else f"{rate:g}-{ramp_to:g}"
+        logger.info(f"开始开环测试: 到达率={label} req/s, 到达模式={arrival}")
+        logger.info(f"测试参数: 持续={test_duration}s, 预热={warmup_time}s, 冷却={cooldown_time}s, "
+                    f"在途上限={max_inflight or '无'}")
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        result_file = data_path(artifact_base(self.output_dir, 'open_loop_test', label, timestamp, self.run_id),
+                                self.data_format)
+        stats_file = artifact_base(self.output_dir, 'open_loop_stats', label, timestamp, self.run_id) + '.csv'
+        histogram_file = artifact_base(self.output_dir, 'open_loop_histogram', label, timestamp, self.run_id) + '.json'
+        writer = RecordWriter(result_file if self.raw_records else None, OPEN_LOOP_HEADER)
+        stats = OpenLoopStats()
+        meter = OverheadMeter()
+        semaphore = asyncio.Semaphore(max_inflight) if max_inflight else None
+
+        try:
+            logger.info(f"预热阶段开始 ({warmup_time}秒)")
+            await self._run_open_loop_phase(label, rate, warmup_time, 'fixed', None, writer, None, semaphore,
+                                            'warmup')
+            logger.info("预热完成")
+
+            logger.info(f"正式测试开始 ({test_duration}秒)")
+            connections_before = self._connections_opened()
+            meter.start()
+            self._start_live(stats_file, label, histogram_file,
+                             {'mode': 'open', 'latency': 'corrected', 'arrival': arrival})
+            try:
+                await self._run_open_loop_phase(label, rate, test_duration, arrival, ramp_to, writer, stats,
+                                                semaphore)
+            finally:
+                live = await self._stop_live({'offered': stats.offered, 'offered_rps': round(stats.offered_rps, 3),
+                                       'achieved_rps': round(stats.achieved_rps, 3),
+                                       'max_schedule_lag': round(stats.max_schedule_lag, 6)})
+            stats.request_types = live.request_type_summary()
+            overhead = await meter.stop(stats.completed)
+            if connections_before is not None:
+                overhead['connections_opened'] = self._connections_opened() - connections_before
+            logger.info("正式测试完成")
+        finally:
+            writer.close()
+
+        await self._cooldown('open', label, cooldown_time, 'open_loop_test')
+
+        self.write_open_loop_report(result_file, label, arrival, stats, overhead)
+        return result_file if self.raw_records else histogram_file, stats, overhead
+
+    def write_open_loop_report(self, result_file, label, arrival, stats, overhead):
+        """生成开环测试报告：请求负载、实际吞吐与校正分位数并列展示"""
+        report_file = f"{os.path.splitext(result_file)[0]}_report.txt"
+        pct = stats.percentiles()
+
+        lines = [
+            "=== 开环测试报告 ===",
+            f"目标到达率: {label} req/s ({arrival})",
+            f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            "",
+            f"计划请求数: {stats.offered}",
+            f"完成请求数: {stats.completed}",
+            f"成功率: {stats.success_rate:.2f}%",
+            "",
+            f"请求负载 (offered): {stats.offered_rps:.2f} req/s",
+            f"实际吞吐 (achieved): {stats.achieved_rps:.2f} req/s",
+            f"最大调度滞后: {stats.max_schedule_lag * 1000:.2f}毫秒",
+            "",
+            "延迟分位数 (成功请求):   服务时间   校正延迟(自预定发送时间)",
+        ]
+        for q in (0.50, 0.95, 0.99):
+            lines.append(f"  P{int(q * 100):<3}                 {pct[('service', q)]:8.3f}秒   "
+                         f"{pct[('corrected', q)]:8.3f}秒")
+        lines += [
+            "",
+            "负载生成器开销 (正式测试阶段):",
+            f"  每请求生成器开销: {overhead['generator_cpu_us_per_request']:.1f}微秒",
+            f"  事件循环最大延迟: {overhead['max_loop_lag_ms']:.2f}毫秒",
+        ]
+        if 'connections_opened' in overhead:
+            lines.append(f"  新建连接数: {overhead['connections_opened']} "
+                         f"(请求数 {overhead['requests']})")
+        lines += format_request_types(stats.request_types)
+        if self.abort_reason:
+            lines += ["", f"提前终止: {self.abort_reason}"]
+        with open(report_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        summary_file = os.path.join(self.output_dir, 'open_loop_summary.csv')
+        new_file = not os.path.exists(summary_file)
+        with open(summary_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(OPEN_LOOP_SUMMARY_HEADER)
+            writer.writerow([
+                label, arrival, f"{stats.offered_rps:.2f}", f"{stats.achieved_rps:.2f}",
+                f"{stats.success_rate:.2f}",
+                f"{pct[('service', 0.50)]:.6f}", f"{pct[('service', 0.95)]:.6f}", f"{pct[('service', 0.99)]:.6f}",
+                f"{pct[('corrected', 0.50)]:.6f}", f"{pct[('corrected', 0.95)]:.6f}",
+                f"{pct[('corrected', 0.99)]:.6f}", f"{stats.max_schedule_lag:.6f}"
+            ])
+
+        logger.info(f"开环测试完成: 请求负载 {stats.offered_rps:.2f} req/s, 实际吞吐 {stats.achieved_rps:.2f} req/s, "
+                    f"校正 P99 {pct[('corrected', 0.99)]:.3f}秒 (服务时间 P99 {pct[('service', 0.99)]:.3f}秒)")
+        logger.info(f"报告已生成: {report_file}")
+        return report_file
+
+    async def batch_test(self, levels, test_duration, warmup_time, cooldown_time, recovery_time):
+        """批量测试多个并发量"""
+        logger.info("开始批量并发测试")
+        logger.info(f"并发量级别: {' '.join(str(c) for c in levels)}")
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        batch_summary = os.path.join(self.output_dir, f"batch_test_summary_{timestamp}.csv")
+        with open(batch_summary, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(BATCH_SUMMARY_HEADER)
+
+        for concurrency in levels:
+            logger.info(f"执行 {concurrency} 并发测试...")
+            _, stats, _ = await self.run_level(concurrency, test_duration, warmup_time, cooldown_time)
+
+            with open(batch_summary, 'a', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow([
+                    concurrency, stats.total, stats.successful, stats.failed,
+                    f"{stats.success_rate:.2f}", f"{stats.avg_success_time:.3f}",
+                    f"{stats.max_time:.3f}", f"{stats.qps:.2f}"
+                ])
+
+            if self.abort_reason:
+                break
+            logger.info("等待系统恢复...")
+            await asyncio.sleep(recovery_time)
+
+        logger.info(f"批量测试完成，摘要文件: {batch_summary}")
+        return batch_summary
+
+    async def stress_test(self, max_concurrency, step, duration_per_step, error_rate_threshold):
+        """压力测试（逐步增加并发）"""
+        logger.info(f"开始压力测试: 最大并发={max_concurrency}, 步长={step}")
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        stress_result = os.path.join(self.output_dir, f"stress_test_{timestamp}.csv")
+        with open(stress_result, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(STRESS_HEADER)
+
+        for concurrency in range(step, max_concurrency + 1, step):
+            logger.info(f"压力测试: {concurrency} 并发")
+            _, stats, _ = await self.run_level(concurrency, duration_per_step, 0, 0, prefix='stress_detail')
+
+            with open(stress_result, 'a', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow([
+                    concurrency, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    f"{stats.total / duration_per_step:.2f}", f"{stats.avg_success_time:.3f}",
+                    f"{stats.error_rate:.2f}"
+                ])
+
+            if stats.error_rate > error_rate_threshold:
+                logger.info(f"错误率过高 ({stats.error_rate:.2f}%)，停止压力测试")
+                break
+            if self.abort_reason:
+                break
+
+        logger.info(f"压力测试完成: {stress_result}")
+        return stress_result
+
+
+def build_backend(config, args):
+    """根据配置与命令行参数构建请求后端（exec: 执行 kbs-client；rcar: 进程内客户端）"""
+    test_config = config.get('test_configuration', {})
+    timeout = args.timeout or test_config.get('timeout_seconds', 30)
+    backend = args.backend or test_config.get('backend', 'exec')
+    # 混合场景由进程内客户端执行，指定场景时隐含 rcar 后端
+    scenario_name = args.scenario or test_config.get('scenario')
+
+    if backend == 'rcar' or scenario_name:
+        rcar_config = config.get('rcar_client', {})
+        evidence = None
+        evidence_file = args.evidence_file or rcar_config.get('evidence_file')
+        if evidence_file:
+            with open(evidence_file, 'r', encoding='utf-8') as f:
+                evidence = f.read()
+        reuse = rcar_config.get('reuse_connections', True) and not args.fresh_connections
+        options = dict(
+            resource_path=args.resource_path or rcar_config.get('resource_path', 'default/key/1'),
+            pool_size=args.pool_size if args.pool_size is not None else rcar_config.get('pool_size', 0),
+            reuse_connections=reuse,
+            tee=rcar_config.get('tee', 'sample'),
+            evidence=evidence
+        )
+        base_url = args.base_url or test_config.get('base_url', 'http://127.0.0.1:8081/api')
+        if scenario_name:
+            scenario = load_scenario(config, scenario_name, args.scenario_file)
+            flows = ', '.join(f"{flow['name']}({flow.get('weight', 1)})" for flow in scenario['flows'])
+            logger.info(f"混合负载场景: {scenario_name}，流程(权重): {flows}")
+            return ScenarioBackend(scenario, base_url, timeout, **options)
+        return RcarBackend(base_url, timeout, flow=args.flow or rcar_config.get('flow', 'attest'), **options)
+
+    command = args.command or test_config.get(
+        'test_command', 'kbs-client --url http://127.0.0.1:8081/api attest')
+    return ExecBackend(command, timeout)
+
+
+def build_generator(config, args):
+    test_config = config.get('test_configuration', {})
+    think_time = args.think_time
+    if think_time is None:
+        think_time = test_config.get('think_time_seconds', 0)
+    stats_interval = args.stats_interval or test_config.get('stats_interval_seconds', STATS_INTERVAL)
+    raw_records = test_config.get('raw_records', True) and not args.no_raw
+    requested_format = args.data_format or config.get('output', {}).get('file_formats', {}).get('data', 'csv')
+    data_format = resolve_format(requested_format)
+    if data_format != requested_format.lower():
+        logger.warning("未安装 pyarrow，原始记录回退为 CSV 格式（pip3 install pyarrow 启用 Parquet）")
+    return LoadGenerator(build_backend(config, args), args.output_dir, config,
+                         think_time=think_time, think_distribution=args.think_distribution,
+                         stats_interval=stats_interval, live_echo=args.live, raw_records=raw_records,
+                         data_format=data_format, run_id=args.run_id)
+
+
+def add_common_arguments(parser, log_file=DEFAULT_LOG_FILE):
+    """请求后端与统计输出的公共选项（负载生成器与分布式协调器/代理共用）"""
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='测试配置文件路径')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='原始数据输出目录')
+    parser.add_argument('--log-file', default=log_file, help='日志文件路径')
+    parser.add_argument('--run-id', type=check_run_id,
+                        help='运行标识，写入各数据文件名；报告以 --run-id 只读取该次运行的文件（如 run_performance_test.sh 的测试名称）')
+    parser.add_argument('--command', help='覆盖配置中的测试命令')
+    parser.add_argument('--timeout', type=float, help='单个请求超时时间（秒）')
+    parser.add_argument('--backend', choices=['exec', 'rcar'],
+                        help='请求后端：exec 执行 kbs-client 命令，rcar 使用进程内 RCAR 客户端')
+    parser.add_argument('--base-url', help='rcar 后端的 KBS 地址（默认取配置 base_url）')
+    parser.add_argument('--flow', choices=['attest', 'resource'],
+                        help='rcar 后端流程：attest 为 auth+attest，resource 额外获取一次资源')
+    parser.add_argument('--resource-path', help='resource 流程获取的资源路径，如 default/key/1')
+    parser.add_argument('--pool-size', type=int, help='rcar 后端连接池上限，0 表示不限制')
+    parser.add_argument('--fresh-connections', action='store_true',
+                        help='rcar 后端每个 HTTP 请求使用新连接（用于与连接复用对比）')
+    parser.add_argument('--evidence-file', help='rcar 后端提交的样例证据文件，默认生成 sample TEE 证据')
+    parser.add_argument('--scenario', help='混合负载场景名（配置 scenarios 段），按权重混合请求类型并分类型统计；隐含 rcar 后端')
+    parser.add_argument('--scenario-file', help='从该 JSON 文件的 scenarios 段读取场景，默认取测试配置')
+    parser.add_argument('--think-time', type=float,
+                        help='虚拟用户两次请求之间的思考时间（秒），为 0 时请求完成后立即发出下一个')
+    parser.add_argument('--think-distribution', choices=['fixed', 'exponential'], default='fixed',
+                        help='思考时间分布：固定值或以 --think-time 为均值的指数分布')
+    parser.add_argument('--stats-interval', type=float,
+                        help=f'实时统计窗口（秒），默认取配置 stats_interval_seconds 或 {STATS_INTERVAL:g}')
+    parser.add_argument('--stats-port', type=int,
+                        help='在 127.0.0.1 上提供实时统计 HTTP/JSON 端点（GET /stats，POST /stop 提前结束）')
+    parser.add_argument('--live', action='store_true', help='每个统计窗口在终端（stderr）输出一行 QPS/错误率/分位数')
+    parser.add_argument('--no-raw', action='store_true',
+                        help='不写逐请求原始记录，只输出统计、报告与延迟直方图（适合数小时的长时间测试）')
+    parser.add_argument('--data-format', choices=DATA_FORMATS,
+                        help='逐请求原始记录格式，默认取配置 output.file_formats.data（parquet 需 pyarrow）')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Trustee Service 异步并发测试')
+    add_common_arguments(parser)
+
+    subparsers = parser.add_subparsers(dest='mode')
+
+    single = subparsers.add_parser('single', help='单个并发量测试')
+    single.add_argument('concurrency', type=int, nargs='?', default=10, help='并发数')
+    single.add_argument('duration', type=int, nargs='?', help='持续时间（秒）')
+    single.add_argument('warmup', type=int, nargs='?', help='预热时间（秒）')
+    single.add_argument('cooldown', type=int, nargs='?', help='冷却时间（秒）')
+
+    batch = subparsers.add_parser('batch', help='批量测试多个并发量')
+    batch.add_argument('duration', type=int, nargs='?', help='单次持续时间（秒）')
+
+    stress = subparsers.add_parser('stress', help='压力测试')
+    stress.add_argument('max_concurrency', type=int, nargs='?', default=100, help='最大并发')
+    stress.add_argument('step', type=int, nargs='?', default=5, help='步长')
+    stress.add_argument('duration', type=int, nargs='?', default=60, help='每步持续时间（秒）')
+
+    rate = subparsers.add_parser('rate', help='开环恒定到达率测试（校正协调遗漏）')
+    rate.add_argument('rate', type=float, help='目标到达率（请求/秒）；ramp 模式下为起始到达率')
+    rate.add_argument('duration', type=int, nargs='?', help='持续时间（秒）')
+    rate.add_argument('warmup', type=int, nargs='?', help='预热时间（秒）')
+    rate.add_argument('cooldown', type=int, nargs='?', help='冷却时间（秒）')
+    rate.add_argument('--arrival', choices=['fixed', 'poisson', 'ramp'], default='fixed',
+                      help='到达模式：固定间隔、泊松到达或线性爬升')
+    rate.add_argument('--ramp-to', type=float, help='ramp 模式的结束到达率（请求/秒）')
+    rate.add_argument('--max-inflight', type=int, help='在途请求上限，超出的请求排队（排队时间计入校正延迟）')
+
+    search = subparsers.add_parser('search', help='自适应容量搜索：找出满足 thresholds 的最大并发量或到达率')
+    search.add_argument('lower', type=float, nargs='?', help='搜索下限（默认取配置 capacity_search）')
+    search.add_argument('upper', type=float, nargs='?', help='搜索上限（默认取配置 capacity_search）')
+    search.add_argument('--open-loop', action='store_true', help='搜索开环到达率（req/s），默认搜索闭环并发量')
+    search.add_argument('--probe-seconds', type=int, help='倍增与二分阶段每个级别的测试时长（秒）')
+    search.add_argument('--confirm-seconds', type=int, help='确认阶段的测试时长（秒），默认取配置 capacity_search')
+    search.add_argument('--resolution', type=float, help='二分停止时区间宽度占下界的百分比')
+
+    soak = subparsers.add_parser('soak', help='长稳测试：以固定并发量或到达率持续数小时，只保留滚动统计与直方图')
+    soak.add_argument('load', type=float, nargs='?', help='并发量（--open-loop 时为到达率 req/s），默认取配置 soak')
+    soak.add_argument('duration', type=float, nargs='?', help='正式测试时长（分钟），默认取配置 soak.duration_minutes')
+    soak.add_argument('--open-loop', action='store_true', help='以开环到达率施压，默认闭环并发量')
+    soak.add_argument('--arrival', choices=['fixed', 'poisson'], default='poisson', help='开环到达模式')
+
+    # 与原 shell 脚本保持一致：不带子命令时执行 single
+    if not any(arg in subparsers.choices for arg in argv):
+        argv = list(argv) + ['single']
+    return parser.parse_args(argv)
+
+
+async def run(args, config):
+    durations = config.get('test_duration', {})
+    # search 模式的各阶段时长取 capacity_search 配置，没有 duration 参数
+    duration = getattr(args, 'duration', None)
+    duration = duration if duration is not None else durations.get('steady_state_seconds', 120)
+    generator = build_generator(config, args)
+    server = None
+    if args.stats_port is not None:
+        server = await StatsServer('127.0.0.1', args.stats_port, generator.live_snapshot, generator.abort).start()
+        logger.info(f"实时统计端点: http://127.0.0.1:{server.port}/stats")
+    try:
+        return await run_mode(generator, args, config, durations, duration)
+    finally:
+        if server is not None:
+            server.close()
+        generator.backend.close()
+
+
+async def run_mode(generator, args, config, durations, duration):
+    if args.mode == 'single':
+        warmup = args.warmup if args.warmup is not None else durations.get('warmup_seconds', 30)
+        cooldown = args.cooldown if args.cooldown is not None else durations.get('cooldown_seconds', 30)
+        result_file, _, _ = await generator.run_level(args.concurrency, duration, warmup, cooldown)
+        return result_file
+
+    if args.mode == 'rate':
+        if args.arrival == 'ramp' and args.ramp_to is None:
+            raise SystemExit("错误: ramp 模式需要指定 --ramp-to")
+        warmup = args.warmup if args.warmup is not None else durations.get('warmup_seconds', 30)
+        cooldown = args.cooldown if args.cooldown is not None else durations.get('cooldown_seconds', 30)
+        result_file, _, _ = await generator.run_open_loop(
+            args.rate, duration, warmup, cooldown,
+            arrival=args.arrival, ramp_to=args.ramp_to, max_inflight=args.max_inflight
+        )
+        return result_file
+
+    if args.mode == 'search':
+        settings = search_settings(config)
+        for key, value in (('probe_seconds', args.probe_seconds), ('confirm_seconds', args.confirm_seconds),
+                           ('resolution_percent', args.resolution)):
+            if value is not None:
+                settings[key] = value
+        search = CapacitySearch(generator, config, 'open' if args.open_loop else 'closed',
+                                args.lower, args.upper, settings)
+        summary = await search.run()
+        summary_file = write_search_results(generator.output_dir, summary)
+        unit = '并发' if summary['mode'] == 'closed' else 'req/s'
+        if summary['capacity'] is not None:
+            logger.info(f"容量搜索完成: 满足 SLO 的最大级别 {summary['capacity']:g} {unit}, "
+                        f"QPS {summary['capacity_qps']:.2f}, 耗时 {summary['elapsed_seconds'] / 60:.1f} 分钟")
+        elif summary['best_probe_level'] is not None:
+            logger.warning(f"容量搜索未能以完整时长确认，短时探测通过的最大级别 {summary['best_probe_level']:g} {unit}"
+                           f"{'（' + summary['stop_reason'] + '）' if summary['stop_reason'] else ''}")
+        else:
+            logger.warning(f"容量搜索未找到满足 SLO 的级别"
+                           f"{'（' + summary['stop_reason'] + '）' if summary['stop_reason'] else ''}")
+        logger.info(f"搜索结果: {summary_file}")
+        return summary_file
+
+    if args.mode == 'soak':
+        return await run_soak(generator, args, config, durations)
+
+    if args.mode == 'batch':
+        levels = config.get('concurrency_levels', [5, 10, 15, 20, 25, 30, 40, 50, 60, 70, 80, 90, 100])
+        return await generator.batch_test(
+            levels, duration,
+            durations.get('warmup_seconds', 30),
+            durations.get('cooldown_seconds', 30),
+            durations.get('recovery_between_tests_seconds', 60)
+        )
+
+    threshold = config.get('safety', {}).get('error_rate_threshold_percent', 50)
+    return await generator.stress_test(args.max_concurrency, args.step, duration, threshold)
+
+
+async def run_soak(generator, args, config, durations):
+    """长稳测试：不写逐请求原始记录，统计窗口取 soak.stats_interval_seconds，
+    直方图窗口超过 soak.max_histogram_windows 时逐级合并，内存占用与测试时长无关"""
+    settings = config.get('soak', {})
+    minutes = args.duration if args.duration is not None else settings.get('duration_minutes', 240)
+    generator.raw_records = settings.get('raw_records', False) and not args.no_raw
+    generator.max_windows = settings.get('max_histogram_windows', 720)
+    if args.stats_interval is None:
+        generator.stats_interval = settings.get('stats_interval_seconds', 60)
+    warmup = settings.get('warmup_seconds', durations.get('warmup_seconds', 30))
+    seconds = int(minutes * 60)
+    logger.info(f"长稳测试: 时长 {minutes:g} 分钟, 统计窗口 {generator.stats_interval:g} 秒, "
+                f"直方图窗口上限 {generator.max_windows}")
+    if args.open_loop:
+        rate = args.load if args.load is not None else settings.get('rate', 50)
+        result_file, _, _ = await generator.run_open_loop(rate, seconds, warmup, 0, arrival=args.arrival)
+    else:
+        concurrency = int(args.load if args.load is not None else settings.get('concurrency', 20))
+        result_file, _, _ = await generator.run_level(concurrency, seconds, warmup, 0)
+    return result_file
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    config = load_config(args.config)
+    setup_logging(args.log_file)
+
+    try:
+        result = asyncio.run(run(args, config))
+    except KeyboardInterrupt:
+        logger.info("测试被中断")
+        sys.exit(130)
+    except ScenarioError as e:
+        logger.error(f"场景配置错误: {e}")
+        sys.exit(2)
+
+    print(result)
+
+
+if __name__ == '__main__':
+    main()
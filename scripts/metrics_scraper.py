@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+服务端指标抓取器
+作者: AI Assistant
+用途: 按资源采样间隔轮询 trustee 服务（或 sidecar）暴露的 Prometheus 文本 / JSON 指标端点，
+      样本以 epoch 秒写入 server_metrics_<测试名>.csv（或 .parquet），与请求记录、资源采样同一时间轴；
+      报告据此由服务端直方图的增量计算处理耗时、排队耗时与下游调用耗时，与客户端测得的延迟对比
+"""
+
+import os
+import sys
+import argparse
+import json
+import logging
+import math
+import re
+import signal
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_FORMATS, data_path, open_table, resolve_format
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+DEFAULT_CONFIG = os.path.join(PROJECT_ROOT, 'config', 'test_config.json')
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'results', 'raw_data')
+DEFAULT_LOG_FILE = os.path.join(PROJECT_ROOT, 'results', 'logs', 'resource_monitor.log')
+
+# 长表：每个指标样本一行，labels 为按名称排序的 Prometheus 标签串（直方图桶含 le）
+SERVER_METRICS_HEADER = ['timestamp', 'endpoint', 'metric', 'labels', 'value', 'epoch_time']
+DEFAULT_TIMEOUT = 2.0
+# 缓冲行数超过该值或距上次写盘超过 FLUSH_INTERVAL 秒时写盘
+FLUSH_ROWS = 5000
+FLUSH_INTERVAL = 5.0
+# 延迟序列的角色：processing 为服务端处理耗时，queueing 为服务端显式计量的排队耗时，
+# downstream 为服务端调用其他服务（如 kbs → grpc-as / rvps）的耗时，包含在 processing 之内
+SERIES_ROLES = ('processing', 'queueing', 'downstream')
+
+SAMPLE_PATTERN = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)(?:\s+-?\d+)?$')
+LABEL_PATTERN = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"((?:[^"\\]|\\.)*)"')
+
+logger = logging.getLogger('metrics_scraper')
+
+
+def load_config(config_path):
+    """读取测试配置文件，不存在时返回空配置"""
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def setup_logging(log_file):
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    formatter = logging.Formatter('[%(asctime)s] %(message)s', '%Y-%m-%d %H:%M:%S')
+    for handler in (logging.FileHandler(log_file, encoding='utf-8'), logging.StreamHandler(sys.stderr)):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+
+def parse_labels(text):
+    return {name: value for name, value in LABEL_PATTERN.findall(text or '')}
+
+
+def parse_prometheus(text):
+    """Prometheus 文本格式，返回 [(指标名, 标签串, 值)]；注释与无法解析的行跳过"""
+    samples = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = SAMPLE_PATTERN.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        try:
+            value = float(value)
+        except ValueError:
+            continue
+        samples.append((name, format_labels(parse_labels(labels)), value))
+    return samples
+
+
+def parse_json(text):
+    """JSON 指标：嵌套对象按 . 连接为指标名，数组元素以下标连接；只保留数值（不含布尔值）"""
+    samples = []
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(f"{prefix}.{key}" if prefix else str(key), item)
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                walk(f"{prefix}.{index}", item)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            samples.append((prefix, '', float(value)))
+
+    walk('', json.loads(text))
+    return samples
+
+
+# 端点格式与解析函数；新的指标格式在此注册即可被配置引用
+PARSERS = {
+    'prometheus': parse_prometheus,
+    'json': parse_json
+}
+
+
+def server_metrics_settings(config):
+    """配置 server_metrics 段：endpoints 为抓取端点，series 为报告中对比的服务端延迟直方图与仪表盘指标"""
+    settings = {'timeout_seconds': DEFAULT_TIMEOUT, 'interval_seconds': None, 'endpoints': [], 'series': []}
+    settings.update(config.get('server_metrics', {}))
+    return settings
+
+
+class MetricsScraper:
+    """并行轮询各指标端点，每轮样本使用同一采样时刻"""
+
+    def __init__(self, endpoints, interval=1.0, timeout=DEFAULT_TIMEOUT):
+        for endpoint in endpoints:
+            if endpoint.get('format', 'prometheus') not in PARSERS:
+                raise ValueError(f"端点 {endpoint.get('name')} 的格式 {endpoint.get('format')} 不支持"
+                                 f"（可选 {', '.join(PARSERS)}）")
+        self.endpoints = endpoints
+        self.interval = interval
+        self.timeout = timeout
+        self._stopped = False
+        # 各端点当前是否不可达，只在状态变化时记录日志
+        self._failing = {}
+
+    def stop(self, *_):
+        self._stopped = True
+
+    def fetch(self, endpoint):
+        """抓取并解析一个端点，metrics 非空时只保留以其中任一前缀开头的指标；失败返回 None"""
+        name = endpoint['name']
+        try:
+            request = urllib.request.Request(endpoint['url'], headers=endpoint.get('headers', {}))
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read().decode('utf-8', 'replace')
+            samples = PARSERS[endpoint.get('format', 'prometheus')](body)
+        except (OSError, ValueError) as e:
+            if not self._failing.get(name):
+                logger.warning(f"指标端点 {name} 抓取失败: {e}")
+            self._failing[name] = True
+            return None
+        if self._failing.get(name):
+            logger.info(f"指标端点 {name} 已恢复")
+        self._failing[name] = False
+        prefixes = tuple(endpoint.get('metrics', []))
+        if prefixes:
+            samples = [sample for sample in samples if sample[0].startswith(prefixes)]
+        return samples
+
+    def run(self, data_file, duration):
+        """抓取 duration 秒（None 表示直到收到停止信号），返回抓取轮数"""
+        os.makedirs(os.path.dirname(data_file), exist_ok=True)
+        start = time.perf_counter()
+        deadline = start + duration if duration else None
+        # perf_counter 与墙钟时间的锚点，与负载生成器、资源采样器相同的换算方式
+        epoch_anchor = time.time() - start
+        rounds = 0
+        buffer = []
+        last_flush = start
+
+        writer = open_table(data_file, SERVER_METRICS_HEADER)
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.endpoints)) as pool:
+                next_tick = start
+                while not self._stopped and (deadline is None or next_tick <= deadline):
+                    delay = next_tick - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_tick += self.interval
+
+                    # 采样时刻取发出请求的时刻，各端点并行抓取
+                    now = time.perf_counter()
+                    epoch = f"{epoch_anchor + now:.3f}"
+                    timestamp = datetime.fromtimestamp(epoch_anchor + now).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+                    for endpoint, samples in zip(self.endpoints, pool.map(self.fetch, self.endpoints)):
+                        if samples:
+                            buffer.extend([timestamp, endpoint['name'], metric, labels, value, epoch]
+                                          for metric, labels, value in samples)
+                    rounds += 1
+
+                    if len(buffer) >= FLUSH_ROWS or now - last_flush >= FLUSH_INTERVAL:
+                        writer.write_rows(buffer)
+                        writer.flush()
+                        buffer.clear()
+                        last_flush = now
+            writer.write_rows(buffer)
+        finally:
+            writer.close()
+        return rounds
+
+
+def counter_increase(values):
+    """计数器在区间内的增量：逐点差分只累加非负部分，服务重启导致的计数器归零不产生负增量"""
+    diffs = np.diff(np.asarray(values, dtype='float64'))
+    return float(diffs[diffs > 0].sum())
+
+
+def bucket_quantile(q, bounds, counts):
+    """由累积桶（上界升序，最后一个为 +Inf）按桶内线性插值估计分位数，与 Prometheus histogram_quantile 相同"""
+    if not counts or counts[-1] <= 0:
+        return math.nan
+    rank = q * counts[-1]
+    index = next(i for i, count in enumerate(counts) if count >= rank)
+    if math.isinf(bounds[index]):
+        # 落在 +Inf 桶时只能给出最大有限上界
+        return bounds[index - 1] if index > 0 else math.nan
+    lower = bounds[index - 1] if index > 0 else 0.0
+    previous = counts[index - 1] if index > 0 else 0.0
+    in_bucket = counts[index] - previous
+    if in_bucket <= 0:
+        return bounds[index]
+    return lower + (bounds[index] - lower) * (rank - previous) / in_bucket
+
+
+def _select(frame, metric, labels):
+    """指标名为 metric、标签包含 labels 的样本，同一时刻的多个标签组合（如各路径）求和"""
+    rows = frame[frame['metric'] == metric]
+    if labels and not rows.empty:
+        parsed = rows['labels'].map(parse_labels)
+        rows = rows[parsed.map(lambda item: all(item.get(key) == value for key, value in labels.items()))]
+    return rows
+
+
+def summarize_histogram(frame, metric, labels=None):
+    """服务端直方图 metric（_bucket/_sum/_count）在采样区间内的增量统计：
+
+    返回 {'count', 'sum', 'seconds', 'rate', 'mean', 'p50', 'p95', 'p99', 'intervals'}，
+    intervals 为逐采样区间的 (epoch_time, 每秒次数, 平均耗时) 表；样本不足两个时返回 None
+    """
+    counts = _select(frame, f"{metric}_count", labels).groupby('epoch_time')['value'].sum().sort_index()
+    sums = _select(frame, f"{metric}_sum", labels).groupby('epoch_time')['value'].sum().sort_index()
+    if len(counts) < 2 or len(sums) < 2:
+        return None
+    count = counter_increase(counts.to_numpy())
+    total = counter_increase(sums.to_numpy())
+    seconds = float(counts.index[-1] - counts.index[0])
+
+    buckets = _select(frame, f"{metric}_bucket", labels)
+    bounds, cumulative = [], []
+    if not buckets.empty:
+        buckets = buckets.assign(le=buckets['labels'].map(lambda text: float(parse_labels(text).get('le', 'nan'))))
+        table = buckets.groupby(['le', 'epoch_time'])['value'].sum().unstack('le').sort_index()
+        table = table[sorted(column for column in table.columns if not math.isnan(column))]
+        bounds = list(table.columns)
+        cumulative = [counter_increase(table[bound].dropna().to_numpy()) for bound in bounds]
+
+    delta_count = counts.diff().clip(lower=0)
+    delta_sum = sums.reindex(counts.index).diff().clip(lower=0)
+    elapsed = pd.Series(counts.index, index=counts.index).diff()
+    intervals = pd.DataFrame({
+        'epoch_time': counts.index[1:],
+        'rate': (delta_count / elapsed).iloc[1:].to_numpy(),
+        'mean': (delta_sum / delta_count.where(delta_count > 0)).iloc[1:].to_numpy()
+    })
+    p50, p95, p99 = (bucket_quantile(q, bounds, cumulative) for q in (0.50, 0.95, 0.99))
+    return {
+        'count': count,
+        'sum': total,
+        'seconds': seconds,
+        'rate': count / seconds if seconds > 0 else 0,
+        'mean': total / count if count > 0 else math.nan,
+        'p50': p50,
+        'p95': p95,
+        'p99': p99,
+        'intervals': intervals
+    }
+
+
+def summarize_gauge(frame, metric, labels=None):
+    """仪表盘指标（如队列深度、在途请求数）：同一时刻各标签组合求和后的均值、最大值与逐采样序列"""
+    values = _select(frame, metric, labels).groupby('epoch_time')['value'].sum().sort_index()
+    if values.empty:
+        return None
+    return {'avg': float(values.mean()), 'max': float(values.max()),
+            'series': pd.DataFrame({'epoch_time': values.index, 'value': values.to_numpy()})}
+
+
+def scrape(args, config):
+    """抓取指定时长，输出 server_metrics_<test_name>.csv（或 .parquet）；未配置端点时直接返回"""
+    settings = server_metrics_settings(config)
+    endpoints = [endpoint for endpoint in settings['endpoints'] if endpoint.get('url')]
+    if not endpoints:
+        return 0
+    interval = args.interval or settings['interval_seconds'] or \
+        config.get('monitoring', {}).get('sample_interval_seconds', 1)
+    requested_format = args.data_format or config.get('output', {}).get('file_formats', {}).get('data', 'csv')
+    data_format = resolve_format(requested_format)
+    data_file = data_path(os.path.join(args.output_dir, f"server_metrics_{args.test_name}"), data_format)
+    logger.info(f"开始抓取服务端指标: {args.test_name}, 端点: "
+                f"{', '.join(endpoint['name'] for endpoint in endpoints)}, 间隔: {interval}秒")
+    logger.info(f"输出文件: {data_file}")
+
+    scraper = MetricsScraper(endpoints, interval, settings['timeout_seconds'])
+    signal.signal(signal.SIGTERM, scraper.stop)
+    signal.signal(signal.SIGINT, scraper.stop)
+    rounds = scraper.run(data_file, args.duration)
+    logger.info(f"服务端指标抓取完成: {args.test_name}, 抓取轮数: {rounds}")
+    return 0
+
+
+def show(args):
+    """抓取一次并打印解析结果，用于核对端点格式与指标名"""
+    scraper = MetricsScraper([{'name': 'endpoint', 'url': args.url, 'format': args.format}], timeout=args.timeout)
+    samples = scraper.fetch(scraper.endpoints[0])
+    if samples is None:
+        return 1
+    for metric, labels, value in samples:
+        print(f"{metric}{{{labels}}} {value:g}" if labels else f"{metric} {value:g}")
+    return 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Trustee Service 服务端指标抓取器（Prometheus 文本 / JSON）')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='测试配置文件路径')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='原始数据输出目录')
+    parser.add_argument('--log-file', default=DEFAULT_LOG_FILE, help='日志文件路径')
+    parser.add_argument('--interval', type=float,
+                        help='抓取间隔（秒），默认取配置 server_metrics.interval_seconds 或资源采样间隔')
+    parser.add_argument('--data-format', choices=DATA_FORMATS,
+                        help='指标数据格式，默认取配置 output.file_formats.data（parquet 需 pyarrow）')
+
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+    scrape_parser = subparsers.add_parser('scrape', help='按配置 server_metrics.endpoints 抓取指定时长')
+    scrape_parser.add_argument('test_name', nargs='?', default='default', help='测试名称（与资源采样相同）')
+    scrape_parser.add_argument('duration', type=float, nargs='?', default=120, help='抓取时长（秒），0 表示直到收到停止信号')
+    show_parser = subparsers.add_parser('show', help='抓取一次并打印解析出的指标')
+    show_parser.add_argument('url', help='指标端点地址')
+    show_parser.add_argument('--format', choices=sorted(PARSERS), default='prometheus', help='端点格式')
+    show_parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='请求超时（秒）')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.mode == 'show':
+        sys.exit(show(args))
+    config = load_config(args.config)
+    setup_logging(args.log_file)
+    sys.exit(scrape(args, config))
+
+
+if __name__ == '__main__':
+    main()
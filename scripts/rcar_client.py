@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+KBS RCAR 协议进程内客户端
+作者: AI Assistant
+用途: 以连接池复用 keep-alive HTTP 连接执行 auth → attest → resource 流程，替代逐请求 exec kbs-client
+"""
+
+import asyncio
+import base64
+import contextvars
+import hashlib
+import json
+import ssl
+import time
+from urllib.parse import urlsplit
+
+# KBS 协议路径（相对 base_url）
+KBS_AUTH_PATH = '/kbs/v0/auth'
+KBS_ATTEST_PATH = '/kbs/v0/attest'
+KBS_RESOURCE_PATH = '/kbs/v0/resource/'
+KBS_SESSION_COOKIE = 'kbs-session-id'
+
+# 每个请求记录的协议阶段耗时（秒）：建连、TLS 握手、/auth、/attest（含 token 签发）、/resource
+PHASE_NAMES = ('connect', 'tls', 'auth', 'attest', 'resource')
+
+# 样例 TEE 公钥（仅用于压测加密响应，对应私钥未保存）
+SAMPLE_TEE_PUBKEY = {
+    'kty': 'RSA',
+    'alg': 'RSA1_5',
+    'n': ('5_qv4pidrba78qnG8ywOqsPq8e3lZ8Keijg3GxCxW46PTC9NA2_x7_hD_ZG9j-U79_TehhZnvXxdfmNzU1xEuWVjJ4R74EYMpdENJ'
+          'dE9LC4flJu4ceulzaAD9EEO7H0pwBS-rioMZcKuRZC9ASZViqkAqM_vHAaIyPaKtSylYOV01vlJAL_ATKkkliiEUupx2T1VetxV5O'
+          'dl07ASchuZC18yGvXSB_BiL78zHR0_If1PM_rJCey3R0ObmEJoingu8pTyXtKDzKLx6o2Ck1RLPC5uUtEXTLo93ZrSwjbBQ0EUFF4Z'
+          '06iYamGQv8UvGu-_MGgmXFI_7izlkWfl-UJHOw'),
+    'e': 'AQAB'
+}
+
+# 单个 HTTP 头部块的最大长度
+MAX_HEADER_BYTES = 64 * 1024
+
+# 请求 ID 头：同一请求的 auth / attest / resource 各次 HTTP 交互携带相同的 ID，便于与服务端日志关联
+REQUEST_ID_HEADER = 'X-Request-Id'
+# 失败请求保留的响应体上限（字节），供最慢 / 失败请求明细使用
+ERROR_BODY_LIMIT = 4096
+
+
+class RequestTrace:
+    """单个请求的追踪上下文：request_id 随每次 HTTP 交互发送，失败时记录 HTTP 状态与（截断的）完整响应体"""
+
+    __slots__ = ('request_id', 'http_status', 'error_body')
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.http_status = None
+        self.error_body = None
+
+
+# 当前请求的追踪上下文：生成器在发出请求的任务中设置，wait_for 创建的子任务复制上下文后引用同一对象
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class HttpError(Exception):
+    """HTTP 协议层错误（响应格式不合法等）"""
+
+
+class StaleConnectionError(HttpError):
+    """连接在收到任何响应字节之前被关闭或重置（多为服务端已关闭的空闲 keep-alive 连接）"""
+
+
+async def read_http_head(reader):
+    """读取起始行与头部，返回 (起始行各字段, 小写键的头部字典)；连接关闭时返回 (None, None)"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None, None
+        raise HttpError("连接在头部读取过程中关闭")
+    except asyncio.LimitOverrunError:
+        raise HttpError("HTTP 头部过长")
+
+    lines = head[:-4].decode('latin-1').split('\r\n')
+    start_line = lines[0].split(' ', 2)
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return start_line, headers
+
+
+async def read_http_body(reader, headers, allow_eof=False):
+    """按 Content-Length / chunked 读取消息体"""
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size_line = await reader.readuntil(b'\r\n')
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # 跳过 trailer
+                while (await reader.readuntil(b'\r\n')) != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    length = headers.get('content-length')
+    if length is not None:
+        return await reader.readexactly(int(length)) if int(length) > 0 else b''
+    if allow_eof:
+        return await reader.read()
+    return b''
+
+
+def build_http_message(start_line, headers, body=b''):
+    """拼装 HTTP/1.1 消息"""
+    lines = [start_line]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+class HttpConnection:
+    """单条 keep-alive HTTP/1.1 连接，记录建连与 TLS 握手耗时"""
+
+    def __init__(self, reader, writer, connect_time, tls_time):
+        self.reader = reader
+        self.writer = writer
+        self.connect_time = connect_time
+        self.tls_time = tls_time
+        self.requests = 0
+        self.reusable = True
+
+    @classmethod
+    async def open(cls, host, port, ssl_context=None):
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_HEADER_BYTES)
+        connected = time.perf_counter()
+        tls_time = 0.0
+
+        if ssl_context is not None:
+            if hasattr(writer, 'start_tls'):
+                await writer.start_tls(ssl_context, server_hostname=host)
+            else:
+                # Python < 3.11 无法在流上升级 TLS，重新建立 TLS 连接
+                writer.close()
+                reader, writer = await asyncio.open_connection(
+                    host, port, ssl=ssl_context, server_hostname=host, limit=MAX_HEADER_BYTES)
+            tls_time = time.perf_counter() - connected
+
+        return cls(reader, writer, connected - start, tls_time)
+
+    async def request(self, method, target, headers, body=b''):
+        """发送请求并读取完整响应，返回 (状态码, 头部, 消息体)"""
+        self.reusable = False
+        try:
+            self.writer.write(build_http_message(f"{method} {target} HTTP/1.1", headers, body))
+            await self.writer.drain()
+            start_line, response_headers = await read_http_head(self.reader)
+        except (ConnectionResetError, BrokenPipeError) as e:
+            raise StaleConnectionError(f"服务端关闭连接: {e}") from e
+        if start_line is None:
+            raise StaleConnectionError("服务端关闭连接")
+        if len(start_line) < 2:
+            raise HttpError("响应起始行不合法")
+        status = int(start_line[1])
+        response_body = await read_http_body(self.reader, response_headers, allow_eof=True)
+
+        self.requests += 1
+        self.reusable = (response_headers.get('connection', '').lower() != 'close' and
+                         ('content-length' in response_headers or
+                          response_headers.get('transfer-encoding', '').lower() == 'chunked'))
+        return status, response_headers, response_body
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """按目标地址复用 keep-alive 连接的连接池"""
+
+    def __init__(self, base_url, max_size=0, reuse=True, ssl_context=None):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or (443 if self.scheme == 'https' else 80)
+        self.base_path = parts.path.rstrip('/')
+        self.host_header = parts.netloc
+        self.reuse = reuse
+        if self.scheme == 'https' and ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        self.ssl_context = ssl_context if self.scheme == 'https' else None
+        self._idle = []
+        self._limit = asyncio.Semaphore(max_size) if max_size else None
+        self.opened = 0
+        # 复用连接已被服务端关闭、改用新连接重发的次数
+        self.stale_retries = 0
+
+    async def acquire(self, fresh=False):
+        """取得一条连接，返回 (连接, 是否为复用连接)；fresh 为 True 时不取空闲连接，新建一条"""
+        if self._limit is not None:
+            await self._limit.acquire()
+        try:
+            while self._idle and not fresh:
+                conn = self._idle.pop()
+                if not conn.reader.at_eof():
+                    return conn, True
+                conn.close()
+            conn = await HttpConnection.open(self.host, self.port, self.ssl_context)
+            self.opened += 1
+            return conn, False
+        except BaseException:
+            if self._limit is not None:
+                self._limit.release()
+            raise
+
+    def release(self, conn):
+        if self.reuse and conn.reusable:
+            self._idle.append(conn)
+        else:
+            conn.close()
+        if self._limit is not None:
+            self._limit.release()
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+class RcarClient:
+    """KBS RCAR（Request-Challenge-Attestation-Response）协议客户端"""
+
+    def __init__(self, pool, tee='sample', evidence=None, tee_pubkey=None, protocol_version='0.1.0'):
+        self.pool = pool
+        self.tee = tee
+        self.evidence = evidence
+        self.tee_pubkey = tee_pubkey or SAMPLE_TEE_PUBKEY
+        self.protocol_version = protocol_version
+
+    async def call(self, method, path, payload=None, headers=None):
+        """在池化连接上发送一次 HTTP 请求，返回 (状态码, 头部, 消息体, 连接信息)"""
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        request_headers = {'Host': self.pool.host_header, 'Connection': 'keep-alive' if self.pool.reuse else 'close'}
+        if payload is not None:
+            request_headers['Content-Type'] = 'application/json'
+        request_headers['Content-Length'] = str(len(body))
+        trace = current_trace.get()
+        if trace is not None:
+            request_headers[REQUEST_ID_HEADER] = trace.request_id
+        if headers:
+            request_headers.update(headers)
+
+        conn, reused = await self.pool.acquire()
+        while True:
+            exchange_start = time.perf_counter()
+            try:
+                status, response_headers, response_body = await conn.request(
+                    method, self.pool.base_path + path, request_headers, body)
+                break
+            except StaleConnectionError:
+                conn.reusable = False
+                if not reused:
+                    raise
+            except BaseException:
+                conn.reusable = False
+                raise
+            finally:
+                self.pool.release(conn)
+            # 空闲期间被服务端关闭的复用连接：请求未被处理，在新连接上重发一次，不计入错误与耗时
+            self.pool.stale_retries += 1
+            conn, reused = await self.pool.acquire(fresh=True)
+        return status, response_headers, response_body, {
+            'reused': reused,
+            'connect_time': 0.0 if reused else conn.connect_time,
+            'tls_time': 0.0 if reused else conn.tls_time,
+            'exchange_time': time.perf_counter() - exchange_start
+        }
+
+    def build_evidence(self, nonce):
+        """构造证据：使用配置的样例证据，否则生成绑定 nonce 与公钥的 sample TEE 证据"""
+        if self.evidence is not None:
+            return self.evidence
+        runtime_data = nonce.encode('utf-8') + json.dumps(self.tee_pubkey, separators=(',', ':')).encode('utf-8')
+        report_data = base64.b64encode(hashlib.sha384(runtime_data).digest()).decode('ascii')
+        return json.dumps({'svn': '1', 'report_data': report_data})
+
+    async def auth(self):
+        """/auth：建立会话并获取 nonce，返回 (状态码, 会话 cookie, nonce, 连接信息)"""
+        status, headers, body, conn_info = await self.call('POST', KBS_AUTH_PATH, {
+            'version': self.protocol_version,
+            'tee': self.tee,
+            'extra-params': ''
+        })
+        if status != 200:
+            return status, None, None, conn_info, body
+
+        cookie = None
+        set_cookie = headers.get('set-cookie', '')
+        for item in set_cookie.split(';'):
+            name, _, value = item.strip().partition('=')
+            if name == KBS_SESSION_COOKIE:
+                cookie = f"{KBS_SESSION_COOKIE}={value}"
+                break
+        nonce = json.loads(body.decode('utf-8')).get('nonce', '')
+        return status, cookie, nonce, conn_info, body
+
+    async def attest(self, cookie, nonce):
+        """/attest：提交证据换取 token，返回 (状态码, token, 连接信息, 消息体)"""
+        headers = {'Cookie': cookie} if cookie else None
+        status, _, body, conn_info = await self.call('POST', KBS_ATTEST_PATH, {
+            'tee-pubkey': self.tee_pubkey,
+            'tee-evidence': self.build_evidence(nonce)
+        }, headers)
+        if status != 200:
+            return status, None, conn_info, body
+        return status, json.loads(body.decode('utf-8')).get('token'), conn_info, body
+
+    async def get_resource(self, token, resource_path):
+        """/resource：以 token 获取机密资源，返回 (状态码, 连接信息, 消息体)"""
+        status, _, body, conn_info = await self.call(
+            'GET', KBS_RESOURCE_PATH + resource_path.strip('/'), None,
+            {'Authorization': f"Bearer {token}"})
+        return status, conn_info, body
+
+
+class RcarBackend:
+    """基于 RcarClient 的请求后端，与 ExecBackend 接口一致"""
+
+    def __init__(self, base_url, timeout, flow='attest', resource_path='default/key/1',
+                 pool_size=0, reuse_connections=True, tee='sample', evidence=None,
+                 ssl_context=None):
+        self.pool = ConnectionPool(base_url, pool_size, reuse_connections, ssl_context)
+        self.client = RcarClient(self.pool, tee=tee, evidence=evidence)
+        self.timeout = timeout
+        self.flow = flow
+        self.resource_path = resource_path
+
+    @staticmethod
+    def _error(step, status, body):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.http_status = status
+            trace.error_body = body[:ERROR_BODY_LIMIT].decode('utf-8', 'replace')
+        detail = body[:200].decode('utf-8', 'replace').replace('\n', ' ').replace(',', ';')
+        return status, f"{step} failed (HTTP {status}): {detail}"
+
+    @staticmethod
+    def _account(phases, phase, conn_info):
+        """将一次 HTTP 交互的建连、TLS 与请求耗时计入对应阶段"""
+        phases['connect'] += conn_info['connect_time']
+        phases['tls'] += conn_info['tls_time']
+        phases[phase] = conn_info['exchange_time']
+
+    async def attest_flow(self, phases):
+        """auth + attest，返回 (response_code, error_msg, token)"""
+        status, cookie, nonce, conn_info, body = await self.client.auth()
+        self._account(phases, 'auth', conn_info)
+        if status != 200:
+            return self._error('auth', status, body) + (None,)
+
+        status, token, conn_info, body = await self.client.attest(cookie, nonce)
+        self._account(phases, 'attest', conn_info)
+        if status != 200:
+            return self._error('attest', status, body) + (None,)
+        return 200, "", token
+
+    async def resource_flow(self, token, resource_path, phases):
+        """以已有 token 获取一次资源，返回 (response_code, error_msg)"""
+        status, conn_info, body = await self.client.get_resource(token, resource_path)
+        self._account(phases, 'resource', conn_info)
+        if status != 200:
+            return self._error('resource', status, body)
+        return 200, ""
+
+    async def _run_flow(self, phases):
+        status, error_msg, token = await self.attest_flow(phases)
+        if status != 200 or self.flow != 'resource':
+            return status, error_msg
+        return await self.resource_flow(token, self.resource_path, phases)
+
+    async def execute(self, flow):
+        """在超时限制内执行 flow(phases)，返回 (response_code, error_msg, 各阶段耗时)"""
+        phases = {'connect': 0.0, 'tls': 0.0, 'auth': None, 'attest': None, 'resource': None}
+        try:
+            response_code, error_msg = await asyncio.wait_for(flow(phases), self.timeout)
+        except asyncio.TimeoutError:
+            response_code, error_msg = 500, "Request timeout"
+        except (OSError, HttpError, asyncio.IncompleteReadError, ValueError) as e:
+            response_code, error_msg = 500, f"{type(e).__name__}: {e}".replace(',', ';')
+        return response_code, error_msg, tuple(phases[name] for name in PHASE_NAMES)
+
+    async def request(self):
+        """执行一次 RCAR 流程，返回 (response_code, error_msg, 各阶段耗时, 请求类型)；单一流程不区分请求类型"""
+        response_code, error_msg, phases = await self.execute(self._run_flow)
+        return response_code, error_msg, phases, None
+
+    def session(self):
+        """虚拟用户会话；单一流程的请求之间没有状态，所有虚拟用户共用后端本身"""
+        return self
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+报告生成性能基准
+作者: AI Assistant
+用途: 按不同行数生成合成的资源采样与请求记录，测量报告加载与分析（可选含图表与 HTML）耗时，
+      观察报告生成时间随数据量的增长情况
+"""
+
+import os
+import sys
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_store import DATA_FORMATS, data_path, resolve_format
+from generate_report import TrusteeReportGenerator
+from load_generator import RESULT_HEADER
+from resource_sampler import DEFAULT_PROCESSES, RESOURCE_HEADER
+
+DEFAULT_ROWS = [10000, 100000, 1000000]
+
+
+def write_frame(df, base, data_format):
+    path = data_path(base, data_format)
+    if data_format == 'parquet':
+        df.to_parquet(path, index=False, compression='zstd')
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def build_dataset(data_dir, rows, levels, processes, data_format, seed=0):
+    """生成 levels 个并发量的数据：资源与请求记录各约 rows 行（按并发量均分），
+    资源数据含 processes 个服务名（超出默认服务数的部分模拟多 worker 明细）与 system 行"""
+    rng = np.random.default_rng(seed)
+    per_level = max(rows // levels, 1)
+    services = (DEFAULT_PROCESSES + [f'worker-{i}' for i in range(processes)])[:processes]
+    names = np.array(services + ['system'])
+    for level in range(1, levels + 1):
+        concurrency = level * 10
+        n = per_level
+        # 各并发量依次占用 120 秒，间隔 30 秒恢复期
+        base = 1.8e9 + (level - 1) * 150
+        process = names[np.arange(n) % len(names)]
+        epoch = base + np.arange(n) * 120 / n
+        resource = pd.DataFrame({
+            'timestamp': pd.to_datetime(epoch, unit='s'),
+            'epoch_time': epoch.round(3),
+            'process': process,
+            'pid': 1000 + np.arange(n) % len(names),
+            'cpu_percent': rng.gamma(2.0, 5.0 * level, n).round(2),
+            'memory_rss_mb': rng.normal(200, 20, n).round(2),
+            'memory_vms_mb': rng.normal(800, 40, n).round(2),
+            'memory_percent': rng.uniform(1, 5, n).round(2),
+            'threads': rng.integers(4, 64, n),
+            'fds': rng.integers(10, 500, n),
+            'process_count': rng.integers(1, 4, n)
+        })
+        for column in RESOURCE_HEADER:
+            if column not in resource.columns:
+                if column.startswith('tcp_'):
+                    resource[column] = rng.integers(0, concurrency * 2, n)
+                else:
+                    resource[column] = rng.gamma(2.0, 100.0, n).round(2)
+        write_frame(resource[RESOURCE_HEADER], os.path.join(data_dir, f'resource_usage_bench_{concurrency}c'),
+                    data_format)
+
+        start = base + np.sort(rng.uniform(0, 120, n))
+        duration = rng.lognormal(np.log(0.005 * level), 0.5, n)
+        records = pd.DataFrame({
+            'start_time': start.round(6),
+            'end_time': (start + duration).round(6),
+            'duration': duration.round(6),
+            'response_code': np.where(rng.random(n) < 0.01, 500, 200),
+            'error_msg': '',
+            'test_phase': 'steady',
+            'request_type': '',
+            'request_id': ''
+        })
+        for column in RESULT_HEADER[5:]:
+            if column not in records.columns:
+                records[column] = (duration * rng.uniform(0.1, 0.4, n)).round(6)
+        write_frame(records[RESULT_HEADER], os.path.join(data_dir, f'concurrent_test_{concurrency}_bench'),
+                    data_format)
+
+
+def run_once(data_dir, output_dir, full):
+    """返回各阶段耗时（秒）"""
+    generator = TrusteeReportGenerator('bench', data_dir, output_dir)
+    logging.getLogger().setLevel(logging.WARNING)
+    timings = {}
+    start = time.perf_counter()
+    generator.load_data()
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generator.analyze()
+    timings['analyze'] = time.perf_counter() - start
+
+    if full:
+        start = time.perf_counter()
+        resource_charts = generator.create_resource_charts() + generator.create_soak_charts()
+        performance_charts = generator.create_performance_charts()
+        rendered = generator.render_charts(resource_charts + performance_charts)
+        generator.generate_html_report(rendered[:len(resource_charts)], rendered[len(resource_charts):])
+        timings['render'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报告生成耗时随数据量变化的基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help='资源与请求记录各自的总行数（可多个）')
+    parser.add_argument('--levels', type=int, default=5, help='并发量个数')
+    parser.add_argument('--processes', type=int, default=len(DEFAULT_PROCESSES), help='资源数据中的服务（进程）个数')
+    parser.add_argument('--data-format', choices=DATA_FORMATS, default='parquet',
+                        help='合成数据格式（parquet 需 pyarrow，缺失时回退 csv）')
+    parser.add_argument('--full', action='store_true', help='同时计入图表与 HTML 报告生成耗时')
+    parser.add_argument('--keep', help='保留合成数据与报告的目录（默认使用临时目录并删除）')
+    parser.add_argument('--json', help='同时将各行数的耗时写入该 JSON 文件（供 harness_benchmark.py 汇总）')
+    args = parser.parse_args()
+
+    data_format = resolve_format(args.data_format)
+    work_dir = args.keep or tempfile.mkdtemp(prefix='report_benchmark_')
+    columns = ['load', 'analyze'] + (['render'] if args.full else [])
+    print(f"数据格式: {data_format}, 并发量个数: {args.levels}, 进程个数: {args.processes}")
+    print(f"{'行数':>10} " + ' '.join(f"{column + '(s)':>12}" for column in columns) +
+          f" {'合计(s)':>10} {'行/秒':>12}")
+    results = []
+    try:
+        for rows in args.rows:
+            data_dir = os.path.join(work_dir, f'rows_{rows}', 'raw_data')
+            output_dir = os.path.join(work_dir, f'rows_{rows}', 'reports')
+            os.makedirs(data_dir, exist_ok=True)
+            build_dataset(data_dir, rows, args.levels, args.processes, data_format)
+            timings = run_once(data_dir, output_dir, args.full)
+            total = sum(timings.values())
+            # 资源与请求记录各 rows 行
+            throughput = rows * 2 / total if total > 0 else 0
+            print(f"{rows:>10} " + ' '.join(f"{timings[column]:>12.3f}" for column in columns) +
+                  f" {total:>10.3f} {throughput:>12.0f}", flush=True)
+            results.append({'rows': rows, 'timings': timings, 'total': total, 'rows_per_second': throughput})
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'data_format': data_format, 'levels': args.levels, 'processes': args.processes,
+                       'full': args.full, 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
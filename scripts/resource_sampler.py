@@ -0,0 +1,1011 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Trustee Service 资源采样器
+作者: AI Assistant
+用途: 直接读取 /proc 采集进程与系统资源，按采样区间计算 CPU 增量，替代 monitor_resources.sh 中的 ps/top/bc 循环；
+      每个服务按可执行文件名严格匹配全部实例及其子进程，按服务汇总并输出逐进程明细；
+      同时采集上下文切换、缺页、TCP 连接状态、进程 I/O 以及系统磁盘与网卡吞吐；
+      长稳测试模式按聚合窗口滚动汇总资源趋势，并可定期采集 smaps_rollup 快照
+"""
+
+import os
+import sys
+import argparse
+import csv
+import json
+import logging
+import resource
+import signal
+import time
+from datetime import datetime
+
+from data_store import DATA_FORMATS, data_path, open_table, resolve_format
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+DEFAULT_CONFIG = os.path.join(PROJECT_ROOT, 'config', 'test_config.json')
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'results', 'raw_data')
+DEFAULT_LOG_FILE = os.path.join(PROJECT_ROOT, 'results', 'logs', 'resource_monitor.log')
+
+DEFAULT_PROCESSES = ['kbs', 'grpc-as', 'rvps', 'trustee-gateway', 'as-restful']
+# 计数器类指标按采样区间换算为每秒速率；进程行的 io_* 为 /proc/<pid>/io 的 read_bytes/write_bytes，
+# system 行的 io_* 为全部物理磁盘吞吐，net_* 仅 system 行有值（网卡吞吐无法归属到进程）；
+# 上下文切换需逐线程读取，与 fds、TCP 连接状态一同按明细间隔低频采集，其间的采样行沿用最近一次的值
+RATE_COLUMNS = ['voluntary_ctx_per_sec', 'involuntary_ctx_per_sec', 'minor_faults_per_sec', 'major_faults_per_sec',
+                'io_read_bytes_per_sec', 'io_write_bytes_per_sec']
+NET_COLUMNS = ['net_rx_bytes_per_sec', 'net_tx_bytes_per_sec']
+# TCP 连接按状态计数；进程的 TIME_WAIT 连接已不属于任何 fd，按服务监听端口归属
+TCP_COLUMNS = ['tcp_established', 'tcp_time_wait', 'tcp_close_wait', 'tcp_listen', 'tcp_other']
+TCP_STATES = {'01': 'tcp_established', '06': 'tcp_time_wait', '08': 'tcp_close_wait', '0A': 'tcp_listen'}
+
+# 按服务汇总的资源数据：pid 为服务的主进程，process_count 为该时刻服务的进程数（含子进程）；
+# epoch_time 为采样时刻的 epoch 秒，与负载生成器请求记录的 start_time/end_time 同一时钟，报告据此按时间对齐
+RESOURCE_HEADER = ['timestamp', 'process', 'pid', 'cpu_percent', 'memory_rss_mb', 'memory_vms_mb',
+                   'memory_percent', 'threads', 'fds', 'process_count'] + RATE_COLUMNS + NET_COLUMNS + TCP_COLUMNS + \
+                  ['epoch_time']
+DETAIL_HEADER = ['timestamp', 'process', 'pid', 'ppid', 'comm', 'cpu_percent', 'memory_rss_mb', 'memory_vms_mb',
+                 'memory_percent', 'threads', 'fds'] + RATE_COLUMNS + TCP_COLUMNS + ['epoch_time']
+# 长稳测试按聚合窗口输出的趋势数据：每个服务每个窗口一行，均值与最大值由滚动汇总得到，内存占用与测试时长无关；
+# pid 为窗口结束时的主进程，变化即服务重启
+SOAK_COLUMNS = ['cpu_percent', 'memory_rss_mb', 'memory_vms_mb', 'threads', 'fds', 'process_count'] + TCP_COLUMNS
+SOAK_HEADER = ['window_start', 'window_end', 'process', 'pid', 'samples'] + SOAK_COLUMNS + \
+              ['memory_rss_max_mb', 'threads_max', 'fds_max']
+# smaps_rollup 快照：按服务汇总各进程的匿名页（堆等）、文件映射页与共享内存，区分堆增长与映射文件增长
+SMAPS_FIELDS = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Anonymous': 'anonymous_mb', 'Pss_File': 'file_mb',
+                'Pss_Shmem': 'shmem_mb', 'Swap': 'swap_mb'}
+SMAPS_HEADER = ['timestamp', 'process', 'pid', 'process_count'] + list(SMAPS_FIELDS.values()) + ['epoch_time']
+REALTIME_HEADER = ['timestamp', 'total_cpu', 'total_memory_mb', 'kbs_cpu', 'kbs_memory', 'grpc_as_cpu',
+                   'grpc_as_memory', 'rvps_cpu', 'rvps_memory', 'gateway_cpu', 'gateway_memory',
+                   'as_restful_cpu', 'as_restful_memory']
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+# /proc/diskstats 的扇区固定为 512 字节，与设备实际扇区大小无关
+DISKSTATS_SECTOR = 512
+# 统计磁盘吞吐时跳过的虚拟/叠加设备，避免与底层物理盘重复计数
+VIRTUAL_DISK_PREFIXES = ('loop', 'ram', 'zram', 'dm-', 'md', 'sr', 'nbd')
+# 缓冲行数超过该值或距上次写盘超过 FLUSH_INTERVAL 秒时写盘
+FLUSH_ROWS = 5000
+FLUSH_INTERVAL = 5.0
+# 重新扫描进程树的默认间隔（秒），用于发现运行中重启或新派生的进程
+RESCAN_INTERVAL = 1.0
+# 逐线程上下文切换、fd 与 TCP 连接表的默认采集间隔（秒）；这些读取的开销随线程数与连接数增长，
+# 不随亚秒采样间隔高频执行，保证 0.1 秒采样时采样器自身 CPU 低于 1%。
+# 明细间隔短于重扫间隔时，/proc/net/tcp* 仍每个重扫间隔至多解析一次，
+# 各进程的 socket inode 集合只在重扫后或 fd 数变化时重新解析
+DETAIL_INTERVAL = 1.0
+
+logger = logging.getLogger('resource_sampler')
+
+
+def load_config(config_path):
+    """读取测试配置文件，不存在时返回空配置"""
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def setup_logging(log_file):
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    formatter = logging.Formatter('[%(asctime)s] %(message)s', '%Y-%m-%d %H:%M:%S')
+    for handler in (logging.FileHandler(log_file, encoding='utf-8'), logging.StreamHandler(sys.stderr)):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class ProcFiles:
+    """保持高频读取的 /proc 文件打开，每轮以 pread 从头重读，省去亚秒采样时每轮的 open/close
+
+    /proc/<pid>/ 下的文件描述符绑定到打开时的进程，进程退出后读取报错而不会读到复用该 PID 的新进程
+    """
+
+    def __init__(self):
+        self._fds = {}
+
+    def read(self, path):
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+            self._fds[path] = fd
+        chunks = []
+        try:
+            while True:
+                chunk = os.pread(fd, 65536, sum(len(c) for c in chunks))
+                chunks.append(chunk)
+                if len(chunk) < 65536:
+                    return b''.join(chunks)
+        except OSError:
+            self.close(path)
+            raise
+
+    def close(self, path):
+        fd = self._fds.pop(path, None)
+        if fd is not None:
+            os.close(fd)
+
+    def close_pid(self, pid):
+        prefix = f'/proc/{pid}/'
+        for path in [path for path in self._fds if path.startswith(prefix)]:
+            self.close(path)
+
+    def close_all(self):
+        for path in list(self._fds):
+            self.close(path)
+
+
+def read_pid_stat(pid, read=read_file):
+    """解析 /proc/<pid>/stat
+
+    返回 (comm, ppid, utime+stime 时钟滴答, 线程数, 启动时刻滴答, vsize 字节, rss 字节, 次缺页数, 主缺页数)
+    """
+    data = read(f'/proc/{pid}/stat')
+    # comm 字段可能包含空格和括号，从最后一个 ')' 之后开始解析
+    end = data.rindex(b')')
+    comm = data[data.index(b'(') + 1:end].decode('utf-8', 'replace')
+    fields = data[end + 2:].split()
+    cpu_ticks = int(fields[11]) + int(fields[12])
+    return (comm, int(fields[1]), cpu_ticks, int(fields[17]), int(fields[19]),
+            int(fields[20]), int(fields[21]) * PAGE_SIZE, int(fields[7]), int(fields[9]))
+
+
+def read_ctx_switches(pid):
+    """汇总各线程的 (自愿, 非自愿) 上下文切换次数
+
+    /proc/<pid>/status 只反映主线程，tokio 等多线程运行时的切换发生在 worker 线程上，需遍历 task 目录
+    """
+    voluntary = involuntary = 0
+    try:
+        tids = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return 0, 0
+    for tid in tids:
+        try:
+            data = read_file(f'/proc/{pid}/task/{tid}/status')
+        except OSError:
+            continue
+        index = data.find(b'\nvoluntary_ctxt_switches:')
+        if index < 0:
+            continue
+        lines = data[index + 1:].split(b'\n', 2)
+        voluntary += int(lines[0].split()[1])
+        involuntary += int(lines[1].split()[1])
+    return voluntary, involuntary
+
+
+def read_pid_io(pid, read=read_file):
+    """返回 /proc/<pid>/io 的 (read_bytes, write_bytes)；非同一用户且非 root 时无权读取，返回 None"""
+    try:
+        data = read(f'/proc/{pid}/io')
+    except OSError:
+        return None
+    counters = {}
+    for line in data.splitlines():
+        name, _, value = line.partition(b':')
+        counters[name] = int(value)
+    return counters.get(b'read_bytes', 0), counters.get(b'write_bytes', 0)
+
+
+def list_fds(pid):
+    """返回进程的 fd 名列表"""
+    try:
+        return os.listdir(f'/proc/{pid}/fd')
+    except OSError:
+        # 无权限读取其他用户进程的 fd 目录
+        return []
+
+
+def read_socket_inodes(pid, fds):
+    """逐个解析 fd 链接，返回其中的 socket inode 集合；连接较多时开销随 fd 数线性增长"""
+    inodes = set()
+    for fd in fds:
+        try:
+            target = os.readlink(f'/proc/{pid}/fd/{fd}')
+        except OSError:
+            continue
+        if target.startswith('socket:['):
+            inodes.add(int(target[8:-1]))
+    return inodes
+
+
+def read_smaps_rollup(pid):
+    """解析 /proc/<pid>/smaps_rollup（Linux 4.14+），返回 {字段: kB}；无权限或不支持时返回 None
+
+    旧内核没有 Pss_File 时以 Rss - Anonymous 近似文件映射页
+    """
+    try:
+        data = read_file(f'/proc/{pid}/smaps_rollup')
+    except OSError:
+        return None
+    values = {}
+    for line in data.splitlines()[1:]:
+        name, _, rest = line.partition(b':')
+        fields = rest.split()
+        if fields:
+            values[name.decode()] = int(fields[0])
+    if 'Pss_File' not in values:
+        values['Pss_File'] = values.get('Rss', 0) - values.get('Anonymous', 0)
+    return values
+
+
+def read_tcp_sockets(read=read_file):
+    """解析 /proc/net/tcp 与 tcp6
+
+    返回 ({inode: (状态列名, 本地端口)}, {状态列名: 系统总数}, {本地端口: TIME_WAIT 数})
+    """
+    sockets = {}
+    totals = dict.fromkeys(TCP_COLUMNS, 0)
+    time_wait_ports = {}
+    for path in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            lines = read(path).splitlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            state = TCP_STATES.get(fields[3].decode('ascii'), 'tcp_other')
+            port = int(fields[1].rsplit(b':', 1)[1], 16)
+            totals[state] += 1
+            inode = int(fields[9])
+            if inode:
+                sockets[inode] = (state, port)
+            elif state == 'tcp_time_wait':
+                time_wait_ports[port] = time_wait_ports.get(port, 0) + 1
+    return sockets, totals, time_wait_ports
+
+
+def count_tcp(inodes, sockets, time_wait_ports):
+    """按状态统计一组 socket inode 对应的 TCP 连接，TIME_WAIT 按其中监听端口归属"""
+    counts = dict.fromkeys(TCP_COLUMNS, 0)
+    listen_ports = set()
+    for inode in inodes:
+        entry = sockets.get(inode)
+        if entry is None:
+            # UDP、Unix socket 等
+            continue
+        counts[entry[0]] += 1
+        if entry[0] == 'tcp_listen':
+            listen_ports.add(entry[1])
+    counts['tcp_time_wait'] += sum(time_wait_ports.get(port, 0) for port in listen_ports)
+    return [counts[column] for column in TCP_COLUMNS]
+
+
+def physical_disks():
+    """返回 /sys/block 下的物理磁盘名（分区不在 /sys/block 顶层）"""
+    try:
+        return {name for name in os.listdir('/sys/block') if not name.startswith(VIRTUAL_DISK_PREFIXES)}
+    except OSError:
+        return set()
+
+
+def read_disk_bytes(disks, read=read_file):
+    """返回物理磁盘累计 (读字节, 写字节)"""
+    read_bytes = write_bytes = 0
+    for line in read('/proc/diskstats').splitlines():
+        fields = line.split()
+        if fields[2].decode('ascii') in disks:
+            read_bytes += int(fields[5]) * DISKSTATS_SECTOR
+            write_bytes += int(fields[9]) * DISKSTATS_SECTOR
+    return read_bytes, write_bytes
+
+
+def read_net_bytes(read=read_file):
+    """返回除 lo 外全部网卡累计 (接收字节, 发送字节)"""
+    rx_bytes = tx_bytes = 0
+    for line in read('/proc/net/dev').splitlines()[2:]:
+        name, _, counters = line.partition(b':')
+        if name.strip() == b'lo':
+            continue
+        fields = counters.split()
+        rx_bytes += int(fields[0])
+        tx_bytes += int(fields[8])
+    return rx_bytes, tx_bytes
+
+
+def find_counter(data, name):
+    """在 /proc 的 "名称 值" 或 "名称: 值 kB" 格式文本中查找单个计数器，不存在时返回 None；
+    亚秒采样每轮只需其中一两项，避免逐行解析上百行"""
+    index = data.find(b'\n' + name)
+    if index < 0:
+        if not data.startswith(name):
+            return None
+        index = -1
+    start = index + 1 + len(name)
+    end = data.find(b'\n', start)
+    return int(data[start:end if end >= 0 else None].split()[0])
+
+
+def read_vmstat_faults(read=read_file):
+    """返回系统累计 (次缺页数, 主缺页数)；/proc/vmstat 的 pgfault 包含主缺页"""
+    data = read('/proc/vmstat')
+    faults = find_counter(data, b'pgfault ') or 0
+    major = find_counter(data, b'pgmajfault ') or 0
+    return faults - major, major
+
+
+def counter_rates(current, previous, elapsed):
+    """计数器增量换算为每秒速率；线程退出导致汇总值回退时按 0 处理，无法读取的计数器保留为 None"""
+    rates = []
+    for value, prev in zip(current, previous):
+        if value is None or prev is None or elapsed <= 0:
+            rates.append(None)
+        else:
+            rates.append(max(value - prev, 0) / elapsed)
+    return rates
+
+
+def format_rates(rates):
+    return ['' if value is None else f"{value:.2f}" for value in rates]
+
+
+def executable_names(pid):
+    """返回进程可执行文件名集合：/proc/<pid>/exe 与 argv[0] 的 basename
+
+    无权限读取 exe 链接时仍可依据 argv[0] 匹配；不做命令行子串匹配，避免 kbs 误命中 kbs-client 或监控脚本自身
+    """
+    names = set()
+    try:
+        target = os.readlink(f'/proc/{pid}/exe')
+        # 二进制文件在进程运行期间被替换（升级部署）时链接带有 " (deleted)" 后缀
+        if target.endswith(' (deleted)'):
+            target = target[:-len(' (deleted)')]
+        names.add(os.path.basename(target))
+    except OSError:
+        pass
+    try:
+        argv0 = read_file(f'/proc/{pid}/cmdline').split(b'\0', 1)[0]
+    except OSError:
+        argv0 = b''
+    if argv0:
+        names.add(os.path.basename(argv0.decode('utf-8', 'replace')))
+    return names
+
+
+def read_uptime():
+    """返回系统启动至今的秒数，用于换算 /proc/<pid>/stat 中的进程启动时刻"""
+    return float(read_file('/proc/uptime').split()[0])
+
+
+def service_executables(config):
+    """从 target_processes 构造 {服务名: 可执行文件名集合}，未配置 executables 时使用服务名本身"""
+    services = {}
+    for entry in config.get('target_processes', []):
+        services[entry['name']] = set(entry.get('executables') or [entry['name']])
+    return services or {name: {name} for name in DEFAULT_PROCESSES}
+
+
+def read_system_cpu(read=read_file):
+    """返回 /proc/stat 的 (总时钟滴答, 空闲时钟滴答)"""
+    fields = read('/proc/stat').split(b'\n', 1)[0].split()[1:9]
+    values = [int(v) for v in fields]
+    return sum(values), values[3] + values[4]
+
+
+def read_meminfo():
+    """返回 /proc/meminfo 的 {字段: kB}"""
+    info = {}
+    for line in read_file('/proc/meminfo').splitlines():
+        name, _, rest = line.partition(b':')
+        parts = rest.split()
+        if parts:
+            info[name.decode('ascii')] = int(parts[0])
+    return info
+
+
+class ResourceSampler:
+    """按固定间隔读取 /proc 采集目标服务（含全部实例与子进程）与系统资源"""
+
+    def __init__(self, services, interval=1.0, rescan_interval=RESCAN_INTERVAL, detail_interval=DETAIL_INTERVAL):
+        self.services = services
+        self.interval = interval
+        self.rescan_interval = rescan_interval
+        self.detail_interval = max(detail_interval, interval)
+        self.mem_total_kb = read_meminfo().get('MemTotal', 0)
+        # {服务名: [pid, ...]}，首个 pid 为服务主进程
+        self.targets = {}
+        # {pid: (启动时刻滴答, 匹配到的服务名或 None)}，启动时刻用于识别 PID 复用
+        self._matched = {}
+        # {pid: (启动时刻滴答, 父进程 PID)}，上次扫描读取的进程树
+        self._scanned = {}
+        # {pid: (启动时刻滴答, 计数器元组, perf_counter 时刻)}，计数器为 CPU 时钟滴答、缺页数与 I/O 字节的累计值
+        self._prev_proc = {}
+        # {pid: (启动时刻滴答, (自愿, 非自愿) 上下文切换累计, perf_counter 时刻)}，按明细间隔更新
+        self._prev_ctx = {}
+        # {pid: (启动时刻滴答, fd 数, socket inode 集合, 上下文切换速率, TCP 状态计数)}，最近一次明细采集的结果
+        self._details = {}
+        # {服务名: TCP 状态计数}，socket 按服务去重后的最近一次结果
+        self._service_tcp = {}
+        # {pid: (启动时刻滴答, fd 数, 重扫序号, socket inode 集合)}
+        self._inodes = {}
+        self._scan_generation = 0
+        # read_tcp_sockets() 的最近一次结果及其 perf_counter 时刻
+        self._tcp = None
+        self._last_tcp = None
+        self._last_detail = None
+        self._prev_system = None
+        # 系统缺页、磁盘与网卡计数器按明细间隔更新：(计数器元组, perf_counter 时刻) 与最近一次的速率
+        self._prev_system_counters = None
+        self._system_rates = None
+        # 每轮都读取的 stat、io 与系统计数器文件保持打开
+        self._files = ProcFiles()
+        self.disks = physical_disks()
+        self._last_scan_uptime = None
+        self._stopped = False
+
+    def _match(self, pid, starttime):
+        cached = self._matched.get(pid)
+        if cached is not None and cached[0] == starttime:
+            return cached[1]
+        names = executable_names(pid)
+        service = next((name for name, executables in self.services.items() if names & executables), None)
+        self._matched[pid] = (starttime, service)
+        return service
+
+    def resolve_targets(self):
+        """扫描 /proc 进程树，将每个进程归属到最近的匹配祖先所属服务
+
+        返回 {服务名: [pid, ...]}；非首次扫描时，扫描间隙中新启动的进程以其启动时刻作为 CPU 基线，
+        保证新派生的 worker 从出生起的 CPU 时间不被遗漏。
+        上次扫描已见过的进程沿用其父进程与启动时刻，只读取新进程及父进程已退出（被重新挂到其他祖先）的进程的 stat，
+        主机进程较多时每次重扫不必读取全部 /proc/<pid>/stat
+        """
+        own_pid = os.getpid()
+        uptime = read_uptime()
+        now = time.perf_counter()
+        live = {int(entry) for entry in os.listdir('/proc') if entry.isdigit()}
+        live.discard(own_pid)
+        scanned = {}
+        matched = {}
+        for pid in live:
+            entry = self._scanned.get(pid)
+            if entry is None or (entry[1] and entry[1] not in live):
+                try:
+                    stat = read_pid_stat(pid)
+                except (OSError, ValueError, IndexError):
+                    continue
+                entry = (stat[4], stat[1])
+            scanned[pid] = entry
+            service = self._match(pid, entry[0])
+            if service:
+                matched[pid] = service
+        parents = {pid: entry[1] for pid, entry in scanned.items()}
+        starts = {pid: entry[0] for pid, entry in scanned.items()}
+
+        owners = {}
+        groups = {}
+        for pid in sorted(parents):
+            chain = []
+            node = pid
+            service = None
+            while node > 0:
+                if node in owners:
+                    service = owners[node]
+                    break
+                if node in matched:
+                    service = matched[node]
+                    break
+                chain.append(node)
+                node = parents.get(node, 0)
+            for visited in chain:
+                owners[visited] = service
+            if service:
+                groups.setdefault(service, []).append(pid)
+
+        targets = {}
+        for service, pids in groups.items():
+            # 主进程：父进程不属于同一服务的进程中 PID 最小者
+            roots = [pid for pid in pids
+                     if (owners.get(parents[pid]) or matched.get(parents[pid])) != service]
+            root = min(roots or pids)
+            targets[service] = [root] + [pid for pid in pids if pid != root]
+
+        if self._last_scan_uptime is not None:
+            self._log_changes(targets)
+            for pids in targets.values():
+                for pid in pids:
+                    started = starts[pid] / CLK_TCK
+                    if pid not in self._prev_proc and started > self._last_scan_uptime:
+                        self._prev_proc[pid] = (starts[pid], (0,) * 5, now - (uptime - started))
+                        self._prev_ctx[pid] = (starts[pid], (0, 0), now - (uptime - started))
+
+        self._matched = {pid: value for pid, value in self._matched.items() if pid in scanned}
+        self._scanned = scanned
+        self._scan_generation += 1
+        self._last_scan_uptime = uptime
+        self.targets = targets
+        return targets
+
+    def _log_changes(self, targets):
+        for service in self.services:
+            before = set(self.targets.get(service, []))
+            after = set(targets.get(service, []))
+            if before and not after:
+                logger.warning(f"警告: 服务 {service} 的全部进程已停止")
+            elif after and not before:
+                logger.info(f"服务 {service} 已启动: PID {format_pids(targets[service])}")
+            else:
+                if after - before:
+                    logger.info(f"服务 {service} 新增进程: PID {format_pids(sorted(after - before))}")
+                if before - after:
+                    logger.info(f"服务 {service} 进程退出: PID {format_pids(sorted(before - after))}")
+
+    def collect_details(self, now):
+        """到达明细间隔时返回 True，本轮各进程随之刷新上下文切换与 fd；TCP 连接表每个重扫间隔至多重读一次"""
+        if self._tcp is not None and now - self._last_detail < self.detail_interval:
+            return False
+        if self._tcp is None or now - self._last_tcp >= self.rescan_interval:
+            self._tcp = read_tcp_sockets(self._files.read)
+            self._last_tcp = now
+        self._last_detail = now
+        return True
+
+    def _socket_inodes(self, pid, starttime, fds):
+        """进程的 socket inode 集合：fd 数未变且此后未重扫进程树时沿用缓存，避免每次逐个 readlink"""
+        cached = self._inodes.get(pid)
+        if cached is None or cached[:3] != (starttime, len(fds), self._scan_generation):
+            cached = (starttime, len(fds), self._scan_generation, read_socket_inodes(pid, fds))
+            self._inodes[pid] = cached
+        return cached[3]
+
+    def _sample_details(self, pid, starttime, now):
+        """逐线程上下文切换、fd 与 socket inode 的低频采集，结果缓存到下一个明细间隔"""
+        counters = read_ctx_switches(pid)
+        prev = self._prev_ctx.get(pid)
+        self._prev_ctx[pid] = (starttime, counters, now)
+        if prev is None or prev[0] != starttime:
+            prev = (starttime, counters, now - 1)
+        fds = list_fds(pid)
+        inodes = self._socket_inodes(pid, starttime, fds)
+        sockets, _, time_wait_ports = self._tcp
+        details = (starttime, len(fds), inodes, counter_rates(counters, prev[1], now - prev[2]),
+                   count_tcp(inodes, sockets, time_wait_ports))
+        self._details[pid] = details
+        return details
+
+    def _forget(self, pid):
+        self._prev_proc.pop(pid, None)
+        self._prev_ctx.pop(pid, None)
+        self._details.pop(pid, None)
+        self._inodes.pop(pid, None)
+        self._files.close_pid(pid)
+
+    def sample_process(self, pid, now, detail=True):
+        """采样单个进程；detail 为 False 时上下文切换、fds 与 TCP 计数沿用最近一次明细采集的结果
+
+        返回 (comm, ppid, cpu_percent, rss, vsize, threads, fds, RATE_COLUMNS 速率, socket inode 集合, TCP 计数)；
+        进程已退出时返回 None
+        """
+        try:
+            comm, ppid, cpu_ticks, threads, starttime, vsize, rss, minflt, majflt = read_pid_stat(pid, self._files.read)
+        except (OSError, ValueError, IndexError):
+            self._forget(pid)
+            return None
+        counters = (cpu_ticks, minflt, majflt) + (read_pid_io(pid, self._files.read) or (None, None))
+
+        prev = self._prev_proc.get(pid)
+        self._prev_proc[pid] = (starttime, counters, now)
+        if prev is None or prev[0] != starttime:
+            # 首次采样仅建立基线
+            prev = (starttime, counters, now - 1)
+        cpu_rate, *rates = counter_rates(counters, prev[1], now - prev[2])
+        cpu_percent = cpu_rate / CLK_TCK * 100 if cpu_rate is not None else 0.0
+
+        details = self._details.get(pid)
+        if detail or details is None or details[0] != starttime:
+            details = self._sample_details(pid, starttime, now)
+        _, fds, inodes, ctx_rates, tcp_counts = details
+        return comm, ppid, cpu_percent, rss, vsize, threads, fds, ctx_rates + rates, inodes, tcp_counts
+
+    def _memory_percent(self, rss):
+        return rss / 1024 / self.mem_total_kb * 100 if self.mem_total_kb else 0
+
+    def sample_services(self, now, detail=True):
+        """采样全部服务，detail 为 collect_details() 的结果；返回 (按服务汇总的行, 逐进程明细行)
+
+        汇总值为服务内各进程之和；RSS 直接相加会重复计入 fork 出的 worker 之间共享的页，
+        socket 按 inode 去重，父子进程共享的监听 socket 只计一次
+        """
+        if self._tcp is None:
+            self.collect_details(now)
+        sockets, _, time_wait_ports = self._tcp
+        rows = []
+        details = []
+        for service, pids in self.targets.items():
+            alive = []
+            cpu = rss = vsize = threads = fds = 0
+            rate_totals = [None] * len(RATE_COLUMNS)
+            service_inodes = set()
+            # 服务的 TCP 计数只在明细采集轮按 inode 去重重算
+            refresh_tcp = detail or service not in self._service_tcp
+            for pid in pids:
+                sample = self.sample_process(pid, now, detail)
+                if sample is None:
+                    continue
+                alive.append(pid)
+                comm, ppid, pid_cpu, pid_rss, pid_vsize, pid_threads, pid_fds, rates, inodes, tcp_counts = sample
+                cpu += pid_cpu
+                rss += pid_rss
+                vsize += pid_vsize
+                threads += pid_threads
+                fds += pid_fds
+                if refresh_tcp:
+                    service_inodes |= inodes
+                for i, value in enumerate(rates):
+                    if value is not None:
+                        rate_totals[i] = (rate_totals[i] or 0) + value
+                details.append([service, pid, ppid, comm, f"{pid_cpu:.2f}", f"{pid_rss / 1048576:.2f}",
+                                f"{pid_vsize / 1048576:.2f}", f"{self._memory_percent(pid_rss):.2f}",
+                                pid_threads, pid_fds] + format_rates(rates) + tcp_counts)
+            if not alive:
+                continue
+            if refresh_tcp:
+                self._service_tcp[service] = count_tcp(service_inodes, sockets, time_wait_ports)
+            rows.append([service, alive[0], f"{cpu:.2f}", f"{rss / 1048576:.2f}", f"{vsize / 1048576:.2f}",
+                         f"{self._memory_percent(rss):.2f}", threads, fds, len(alive)] +
+                        format_rates(rate_totals) + ['', ''] + self._service_tcp[service])
+        return rows, details
+
+    def sample_system(self, now, detail=True):
+        """采样系统整体 CPU、内存、缺页、磁盘与网卡吞吐及 TCP 连接总数，前 9 列沿用原 system 行格式
+
+        CPU 与内存每轮读取；缺页、磁盘与网卡吞吐与 TCP 连接总数同属明细，detail 为 False 时沿用最近一次的值
+        """
+        read = self._files.read
+        total, idle = read_system_cpu(read)
+        prev = self._prev_system
+        self._prev_system = (total, idle)
+        if prev is None or total == prev[0]:
+            cpu_percent = 0.0
+        else:
+            cpu_percent = (1 - (idle - prev[1]) / (total - prev[0])) * 100
+        if detail or self._system_rates is None:
+            counters = read_vmstat_faults(read) + read_disk_bytes(self.disks, read) + read_net_bytes(read)
+            prev = self._prev_system_counters
+            self._prev_system_counters = (counters, now)
+            self._system_rates = counter_rates(counters, prev[0] if prev else counters, now - prev[1] if prev else 1)
+
+        meminfo = read('/proc/meminfo')
+        available = find_counter(meminfo, b'MemAvailable:')
+        mem_total_mb = self.mem_total_kb / 1024
+        mem_used_mb = mem_total_mb - (available if available is not None else
+                                      find_counter(meminfo, b'MemFree:') or 0) / 1024
+        mem_percent = mem_used_mb / mem_total_mb * 100 if mem_total_mb else 0
+        return ['system', 0, f"{cpu_percent:.2f}", f"{mem_used_mb:.0f}", f"{mem_total_mb:.0f}",
+                f"{mem_percent:.2f}", 0, 0, 0, '', ''] + format_rates(self._system_rates) + \
+            [self._tcp[1][c] for c in TCP_COLUMNS]
+
+    def stop(self, *_):
+        self._stopped = True
+
+    def run(self, data_file, duration, detail_file=None):
+        """采样 duration 秒（None 表示直到收到停止信号），返回采样轮数
+
+        data_file 按扩展名写 CSV 或 Parquet；detail_file 非空时额外写出逐进程明细
+        """
+        os.makedirs(os.path.dirname(data_file), exist_ok=True)
+        start = time.perf_counter()
+        deadline = start + duration if duration else None
+        rounds = 0
+        buffer = []
+        detail_buffer = []
+        last_flush = start
+        last_scan = start
+        # perf_counter 与墙钟时间的锚点，与负载生成器相同的换算方式，采样时刻不受墙钟跳变影响
+        epoch_anchor = time.time() - start
+
+        writer = open_table(data_file, RESOURCE_HEADER)
+        detail_writer = open_table(detail_file, DETAIL_HEADER) if detail_file else None
+        try:
+            # 首轮仅建立 CPU 与计数器基线，不写入
+            self.sample_services(time.perf_counter(), self.collect_details(time.perf_counter()))
+            self.sample_system(time.perf_counter())
+
+            next_tick = start + self.interval
+            while not self._stopped and (deadline is None or next_tick <= deadline):
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_tick += self.interval
+
+                if time.perf_counter() - last_scan >= self.rescan_interval:
+                    self.resolve_targets()
+                    last_scan = time.perf_counter()
+
+                now = time.perf_counter()
+                epoch = f"{epoch_anchor + now:.3f}"
+                timestamp = datetime.fromtimestamp(epoch_anchor + now).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+                detail = self.collect_details(now)
+                rows, details = self.sample_services(now, detail)
+                buffer.extend([timestamp] + row + [epoch] for row in rows)
+                buffer.append([timestamp] + self.sample_system(now, detail) + [epoch])
+                if detail_file:
+                    detail_buffer.extend([timestamp] + row + [epoch] for row in details)
+                rounds += 1
+
+                if len(buffer) + len(detail_buffer) >= FLUSH_ROWS or now - last_flush >= FLUSH_INTERVAL:
+                    self._flush(writer, buffer, detail_writer, detail_buffer)
+                    last_flush = now
+
+            self._flush(writer, buffer, detail_writer, detail_buffer)
+        finally:
+            self._files.close_all()
+            writer.close()
+            if detail_writer is not None:
+                detail_writer.close()
+        return rounds
+
+    def sample_smaps(self):
+        """各服务全部进程的 smaps_rollup 之和（MB），返回 SMAPS_HEADER 中除时间列外的行"""
+        rows = []
+        for service, pids in self.targets.items():
+            totals = dict.fromkeys(SMAPS_FIELDS, 0)
+            count = 0
+            for pid in pids:
+                values = read_smaps_rollup(pid)
+                if values is None:
+                    continue
+                count += 1
+                for field in SMAPS_FIELDS:
+                    totals[field] += values.get(field, 0)
+            if count:
+                rows.append([service, pids[0], count] + [f"{totals[field] / 1024:.2f}" for field in SMAPS_FIELDS])
+        return rows
+
+    def run_soak(self, trend_file, duration, window_seconds, smaps_file=None, smaps_interval=0):
+        """长稳采样：每轮采样只计入各服务的滚动汇总，每 window_seconds 秒写出一行均值与最大值；
+        smaps_interval 大于 0 时每隔该秒数写出一次 smaps_rollup 快照。返回写出的窗口数"""
+        os.makedirs(os.path.dirname(trend_file), exist_ok=True)
+        start = time.perf_counter()
+        deadline = start + duration if duration else None
+        epoch_anchor = time.time() - start
+        windows = 0
+        aggregate = {}
+        window_start = start
+        last_scan = start
+        next_smaps = start
+
+        trend = open(trend_file, 'w', newline='', encoding='utf-8')
+        smaps = open(smaps_file, 'w', newline='', encoding='utf-8') if smaps_file and smaps_interval > 0 else None
+        trend_writer = csv.writer(trend)
+        trend_writer.writerow(SOAK_HEADER)
+        smaps_writer = csv.writer(smaps) if smaps is not None else None
+        if smaps_writer is not None:
+            smaps_writer.writerow(SMAPS_HEADER)
+        try:
+            self.sample_services(time.perf_counter(), self.collect_details(time.perf_counter()))
+            next_tick = start + self.interval
+            while not self._stopped and (deadline is None or next_tick <= deadline):
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_tick += self.interval
+
+                if time.perf_counter() - last_scan >= self.rescan_interval:
+                    self.resolve_targets()
+                    last_scan = time.perf_counter()
+
+                now = time.perf_counter()
+                rows, _ = self.sample_services(now, self.collect_details(now))
+                for row in rows:
+                    values = dict(zip(RESOURCE_HEADER[1:-1], row))
+                    entry = aggregate.setdefault(values['process'], {
+                        'samples': 0, 'sums': dict.fromkeys(SOAK_COLUMNS, 0.0),
+                        'memory_rss_max_mb': 0.0, 'threads_max': 0, 'fds_max': 0})
+                    entry['pid'] = values['pid']
+                    entry['samples'] += 1
+                    for column in SOAK_COLUMNS:
+                        entry['sums'][column] += float(values[column])
+                    entry['memory_rss_max_mb'] = max(entry['memory_rss_max_mb'], float(values['memory_rss_mb']))
+                    entry['threads_max'] = max(entry['threads_max'], values['threads'])
+                    entry['fds_max'] = max(entry['fds_max'], values['fds'])
+
+                if smaps_writer is not None and now >= next_smaps:
+                    next_smaps = now + smaps_interval
+                    timestamp = datetime.fromtimestamp(epoch_anchor + now).strftime('%Y-%m-%d %H:%M:%S')
+                    smaps_writer.writerows([timestamp] + row + [f"{epoch_anchor + now:.3f}"]
+                                           for row in self.sample_smaps())
+                    smaps.flush()
+
+                if now - window_start >= window_seconds:
+                    self._write_soak_window(trend_writer, aggregate, epoch_anchor + window_start, epoch_anchor + now)
+                    trend.flush()
+                    aggregate = {}
+                    window_start = now
+                    windows += 1
+
+            if aggregate:
+                self._write_soak_window(trend_writer, aggregate, epoch_anchor + window_start,
+                                        epoch_anchor + time.perf_counter())
+                windows += 1
+        finally:
+            self._files.close_all()
+            trend.close()
+            if smaps is not None:
+                smaps.close()
+        return windows
+
+    @staticmethod
+    def _write_soak_window(writer, aggregate, start_epoch, end_epoch):
+        for service, entry in aggregate.items():
+            samples = entry['samples']
+            writer.writerow([f"{start_epoch:.3f}", f"{end_epoch:.3f}", service, entry['pid'], samples] +
+                            [f"{entry['sums'][column] / samples:.2f}" for column in SOAK_COLUMNS] +
+                            [f"{entry['memory_rss_max_mb']:.2f}", entry['threads_max'], entry['fds_max']])
+
+    @staticmethod
+    def _flush(writer, buffer, detail_writer, detail_buffer):
+        writer.write_rows(buffer)
+        writer.flush()
+        buffer.clear()
+        if detail_writer is not None:
+            detail_writer.write_rows(detail_buffer)
+            detail_writer.flush()
+        detail_buffer.clear()
+
+
+def format_pids(pids):
+    return ','.join(str(pid) for pid in pids)
+
+
+def self_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def monitor(args, config):
+    """监控指定时长，输出 resource_usage_<test_name>.csv（或 .parquet）"""
+    monitoring = config.get('monitoring', {})
+    interval = args.interval or monitoring.get('sample_interval_seconds', 1)
+    rescan_interval = monitoring.get('rescan_interval_seconds', RESCAN_INTERVAL)
+    detail_interval = monitoring.get('detail_interval_seconds', DETAIL_INTERVAL)
+    requested_format = args.data_format or config.get('output', {}).get('file_formats', {}).get('data', 'csv')
+    data_format = resolve_format(requested_format)
+    if data_format != requested_format.lower():
+        logger.warning("未安装 pyarrow，资源数据回退为 CSV 格式（pip3 install pyarrow 启用 Parquet）")
+
+    data_file = data_path(os.path.join(args.output_dir, f"resource_usage_{args.test_name}"), data_format)
+    detail_file = data_path(os.path.join(args.output_dir, f"resource_detail_{args.test_name}"), data_format)
+    logger.info(f"开始资源监控: {args.test_name}")
+    logger.info(f"监控时长: {args.duration}秒, 采样间隔: {interval}秒, 进程树重扫间隔: {rescan_interval}秒, "
+                f"上下文切换/fd/TCP 采集间隔: {max(detail_interval, interval)}秒")
+    logger.info(f"输出文件: {data_file}")
+    logger.info(f"逐进程明细: {detail_file}")
+
+    sampler = ResourceSampler(service_executables(config), interval, rescan_interval, detail_interval)
+    targets = sampler.resolve_targets()
+    if not targets:
+        logger.error("错误: 未找到 trustee 相关进程")
+        return 1
+    logger.info("监控进程PID: " + ' '.join(f"{name}={format_pids(pids)}" for name, pids in targets.items()))
+
+    signal.signal(signal.SIGTERM, sampler.stop)
+    signal.signal(signal.SIGINT, sampler.stop)
+
+    cpu_start = self_cpu_seconds()
+    wall_start = time.perf_counter()
+    rounds = sampler.run(data_file, args.duration, detail_file)
+    wall_time = time.perf_counter() - wall_start
+    own_cpu = (self_cpu_seconds() - cpu_start) / wall_time * 100 if wall_time > 0 else 0
+
+    logger.info(f"采样轮数: {rounds}, 采样器自身 CPU 占用: {own_cpu:.2f}%")
+    logger.info(f"资源监控完成: {args.test_name}")
+    return 0
+
+
+def soak(args, config):
+    """长稳测试监控，输出 soak_trend_<test_name>.csv 与（可选）soak_smaps_<test_name>.csv"""
+    monitoring = config.get('monitoring', {})
+    settings = config.get('soak', {})
+    interval = args.interval or monitoring.get('sample_interval_seconds', 1)
+    window_seconds = args.window or settings.get('aggregate_seconds', 60)
+    smaps_interval = args.smaps_interval if args.smaps_interval is not None else \
+        settings.get('smaps_interval_seconds', 0)
+    trend_file = os.path.join(args.output_dir, f"soak_trend_{args.test_name}.csv")
+    smaps_file = os.path.join(args.output_dir, f"soak_smaps_{args.test_name}.csv")
+    logger.info(f"开始长稳测试监控: {args.test_name}")
+    logger.info(f"监控时长: {args.duration or '直到停止'}秒, 采样间隔: {interval}秒, 聚合窗口: {window_seconds}秒")
+    logger.info(f"趋势文件: {trend_file}")
+    if smaps_interval > 0:
+        logger.info(f"smaps_rollup 快照间隔: {smaps_interval}秒, 输出: {smaps_file}")
+
+    sampler = ResourceSampler(service_executables(config), interval,
+                              monitoring.get('rescan_interval_seconds', RESCAN_INTERVAL),
+                              monitoring.get('detail_interval_seconds', DETAIL_INTERVAL))
+    targets = sampler.resolve_targets()
+    if not targets:
+        logger.error("错误: 未找到 trustee 相关进程")
+        return 1
+    logger.info("监控进程PID: " + ' '.join(f"{name}={format_pids(pids)}" for name, pids in targets.items()))
+    if smaps_interval > 0 and not any(read_smaps_rollup(pids[0]) for pids in targets.values()):
+        logger.warning("警告: 无法读取 smaps_rollup（需要 Linux 4.14+ 且与服务同用户或 root），不输出内存映射快照")
+        smaps_interval = 0
+
+    signal.signal(signal.SIGTERM, sampler.stop)
+    signal.signal(signal.SIGINT, sampler.stop)
+    windows = sampler.run_soak(trend_file, args.duration, window_seconds, smaps_file, smaps_interval)
+    logger.info(f"长稳测试监控完成: {args.test_name}, 聚合窗口数: {windows}")
+    return 0
+
+
+def realtime(args, config):
+    """实时监控（直到 Ctrl+C），输出 realtime_monitor.csv 宽表"""
+    interval = args.interval or config.get('monitoring', {}).get('sample_interval_seconds', 1)
+    csv_file = os.path.join(args.output_dir, 'realtime_monitor.csv')
+    sampler = ResourceSampler(service_executables(config), interval)
+    signal.signal(signal.SIGTERM, sampler.stop)
+    signal.signal(signal.SIGINT, sampler.stop)
+
+    print("开始实时监控，按 Ctrl+C 停止...", file=sys.stderr)
+    sampler.collect_details(time.perf_counter())
+    sampler.sample_system(time.perf_counter())
+    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(REALTIME_HEADER)
+        next_tick = time.perf_counter() + interval
+        while not sampler._stopped:
+            # 实时模式下进程可能重启或派生新 worker，每轮重新扫描进程树
+            sampler.resolve_targets()
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_tick += interval
+
+            now = time.perf_counter()
+            detail = sampler.collect_details(now)
+            rows = {row[0]: row for row in sampler.sample_services(now, detail)[0]}
+            system = sampler.sample_system(now, detail)
+            line = [datetime.now().strftime('%Y-%m-%d %H:%M:%S'), system[2], system[3]]
+            for name in DEFAULT_PROCESSES:
+                row = rows.get(name)
+                line += [row[2], row[3]] if row else [0, 0]
+            writer.writerow(line)
+            f.flush()
+
+    print("监控已停止", file=sys.stderr)
+    return 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Trustee Service 资源采样器（/proc）')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='测试配置文件路径')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='原始数据输出目录')
+    parser.add_argument('--log-file', default=DEFAULT_LOG_FILE, help='日志文件路径')
+    parser.add_argument('--interval', type=float, help='采样间隔（秒），支持 0.1 等亚秒间隔')
+    parser.add_argument('--data-format', choices=DATA_FORMATS,
+                        help='资源数据格式，默认取配置 output.file_formats.data（parquet 需 pyarrow）')
+
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+    mon = subparsers.add_parser('monitor', help='监控指定时长')
+    mon.add_argument('test_name', nargs='?', default='default', help='测试名称')
+    mon.add_argument('duration', type=float, nargs='?', default=120, help='监控时长（秒）')
+    subparsers.add_parser('realtime', help='实时监控（按Ctrl+C停止）')
+    soak_parser = subparsers.add_parser('soak', help='长稳测试监控：按聚合窗口输出资源趋势，内存占用与时长无关')
+    soak_parser.add_argument('test_name', nargs='?', default='soak', help='测试名称')
+    soak_parser.add_argument('duration', type=float, nargs='?', default=0, help='监控时长（秒），0 表示直到收到停止信号')
+    soak_parser.add_argument('--window', type=float, help='聚合窗口（秒），默认取配置 soak.aggregate_seconds')
+    soak_parser.add_argument('--smaps-interval', type=float,
+                             help='smaps_rollup 快照间隔（秒），0 为不采集，默认取配置 soak.smaps_interval_seconds')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    config = load_config(args.config)
+    if args.mode == 'realtime':
+        sys.exit(realtime(args, config))
+    setup_logging(args.log_file)
+    if args.mode == 'soak':
+        sys.exit(soak(args, config))
+    sys.exit(monitor(args, config))
+
+
+if __name__ == '__main__':
+    main()
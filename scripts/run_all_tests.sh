@@ -70,6 +70,22 @@ check_environment() {
         "scripts/install_dependencies.sh"
         "scripts/monitor_resources.sh"
         "scripts/concurrent_test.sh"
+        "scripts/load_generator.py"
+        "scripts/rcar_client.py"
+        "scripts/live_stats.py"
+        "scripts/latency_histogram.py"
+        "scripts/data_store.py"
+        "scripts/report_benchmark.py"
+        "scripts/resource_sampler.py"
+        "scripts/metrics_scraper.py"
+        "scripts/load_coordinator.py"
+        "scripts/capacity_search.py"
+        "scripts/scenarios.py"
+        "scripts/tail_capture.py"
+        "scripts/kbs_stub.py"
+        "scripts/run_catalog.py"
+        "scripts/scalability_model.py"
+        "scripts/leak_trend.py"
         "scripts/run_performance_test.sh"
         "scripts/generate_report.py"
     )
@@ -111,6 +127,50 @@ install_dependencies() {
     echo ""
 }
 
+# 检查 Python 模块：逐个导入 run_performance_test.sh 可能调用的脚本（连同其导入的平铺模块与第三方包），
+# 缺失的模块或依赖在测试开始前暴露；pyarrow 只在 Parquet 输出时需要，缺失时回退为 CSV，仅提示
+check_python_modules() {
+    print_header "🐍 Python 模块检查"
+    echo ""
+    
+    local modules=(
+        "load_generator"
+        "load_coordinator"
+        "capacity_search"
+        "scenarios"
+        "tail_capture"
+        "kbs_stub"
+        "resource_sampler"
+        "metrics_scraper"
+        "run_catalog"
+        "generate_report"
+    )
+    local failed=0
+    local module error
+    
+    for module in "${modules[@]}"; do
+        if error=$(cd "$SCRIPT_DIR" && python3 -c "import $module" 2>&1); then
+            print_info "✓ $module 可导入"
+        else
+            print_error "✗ $module 导入失败: $(echo "$error" | tail -n 1)"
+            failed=$((failed + 1))
+        fi
+    done
+    
+    if python3 -c "import pyarrow.parquet" 2>/dev/null; then
+        print_info "✓ pyarrow 可用，数据文件可写为 Parquet"
+    else
+        print_warning "未安装 pyarrow，数据文件回退为 CSV 格式（pip3 install pyarrow 启用 Parquet）"
+    fi
+    
+    if [ $failed -gt 0 ]; then
+        print_error "$failed 个 Python 模块无法导入"
+        return 1
+    fi
+    print_success "Python 模块检查通过"
+    echo ""
+}
+
 # 检查服务状态
 check_services() {
     print_header "🔧 服务状态检查"
@@ -224,7 +284,7 @@ show_results() {
         fi
         
         # 显示数据文件数量
-        local data_files=$(find "$results_dir/raw_data" -name "*.csv" -type f 2>/dev/null | wc -l)
+        local data_files=$(find "$results_dir/raw_data" \( -name "*.csv" -o -name "*.parquet" \) -type f 2>/dev/null | wc -l)
         print_info "  📈 数据文件: $data_files 个 CSV 文件"
         
         echo ""
@@ -251,6 +311,8 @@ cleanup() {
     # 停止可能仍在运行的后台进程
     pkill -f "monitor_resources.sh" 2>/dev/null || true
     pkill -f "concurrent_test.sh" 2>/dev/null || true
+    pkill -f "resource_sampler.py" 2>/dev/null || true
+    pkill -f "metrics_scraper.py" 2>/dev/null || true
     pkill -f "kbs-client" 2>/dev/null || true
     
     print_info "清理完成"
@@ -339,6 +401,8 @@ main() {
         print_info "跳过依赖安装"
     fi
     
+    check_python_modules
+    
     if [ "$skip_service_check" = false ]; then
         check_services
     else
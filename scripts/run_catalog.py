@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试运行目录与性能回归对比
+作者: AI Assistant
+用途: 以 SQLite 按运行收录构建版本、主机、配置哈希及各并发量/到达率的汇总统计与延迟直方图；
+      compare 逐级别对比两次或多次运行，对延迟分布做两样本 KS 检验，
+      超过阈值且统计显著的回归写入 HTML/JSON 并以退出码 1 返回，便于 CI 判定；
+      另以 harness_runs/harness_metrics 表收录负载工具自身基准（harness_benchmark.py）的逐提交结果
+"""
+
+import os
+import sys
+import argparse
+import hashlib
+import json
+import math
+import shutil
+import socket
+import sqlite3
+import tempfile
+from datetime import datetime
+
+from latency_histogram import LatencyHistogram
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+DEFAULT_CONFIG = os.path.join(PROJECT_ROOT, 'config', 'test_config.json')
+DEFAULT_CATALOG = os.path.join(PROJECT_ROOT, 'results', 'run_catalog.db')
+
+LEVEL_COLUMNS = ['total_requests', 'success_rate', 'qps', 'avg_response_time', 'p50_response_time',
+                 'p95_response_time', 'p99_response_time', 'max_response_time', 'cpu_avg', 'memory_avg']
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    test_name TEXT,
+    build TEXT,
+    host TEXT,
+    config_hash TEXT,
+    started_at TEXT,
+    ingested_at TEXT,
+    data_dir TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_build ON runs (build);
+CREATE INDEX IF NOT EXISTS runs_host_config ON runs (host, config_hash, started_at);
+CREATE TABLE IF NOT EXISTS levels (
+    run_id TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    level TEXT NOT NULL,
+    {', '.join(f'{column} REAL' for column in LEVEL_COLUMNS)},
+    histogram TEXT,
+    PRIMARY KEY (run_id, mode, level)
+);
+CREATE TABLE IF NOT EXISTS harness_runs (
+    run_id TEXT PRIMARY KEY,
+    git_commit TEXT,
+    host TEXT,
+    settings_hash TEXT,
+    started_at TEXT,
+    settings TEXT
+);
+CREATE INDEX IF NOT EXISTS harness_runs_host_settings ON harness_runs (host, settings_hash, started_at);
+CREATE TABLE IF NOT EXISTS harness_metrics (
+    run_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    unit TEXT,
+    better TEXT,
+    PRIMARY KEY (run_id, metric)
+);
+"""
+# 默认回归判定：延迟分位数上升或吞吐下降超过阈值百分比，且延迟分布 KS 检验 p 值低于显著性水平
+DEFAULT_REGRESSION = {
+    'threshold_percent': 10.0,
+    'significance': 0.01,
+    'success_rate_drop_percent': 1.0
+}
+# 负载工具基准的绝对容差：变化同时超过阈值百分比与该单位的绝对量才算回归，避免亚毫秒级指标的噪声误报
+HARNESS_TOLERANCE = {'ms': 0.5, 's': 0.05, 'us/req': 5.0, 'MB': 5.0, '%': 1.0}
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_ERROR = 2
+
+
+def config_hash(config_path):
+    """配置内容的短哈希（键排序后的 JSON），相同配置的运行才可直接比较"""
+    if not config_path or not os.path.exists(config_path):
+        return None
+    with open(config_path, 'r', encoding='utf-8') as f:
+        content = json.dumps(json.load(f), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+
+
+def regression_settings(config_path=None, **overrides):
+    """合并默认值、配置中的 regression 段与命令行覆盖值"""
+    settings = dict(DEFAULT_REGRESSION)
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            settings.update(json.load(f).get('regression', {}))
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    return settings
+
+
+def connect(db_path):
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+
+def record_run(db, run_id, levels, test_name=None, build=None, host=None, config_digest=None,
+               started_at=None, data_dir=None):
+    """收录一次运行；同一 run_id 重复收录时整体替换"""
+    with db:
+        db.execute("DELETE FROM levels WHERE run_id = ?", (run_id,))
+        db.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                   (run_id, test_name or run_id, build or 'unknown', host or socket.gethostname(), config_digest,
+                    started_at, datetime.now().isoformat(timespec='seconds'),
+                    os.path.abspath(data_dir) if data_dir else None))
+        db.executemany(
+            f"INSERT INTO levels VALUES (?, ?, ?, {', '.join('?' for _ in LEVEL_COLUMNS)}, ?)",
+            [(run_id, level['mode'], str(level['level'])) + tuple(level.get(column) for column in LEVEL_COLUMNS) +
+             (json.dumps(level['histogram'].to_dict()) if level.get('histogram') is not None else None,)
+             for level in levels])
+
+
+def record_generator(db, generator, run_id, build=None, host=None, config_digest=None):
+    """收录已完成分析的报告生成器（TrusteeReportGenerator）中的运行数据，返回收录的级别数"""
+    levels = generator.catalog_levels()
+    starts = [window['start'] for windows in list(generator.latency_windows.values()) +
+              list(generator.open_loop_windows.values()) for window in windows]
+    started_at = datetime.fromtimestamp(min(starts)).isoformat(timespec='seconds') if starts else None
+    record_run(db, run_id, levels, generator.test_name, build, host, config_digest, started_at, generator.data_dir)
+    return len(levels)
+
+
+def _level_key(level):
+    mode, value = level
+    try:
+        return mode, float(value.split('-')[0])
+    except ValueError:
+        return mode, math.inf
+
+
+def load_run(db, run_id):
+    """返回 (运行信息, {(模式, 级别): 统计})，运行不存在时返回 (None, {})"""
+    run = db.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if run is None:
+        return None, {}
+    levels = {}
+    for row in db.execute("SELECT * FROM levels WHERE run_id = ?", (run_id,)):
+        stats = {column: row[column] for column in LEVEL_COLUMNS}
+        stats['histogram'] = LatencyHistogram.from_dict(json.loads(row['histogram'])) if row['histogram'] else None
+        levels[(row['mode'], row['level'])] = stats
+    return dict(run), dict(sorted(levels.items(), key=lambda item: _level_key(item[0])))
+
+
+def resolve_run(db, spec, exclude=None):
+    """运行标识：run_id、latest（最近一次）或 auto（与 exclude 同主机同配置的最近一次，缺少时同配置的最近一次）"""
+    if spec not in ('latest', 'auto'):
+        return spec
+    query = "SELECT run_id FROM runs WHERE run_id != ?"
+    params = [exclude or '']
+    if spec == 'auto' and exclude:
+        current = db.execute("SELECT host, config_hash, started_at FROM runs WHERE run_id = ?",
+                             (exclude,)).fetchone()
+        if current is not None:
+            for filters in (("host = ?", "config_hash IS ?"), ("config_hash IS ?",)):
+                values = [current['host'], current['config_hash']][-len(filters):]
+                row = db.execute(f"{query} AND {' AND '.join(filters)} AND (started_at IS NULL OR ? IS NULL "
+                                 f"OR started_at <= ?) ORDER BY started_at DESC, ingested_at DESC LIMIT 1",
+                                 params + values + [current['started_at'], current['started_at']]).fetchone()
+                if row is not None:
+                    return row['run_id']
+            return None
+    row = db.execute(f"{query} ORDER BY started_at DESC, ingested_at DESC LIMIT 1", params).fetchone()
+    return row['run_id'] if row is not None else None
+
+
+def record_harness_run(db, run_id, metrics, git_commit=None, host=None, settings=None, settings_digest=None,
+                       started_at=None):
+    """收录一次负载工具自身基准；metrics 为 {指标名: {'value', 'unit', 'better'}}，better 为 higher 或 lower"""
+    with db:
+        db.execute("DELETE FROM harness_metrics WHERE run_id = ?", (run_id,))
+        db.execute("INSERT OR REPLACE INTO harness_runs VALUES (?, ?, ?, ?, ?, ?)",
+                   (run_id, git_commit or 'unknown', host or socket.gethostname(), settings_digest,
+                    started_at or datetime.now().isoformat(timespec='seconds'),
+                    json.dumps(settings, sort_keys=True) if settings is not None else None))
+        db.executemany("INSERT INTO harness_metrics VALUES (?, ?, ?, ?, ?)",
+                       [(run_id, name, metric['value'], metric['unit'], metric['better'])
+                        for name, metric in metrics.items() if metric['value'] is not None])
+
+
+def load_harness_run(db, run_id):
+    """返回 (运行信息, {指标名: 指标})，运行不存在时返回 (None, {})"""
+    run = db.execute("SELECT * FROM harness_runs WHERE run_id = ?", (run_id,)).fetchone()
+    if run is None:
+        return None, {}
+    metrics = {row['metric']: {'value': row['value'], 'unit': row['unit'], 'better': row['better']}
+               for row in db.execute("SELECT * FROM harness_metrics WHERE run_id = ? ORDER BY metric", (run_id,))}
+    return dict(run), metrics
+
+
+def resolve_harness_run(db, spec, exclude=None):
+    """负载工具基准的运行标识：run_id、latest 或 auto（与 exclude 同主机同基准参数的上一次运行）"""
+    if spec not in ('latest', 'auto'):
+        return spec
+    query = "SELECT run_id FROM harness_runs WHERE run_id != ?"
+    params = [exclude or '']
+    if spec == 'auto' and exclude:
+        current = db.execute("SELECT host, settings_hash, started_at FROM harness_runs WHERE run_id = ?",
+                             (exclude,)).fetchone()
+        if current is None:
+            return None
+        query += " AND host = ? AND settings_hash IS ? AND started_at <= ?"
+        params += [current['host'], current['settings_hash'], current['started_at']]
+    row = db.execute(f"{query} ORDER BY started_at DESC LIMIT 1", params).fetchone()
+    return row['run_id'] if row is not None else None
+
+
+def compare_harness_metrics(baseline, candidate, threshold_percent):
+    """逐指标对比两次负载工具基准，返回行列表；按 better 方向变差超过阈值百分比与单位容差的为回归，
+    better 为 none 的指标只列出变化"""
+    rows = []
+    for name, before in baseline.items():
+        after = candidate.get(name)
+        if after is None:
+            continue
+        change = _change(before['value'], after['value'])
+        worse = after['value'] - before['value'] if before['better'] == 'lower' else before['value'] - after['value']
+        regression = (before['better'] in ('higher', 'lower') and change is not None and
+                      abs(change) > threshold_percent and worse > HARNESS_TOLERANCE.get(before['unit'], 0.0))
+        rows.append({'metric': name, 'unit': before['unit'], 'better': before['better'],
+                     'baseline': before['value'], 'candidate': after['value'], 'change': change,
+                     'regression': regression})
+    return rows
+
+
+def ks_test(first, second):
+    """两个延迟直方图的两样本 Kolmogorov-Smirnov 检验，返回 (D 统计量, 渐近 p 值)；
+    同一分桶下比较各桶上界处的累计分布，分桶误差使检验略偏保守"""
+    if not first.count or not second.count:
+        return 0.0, 1.0
+    d = 0.0
+    seen_first = seen_second = 0
+    for index in sorted(set(first.counts) | set(second.counts)):
+        seen_first += first.counts.get(index, 0)
+        seen_second += second.counts.get(index, 0)
+        d = max(d, abs(seen_first / first.count - seen_second / second.count))
+    effective = first.count * second.count / (first.count + second.count)
+    lam = (math.sqrt(effective) + 0.12 + 0.11 / math.sqrt(effective)) * d
+    if lam < 1e-3:
+        return d, 1.0
+    p_value = 0.0
+    for j in range(1, 101):
+        term = 2 * (-1) ** (j - 1) * math.exp(-2 * j * j * lam * lam)
+        p_value += term
+        if abs(term) < 1e-12:
+            break
+    return d, min(max(p_value, 0.0), 1.0)
+
+
+def _change(baseline, candidate):
+    if not baseline:
+        return None
+    return (candidate - baseline) / baseline * 100
+
+
+def compare_levels(baseline, candidate, settings):
+    """逐级别对比两次运行，返回行列表；regressions 非空的行为回归"""
+    rows = []
+    threshold = settings['threshold_percent']
+    for key in baseline:
+        if key not in candidate:
+            continue
+        before, after = baseline[key], candidate[key]
+        d, p_value = (ks_test(before['histogram'], after['histogram'])
+                      if before['histogram'] is not None and after['histogram'] is not None else (None, None))
+        significant = p_value is not None and p_value < settings['significance']
+        changes = {column: _change(before[column], after[column])
+                   for column in ('p50_response_time', 'p95_response_time', 'p99_response_time', 'qps')}
+        regressions = []
+        for column, label in (('p50_response_time', 'P50'), ('p99_response_time', 'P99')):
+            change = changes[column]
+            if change is not None and change > threshold and significant:
+                regressions.append(f"{label} +{change:.1f}%")
+        if changes['qps'] is not None and changes['qps'] < -threshold:
+            regressions.append(f"QPS {changes['qps']:.1f}%")
+        success_drop = (before['success_rate'] or 0) - (after['success_rate'] or 0)
+        if success_drop > settings['success_rate_drop_percent']:
+            regressions.append(f"成功率 -{success_drop:.2f}pp")
+        rows.append({
+            'mode': key[0],
+            'level': key[1],
+            'baseline': before,
+            'candidate': after,
+            'changes': changes,
+            'ks_statistic': d,
+            'p_value': p_value,
+            'regressions': regressions
+        })
+    return rows
+
+
+def compare_runs(db, run_ids, settings):
+    """第一个运行为基线，其余逐个与之对比；返回对比结果列表，运行不存在时抛出 KeyError"""
+    baseline_run, baseline_levels = load_run(db, run_ids[0])
+    if baseline_run is None:
+        raise KeyError(run_ids[0])
+    results = []
+    for run_id in run_ids[1:]:
+        run, levels = load_run(db, run_id)
+        if run is None:
+            raise KeyError(run_id)
+        results.append({'baseline': baseline_run, 'candidate': run,
+                        'levels': compare_levels(baseline_levels, levels, settings)})
+    return results
+
+
+def has_regression(results):
+    return any(row['regressions'] for result in results for row in result['levels'])
+
+
+def _format_change(value):
+    return f"{value:+.1f}%" if value is not None else '-'
+
+
+def comparison_rows(result):
+    """单个对比结果转为报告表格行（毫秒与百分比格式）"""
+    rows = []
+    for row in result['levels']:
+        before, after, changes = row['baseline'], row['candidate'], row['changes']
+        unit = '并发' if row['mode'] == 'closed' else 'req/s'
+        rows.append({
+            '级别': f"{row['level']} {unit}",
+            'P50(ms)': f"{before['p50_response_time'] * 1000:.2f} → {after['p50_response_time'] * 1000:.2f} "
+                       f"({_format_change(changes['p50_response_time'])})",
+            'P99(ms)': f"{before['p99_response_time'] * 1000:.2f} → {after['p99_response_time'] * 1000:.2f} "
+                       f"({_format_change(changes['p99_response_time'])})",
+            'QPS': f"{before['qps']:.1f} → {after['qps']:.1f} ({_format_change(changes['qps'])})",
+            '成功率(%)': f"{before['success_rate']:.2f} → {after['success_rate']:.2f}",
+            'KS D / p': f"{row['ks_statistic']:.3f} / {row['p_value']:.2g}" if row['p_value'] is not None else '-',
+            '结论': '；'.join(row['regressions']) or '无回归'
+        })
+    return rows
+
+
+def comparison_summary(result, settings):
+    regressed = [row for row in result['levels'] if row['regressions']]
+    head = (f"基线 {result['baseline']['run_id']}（构建 {result['baseline']['build']}）→ "
+            f"{result['candidate']['run_id']}（构建 {result['candidate']['build']}），"
+            f"共同级别 {len(result['levels'])} 个")
+    if result['baseline']['config_hash'] != result['candidate']['config_hash']:
+        head += '，两次运行的配置不同，差异可能来自配置'
+    if not regressed:
+        return head + f"，未发现超过 {settings['threshold_percent']:g}% 的回归。"
+    return head + f"，<strong>{len(regressed)} 个级别出现回归</strong>。"
+
+
+def render_table(rows):
+    if not rows:
+        return ''
+    html = '<table><thead><tr>' + ''.join(f'<th>{key}</th>' for key in rows[0]) + '</tr></thead><tbody>'
+    for row in rows:
+        style = '' if row.get('结论', '无回归') == '无回归' else ' style="background:#fdecea"'
+        html += f'<tr{style}>' + ''.join(f'<td>{value}</td>' for value in row.values()) + '</tr>'
+    return html + '</tbody></table>'
+
+
+def write_html(path, results, settings):
+    """独立的回归对比 HTML 页面"""
+    sections = ''.join(f"<h2>{result['candidate']['run_id']}</h2><p>{comparison_summary(result, settings)}</p>"
+                       f"{render_table(comparison_rows(result))}" for result in results)
+    html = f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="UTF-8">
+<title>Trustee Service 性能回归对比</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 20px; }}
+table {{ border-collapse: collapse; width: 100%; margin: 10px 0 30px; }}
+th, td {{ border: 1px solid #ddd; padding: 6px 10px; text-align: left; }}
+th {{ background: #f5f5f5; }}
+</style>
+</head>
+<body>
+<h1>Trustee Service 性能回归对比</h1>
+<p>延迟分位数上升或 QPS 下降超过 {settings['threshold_percent']:g}%、成功率下降超过 {settings['success_rate_drop_percent']:g} 个百分点判定为回归；
+延迟回归还要求成功请求延迟分布的 KS 检验 p 值低于 {settings['significance']:g}。</p>
+{sections}
+<p>生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+</body>
+</html>
+"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return path
+
+
+def _json_ready(results):
+    """去掉直方图对象，便于写出 JSON"""
+    output = []
+    for result in results:
+        levels = []
+        for row in result['levels']:
+            row = dict(row)
+            row['baseline'] = {k: v for k, v in row['baseline'].items() if k != 'histogram'}
+            row['candidate'] = {k: v for k, v in row['candidate'].items() if k != 'histogram'}
+            levels.append(row)
+        output.append(dict(result, levels=levels))
+    return output
+
+
+def ingest(args):
+    from generate_report import TrusteeReportGenerator
+
+    run_id = args.run_id
+    db = connect(args.db)
+    if not args.replace and db.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone():
+        print(f"错误: 运行 {run_id} 已收录，覆盖请加 --replace", file=sys.stderr)
+        return EXIT_ERROR
+    # 只读取属于该次运行的数据文件：默认按文件名中的运行标识筛选，--latest 时每个级别取最新一批文件（旧版结果）
+    match = None if args.latest else (args.match or run_id)
+    work_dir = tempfile.mkdtemp(prefix='run_catalog_')
+    try:
+        generator = TrusteeReportGenerator(run_id, args.data_dir, work_dir, jobs=1, run_id=match)
+        generator.load_data()
+        generator.analyze()
+        if not generator.catalog_levels():
+            print(f"错误: {args.data_dir} 中没有运行 {match or run_id} 的数据文件", file=sys.stderr)
+            return EXIT_ERROR
+        count = record_generator(db, generator, run_id, args.build, args.host, config_hash(args.config))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"已收录 {run_id}: {count} 个级别")
+    return EXIT_OK
+
+
+def list_runs(args):
+    db = connect(args.db)
+    query = "SELECT r.*, COUNT(l.level) AS levels FROM runs r LEFT JOIN levels l ON l.run_id = r.run_id"
+    filters, params = [], []
+    for column in ('build', 'host'):
+        if getattr(args, column):
+            filters.append(f"r.{column} = ?")
+            params.append(getattr(args, column))
+    if filters:
+        query += ' WHERE ' + ' AND '.join(filters)
+    query += ' GROUP BY r.run_id ORDER BY r.started_at DESC, r.ingested_at DESC'
+    print(f"{'运行':<40} {'构建':<20} {'主机':<16} {'配置':<12} {'开始时间':<20} {'级别数':>6}")
+    for row in db.execute(query, params):
+        print(f"{row['run_id']:<40} {row['build'] or '-':<20} {row['host'] or '-':<16} "
+              f"{row['config_hash'] or '-':<12} {row['started_at'] or '-':<20} {row['levels']:>6}")
+    return EXIT_OK
+
+
+def compare(args):
+    db = connect(args.db)
+    settings = regression_settings(args.config, threshold_percent=args.threshold, significance=args.significance)
+    run_ids = list(args.runs)
+    if len(run_ids) == 1:
+        # 只给出待比较的运行时，基线取同主机同配置的上一次运行
+        candidate = resolve_run(db, run_ids[0])
+        run_ids = [resolve_run(db, 'auto', exclude=candidate), candidate]
+    else:
+        run_ids[0] = resolve_run(db, run_ids[0], exclude=run_ids[1])
+    if None in run_ids:
+        print("错误: 找不到可作为基线的运行", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        results = compare_runs(db, run_ids, settings)
+    except KeyError as e:
+        print(f"错误: 运行不存在: {e.args[0]}", file=sys.stderr)
+        return EXIT_ERROR
+
+    for result in results:
+        print(comparison_summary(result, settings).replace('<strong>', '').replace('</strong>', ''))
+        for row in comparison_rows(result):
+            marker = '!!' if row['结论'] != '无回归' else '  '
+            print(f"{marker} {row['级别']:<14} P99 {row['P99(ms)']:<32} QPS {row['QPS']:<28} {row['结论']}")
+    if args.html:
+        print(f"HTML: {write_html(args.html, results, settings)}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'regression': has_regression(results), 'results': _json_ready(results)},
+                      f, ensure_ascii=False, indent=2)
+        print(f"JSON: {args.json}")
+    return EXIT_REGRESSION if has_regression(results) else EXIT_OK
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试运行目录与性能回归对比')
+    parser.add_argument('--db', default=DEFAULT_CATALOG, help='运行目录 SQLite 文件')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='测试配置文件（计算配置哈希、读取 regression 阈值）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='收录一个结果目录（raw_data）')
+    ingest_parser.add_argument('data_dir', help='原始数据目录，如 results/raw_data')
+    ingest_parser.add_argument('--run-id', required=True, help='运行目录中的运行标识')
+    match_group = ingest_parser.add_mutually_exclusive_group()
+    match_group.add_argument('--match', help='只收录文件名含该运行标识的数据文件（负载生成器 --run-id，默认与 --run-id 相同）')
+    match_group.add_argument('--latest', action='store_true', help='数据文件名不含运行标识（旧版结果）时，每个级别取最新一批文件')
+    ingest_parser.add_argument('--replace', action='store_true', help='覆盖已收录的同名运行')
+    ingest_parser.add_argument('--build', help='被测 trustee 的构建/版本号')
+    ingest_parser.add_argument('--host', help='被测主机名（默认本机）')
+
+    list_parser = subparsers.add_parser('list', help='列出已收录的运行')
+    list_parser.add_argument('--build', help='只列出指定构建')
+    list_parser.add_argument('--host', help='只列出指定主机')
+
+    compare_parser = subparsers.add_parser(
+        'compare', help='逐级别对比运行（第一个为基线），有回归时退出码为 1')
+    compare_parser.add_argument('runs', nargs='+',
+                                help='运行标识；第一个可为 latest，只给一个时基线取同主机同配置的上一次运行')
+    compare_parser.add_argument('--threshold', type=float, help='回归阈值百分比（默认取配置 regression.threshold_percent）')
+    compare_parser.add_argument('--significance', type=float, help='KS 检验显著性水平')
+    compare_parser.add_argument('--html', help='写出 HTML 对比报告')
+    compare_parser.add_argument('--json', help='写出 JSON 对比结果')
+    args = parser.parse_args()
+
+    handlers = {'ingest': ingest, 'list': list_runs, 'compare': compare}
+    sys.exit(handlers[args.command](args))
+
+
+if __name__ == '__main__':
+    main()
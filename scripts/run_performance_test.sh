@@ -10,6 +10,15 @@ set -e
 TEST_NAME="trustee_performance_$(date +%Y%m%d_%H%M%S)"
 OUTPUT_DIR="results"
 LOG_FILE="$OUTPUT_DIR/logs/main_test.log"
+# 执行模式: sweep 逐个测试固定并发量，search 自适应搜索满足 thresholds 的最大并发量，
+# soak 以固定负载长时间运行并检测资源泄漏
+RUN_MODE="sweep"
+# 被测 trustee 的构建/版本号，随本次运行收录到运行目录，用于跨构建的回归对比
+TRUSTEE_BUILD="${TRUSTEE_BUILD:-unknown}"
+RUN_CATALOG="$OUTPUT_DIR/run_catalog.db"
+# 分布式负载生成：为空时由单个负载生成器施压；local:N 在本机启动 N 个代理进程，
+# 否则为代理地址列表（主机:端口,主机:端口），各级别的总并发量由协调器分给各代理
+LOAD_AGENTS="${LOAD_AGENTS:-}"
 
 # 创建输出目录
 mkdir -p "$OUTPUT_DIR"/{raw_data,reports,logs,charts}
@@ -126,6 +135,16 @@ run_performance_tests() {
     local cooldown_time=30
     
     log "测试配置: 并发量=${concurrency_levels[*]}, 持续=${test_duration}s, 预热=${warmup_time}s, 冷却=${cooldown_time}s"
+
+    local generator_args=()
+    if [[ "$LOAD_AGENTS" == local:* ]]; then
+        generator_args=(distributed --local "${LOAD_AGENTS#local:}")
+    elif [ -n "$LOAD_AGENTS" ]; then
+        generator_args=(distributed --agents "$LOAD_AGENTS")
+    fi
+    if [ ${#generator_args[@]} -gt 0 ]; then
+        log "分布式负载生成: ${generator_args[*]:1}"
+    fi
     
     # 为每个并发量执行测试
     for concurrency in "${concurrency_levels[@]}"; do
@@ -142,7 +161,7 @@ run_performance_tests() {
         sleep 2
         
         # 执行并发测试
-        local test_result=$("$script_dir/concurrent_test.sh" single "$concurrency" "$test_duration" "$warmup_time" "$cooldown_time")
+        local test_result=$("$script_dir/concurrent_test.sh" --run-id "$TEST_NAME" "${generator_args[@]}" single "$concurrency" "$test_duration" "$warmup_time" "$cooldown_time" | tail -n 1)
         
         # 等待监控完成
         wait $monitor_pid
@@ -157,6 +176,45 @@ run_performance_tests() {
     log "所有并发量测试完成"
 }
 
+# 自适应容量搜索：倍增确定区间、二分逼近拐点，再以完整时长确认
+run_capacity_search() {
+    log "开始自适应容量搜索（SLO 取 config/test_config.json 的 thresholds，参数见 capacity_search）..."
+
+    local script_dir="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+    local summary_file=$("$script_dir/concurrent_test.sh" --run-id "$TEST_NAME" search | tail -n 1)
+
+    log "容量搜索结果: $summary_file"
+    python3 -c "
+import json, sys
+summary = json.load(open(sys.argv[1], encoding='utf-8'))
+if summary['capacity'] is not None:
+    print(f\"满足 SLO 的最大并发量: {summary['capacity']}, QPS {summary['capacity_qps']:.2f}\")
+else:
+    print(f\"未确认满足 SLO 的并发量，短时探测通过的最大级别: {summary['best_probe_level']}\")
+print(f\"搜索耗时: {summary['elapsed_seconds'] / 60:.1f} 分钟, 测试级别数: {len(summary['probes'])}\")
+" "$summary_file" | while read -r line; do log "$line"; done
+}
+
+# 长稳测试：固定负载持续数小时，采样器按聚合窗口输出资源趋势与 smaps_rollup 快照
+run_soak_test() {
+    log "开始长稳测试（时长、负载、聚合窗口与 smaps 快照间隔见 config/test_config.json 的 soak）..."
+
+    local script_dir="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+    # 采样器运行到收到停止信号为止，覆盖预热与正式测试全程
+    "$script_dir/monitor_resources.sh" soak "$TEST_NAME" &
+    local monitor_pid=$!
+    sleep 2
+
+    local test_result=$("$script_dir/concurrent_test.sh" --run-id "$TEST_NAME" soak | tail -n 1)
+
+    # 停止信号使采样器写出最后一个聚合窗口
+    kill -TERM $monitor_pid 2>/dev/null || true
+    wait $monitor_pid || true
+
+    log "长稳测试完成，结果: $test_result"
+}
+
 # 生成测试报告
 generate_reports() {
     log "生成测试报告..."
@@ -166,9 +224,13 @@ generate_reports() {
     
     python3 "$script_dir/generate_report.py" \
         --test-name "$TEST_NAME" \
+        --run-id "$TEST_NAME" \
         --data-dir "$OUTPUT_DIR/raw_data" \
         --output-dir "$OUTPUT_DIR/reports" \
-        --log-file "$LOG_FILE"
+        --log-file "$LOG_FILE" \
+        --catalog "$RUN_CATALOG" \
+        --build "$TRUSTEE_BUILD" \
+        --baseline auto
     
     if [ $? -eq 0 ]; then
         log "报告生成成功"
@@ -188,18 +250,45 @@ cleanup_and_archive() {
     local archive_dir="$OUTPUT_DIR/archives"
     mkdir -p "$archive_dir"
     
-    # 打包测试结果
+    # 打包测试结果：覆盖重新入库（run_catalog.py ingest --run-id）与重新生成报告所需的全部数据，
+    # 包括各级别请求记录与逐级别报告、窗口统计、直方图（尾部采集的最慢/失败请求及服务日志写在其 tail 段）、
+    # 在途请求时间线、资源采样与逐进程明细、服务端指标、开环测试、容量搜索及其探测级别、长稳趋势、阶段日志与运行目录库；
+    # 只打包实际存在的文件（CSV 与 Parquet 二者取其一）
     local archive_file="$archive_dir/${TEST_NAME}.tar.gz"
-    tar -czf "$archive_file" \
-        -C "$OUTPUT_DIR" \
+    local files=()
+    mapfile -t files < <(cd "$OUTPUT_DIR" && shopt -s nullglob && for path in \
         raw_data/resource_usage_${TEST_NAME}_*.csv \
-        raw_data/concurrent_test_*_*.csv \
-        raw_data/concurrent_stats_*_*.csv \
+        raw_data/resource_usage_${TEST_NAME}_*.parquet \
+        raw_data/resource_detail_${TEST_NAME}_*.csv \
+        raw_data/resource_detail_${TEST_NAME}_*.parquet \
+        raw_data/server_metrics_${TEST_NAME}_*.csv \
+        raw_data/server_metrics_${TEST_NAME}_*.parquet \
+        raw_data/concurrent_test_*_${TEST_NAME}_*.csv \
+        raw_data/concurrent_test_*_${TEST_NAME}_*.parquet \
+        raw_data/concurrent_test_*_${TEST_NAME}_*_report.txt \
+        raw_data/concurrent_stats_*_${TEST_NAME}_*.csv \
+        raw_data/latency_histogram_*_${TEST_NAME}_*.json \
+        raw_data/concurrency_timeline_*_${TEST_NAME}_*.csv \
+        raw_data/open_loop_test_*_${TEST_NAME}_*.csv \
+        raw_data/open_loop_test_*_${TEST_NAME}_*.parquet \
+        raw_data/open_loop_test_*_${TEST_NAME}_*_report.txt \
+        raw_data/open_loop_stats_*_${TEST_NAME}_*.csv \
+        raw_data/open_loop_histogram_*_${TEST_NAME}_*.json \
+        raw_data/open_loop_summary.csv \
+        raw_data/capacity_probe_*_${TEST_NAME}_*.csv \
+        raw_data/capacity_probe_*_${TEST_NAME}_*.parquet \
+        raw_data/capacity_probe_*_${TEST_NAME}_*.json \
+        raw_data/capacity_search_*.csv \
+        raw_data/capacity_search_*.json \
+        raw_data/test_phases.csv \
+        raw_data/soak_trend_${TEST_NAME}.csv \
+        raw_data/soak_smaps_${TEST_NAME}.csv \
+        run_catalog.db \
         reports/${TEST_NAME}_*.html \
         reports/${TEST_NAME}_*.pdf \
         logs/main_test.log \
-        system_info.txt \
-        2>/dev/null || log "警告: 部分文件打包失败"
+        system_info.txt; do [ -e "$path" ] && echo "$path"; done)
+    tar -czf "$archive_file" -C "$OUTPUT_DIR" "${files[@]}" 2>/dev/null || log "警告: 部分文件打包失败"
     
     log "测试结果已归档: $archive_file"
     
@@ -275,11 +364,18 @@ main() {
     # 3. 收集系统信息
     collect_system_info
     
-    # 4. 执行性能测试
-    run_performance_tests
-    
-    # 5. 生成报告
-    generate_reports
+    # 4. 执行性能测试（容量搜索模式只输出搜索结果，不生成逐并发量报告）
+    if [ "$RUN_MODE" = "search" ]; then
+        run_capacity_search
+    elif [ "$RUN_MODE" = "soak" ]; then
+        run_soak_test
+        generate_reports
+    else
+        run_performance_tests
+
+        # 5. 生成报告
+        generate_reports
+    fi
     
     # 6. 清理和归档
     cleanup_and_archive
@@ -314,11 +410,20 @@ usage() {
     echo "  -h, --help     显示帮助信息"
     echo "  --dry-run      只检查环境，不执行测试"
     echo "  --quick        快速测试（较少并发量，较短时间）"
+    echo "  --search       自适应容量搜索，找出满足 thresholds 的最大并发量（通常数分钟）"
+    echo "  --soak         长稳测试，以固定负载运行数小时并检测资源泄漏（时长见配置 soak.duration_minutes）"
+    echo ""
+    echo "环境变量:"
+    echo "  LOAD_AGENTS    分布式负载生成：local:N 为本机 N 个代理进程，或代理地址列表 主机:端口,主机:端口"
+    echo "  TRUSTEE_BUILD  被测 trustee 的构建/版本号，随运行收录到运行目录"
     echo ""
     echo "例子:"
     echo "  $0              # 执行完整测试"
     echo "  $0 --dry-run    # 检查环境"
     echo "  $0 --quick      # 快速测试"
+    echo "  $0 --search     # 容量搜索"
+    echo "  $0 --soak       # 长稳测试"
+    echo "  LOAD_AGENTS=lab1:8790,lab2:8790 $0   # 由两台负载机共同施压"
 }
 
 # 处理命令行参数
@@ -340,6 +445,14 @@ case "${1:-}" in
         # 修改测试参数为快速模式
         # 这里可以重新定义并发量和持续时间
         ;;
+    "--search")
+        log "执行自适应容量搜索模式..."
+        RUN_MODE="search"
+        ;;
+    "--soak")
+        log "执行长稳测试模式..."
+        RUN_MODE="soak"
+        ;;
     "")
         # 正常执行
         ;;
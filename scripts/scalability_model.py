@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+可扩展性模型
+作者: AI Assistant
+用途: 以通用可扩展性定律（USL）拟合吞吐随并发量的变化，残差自助法估计参数与预测值的置信区间，
+      得出争用（σ）与一致性（κ）开销、吞吐峰值所在并发量，并预测未测试并发量下的吞吐与平均延迟；
+      只依赖 numpy
+"""
+
+import numpy as np
+
+# 拟合所需的最少并发量个数（模型有 3 个参数）
+MIN_LEVELS = 4
+# 自助法重采样次数与置信水平
+BOOTSTRAP_SAMPLES = 500
+CONFIDENCE = 0.95
+# Levenberg-Marquardt 迭代次数
+FIT_ITERATIONS = 100
+BOOTSTRAP_ITERATIONS = 30
+# 低于此值的争用 / 一致性系数视为 0（拟合的数值残留，如 3e-18），否则线性扩展时也会得出 1e19 量级的吞吐上限
+NEGLIGIBLE_COEFFICIENT = 1e-9
+
+
+def usl_throughput(n, lam, sigma, kappa):
+    """USL 吞吐 X(N) = λN / (1 + σ(N-1) + κN(N-1))；参数可为数组（按行广播）"""
+    n = np.asarray(n, dtype=float)
+    return lam * n / (1 + sigma * (n - 1) + kappa * n * (n - 1))
+
+
+def peak_concurrency(sigma, kappa):
+    """吞吐峰值所在并发量 N* = sqrt((1-σ)/κ)；κ 可忽略时吞吐单调趋近 λ/σ，返回 inf"""
+    sigma = np.asarray(sigma, dtype=float)
+    kappa = np.asarray(kappa, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(kappa > NEGLIGIBLE_COEFFICIENT, np.sqrt(np.clip(1 - sigma, 0, None) / kappa), np.inf)
+
+
+def max_throughput(lam, sigma, kappa):
+    """吞吐上限：κ > 0 时为 X(N*)，否则为 λ/σ（σ 也可忽略时线性扩展，返回 inf）"""
+    n_peak = peak_concurrency(sigma, kappa)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        asymptote = np.where(np.asarray(sigma) > NEGLIGIBLE_COEFFICIENT, lam / np.asarray(sigma, dtype=float), np.inf)
+        return np.where(np.isfinite(n_peak), usl_throughput(np.maximum(n_peak, 1), lam, sigma, kappa), asymptote)
+
+
+def _initial_guess(n, x):
+    """线性化 N/X = a + b(N-1) + cN(N-1) 的最小二乘解作为初值：λ=1/a, σ=b/a, κ=c/a"""
+    design = np.column_stack([np.ones_like(n), n - 1, n * (n - 1)])
+    (a, b, c), *_ = np.linalg.lstsq(design, n / x, rcond=None)
+    if a <= 0:
+        return np.array([x[0] / n[0], 0.0, 0.0])
+    return np.array([1 / a, min(max(b / a, 0.0), 1.0), max(c / a, 0.0)])
+
+
+def _refine(n, x, params, iterations):
+    """以相对残差最小二乘（吞吐越大波动越大）做 Levenberg-Marquardt，σ∈[0,1]、κ≥0"""
+    weights = 1 / x
+    damping = 1e-3
+
+    def cost(p):
+        return np.sum(((x - usl_throughput(n, *p)) * weights) ** 2)
+
+    current = cost(params)
+    for _ in range(iterations):
+        lam, sigma, kappa = params
+        denominator = 1 + sigma * (n - 1) + kappa * n * (n - 1)
+        fitted = lam * n / denominator
+        jacobian = np.column_stack([
+            n / denominator,
+            -fitted * (n - 1) / denominator,
+            -fitted * n * (n - 1) / denominator
+        ]) * weights[:, None]
+        residual = (x - fitted) * weights
+        normal = jacobian.T @ jacobian
+        gradient = jacobian.T @ residual
+        improved = False
+        while damping < 1e10:
+            try:
+                step = np.linalg.solve(normal + damping * np.diag(np.diag(normal) + 1e-12), gradient)
+            except np.linalg.LinAlgError:
+                damping *= 10
+                continue
+            candidate = params + step
+            candidate[0] = max(candidate[0], 1e-12)
+            candidate[1] = min(max(candidate[1], 0.0), 1.0)
+            candidate[2] = max(candidate[2], 0.0)
+            candidate_cost = cost(candidate)
+            if candidate_cost < current:
+                params, current = candidate, candidate_cost
+                damping = max(damping / 10, 1e-12)
+                improved = True
+                break
+            damping *= 10
+        if not improved or np.max(np.abs(step) / (np.abs(params) + 1e-12)) < 1e-9:
+            break
+    return params
+
+
+def fit_usl(concurrency, throughput, samples=BOOTSTRAP_SAMPLES, seed=0):
+    """拟合 USL，返回参数、拟合优度、峰值并发与吞吐上限及其置信区间；有效并发量不足 MIN_LEVELS 时返回 None"""
+    n = np.asarray(concurrency, dtype=float)
+    x = np.asarray(throughput, dtype=float)
+    valid = (n > 0) & (x > 0) & np.isfinite(x)
+    n, x = n[valid], x[valid]
+    if len(np.unique(n)) < MIN_LEVELS:
+        return None
+    order = np.argsort(n)
+    n, x = n[order], x[order]
+
+    params = _refine(n, x, _initial_guess(n, x), FIT_ITERATIONS)
+    fitted = usl_throughput(n, *params)
+    total = np.sum((x - x.mean()) ** 2)
+    r2 = 1 - np.sum((x - fitted) ** 2) / total if total > 0 else 1.0
+
+    # 残差自助法：相对残差按自由度放大后重采样，叠加到拟合值上重新拟合
+    rng = np.random.default_rng(seed)
+    relative = (x - fitted) / fitted
+    relative = (relative - relative.mean()) * np.sqrt(len(n) / max(len(n) - 3, 1))
+    draws = np.empty((samples, 3))
+    for i in range(samples):
+        resampled = fitted * (1 + rng.choice(relative, size=len(n)))
+        draws[i] = _refine(n, np.maximum(resampled, 1e-12), params.copy(), BOOTSTRAP_ITERATIONS)
+
+    lam, sigma, kappa = params
+    n_peak = float(peak_concurrency(sigma, kappa))
+    x_max = float(max_throughput(lam, sigma, kappa))
+    draw_peak = peak_concurrency(draws[:, 1], draws[:, 2])
+    draw_max = max_throughput(draws[:, 0], draws[:, 1], draws[:, 2])
+    return {
+        'lambda': lam,
+        'sigma': sigma,
+        'kappa': kappa,
+        'r2': r2,
+        'n_peak': n_peak,
+        'x_max': x_max,
+        'concurrency': n,
+        'throughput': x,
+        'ci': {
+            'lambda': _interval(draws[:, 0]),
+            'sigma': _interval(draws[:, 1]),
+            'kappa': _interval(draws[:, 2]),
+            'n_peak': _interval(draw_peak),
+            'x_max': _interval(draw_max)
+        },
+        'draws': draws
+    }
+
+
+def _interval(values):
+    # 峰值并发等可能为 inf（κ 为 0），取最近秩分位数避免插值时 inf - inf
+    tail = (1 - CONFIDENCE) / 2 * 100
+    low, high = np.percentile(values, [tail, 100 - tail], method='nearest')
+    return float(low), float(high)
+
+
+def predict(fit, concurrency, think_time=0.0):
+    """预测给定并发量的吞吐与平均响应时间（Little 定律 R = N/X - Z）及其置信区间，返回各列为数组的字典"""
+    n = np.atleast_1d(np.asarray(concurrency, dtype=float))
+    x = usl_throughput(n, fit['lambda'], fit['sigma'], fit['kappa'])
+    draws = fit['draws']
+    x_draws = usl_throughput(n[None, :], draws[:, :1], draws[:, 1:2], draws[:, 2:3])
+    tail = (1 - CONFIDENCE) / 2 * 100
+    x_low, x_high = np.percentile(x_draws, [tail, 100 - tail], axis=0)
+    return {
+        'concurrency': n,
+        'throughput': x,
+        'throughput_low': x_low,
+        'throughput_high': x_high,
+        'response_time': n / x - think_time,
+        # 吞吐越低响应时间越长，区间端点对调
+        'response_time_low': n / x_high - think_time,
+        'response_time_high': n / x_low - think_time
+    }
+
+
+def concurrency_for(fit, target, limit=None):
+    """达到目标吞吐所需的最小并发量；超过模型吞吐上限时返回 None"""
+    limit = limit or (fit['n_peak'] if np.isfinite(fit['n_peak']) else max(fit['concurrency'].max() * 100, 1000))
+    n = np.arange(1, int(np.ceil(limit)) + 1)
+    reached = np.nonzero(usl_throughput(n, fit['lambda'], fit['sigma'], fit['kappa']) >= target)[0]
+    return int(n[reached[0]]) if len(reached) else None
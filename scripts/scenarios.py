@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+混合负载场景
+作者: AI Assistant
+用途: 按配置 scenarios 段定义的加权请求类型与虚拟用户会话行为（如“证明一次后以 token 获取 K 个资源”）生成混合负载，
+      每个请求标注请求类型，分别统计 token 复用热路径、完整证明路径、策略读写、RVPS 查询与直接调用 as-restful 的吞吐与延迟
+"""
+
+import base64
+import json
+import os
+import random
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from rcar_client import ConnectionPool, RcarBackend, RcarClient
+
+# 请求类型：attest 为 auth+attest 并缓存 token；resource 以会话 token 获取资源；http 为任意 JSON 接口
+REQUEST_KINDS = ('attest', 'resource', 'http')
+HTTP_AUTH = ('none', 'token', 'admin')
+DEFAULT_TOKEN_TTL = 300
+
+
+class ScenarioError(ValueError):
+    """场景定义不合法"""
+
+
+def _load_admin_token(scenario):
+    token_file = scenario.get('admin_token_file')
+    if token_file:
+        try:
+            with open(os.path.expanduser(token_file), 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError as e:
+            raise ScenarioError(f"无法读取管理 token 文件 {token_file}: {e}")
+    return scenario.get('admin_token')
+
+
+def load_scenario(config, name, scenario_file=None):
+    """读取并校验场景：scenario_file 指定时从该文件的 scenarios 段读取，否则取测试配置的 scenarios 段
+
+    场景的 requests 定义请求类型；flows 为虚拟用户每轮按权重选择的会话流程，每个流程由若干步骤组成
+    （request 引用请求类型，repeat 为重复次数，once 为每个虚拟用户只执行一次）；未定义 flows 时，
+    每个带 weight 的请求类型各自构成一个单步流程
+    """
+    source = config
+    if scenario_file:
+        try:
+            with open(scenario_file, 'r', encoding='utf-8') as f:
+                source = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ScenarioError(f"无法读取场景文件 {scenario_file}: {e}")
+    scenarios = source.get('scenarios', {})
+    if name not in scenarios:
+        raise ScenarioError(f"未找到场景 {name}，可用场景: {', '.join(sorted(scenarios)) or '无'}")
+    scenario = scenarios[name]
+
+    requests = {}
+    for request_name, spec in scenario.get('requests', {}).items():
+        spec = dict(spec)
+        kind = spec.get('kind', 'http')
+        if kind not in REQUEST_KINDS:
+            raise ScenarioError(f"场景 {name} 的请求 {request_name} 类型 {kind} 不支持（可选 {', '.join(REQUEST_KINDS)}）")
+        if kind == 'http':
+            if not spec.get('path') and not spec.get('url'):
+                raise ScenarioError(f"场景 {name} 的 http 请求 {request_name} 需要 path 或 url")
+            if spec.get('auth', 'none') not in HTTP_AUTH:
+                raise ScenarioError(f"场景 {name} 的请求 {request_name} auth 取值为 {', '.join(HTTP_AUTH)}")
+            spec.setdefault('method', 'GET')
+            spec['expect'] = [int(code) for code in spec.get('expect', [200])]
+        spec['kind'] = kind
+        requests[request_name] = spec
+    if not requests:
+        raise ScenarioError(f"场景 {name} 没有定义请求类型")
+
+    flows = scenario.get('flows')
+    if not flows:
+        flows = [{'name': request_name, 'weight': spec['weight'], 'steps': [{'request': request_name}]}
+                 for request_name, spec in requests.items() if spec.get('weight', 0) > 0]
+    for index, flow in enumerate(flows):
+        flow.setdefault('name', f"flow{index + 1}")
+        if flow.get('weight', 1) <= 0 or not flow.get('steps'):
+            raise ScenarioError(f"场景 {name} 的流程 {flow['name']} 需要正权重与至少一个步骤")
+        for step in flow['steps']:
+            if step.get('request') not in requests:
+                raise ScenarioError(f"场景 {name} 的流程 {flow['name']} 引用了未定义的请求 {step.get('request')}")
+            if int(step.get('repeat', 1)) < 1:
+                raise ScenarioError(f"场景 {name} 的流程 {flow['name']} repeat 至少为 1")
+    if not flows:
+        raise ScenarioError(f"场景 {name} 没有权重为正的请求或流程")
+
+    admin_token = _load_admin_token(scenario)
+    if admin_token is None and any(spec.get('auth') == 'admin' for spec in requests.values()):
+        raise ScenarioError(f"场景 {name} 含管理接口请求，需要 admin_token 或 admin_token_file")
+    return {
+        'name': name,
+        'description': scenario.get('description', ''),
+        'requests': requests,
+        'flows': flows,
+        'token_ttl_seconds': scenario.get('token_ttl_seconds', DEFAULT_TOKEN_TTL),
+        'admin_token': admin_token
+    }
+
+
+def _substitute(value, variables):
+    """请求体中的 ${name} 占位符替换为会话变量（evidence、nonce、token、tee）"""
+    if isinstance(value, str):
+        for name, replacement in variables.items():
+            value = value.replace('${' + name + '}', replacement)
+        return value
+    if isinstance(value, dict):
+        return {key: _substitute(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute(item, variables) for item in value]
+    return value
+
+
+class ScenarioSession:
+    """单个虚拟用户的会话：缓存证明得到的 token，按流程权重依次产生请求"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.token = None
+        self.token_time = 0.0
+        self.queue = deque()
+        self.done_once = set()
+
+    def _next_request(self):
+        if not self.queue:
+            backend = self.backend
+            flow = random.choices(backend.flows, backend.weights)[0]
+            for index, step in enumerate(flow['steps']):
+                if step.get('once'):
+                    if (flow['name'], index) in self.done_once:
+                        continue
+                    self.done_once.add((flow['name'], index))
+                self.queue.extend([step['request']] * int(step.get('repeat', 1)))
+        return self.queue.popleft()
+
+    def _token_valid(self):
+        return self.token is not None and \
+            time.monotonic() - self.token_time < self.backend.scenario['token_ttl_seconds']
+
+    async def request(self):
+        """执行会话中的下一个请求，返回 (response_code, error_msg, 各阶段耗时, 请求类型)"""
+        name = self._next_request()
+        spec = self.backend.scenario['requests'][name]
+        if (spec['kind'] == 'resource' or spec.get('auth') == 'token') and not self._token_valid():
+            # 没有有效 token 时本次先完成一次证明（记为证明请求），原请求顺延到下一次
+            self.queue.appendleft(name)
+            name = self.backend.attest_name
+            spec = self.backend.scenario['requests'].get(name, {'kind': 'attest'})
+        response_code, error_msg, phases = await self.backend.execute(
+            lambda phases: self._run(name, spec, phases))
+        return response_code, error_msg, phases, name
+
+    async def _run(self, name, spec, phases):
+        backend = self.backend
+        if spec['kind'] == 'attest':
+            response_code, error_msg, token = await backend.attest_flow(phases)
+            if token is not None:
+                self.token, self.token_time = token, time.monotonic()
+            return response_code, error_msg
+        if spec['kind'] == 'resource':
+            response_code, error_msg = await backend.resource_flow(
+                self.token, spec.get('resource_path', backend.resource_path), phases)
+            if response_code in (401, 403):
+                # token 被拒绝（过期或吊销）时丢弃，下一次资源请求前重新证明
+                self.token = None
+            return response_code, error_msg
+        return await self._http(name, spec, phases)
+
+    async def _http(self, name, spec, phases):
+        backend = self.backend
+        client, path = backend.client_for(spec)
+        headers = dict(spec.get('headers', {}))
+        if spec.get('auth') == 'token':
+            headers['Authorization'] = f"Bearer {self.token}"
+        elif spec.get('auth') == 'admin':
+            headers['Authorization'] = f"Bearer {backend.scenario['admin_token']}"
+        payload = spec.get('body')
+        if payload is not None:
+            nonce = base64.urlsafe_b64encode(os.urandom(32)).rstrip(b'=').decode('ascii')
+            evidence = base64.urlsafe_b64encode(client.build_evidence(nonce).encode('utf-8')).rstrip(b'=')
+            payload = _substitute(payload, {'evidence': evidence.decode('ascii'), 'nonce': nonce,
+                                            'token': self.token or '', 'tee': client.tee})
+        status, _, body, conn_info = await client.call(spec['method'], path, payload, headers)
+        phases['connect'] += conn_info['connect_time']
+        phases['tls'] += conn_info['tls_time']
+        if status not in spec['expect']:
+            return backend._error(name, status, body)
+        return 200, ""
+
+
+class ScenarioBackend(RcarBackend):
+    """混合场景请求后端：闭环每个虚拟用户通过 session() 持有独立会话，开环请求复用空闲会话"""
+
+    def __init__(self, scenario, base_url, timeout, **kwargs):
+        super().__init__(base_url, timeout, **kwargs)
+        self.scenario = scenario
+        self.scenario_name = scenario['name']
+        self.flows = scenario['flows']
+        self.weights = [flow.get('weight', 1) for flow in self.flows]
+        # 会话缺少 token 时隐式执行的证明请求记在场景中第一个 attest 类型下
+        self.attest_name = next((name for name, spec in scenario['requests'].items() if spec['kind'] == 'attest'),
+                                'attest')
+        self._pool_options = (kwargs.get('pool_size', 0), kwargs.get('reuse_connections', True),
+                              kwargs.get('ssl_context'))
+        self._clients = {}
+        self._idle = []
+
+    def client_for(self, spec):
+        """http 请求的客户端与请求路径：path 相对 base_url，url 为其他服务（如 as-restful、网关）的完整地址"""
+        if not spec.get('url'):
+            return self.client, spec['path']
+        parts = urlsplit(spec['url'])
+        origin = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(origin)
+        if client is None:
+            pool_size, reuse, ssl_context = self._pool_options
+            client = self._clients[origin] = RcarClient(ConnectionPool(origin, pool_size, reuse, ssl_context),
+                                                        tee=self.client.tee, evidence=self.client.evidence)
+        return client, parts.path + (f"?{parts.query}" if parts.query else '')
+
+    def session(self):
+        return ScenarioSession(self)
+
+    async def request(self):
+        session = self._idle.pop() if self._idle else ScenarioSession(self)
+        try:
+            return await session.request()
+        finally:
+            self._idle.append(session)
+
+    def close(self):
+        super().close()
+        for client in self._clients.values():
+            client.pool.close()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+慢请求与失败请求尾部采集
+作者: AI Assistant
+用途: 正式测试阶段以有界蓄水池保留最慢的 K 个成功请求与均匀抽样的失败请求（含请求 ID、各阶段耗时、HTTP 状态与响应体），
+      级别结束时只读取各服务日志文件在该级别期间新写入的部分，按请求 ID 与请求时间窗口提取匹配行，
+      随直方图文件的 tail 段保存，供报告“最慢请求”一节展示；不保存逐请求的日志
+"""
+
+import os
+import sys
+import argparse
+import glob
+import heapq
+import json
+import logging
+import random
+import re
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+DEFAULT_CONFIG = os.path.join(PROJECT_ROOT, 'config', 'test_config.json')
+DEFAULT_DATA_DIR = os.path.join(PROJECT_ROOT, 'results', 'raw_data')
+
+DEFAULT_SLOWEST = 20
+DEFAULT_FAILED = 20
+# 请求起止时间前后扩展的秒数，覆盖服务端与生成器的时钟偏差及异步写日志的延迟
+DEFAULT_CONTEXT_SECONDS = 1.0
+DEFAULT_MAX_LINES = 20
+# 日志行不含请求 ID 时按时间窗口匹配，默认只取告警与错误级别的行（并发高时窗口内的普通日志多为其他请求）
+DEFAULT_WINDOW_PATTERN = r'(?i)\b(warn|warning|error|fatal|panic)\b'
+# 日志行中的时间戳（ISO 8601 / RFC 3339，可带小数秒与时区；不带时区时按本机时区解析）
+DEFAULT_TIMESTAMP_PATTERN = r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?'
+# 时间戳只在行首这么多字符内查找
+TIMESTAMP_SEARCH_CHARS = 64
+# 单行日志保留的最大字符数
+MAX_LINE_CHARS = 1000
+
+logger = logging.getLogger('load_generator')
+
+
+def tail_capture_settings(config):
+    """配置 tail_capture 段：slowest / failed 为每个级别保留的最慢成功请求数与失败请求数，log_files 为各服务日志文件"""
+    settings = {
+        'slowest': DEFAULT_SLOWEST,
+        'failed': DEFAULT_FAILED,
+        'context_seconds': DEFAULT_CONTEXT_SECONDS,
+        'max_lines_per_request': DEFAULT_MAX_LINES,
+        'window_pattern': DEFAULT_WINDOW_PATTERN,
+        'timestamp_pattern': DEFAULT_TIMESTAMP_PATTERN,
+        'log_files': {}
+    }
+    settings.update(config.get('tail_capture', {}))
+    return settings
+
+
+class TailReservoir:
+    """单个级别的尾部请求蓄水池：最慢的 slowest 个成功请求（最小堆）与失败请求的均匀抽样（Algorithm R），内存有上界"""
+
+    def __init__(self, slowest=DEFAULT_SLOWEST, failed=DEFAULT_FAILED):
+        self.slowest_size = slowest
+        self.failed_size = failed
+        self.failed_total = 0
+        self._slowest = []
+        self._failed = []
+        self._seq = 0
+
+    def is_slow(self, duration):
+        """duration 能否进入最慢请求集合；调用方据此决定是否构造请求明细，大多数请求只需这一次比较"""
+        return len(self._slowest) < self.slowest_size or \
+            (self.slowest_size > 0 and duration > self._slowest[0][0])
+
+    def add(self, duration, failed, record):
+        if failed:
+            self.failed_total += 1
+            if len(self._failed) < self.failed_size:
+                self._failed.append(record)
+            else:
+                index = random.randrange(self.failed_total)
+                if index < self.failed_size:
+                    self._failed[index] = record
+            return
+        if not self.is_slow(duration):
+            return
+        self._seq += 1
+        if len(self._slowest) < self.slowest_size:
+            heapq.heappush(self._slowest, (duration, self._seq, record))
+        else:
+            heapq.heapreplace(self._slowest, (duration, self._seq, record))
+
+    def records(self):
+        """当前保留的全部请求明细（最慢请求按耗时降序，失败请求按开始时间）"""
+        return self.slowest() + self.failed()
+
+    def slowest(self):
+        return [record for _, _, record in sorted(self._slowest, key=lambda item: -item[0])]
+
+    def failed(self):
+        return sorted(self._failed, key=lambda record: record['start_time'])
+
+    def to_dict(self):
+        return {
+            'slowest_size': self.slowest_size,
+            'failed_size': self.failed_size,
+            'failed_total': self.failed_total,
+            'slowest': self.slowest(),
+            'failed': self.failed()
+        }
+
+
+def merge_tails(tails):
+    """合并多个直方图文件的 tail 段（多台生成器主机或多轮测试）：最慢请求取整体最慢的前 K 个，
+    失败请求按各来源的失败总数加权抽样，使合并结果仍近似为全部失败请求的均匀样本"""
+    tails = [tail for tail in tails if tail]
+    if not tails:
+        return {}
+    slowest_size = max(tail.get('slowest_size', DEFAULT_SLOWEST) for tail in tails)
+    failed_size = max(tail.get('failed_size', DEFAULT_FAILED) for tail in tails)
+    slowest = sorted((record for tail in tails for record in tail.get('slowest', [])),
+                     key=lambda record: -record['duration'])[:slowest_size]
+
+    # 每条失败样本代表其来源 failed_total / 样本数 个失败请求，按该权重无放回抽样
+    weighted = []
+    for tail in tails:
+        samples = tail.get('failed', [])
+        if samples:
+            weight = max(tail.get('failed_total', len(samples)), len(samples)) / len(samples)
+            weighted.extend((random.random() ** (1.0 / weight), record) for record in samples)
+    weighted.sort(key=lambda item: -item[0])
+    failed = sorted((record for _, record in weighted[:failed_size]), key=lambda record: record['start_time'])
+    return {
+        'slowest_size': slowest_size,
+        'failed_size': failed_size,
+        'failed_total': sum(tail.get('failed_total', 0) for tail in tails),
+        'slowest': slowest,
+        'failed': failed
+    }
+
+
+def parse_timestamp(text):
+    """日志时间戳转换为 epoch 秒，无法解析时返回 None"""
+    text = text.replace(',', '.').replace(' ', 'T', 1)
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    # 纳秒精度的时间戳截断到微秒
+    text = re.sub(r'(\.\d{6})\d+', r'\1', text)
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return None
+
+
+def resolve_log_files(log_files):
+    """log_files 为 {服务名: 路径或路径列表}，路径支持通配符（如带日期的轮转文件）；值为 null 的服务视为未配置。
+    返回 ({服务名: [存在的文件]}, [未匹配到文件的配置路径])"""
+    resolved = {}
+    missing = []
+    for service, paths in (log_files or {}).items():
+        if not paths:
+            continue
+        if isinstance(paths, str):
+            paths = [paths]
+        files = []
+        for pattern in paths:
+            matched = sorted(glob.glob(os.path.expanduser(pattern)))
+            if not matched:
+                missing.append(pattern)
+            files.extend(path for path in matched if path not in files)
+        if files:
+            resolved[service] = files
+    return resolved, missing
+
+
+class LogTail:
+    """级别开始时记录各日志文件的 (inode, 长度)，提取时只读取此后新写入的部分；
+    文件在期间被轮转（inode 变化）或截断时从头读取，期间新出现的文件（如轮转产生）整个读取"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.offsets = {}
+        _, missing = resolve_log_files(settings.get('log_files'))
+        for pattern in missing:
+            logger.warning(f"尾部采集: 日志文件不存在，跳过 {pattern}")
+
+    def mark(self):
+        self.offsets = {}
+        services, _ = resolve_log_files(self.settings.get('log_files'))
+        for files in services.values():
+            for path in files:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                self.offsets[path] = (stat.st_ino, stat.st_size)
+        return self
+
+    def sources(self):
+        """{服务名: [(文件, 起始偏移)]}"""
+        services, _ = resolve_log_files(self.settings.get('log_files'))
+        sources = {}
+        for service, files in services.items():
+            for path in files:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                inode, size = self.offsets.get(path, (None, 0))
+                offset = size if inode == stat.st_ino and size <= stat.st_size else 0
+                if stat.st_size > offset:
+                    sources.setdefault(service, []).append((path, offset))
+        return sources
+
+    def extract(self, records):
+        return extract_logs(records, self.sources(), self.settings)
+
+
+def extract_logs(records, sources, settings):
+    """顺序扫描各日志文件一次，为每条请求明细附加 logs = {服务名: [{'match': 'id' | 'time', 'line': 行}]}：
+    含请求 ID 的行优先，其余名额给时间戳落在 [开始 - context, 结束 + context] 内且匹配 window_pattern 的行
+    （带有本次测试其他请求 ID 的行属于别的请求，不按时间窗口匹配）；返回匹配的行数"""
+    if not records or not sources:
+        return 0
+    by_id = {record['request_id']: record for record in records if record.get('request_id')}
+    id_pattern = re.compile('|'.join(re.escape(request_id) for request_id in by_id)) if by_id else None
+    prefixes = {request_id.rsplit('-', 1)[0] for request_id in by_id}
+    other_pattern = re.compile('(?:' + '|'.join(re.escape(prefix) for prefix in prefixes) + r')-[0-9a-f]+') \
+        if prefixes else None
+    window_pattern = re.compile(settings['window_pattern']) if settings.get('window_pattern') else None
+    timestamp_pattern = re.compile(settings.get('timestamp_pattern') or DEFAULT_TIMESTAMP_PATTERN)
+    context = settings.get('context_seconds', DEFAULT_CONTEXT_SECONDS)
+    limit = settings.get('max_lines_per_request', DEFAULT_MAX_LINES)
+    windows = [(record['start_time'] - context, record['end_time'] + context, record) for record in records]
+    earliest = min(start for start, _, _ in windows)
+    latest = max(end for _, end, _ in windows)
+
+    matched = 0
+    for service, files in sources.items():
+        by_id_lines = {id(record): [] for record in records}
+        by_time_lines = {id(record): [] for record in records}
+        for path, offset in files:
+            try:
+                handle = open(path, 'rb')
+            except OSError as e:
+                logger.warning(f"尾部采集: 无法读取日志文件 {path}: {e}")
+                continue
+            with handle:
+                handle.seek(offset)
+                for raw in handle:
+                    line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+                    if id_pattern is not None:
+                        found = id_pattern.search(line)
+                        if found:
+                            lines = by_id_lines[id(by_id[found.group(0)])]
+                            if len(lines) < limit:
+                                lines.append(line[:MAX_LINE_CHARS])
+                            continue
+                    if window_pattern is not None and not window_pattern.search(line):
+                        continue
+                    if other_pattern is not None and other_pattern.search(line):
+                        continue
+                    stamp = timestamp_pattern.search(line, 0, TIMESTAMP_SEARCH_CHARS)
+                    epoch = parse_timestamp(stamp.group(0)) if stamp else None
+                    if epoch is None or epoch < earliest or epoch > latest:
+                        continue
+                    for start, end, record in windows:
+                        if start <= epoch <= end:
+                            lines = by_time_lines[id(record)]
+                            if len(lines) < limit:
+                                lines.append(line[:MAX_LINE_CHARS])
+        for record in records:
+            entries = [{'match': 'id', 'line': line} for line in by_id_lines[id(record)]]
+            entries += [{'match': 'time', 'line': line}
+                        for line in by_time_lines[id(record)][:limit - len(entries)]]
+            if entries:
+                record.setdefault('logs', {})[service] = entries
+                matched += len(entries)
+    return matched
+
+
+def extract_artifacts(data_dir, settings):
+    """事后提取：为数据目录中的直方图文件重新匹配日志（如分布式测试的代理主机上没有服务日志，
+    将日志复制到本机后执行）；整个读取各日志文件，靠请求 ID 与时间窗口筛选"""
+    services, missing = resolve_log_files(settings.get('log_files'))
+    for pattern in missing:
+        logger.warning(f"日志文件不存在，跳过 {pattern}")
+    if not services:
+        logger.error("tail_capture.log_files 未配置可用的日志文件")
+        return 0
+    sources = {service: [(path, 0) for path in files] for service, files in services.items()}
+    updated = 0
+    for pattern in ('latency_histogram_*.json', 'open_loop_histogram_*.json'):
+        for path in sorted(glob.glob(os.path.join(data_dir, pattern))):
+            with open(path, 'r', encoding='utf-8') as f:
+                document = json.load(f)
+            tail = document.get('tail')
+            if not tail:
+                continue
+            records = tail.get('slowest', []) + tail.get('failed', [])
+            for record in records:
+                record.pop('logs', None)
+            matched = extract_logs(records, sources, settings)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+            logger.info(f"{os.path.basename(path)}: {len(records)} 个请求匹配到 {matched} 行日志")
+            updated += 1
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='慢请求与失败请求的服务日志提取')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='测试配置文件（读取 tail_capture 段）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    extract_parser = subparsers.add_parser('extract', help='为已有直方图文件中的尾部请求重新提取服务日志')
+    extract_parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='原始数据目录')
+
+    args = parser.parse_args()
+    logging.basicConfig(format='[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S', level=logging.INFO)
+    config = {}
+    if args.config and os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    updated = extract_artifacts(args.data_dir, tail_capture_settings(config))
+    sys.exit(0 if updated else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+"""
+测试公共设置
+作者: AI Assistant
+用途: scripts 下的工具为平铺模块（脚本之间以模块名互相导入），测试时将该目录加入 sys.path
+"""
+
+import os
+import sys
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+if SCRIPT_DIR not in sys.path:
+    sys.path.insert(0, SCRIPT_DIR)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+报告数据加载测试
+作者: AI Assistant
+用途: 共享数据目录中多次运行、压力测试与容量探测的数据文件按运行标识筛选，不混入同一报告；
+      只有负载数据（无资源采样文件）的运行也能收录到运行目录
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+
+from data_store import PHASE_LOG_FILE, PHASE_LOG_HEADER, append_phase_log
+from generate_report import TrusteeReportGenerator
+from kbs_stub import start_stub
+from load_generator import DEFAULT_CONFIG, build_generator, load_config, parse_args
+import run_catalog
+
+
+def run_levels(data_dir, levels):
+    """levels 为 [(运行标识, 文件名前缀)]，依次在同一数据目录执行 4 并发、1 秒的闭环级别，返回各级别请求数"""
+    async def run():
+        _, server, port = await start_stub()
+        totals = []
+        try:
+            for run_id, prefix in levels:
+                argv = ['--output-dir', data_dir, '--backend', 'rcar', '--base-url', f"http://127.0.0.1:{port}/api"]
+                generator = build_generator(load_config(DEFAULT_CONFIG), parse_args(argv + ['--run-id', run_id]))
+                try:
+                    _, stats, _ = await generator.run_level(4, 1, 0, 0, prefix=prefix)
+                finally:
+                    generator.backend.close()
+                totals.append(stats.total)
+                # 文件名时间戳精确到秒，保证后一次运行的时间戳更新
+                await asyncio.sleep(1.1)
+        finally:
+            server.close()
+            await server.wait_closed()
+        return totals
+
+    return asyncio.run(run())
+
+
+def test_report_reads_only_one_run(tmp_path):
+    data_dir = str(tmp_path / 'raw_data')
+    totals = run_levels(data_dir, [('runA', 'concurrent_test'), ('runB', 'concurrent_test'),
+                                   ('runB', 'capacity_probe')])
+    names = os.listdir(data_dir)
+    assert any(name.startswith('capacity_probe_histogram_4_runB_') for name in names)
+    assert sum(name.startswith('latency_histogram_4_') for name in names) == 2
+
+    with open(os.path.join(data_dir, PHASE_LOG_FILE), newline='', encoding='utf-8') as f:
+        steady = {(row['run_id'], row['test_name']): (float(row['start_time']), float(row['end_time']))
+                  for row in csv.DictReader(f) if row['test_phase'] == 'steady'}
+    assert set(steady) == {('runA', 'concurrent_test'), ('runB', 'concurrent_test'), ('runB', 'capacity_probe')}
+
+    def load(run_id):
+        generator = TrusteeReportGenerator('t', data_dir, str(tmp_path / f'report_{run_id}'), jobs=1, run_id=run_id)
+        generator.load_data()
+        assert list(generator.histogram_data) == [4]
+        return generator
+
+    for run_id, total in (('runA', totals[0]), ('runB', totals[1]), (None, totals[1])):
+        generator = load(run_id)
+        # 未指定运行标识时取最新一次扫描运行，容量探测的文件与阶段都不计入
+        assert generator.histogram_data[4]['total'] == total
+        assert generator._phase_interval(4, 'steady') == steady[(run_id or 'runB', 'concurrent_test')]
+
+
+def test_legacy_phase_log_is_upgraded(tmp_path):
+    log_file = tmp_path / PHASE_LOG_FILE
+    log_file.write_text('mode,label,test_phase,start_time,end_time\nclosed,4,steady,1.0,2.0\n', encoding='utf-8')
+    append_phase_log(str(tmp_path), [['closed', 4, 'steady', '3.0', '4.0', 'stress_detail', 'run1']])
+    with open(log_file, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows == [PHASE_LOG_HEADER, ['closed', '4', 'steady', '1.0', '2.0', '', ''],
+                    ['closed', '4', 'steady', '3.0', '4.0', 'stress_detail', 'run1']]
+
+    generator = TrusteeReportGenerator('t', str(tmp_path), str(tmp_path / 'report'), jobs=1)
+    # 压力测试的同一并发量阶段不覆盖批量测试的阶段
+    assert generator._load_phase_log()[4]['start_time'].tolist() == [1.0]
+
+
+def test_ingest_load_only_run(tmp_path):
+    data_dir = str(tmp_path / 'raw_data')
+    total = run_levels(data_dir, [('runA', 'concurrent_test')])[0]
+    assert not any(name.startswith('resource_usage_') for name in os.listdir(data_dir))
+
+    db_path = str(tmp_path / 'run_catalog.db')
+    args = argparse.Namespace(db=db_path, config=run_catalog.DEFAULT_CONFIG, data_dir=data_dir, run_id='runA',
+                              match=None, latest=False, replace=False, build=None, host=None)
+    assert run_catalog.ingest(args) == run_catalog.EXIT_OK
+
+    _, levels = run_catalog.load_run(run_catalog.connect(db_path), 'runA')
+    stats = levels[('closed', '4')]
+    assert stats['total_requests'] == total
+    assert stats['histogram'].count > 0
+    # 没有资源采样时 CPU / 内存为空
+    assert stats['cpu_avg'] is None and stats['memory_avg'] is None
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""
+负载工具自身基准测试
+作者: AI Assistant
+用途: 子进程峰值 RSS 测量、基准参数合并、回归判定与替身服务上的闭环基准项
+"""
+
+import asyncio
+import sys
+
+import pytest
+
+from harness_benchmark import HarnessBenchmark, harness_settings, peak_rss_mb, run_measured
+from load_generator import DEFAULT_CONFIG, load_config
+from run_catalog import compare_harness_metrics
+
+
+def test_child_peak_rss_excludes_parent(tmp_path):
+    ballast = bytearray(200 * 1024 * 1024)
+    ballast[::4096] = b'\x01' * len(ballast[::4096])
+    code = 'import time; data = bytearray(40 * 1024 * 1024); data[::4096] = b"x" * len(data[::4096]); time.sleep(0.3)'
+    wall, cpu, rss = run_measured([sys.executable, '-c', code], str(tmp_path / 'child.out'))
+    assert wall >= 0.3
+    assert cpu > 0
+    assert 40 <= rss < 150
+    assert peak_rss_mb() >= 200
+
+
+def test_run_measured_failure(tmp_path):
+    from harness_benchmark import HarnessError
+    with pytest.raises(HarnessError, match='退出码 3'):
+        run_measured([sys.executable, '-c', 'import sys; print("boom"); sys.exit(3)'], str(tmp_path / 'fail.out'))
+
+
+def test_harness_settings():
+    settings = harness_settings({'harness_benchmark': {'probe_seconds': 5}}, probe_seconds=None, closed_concurrency=8)
+    assert settings['probe_seconds'] == 5
+    assert settings['closed_concurrency'] == 8
+    assert settings['stub_processes'] >= 1
+    with pytest.raises(ValueError, match='未知的基准项'):
+        harness_settings({}, suites=['closed', 'nope'])
+
+
+def test_compare_harness_metrics():
+    baseline = {'closed.qps': {'value': 1000.0, 'unit': 'req/s', 'better': 'higher'},
+                'closed.peak_rss': {'value': 50.0, 'unit': 'MB', 'better': 'lower'},
+                'closed.max_loop_lag': {'value': 1.0, 'unit': 'ms', 'better': 'none'}}
+    candidate = {'closed.qps': {'value': 800.0}, 'closed.peak_rss': {'value': 53.0}, 'closed.max_loop_lag': {'value': 9.0}}
+    rows = {row['metric']: row for row in compare_harness_metrics(baseline, candidate, 5.0)}
+    assert rows['closed.qps']['regression']
+    # 变化超过阈值百分比但未超过单位容差（5MB）
+    assert not rows['closed.peak_rss']['regression']
+    assert not rows['closed.max_loop_lag']['regression']
+
+
+def test_closed_suite_against_stub(tmp_path):
+    settings = harness_settings({}, suites=['closed'], stub_processes=1, probe_seconds=1, warmup_seconds=0,
+                                closed_concurrency=4)
+    benchmark = HarnessBenchmark(load_config(DEFAULT_CONFIG), settings, str(tmp_path))
+    asyncio.run(benchmark.suite_closed())
+    metrics = benchmark.metrics
+    assert metrics['closed.qps']['value'] > 0
+    assert metrics['closed.peak_rss']['value'] > 0
+    assert metrics['closed.cpu_per_request']['better'] == 'lower'
+    assert benchmark.notes
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+延迟直方图测试
+作者: AI Assistant
+用途: 分位数精度、合并与序列化
+"""
+
+import pytest
+
+from latency_histogram import LatencyHistogram
+
+
+def build(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def test_percentiles_within_bucket_error():
+    # 1ms ~ 1000ms 各一个样本，分位数为桶上界，相对误差 < 0.8%
+    histogram = build([ms / 1000 for ms in range(1, 1001)])
+    p50, p95, p99 = histogram.percentiles([0.50, 0.95, 0.99])
+    assert p50 == pytest.approx(0.500, rel=0.008)
+    assert p95 == pytest.approx(0.950, rel=0.008)
+    assert p99 == pytest.approx(0.990, rel=0.008)
+    assert histogram.percentile(0.99) == p99
+    assert histogram.min == pytest.approx(0.001)
+    assert histogram.max == pytest.approx(1.0)
+    assert histogram.mean == pytest.approx(0.5005, rel=1e-6)
+
+
+def test_percentiles_order_independent_and_capped_at_max():
+    histogram = build([0.010] * 99 + [0.250])
+    assert histogram.percentiles([0.99, 0.5, 1.0]) == [histogram.percentile(0.99), histogram.percentile(0.5),
+                                                         histogram.max]
+    assert histogram.percentile(1.0) == pytest.approx(0.250)
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentiles([0.5, 0.99]) == [0.0, 0.0]
+    assert histogram.mean == 0.0
+    assert histogram.cdf() == []
+
+
+def test_merge_equals_single_histogram():
+    values = [ms / 1000 for ms in range(1, 2001)]
+    whole = build(values)
+    merged = build(values[::2]).merge(build(values[1::2]))
+    assert merged.count == whole.count
+    assert merged.counts == whole.counts
+    assert merged.min_us == whole.min_us
+    assert merged.max_us == whole.max_us
+    assert merged.percentiles([0.5, 0.95, 0.99]) == whole.percentiles([0.5, 0.95, 0.99])
+
+
+def test_merge_into_empty_and_round_trip():
+    source = build([0.003, 0.004, 0.120])
+    merged = LatencyHistogram().merge(source)
+    assert merged.min_us == 3000
+    restored = LatencyHistogram.from_dict(merged.to_dict())
+    assert restored.to_dict() == source.to_dict()
+    assert restored.cdf()[-1] == (pytest.approx(0.120), 1.0)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""
+长稳测试趋势拟合测试
+作者: AI Assistant
+用途: 线性趋势斜率、置信区间与泄漏判定
+"""
+
+import numpy as np
+import pytest
+
+from leak_trend import MIN_POINTS, fit_trend, is_leak
+
+
+def hours_and_noise(points=121):
+    hours = np.linspace(0, 4, points)
+    noise = np.random.default_rng(0).normal(0, 1.0, points)
+    return hours, noise
+
+
+def test_growing_series_is_a_leak():
+    hours, noise = hours_and_noise()
+    trend = fit_trend(hours, 200 + 10 * hours + noise)
+    assert trend['slope_per_hour'] == pytest.approx(10, abs=0.5)
+    assert trend['ci'][0] < trend['slope_per_hour'] < trend['ci'][1]
+    assert trend['start'] == pytest.approx(200, abs=1)
+    assert trend['growth_percent_per_hour'] == pytest.approx(5, abs=0.3)
+    assert trend['confidence'] > 0.99
+    assert is_leak(trend, 1.0)
+    assert not is_leak(trend, 10.0)
+
+
+def test_flat_series_is_not_a_leak():
+    hours, noise = hours_and_noise()
+    trend = fit_trend(hours, 200 + noise)
+    assert trend['ci'][0] < 0 < trend['ci'][1]
+    assert not is_leak(trend, 1.0)
+
+
+def test_constant_series():
+    trend = fit_trend(np.arange(10) / 10, [50.0] * 10)
+    assert trend['slope_per_hour'] == 0
+    assert trend['confidence'] == 0.5
+    assert not is_leak(trend, 1.0)
+
+
+def test_insufficient_points_and_nan():
+    assert fit_trend(range(MIN_POINTS - 1), range(MIN_POINTS - 1)) is None
+    assert fit_trend([0.0] * 10, range(10)) is None
+    values = [1.0, np.nan, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0]
+    assert fit_trend(range(8), values)['points'] == 7
+    assert not is_leak(None, 1.0)
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+"""
+分布式负载拆分测试
+作者: AI Assistant
+用途: 按权重拆分闭环并发量与开环到达率
+"""
+
+import pytest
+
+from load_coordinator import split_load
+
+
+def test_integer_split_sums_to_total():
+    assert split_load(10, [1, 1, 1], True) == [4, 3, 3]
+    assert sum(split_load(101, [3, 2, 5], True)) == 101
+
+
+def test_integer_split_largest_remainder():
+    # 精确份额 2.5 / 7.5：余数相同时取靠前的代理，仍保证总和为 10
+    assert split_load(10, [1, 3], True) == [3, 7]
+    assert split_load(7, [2, 1], True) == [5, 2]
+
+
+def test_rate_split_is_exact():
+    assert split_load(100.0, [1, 3], False) == pytest.approx([25.0, 75.0])
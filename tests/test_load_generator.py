@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+负载生成器端到端测试
+作者: AI Assistant
+用途: 对进程内启动的 KBS 替身服务执行一次短时闭环测试，检查统计与输出文件；开环调度落后时让出事件循环
+"""
+
+import asyncio
+import json
+import os
+
+from data_store import read_table
+from kbs_stub import start_stub
+from load_generator import DEFAULT_CONFIG, OpenLoopStats, RecordWriter, build_generator, load_config, parse_args
+
+
+def test_closed_loop_against_stub(tmp_path):
+    async def run():
+        _, server, port = await start_stub(latency=0.002)
+        try:
+            argv = ['--output-dir', str(tmp_path), '--backend', 'rcar', '--run-id', 'pytest',
+                    '--base-url', f"http://127.0.0.1:{port}/api"]
+            generator = build_generator(load_config(DEFAULT_CONFIG), parse_args(argv))
+            try:
+                return await generator.run_level(4, 1, 0, 0)
+            finally:
+                generator.backend.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    result_file, stats, overhead = asyncio.run(run())
+    assert stats.total > 0
+    assert stats.failed == 0
+    assert stats.successful == stats.total
+    # 每个请求至少经历 /auth 与 /attest 两次 2ms 的处理延迟
+    assert stats.min_time >= 0.004
+    assert overhead['wall_seconds'] > 0
+
+    names = os.listdir(tmp_path)
+    for kind in ('concurrent_stats', 'latency_histogram', 'concurrency_timeline'):
+        assert any(name.startswith(f'{kind}_4_pytest_') for name in names), kind
+    assert os.path.basename(result_file).startswith('concurrent_test_4_pytest_')
+
+    records = read_table(result_file)
+    assert (records['response_code'] == 200).all()
+    histogram_file = next(name for name in names if name.startswith('latency_histogram_'))
+    with open(tmp_path / histogram_file, 'r', encoding='utf-8') as f:
+        artifact = json.load(f)
+    assert sum(window['total'] for window in artifact['windows']) == stats.total
+
+
+def test_open_loop_yields_when_behind_schedule(tmp_path):
+    argv = ['--output-dir', str(tmp_path), '--backend', 'rcar', '--base-url', 'http://127.0.0.1:9/api']
+    generator = build_generator(load_config(DEFAULT_CONFIG), parse_args(argv))
+    stats = OpenLoopStats()
+    offered_at_start = []
+
+    async def request():
+        offered_at_start.append(stats.offered)
+        return 200, '', None, None
+
+    generator.backend.request = request
+    # 全部到达都已过预定时间：调度循环始终处于落后状态
+    generator.arrival_offsets = lambda *args: [0.0] * 500
+    try:
+        asyncio.run(generator._run_open_loop_phase('500', 500, 1, 'fixed', None, RecordWriter(None), stats, None))
+    finally:
+        generator.backend.close()
+    assert stats.offered == stats.completed == 500
+    # 请求在调度过程中即已开始执行，而不是等全部到达创建完毕
+    assert offered_at_start[0] < 10
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+服务端指标测试
+作者: AI Assistant
+用途: Prometheus 文本解析与服务端直方图的区间增量统计
+"""
+
+import math
+
+import pandas as pd
+import pytest
+
+from metrics_scraper import counter_increase, parse_prometheus, summarize_histogram
+
+SCRAPES = [
+    (100.0, """
+# HELP http_request_duration_seconds 请求耗时
+# TYPE http_request_duration_seconds histogram
+http_request_duration_seconds_bucket{path="/attest",le="0.1"} 10
+http_request_duration_seconds_bucket{path="/attest",le="0.5"} 10
+http_request_duration_seconds_bucket{path="/attest",le="+Inf"} 10
+http_request_duration_seconds_sum{path="/attest"} 0.5
+http_request_duration_seconds_count{path="/attest"} 10
+"""),
+    (110.0, """
+http_request_duration_seconds_bucket{path="/attest",le="0.1"} 60
+http_request_duration_seconds_bucket{path="/attest",le="0.5"} 100
+http_request_duration_seconds_bucket{path="/attest",le="+Inf"} 110
+http_request_duration_seconds_sum{path="/attest"} 20.5
+http_request_duration_seconds_count{path="/attest"} 110
+""")
+]
+
+
+def frame():
+    rows = [{'epoch_time': epoch, 'metric': name, 'labels': labels, 'value': value}
+            for epoch, text in SCRAPES for name, labels, value in parse_prometheus(text)]
+    return pd.DataFrame(rows)
+
+
+def test_parse_prometheus():
+    samples = parse_prometheus("""
+# TYPE queue_depth gauge
+queue_depth 3
+requests_total{method="POST",code="200"} 1.5e3 1700000000000
+not a sample line
+bad_value{a="b"} NaNx
+""")
+    assert samples == [('queue_depth', '', 3.0), ('requests_total', 'code="200",method="POST"', 1500.0)]
+
+
+def test_parse_prometheus_histogram_labels():
+    samples = parse_prometheus(SCRAPES[0][1])
+    assert len(samples) == 5
+    assert samples[2] == ('http_request_duration_seconds_bucket', 'le="+Inf",path="/attest"', 10.0)
+
+
+def test_summarize_histogram():
+    summary = summarize_histogram(frame(), 'http_request_duration_seconds', {'path': '/attest'})
+    assert summary['count'] == 100
+    assert summary['sum'] == pytest.approx(20.0)
+    assert summary['seconds'] == 10
+    assert summary['rate'] == pytest.approx(10.0)
+    assert summary['mean'] == pytest.approx(0.2)
+    # 50 个落在 (0, 0.1]：P50 按桶内线性插值为 0.1；P99 落在 +Inf 桶时取最大有限上界
+    assert summary['p50'] == pytest.approx(0.1)
+    assert summary['p95'] == pytest.approx(0.5)
+    assert summary['p99'] == pytest.approx(0.5)
+    assert len(summary['intervals']) == 1
+
+
+def test_summarize_histogram_label_mismatch_and_single_sample():
+    assert summarize_histogram(frame(), 'http_request_duration_seconds', {'path': '/auth'}) is None
+    first = frame()
+    assert summarize_histogram(first[first['epoch_time'] == 100.0], 'http_request_duration_seconds') is None
+
+
+def test_counter_increase_ignores_resets():
+    assert counter_increase([10, 20, 5, 15]) == 20
+    assert math.isclose(counter_increase([1.5, 1.5]), 0.0)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+RCAR 客户端测试
+作者: AI Assistant
+用途: 连接池复用、过期 keep-alive 连接的重发，以及对 KBS 替身服务的完整 RCAR 流程
+"""
+
+import asyncio
+
+import pytest
+
+from kbs_stub import start_stub
+from rcar_client import ConnectionPool, RcarBackend, RcarClient, StaleConnectionError
+
+
+async def closing_server(responses_per_connection):
+    """声明 keep-alive、但每条连接应答 responses_per_connection 个请求后，收到下一个请求即不作应答直接关闭的服务"""
+    async def handle(reader, writer):
+        try:
+            for _ in range(responses_per_connection):
+                await reader.readuntil(b'\r\n\r\n')
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok')
+                await writer.drain()
+            await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_stale_reused_connection_is_retried():
+    async def run():
+        server, port = await closing_server(1)
+        pool = ConnectionPool(f'http://127.0.0.1:{port}')
+        client = RcarClient(pool)
+        try:
+            results = []
+            for _ in range(3):
+                status, _, body, info = await client.call('GET', '/x')
+                results.append((status, body))
+            return results, pool
+        finally:
+            pool.close()
+            server.close()
+            await server.wait_closed()
+
+    results, pool = asyncio.run(run())
+    assert results == [(200, b'ok')] * 3
+    assert pool.opened == 3
+    assert pool.stale_retries == 2
+
+
+def test_fresh_connection_failure_is_not_retried():
+    async def run():
+        server, port = await closing_server(0)
+        pool = ConnectionPool(f'http://127.0.0.1:{port}')
+        try:
+            with pytest.raises(StaleConnectionError):
+                await RcarClient(pool).call('GET', '/x')
+            return pool.stale_retries
+        finally:
+            pool.close()
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_attest_flow_reuses_connections():
+    async def run():
+        _, server, port = await start_stub()
+        backend = RcarBackend(f'http://127.0.0.1:{port}/api', timeout=5, flow='resource')
+        try:
+            return [await backend.request() for _ in range(5)], backend.pool.opened
+        finally:
+            backend.close()
+            server.close()
+            await server.wait_closed()
+
+    results, opened = asyncio.run(run())
+    for response_code, error_msg, phases, _ in results:
+        assert (response_code, error_msg) == (200, '')
+        assert all(value is not None for value in phases)
+    assert opened == 1
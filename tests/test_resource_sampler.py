@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+资源采样器测试
+作者: AI Assistant
+用途: 0.1 秒采样间隔下采样器自身 CPU 预算，以及上下文切换/fd/TCP 明细按低频间隔刷新
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from data_store import read_table
+from resource_sampler import ResourceSampler, self_cpu_seconds
+
+TARGET_NAME = 'sampler-target'
+# 替身服务进程：持有若干 socket 与线程，每从 stdin 读到一行再打开 10 对 socket
+TARGET_CODE = '''
+import socket, sys, threading, time
+sockets = [socket.socketpair() for _ in range(int(sys.argv[1]))]
+for _ in range(8):
+    threading.Thread(target=time.sleep, args=(600,), daemon=True).start()
+print('ready', flush=True)
+for line in sys.stdin:
+    sockets += [socket.socketpair() for _ in range(10)]
+    print('opened', flush=True)
+'''
+
+
+@pytest.fixture
+def targets(tmp_path):
+    """启动以 TARGET_NAME 为 argv[0] 的替身进程，返回启动函数"""
+    link = tmp_path / TARGET_NAME
+    os.symlink(sys.executable, link)
+    processes = []
+
+    def start(count, sockets):
+        for _ in range(count):
+            process = subprocess.Popen([str(link), '-c', TARGET_CODE, str(sockets)], stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE, text=True)
+            assert process.stdout.readline().strip() == 'ready'
+            processes.append(process)
+        return processes
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def test_own_cpu_below_one_percent_at_100ms(targets, tmp_path):
+    targets(4, 20)
+    sampler = ResourceSampler({'svc': {TARGET_NAME}}, interval=0.1)
+    assert len(sampler.resolve_targets()['svc']) == 4
+    data_file = str(tmp_path / 'resource_usage.csv')
+
+    cpu_start = self_cpu_seconds()
+    wall_start = time.perf_counter()
+    rounds = sampler.run(data_file, 5, str(tmp_path / 'resource_detail.csv'))
+    own_cpu = (self_cpu_seconds() - cpu_start) / (time.perf_counter() - wall_start) * 100
+
+    assert rounds >= 45
+    assert own_cpu < 1.0
+    rows = read_table(data_file)
+    service = rows[rows['process'] == 'svc']
+    assert len(service) == rounds
+    # 每个进程 20 对 socket（40 个 fd）外加标准输入输出等
+    assert (service['fds'] >= 160).all()
+
+
+def test_details_refresh_on_detail_interval(targets):
+    process = targets(1, 0)[0]
+    sampler = ResourceSampler({'svc': {TARGET_NAME}}, interval=0.1, detail_interval=1.0)
+    sampler.resolve_targets()
+    start = time.perf_counter()
+    rows, _ = sampler.sample_services(start, sampler.collect_details(start))
+    fds = rows[0][7]
+
+    process.stdin.write('open\n')
+    process.stdin.flush()
+    assert process.stdout.readline().strip() == 'opened'
+    # 未到明细间隔：fds 沿用上次的值，CPU 等每轮指标照常采集
+    assert not sampler.collect_details(start + 0.5)
+    rows, details = sampler.sample_services(start + 0.5, False)
+    assert rows[0][7] == fds
+    assert details[0][9] == fds
+
+    assert sampler.collect_details(start + 1.05)
+    rows, _ = sampler.sample_services(start + 1.05, True)
+    assert rows[0][7] == fds + 20
+
+
+def test_socket_inodes_cached_until_fd_count_changes_or_rescan(targets, monkeypatch):
+    import resource_sampler
+
+    process = targets(1, 5)[0]
+    calls = {'inodes': 0, 'tcp': 0}
+
+    def counted(name, function):
+        def wrapper(*args):
+            calls[name] += 1
+            return function(*args)
+        return wrapper
+
+    monkeypatch.setattr(resource_sampler, 'read_socket_inodes',
+                        counted('inodes', resource_sampler.read_socket_inodes))
+    monkeypatch.setattr(resource_sampler, 'read_tcp_sockets', counted('tcp', resource_sampler.read_tcp_sockets))
+    sampler = ResourceSampler({'svc': {TARGET_NAME}}, interval=0.1, rescan_interval=1.0, detail_interval=0.2)
+    sampler.resolve_targets()
+    start = time.perf_counter()
+    for tick in range(5):
+        now = start + tick * 0.21
+        assert sampler.collect_details(now)
+        sampler.sample_services(now, True)
+    # 明细间隔 0.2 秒采集 5 轮：fd 数未变，socket inode 只解析一次；TCP 连接表 1 秒内只解析一次
+    assert calls == {'inodes': 1, 'tcp': 1}
+
+    process.stdin.write('open\n')
+    process.stdin.flush()
+    assert process.stdout.readline().strip() == 'opened'
+    assert sampler.collect_details(start + 1.05)
+    rows, _ = sampler.sample_services(start + 1.05, True)
+    assert calls == {'inodes': 2, 'tcp': 2}
+    # 新打开的 10 对 socket 不在 TCP 连接表中，不影响 TCP 计数
+    assert rows[0][-5:] == [0] * 5
+
+    sampler.resolve_targets()
+    assert sampler.collect_details(start + 1.3)
+    sampler.sample_services(start + 1.2, True)
+    assert calls == {'inodes': 3, 'tcp': 2}
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""
+运行目录回归对比测试
+作者: AI Assistant
+用途: 直方图 KS 检验与逐级别回归判定
+"""
+
+from latency_histogram import LatencyHistogram
+from run_catalog import DEFAULT_REGRESSION, compare_levels, ks_test
+
+
+def build(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def level(scale=1.0, qps=100.0, success_rate=100.0):
+    histogram = build([ms / 1000 * scale for ms in range(1, 1001)])
+    p50, p95, p99 = histogram.percentiles([0.50, 0.95, 0.99])
+    return {'p50_response_time': p50, 'p95_response_time': p95, 'p99_response_time': p99, 'qps': qps,
+            'success_rate': success_rate, 'histogram': histogram}
+
+
+def test_ks_identical_distributions():
+    first = build([ms / 1000 for ms in range(1, 1001)])
+    d, p_value = ks_test(first, build([ms / 1000 for ms in range(1, 1001)]))
+    assert d == 0.0
+    assert p_value == 1.0
+
+
+def test_ks_shifted_distribution_is_significant():
+    d, p_value = ks_test(build([ms / 1000 for ms in range(1, 1001)]), build([ms / 500 for ms in range(1, 1001)]))
+    assert d > 0.4
+    assert p_value < 1e-6
+
+
+def test_ks_empty_histogram():
+    assert ks_test(LatencyHistogram(), build([0.01])) == (0.0, 1.0)
+
+
+def test_compare_levels_flags_latency_regression():
+    rows = compare_levels({('closed', '10'): level()}, {('closed', '10'): level(scale=2.0)}, DEFAULT_REGRESSION)
+    assert len(rows) == 1
+    assert [item.split()[0] for item in rows[0]['regressions']] == ['P50', 'P99']
+    assert rows[0]['changes']['p50_response_time'] > 90
+    assert rows[0]['p_value'] < DEFAULT_REGRESSION['significance']
+
+
+def test_compare_levels_no_regression_for_same_run():
+    rows = compare_levels({('closed', '10'): level()}, {('closed', '10'): level()}, DEFAULT_REGRESSION)
+    assert rows[0]['regressions'] == []
+
+
+def test_compare_levels_qps_and_success_rate():
+    rows = compare_levels({('open', '50'): level()}, {('open', '50'): level(qps=80.0, success_rate=97.0)},
+                          DEFAULT_REGRESSION)
+    assert rows[0]['regressions'] == ['QPS -20.0%', '成功率 -3.00pp']
+
+
+def test_compare_levels_skips_missing_levels():
+    rows = compare_levels({('closed', '10'): level(), ('closed', '20'): level()}, {('closed', '20'): level()},
+                          DEFAULT_REGRESSION)
+    assert [(row['mode'], row['level']) for row in rows] == [('closed', '20')]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+"""
+可扩展性模型测试
+作者: AI Assistant
+用途: USL 参数拟合、峰值并发与吞吐上限
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from scalability_model import MIN_LEVELS, fit_usl, max_throughput, usl_throughput
+
+LEVELS = [1, 2, 4, 8, 16, 32, 64]
+
+
+def test_fit_recovers_parameters():
+    throughput = usl_throughput(LEVELS, 100.0, 0.05, 0.001)
+    fit = fit_usl(LEVELS, throughput, samples=50)
+    assert fit['lambda'] == pytest.approx(100.0, rel=0.01)
+    assert fit['sigma'] == pytest.approx(0.05, abs=0.005)
+    assert fit['kappa'] == pytest.approx(0.001, rel=0.05)
+    assert fit['n_peak'] == pytest.approx(math.sqrt(0.95 / 0.001), rel=0.05)
+    assert fit['x_max'] == pytest.approx(float(max_throughput(100.0, 0.05, 0.001)), rel=0.02)
+    assert fit['r2'] > 0.99
+
+
+def test_linear_scaling_has_no_limit():
+    fit = fit_usl(LEVELS, [100.0 * n for n in LEVELS], samples=50)
+    assert fit['sigma'] < 1e-6
+    assert math.isinf(fit['n_peak'])
+    assert math.isinf(fit['x_max'])
+
+
+def test_negligible_sigma_is_treated_as_zero():
+    assert math.isinf(max_throughput(100.0, 3e-18, 0.0))
+    assert max_throughput(100.0, 0.01, 0.0) == pytest.approx(10000.0)
+
+
+def test_too_few_levels():
+    levels = LEVELS[:MIN_LEVELS - 1]
+    assert fit_usl(levels, np.asarray(levels) * 100.0) is None
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+"""
+混合负载场景测试
+作者: AI Assistant
+用途: 场景定义的读取与校验
+"""
+
+import json
+
+import pytest
+
+from scenarios import DEFAULT_TOKEN_TTL, ScenarioError, load_scenario
+
+
+def config(scenario):
+    return {'scenarios': {'test': scenario}}
+
+
+def test_weighted_requests_become_single_step_flows():
+    scenario = load_scenario(config({
+        'requests': {
+            'attest': {'kind': 'attest', 'weight': 1},
+            'resource': {'kind': 'resource', 'weight': 4},
+            'health': {'path': '/health'}
+        }
+    }), 'test')
+    assert [(flow['name'], flow['weight']) for flow in scenario['flows']] == [('attest', 1), ('resource', 4)]
+    health = scenario['requests']['health']
+    assert (health['kind'], health['method'], health['expect']) == ('http', 'GET', [200])
+    assert scenario['token_ttl_seconds'] == DEFAULT_TOKEN_TTL
+
+
+def test_explicit_flows_and_scenario_file(tmp_path):
+    path = tmp_path / 'scenarios.json'
+    path.write_text(json.dumps(config({
+        'requests': {'attest': {'kind': 'attest'}, 'resource': {'kind': 'resource'}},
+        'flows': [{'weight': 1, 'steps': [{'request': 'attest', 'once': True}, {'request': 'resource', 'repeat': 3}]}]
+    })), encoding='utf-8')
+    scenario = load_scenario({}, 'test', str(path))
+    assert scenario['flows'][0]['name'] == 'flow1'
+
+
+def test_repository_scenarios_are_valid():
+    from load_generator import DEFAULT_CONFIG, load_config
+    repo_config = load_config(DEFAULT_CONFIG)
+    for name in repo_config.get('scenarios', {}):
+        assert load_scenario(repo_config, name)['flows']
+
+
+@pytest.mark.parametrize('scenario, message', [
+    ({'requests': {}}, '没有定义请求类型'),
+    ({'requests': {'x': {'kind': 'grpc', 'weight': 1}}}, '类型 grpc 不支持'),
+    ({'requests': {'x': {'kind': 'http', 'weight': 1}}}, '需要 path 或 url'),
+    ({'requests': {'x': {'path': '/a', 'auth': 'basic', 'weight': 1}}}, 'auth 取值'),
+    ({'requests': {'x': {'kind': 'attest'}}}, '没有权重为正'),
+    ({'requests': {'x': {'kind': 'attest'}}, 'flows': [{'name': 'f', 'weight': 0, 'steps': [{'request': 'x'}]}]},
+     '需要正权重'),
+    ({'requests': {'x': {'kind': 'attest'}}, 'flows': [{'name': 'f', 'steps': [{'request': 'y'}]}]},
+     '未定义的请求 y'),
+    ({'requests': {'x': {'kind': 'attest'}}, 'flows': [{'name': 'f', 'steps': [{'request': 'x', 'repeat': 0}]}]},
+     'repeat 至少为 1'),
+    ({'requests': {'x': {'path': '/policy', 'auth': 'admin', 'weight': 1}}}, '需要 admin_token')
+])
+def test_invalid_scenarios(scenario, message):
+    with pytest.raises(ScenarioError, match=message):
+        load_scenario(config(scenario), 'test')
+
+
+def test_unknown_scenario_and_unreadable_file(tmp_path):
+    with pytest.raises(ScenarioError, match='未找到场景 missing'):
+        load_scenario(config({'requests': {}}), 'missing')
+    with pytest.raises(ScenarioError, match='无法读取场景文件'):
+        load_scenario({}, 'test', str(tmp_path / 'absent.json'))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+尾部请求采集测试
+作者: AI Assistant
+用途: 最慢 / 失败请求蓄水池与多来源合并
+"""
+
+import random
+
+from tail_capture import TailReservoir, merge_tails
+
+
+def record(duration, start_time=0.0, failed=False):
+    return {'duration': duration, 'start_time': start_time, 'failed': failed}
+
+
+def test_reservoir_keeps_slowest():
+    reservoir = TailReservoir(slowest=3, failed=2)
+    for duration in [5, 1, 9, 3, 7, 2, 8]:
+        reservoir.add(duration, False, record(duration))
+    assert [item['duration'] for item in reservoir.slowest()] == [9, 8, 7]
+    assert not reservoir.is_slow(6)
+    assert reservoir.is_slow(10)
+
+
+def test_reservoir_samples_failures():
+    random.seed(1)
+    reservoir = TailReservoir(slowest=1, failed=2)
+    for index in range(10):
+        reservoir.add(0.1, True, record(0.1, start_time=index, failed=True))
+    assert reservoir.failed_total == 10
+    failed = reservoir.failed()
+    assert len(failed) == 2
+    assert failed[0]['start_time'] < failed[1]['start_time']
+    assert reservoir.slowest() == []
+    summary = reservoir.to_dict()
+    assert summary['failed_total'] == 10
+    assert len(reservoir.records()) == 2
+
+
+def test_zero_sized_reservoir():
+    reservoir = TailReservoir(slowest=0, failed=0)
+    reservoir.add(1.0, False, record(1.0))
+    reservoir.add(1.0, True, record(1.0, failed=True))
+    assert reservoir.records() == []
+    assert reservoir.failed_total == 1
+
+
+def test_merge_tails():
+    first = TailReservoir(slowest=2, failed=5)
+    second = TailReservoir(slowest=3, failed=5)
+    for duration in [1, 4, 6]:
+        first.add(duration, False, record(duration))
+    for duration in [2, 5, 3]:
+        second.add(duration, False, record(duration))
+    for index in range(3):
+        first.add(0.5, True, record(0.5, start_time=10 + index, failed=True))
+        second.add(0.5, True, record(0.5, start_time=index, failed=True))
+    merged = merge_tails([first.to_dict(), None, second.to_dict()])
+    assert merged['slowest_size'] == 3
+    assert [item['duration'] for item in merged['slowest']] == [6, 5, 4]
+    assert merged['failed_total'] == 6
+    starts = [item['start_time'] for item in merged['failed']]
+    assert len(starts) == 5
+    assert starts == sorted(starts)
+    assert set(starts) <= {0, 1, 2, 10, 11, 12}
+
+
+def test_merge_tails_empty():
+    assert merge_tails([]) == {}
+    assert merge_tails([None, {}]) == {}